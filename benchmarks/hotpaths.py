@@ -0,0 +1,276 @@
+"""Micro-benchmarks of the QueryShield hot paths.
+
+Measures what every CI build pays: the per-query cost of the Django probe
+(``ProbeWrapper.__call__``) and the SQLAlchemy listener, ``normalize_sql``
+throughput, N+1 classification of a million events, ``build_report`` plus
+writing the JSON, ``check_budgets`` on a large report, and recorder
+memory per event.
+
+    python benchmarks/hotpaths.py --output .queryshield/hotpaths.json
+    python benchmarks/hotpaths.py --quick --only normalize_sql
+
+Results are written as JSON (commit, environment, and per benchmark the
+distribution of the per-operation time over the repeats) so runs on two
+commits can be compared; ``queryshield bench --compare`` style tooling
+can read the ``samples``.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import synthetic
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+        INSTALLED_APPS=[],
+        USE_TZ=True,
+    )
+    django.setup()
+
+from queryshield_probe.bench import _git_commit, summarize  # noqa: E402
+from queryshield_probe.budgets import check_budgets  # noqa: E402
+from queryshield_probe.capture import ProbeWrapper, QueryEvent, Recorder  # noqa: E402
+from queryshield_probe.classify import classify_n_plus_one  # noqa: E402
+from queryshield_probe.report import build_report, write_report  # noqa: E402
+from queryshield_probe.utils import normalize_sql, params_hash  # noqa: E402
+
+# name -> (unit, function(scale) returning a timed callable and its op count)
+Benchmark = Callable[[float], Tuple[Callable[[], Any], int]]
+BENCHMARKS: Dict[str, Tuple[str, Benchmark]] = {}
+
+
+def benchmark(name: str, unit: str = "us/op"):
+    def register(fn: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = (unit, fn)
+        return fn
+
+    return register
+
+
+def _events(n: int) -> List[QueryEvent]:
+    out: List[QueryEvent] = []
+    for f in synthetic.event_fields(n):
+        e = QueryEvent()
+        e.sql = f["sql"]
+        e.params = f["params"]
+        e.duration_ms = f["duration_ms"]
+        e.stack = f["stack"]
+        out.append(e)
+    return out
+
+
+class _Connection:
+    """Just enough of a Django / SQLAlchemy connection for the probes."""
+
+    alias = "default"
+    vendor = "postgresql"
+
+    def __init__(self) -> None:
+        self.info: Dict[str, Any] = {}
+        self.dialect = type("Dialect", (), {"name": "postgresql"})()
+
+
+class _Cursor:
+    rowcount = 1
+
+
+def _noop_execute(sql, params, many, context):
+    return None
+
+
+@benchmark("probe_wrapper_call")
+def bench_probe_wrapper(scale: float):
+    n = int(20000 * scale)
+    sql = synthetic.sql_corpus(1)[0]
+    context = {"connection": _Connection(), "cursor": _Cursor()}
+
+    def run():
+        recorder = Recorder()
+        probe = ProbeWrapper(recorder)
+        for _ in range(n):
+            probe(_noop_execute, sql, (1,), False, context)
+
+    return run, n
+
+
+@benchmark("sqlalchemy_listener")
+def bench_sqlalchemy_listener(scale: float):
+    from queryshield_sqlalchemy.probe import ProbeListener, Recorder as SARecorder
+
+    n = int(20000 * scale)
+    sql = synthetic.sql_corpus(1)[0]
+    conn, cursor = _Connection(), _Cursor()
+
+    def run():
+        listener = ProbeListener(SARecorder())
+        for _ in range(n):
+            listener.before_cursor_execute(conn, cursor, sql, {"id": 1}, None, False)
+            listener.after_cursor_execute(conn, cursor, sql, {"id": 1}, None, False)
+
+    return run, n
+
+
+@benchmark("normalize_sql")
+def bench_normalize_sql(scale: float):
+    corpus = synthetic.sql_corpus(int(50000 * scale))
+
+    def run():
+        for sql in corpus:
+            normalize_sql(sql)
+
+    return run, len(corpus)
+
+
+@benchmark("params_hash")
+def bench_params_hash(scale: float):
+    params = [(i, f"title {i}", None, 3.5) for i in range(int(50000 * scale))]
+
+    def run():
+        for p in params:
+            params_hash(p)
+
+    return run, len(params)
+
+
+@benchmark("classify_n_plus_one_1m")
+def bench_classify(scale: float):
+    events = _events(int(1_000_000 * scale))
+
+    def run():
+        classify_n_plus_one(events)
+
+    return run, len(events)
+
+
+def _recorder(tests: int, per_test: int) -> Recorder:
+    recorder = Recorder()
+    events = _events(tests * per_test)
+    for i in range(tests):
+        recorder.start_test(f"app.tests.test_mod.Case.test_{i}")
+        for e in events[i * per_test:(i + 1) * per_test]:
+            recorder.record(e)
+        recorder.end_test()
+    return recorder
+
+
+@benchmark("build_report", unit="ms/report")
+def bench_build_report(scale: float):
+    recorder = _recorder(int(500 * scale) or 1, 200)
+
+    def run():
+        build_report(recorder, explain=False)
+
+    return run, 1
+
+
+@benchmark("write_report_json", unit="ms/report")
+def bench_write_report(scale: float):
+    report = build_report(_recorder(int(500 * scale) or 1, 200), explain=False)
+    path = os.path.join(tempfile.mkdtemp(), "report.json")
+
+    def run():
+        write_report(report, path)
+
+    return run, 1
+
+
+@benchmark("check_budgets", unit="us/test")
+def bench_check_budgets(scale: float):
+    report = synthetic.report(int(10000 * scale) or 1)
+    budgets = {
+        "defaults": {"max_queries": 40, "max_p99_ms": 2.0, "max_nplus1_cluster": 30, "forbid": ["N+1"]},
+        "tests": {"app.tests.test_mod1": {"max_queries": 100}, "*Case3*": {"max_rows": 100}},
+    }
+
+    def run():
+        check_budgets(budgets, report)
+
+    return run, len(report["tests"])
+
+
+def _recorder_memory(scale: float) -> Dict[str, Any]:
+    """Bytes retained by the recorder per recorded event (event included)."""
+    fields = list(synthetic.event_fields(int(100000 * scale)))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    recorder = Recorder(nplus1_threshold=5)
+    recorder.start_test("t")
+    for f in fields:
+        e = QueryEvent()
+        e.sql = f["sql"]
+        e.params = f["params"]
+        e.params_hash = params_hash(f["params"])
+        e.duration_ms = f["duration_ms"]
+        e.stack = list(f["stack"])
+        recorder.record(e)
+    recorder.end_test()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {"unit": "bytes/event", "value": round(used / len(fields), 1), "events": len(fields)}
+
+
+def _time(run: Callable[[], Any], ops: int, repeat: int, per: float) -> List[float]:
+    samples: List[float] = []
+    run()  # warmup
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * per / ops)
+    return samples
+
+
+def run_benchmarks(scale: float = 1.0, repeat: int = 5, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, (unit, fn) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        run, ops = fn(scale)
+        per = 1e3 if unit.startswith("ms") else 1e6
+        samples = _time(run, ops, repeat, per)
+        results[name] = {"unit": unit, "ops": ops, **summarize(samples)}
+        print(f"{name:<24} {results[name]['median']:>12.3f} {unit}", file=sys.stderr)
+    if not only or "recorder_memory" in only:
+        results["recorder_memory"] = _recorder_memory(scale)
+        print(f"{'recorder_memory':<24} {results['recorder_memory']['value']:>12.1f} bytes/event", file=sys.stderr)
+    return {
+        "version": "1",
+        "kind": "microbench",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": _git_commit(),
+        "environment": {"python": sys.version.split()[0], "platform": sys.platform},
+        "scale": scale,
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=".queryshield/hotpaths.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Run at a tenth of the default sizes")
+    parser.add_argument("--only", action="append", help="Benchmark name (repeatable)")
+    args = parser.parse_args(argv)
+    result = run_benchmarks(scale=0.1 if args.quick else 1.0, repeat=args.repeat, only=args.only)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Synthetic query events and reports for the hot-path benchmarks.
+
+Everything is generated from a seeded RNG so two runs (or two commits)
+measure the same input.
+"""
+
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+TABLES = ("app_book", "app_author", "app_review", "app_publisher", "auth_user", "app_order")
+COLUMNS = ("id", "author_id", "title", "created_at", "status", "price", "user_id")
+
+_TEMPLATES = (
+    'SELECT "{t}"."id", "{t}"."{c}" FROM "{t}" WHERE "{t}"."{c}" = {n}',
+    'SELECT "{t}"."id", "{t}"."{c}" FROM "{t}" WHERE "{t}"."{c}" IN ({ns}) ORDER BY "{t}"."created_at" DESC',
+    "SELECT COUNT(*) AS \"__count\" FROM \"{t}\" WHERE \"{t}\".\"{c}\" = '{s}'",
+    'INSERT INTO "{t}" ("{c}", "created_at") VALUES ({n}, \'2024-01-0{d} 10:00:00\') RETURNING "{t}"."id"',
+    'UPDATE "{t}" SET "{c}" = {n} WHERE "{t}"."id" = {m}',
+    'SELECT "{t}"."id" FROM "{t}" INNER JOIN "{u}" ON ("{t}"."{c}" = "{u}"."id") WHERE "{u}"."{c}" > {n} LIMIT 21',
+)
+
+
+def random_sql(rng: random.Random) -> str:
+    t, u = rng.sample(TABLES, 2)
+    return rng.choice(_TEMPLATES).format(
+        t=t,
+        u=u,
+        c=rng.choice(COLUMNS),
+        n=rng.randint(1, 100000),
+        m=rng.randint(1, 100000),
+        ns=", ".join(str(rng.randint(1, 1000)) for _ in range(rng.randint(2, 12))),
+        s="".join(rng.choice("abcdefgh") for _ in range(8)),
+        d=rng.randint(1, 9),
+    )
+
+
+def sql_corpus(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [random_sql(rng) for _ in range(n)]
+
+
+def _stacks(rng: random.Random, n: int) -> List[List[Tuple[str, str, int]]]:
+    return [
+        [(f"app/views_{i % 7}.py", f"view_{i}", rng.randint(1, 400)), ("app/tests.py", "test_view", i)]
+        for i in range(n)
+    ]
+
+
+def event_fields(n: int, seed: int = 2, loop_share: float = 0.3) -> Iterator[Dict[str, Any]]:
+    """Query event fields; ``loop_share`` of them come from N+1 style loops."""
+    rng = random.Random(seed)
+    stacks = _stacks(rng, 200)
+    loop_sql = [f'SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = {i}' for i in range(50)]
+    for i in range(n):
+        if rng.random() < loop_share:
+            sql, stack = rng.choice(loop_sql), stacks[i % 5]
+        else:
+            sql, stack = random_sql(rng), rng.choice(stacks)
+        yield {
+            "sql": sql,
+            "params": (rng.randint(1, 1000),),
+            "duration_ms": rng.expovariate(2.0),
+            "stack": stack,
+            "db_alias": "default",
+        }
+
+
+def report(tests: int, queries_per_test: int = 50, seed: int = 3) -> Dict[str, Any]:
+    """Report-shaped document as ``build_report`` writes it."""
+    rng = random.Random(seed)
+    out: List[Dict[str, Any]] = []
+    for i in range(tests):
+        durations = [rng.expovariate(2.0) for _ in range(queries_per_test)]
+        ordered = sorted(durations)
+        out.append(
+            {
+                "name": f"app.tests.test_mod{i % 100}.Case{i % 10}.test_{i}",
+                "duration_ms": sum(durations),
+                "queries_total": queries_per_test,
+                "queries_p95_ms": ordered[int(0.95 * (len(ordered) - 1))],
+                "queries_p99_ms": ordered[int(0.99 * (len(ordered) - 1))],
+                "query_max_ms": ordered[-1],
+                "rows_total": rng.randint(0, 5000),
+                "top_fingerprint": {"sql": "SELECT ?", "count": rng.randint(1, 20)},
+                "problems": [
+                    {"id": f"n+1:app/views.py:{i}", "type": "N+1", "evidence": {"cluster_count": rng.randint(5, 40)}}
+                ]
+                if i % 3 == 0
+                else [],
+                "queries": [
+                    {"normalized_sql": "SELECT ?", "duration_ms": d, "tags": []} for d in durations
+                ],
+            }
+        )
+    return {"version": "1", "tests": out}
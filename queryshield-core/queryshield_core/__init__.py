@@ -9,33 +9,38 @@ This package contains reusable components:
 - Utility functions
 """
 
-__version__ = "0.2.0"
+__version__ = "0.3.0"
 __author__ = "QueryShield"
 __email__ = "dev@queryshield.io"
 
 # Analysis engines
-from queryshield_core.analysis.classify import classify_n_plus_one, classify_all
+from queryshield_core.analysis.classify import NPlusOneTracker, classify_n_plus_one, classify_all
 from queryshield_core.analysis.explain_checks import explain_classify
-
-# TODO: These modules need to be created
-# from queryshield_core.analysis.explain_pg import (
-#     explain_query as explain_query_postgres,
-#     plan_has_seq_scan_with_filter,
-#     plan_has_sort_without_index,
-# )
-# from queryshield_core.analysis.explain_mysql import explain_query as explain_query_mysql
-# from queryshield_core.analysis.explain_checks import (
-#     analyze_plan_missing_index,
-#     analyze_plan_sort_without_index,
-#     analyze_select_star_large,
-# )
-# from queryshield_core.analysis.cost_analysis import (
-#     calculate_monthly_cost,
-#     estimate_fix_time,
-#     calculate_problem_cost,
-#     rank_problems_by_roi,
-#     generate_cost_summary,
-# )
+from queryshield_core.analysis.explain_pg import (
+    ExplainSession,
+    explain_query as explain_query_postgres,
+    plan_has_seq_scan_with_filter,
+    plan_has_sort_without_index,
+)
+from queryshield_core.analysis.explain_mysql import explain_query as explain_query_mysql
+from queryshield_core.analysis.explain_sqlite import explain_query as explain_query_sqlite
+from queryshield_core.analysis.explain_checks import (
+    analyze_plan_missing_index,
+    analyze_plan_sort_without_index,
+    analyze_select_star_large,
+)
+from queryshield_core.analysis.plan_visitor import PlanRule, PlanRules, PlanWalk
+from queryshield_core.analysis.index_advisor import advise_indexes
+from queryshield_core.analysis.hypopg import validate_index_advice
+from queryshield_core.analysis.pg_stats import StatsTracker, usage_report
+from queryshield_core.analysis.rollup import FingerprintRollup
+from queryshield_core.analysis.cost_analysis import (
+    calculate_monthly_cost,
+    estimate_fix_time,
+    calculate_problem_cost,
+    rank_problems_by_roi,
+    generate_cost_summary,
+)
 
 # Budget checking
 # from queryshield_core.budgets import load_budgets, check_budgets
@@ -45,23 +50,34 @@ from queryshield_core.analysis.explain_checks import explain_classify
 
 __all__ = [
     # Analysis
+    "NPlusOneTracker",
     "classify_n_plus_one",
     "classify_all",
     "explain_classify",
+    "ExplainSession",
+    "explain_query_postgres",
+    "explain_query_mysql",
+    "explain_query_sqlite",
+    "plan_has_seq_scan_with_filter",
+    "plan_has_sort_without_index",
+    "analyze_plan_missing_index",
+    "analyze_plan_sort_without_index",
+    "analyze_select_star_large",
+    "PlanWalk",
+    "PlanRule",
+    "PlanRules",
+    "advise_indexes",
+    "validate_index_advice",
+    "StatsTracker",
+    "usage_report",
+    "FingerprintRollup",
+    # Cost
+    "calculate_monthly_cost",
+    "estimate_fix_time",
+    "calculate_problem_cost",
+    "rank_problems_by_roi",
+    "generate_cost_summary",
     # TODO: Add back when modules exist
-    # "explain_query_postgres",
-    # "explain_query_mysql",
-    # "plan_has_seq_scan_with_filter",
-    # "plan_has_sort_without_index",
-    # "analyze_plan_missing_index",
-    # "analyze_plan_sort_without_index",
-    # "analyze_select_star_large",
-    # # Cost
-    # "calculate_monthly_cost",
-    # "estimate_fix_time",
-    # "calculate_problem_cost",
-    # "rank_problems_by_roi",
-    # "generate_cost_summary",
     # # Budgets
     # "load_budgets",
     # "check_budgets",
@@ -1,13 +1,16 @@
 """Query analysis module with AI suggestions"""
 
-from queryshield_core.analysis.classify import classify_n_plus_one, classify_all
+from queryshield_core.analysis.classify import NPlusOneTracker, classify_n_plus_one, classify_all
 from queryshield_core.analysis.explain_checks import explain_classify
+from queryshield_core.analysis.rollup import FingerprintRollup
 from queryshield_core.analysis.ml_suggestions import AIAnalyzer, Suggestion
 
 __all__ = [
+    "NPlusOneTracker",
     "classify_n_plus_one",
     "classify_all",
     "explain_classify",
+    "FingerprintRollup",
     "AIAnalyzer",
     "Suggestion",
 ]
@@ -1,68 +1,487 @@
 """EXPLAIN plan analysis and classification"""
 
+from __future__ import annotations
 
-def explain_classify(explain_plan):
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from queryshield_core.analysis.explain_sqlite import constraint_columns
+from queryshield_core.analysis.plan_visitor import ANY_NODE, PlanNode, PlanRule, PlanRules, PlanWalk
+from queryshield_core.utils import normalize_sql
+
+
+LARGE_ROWS_THRESHOLD = 10_000
+
+
+# A column compared with a parameter or literal, e.g. ``(author_id = $1)`` or
+# ``((name)::text = 'x'::text)``; column-to-column (join) comparisons are skipped
+_re_where_eq = re.compile(
+    r"([A-Za-z_][A-Za-z0-9_\.\"]*)\)?(?:::\w+(?:\s\w+)*)?\s*(?:=|<>|!=|<=|>=|<|>|~~\*?)\s*(?=[$?'\d(-]|ANY\b)"
+)
+_re_select_star = re.compile(r"^\s*SELECT\s+\*\s+FROM\s", re.IGNORECASE)
+
+
+def _hash_id(*parts: str) -> str:
+    h = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:8]
+    return h
+
+
+def _estimated_rows(plan: Dict[str, Any]) -> int:
+    # EXPLAIN JSON uses 'Plan Rows' for estimates
+    return int(plan.get("Plan Rows") or plan.get("Rows") or 0)
+
+
+def _filter_columns_text(filter_text: Optional[str]) -> List[str]:
+    if not filter_text:
+        return []
+    cols = []
+    for m in _re_where_eq.finditer(filter_text):
+        # normalize quoted and table-qualified names
+        col = m.group(1).replace('"', "").split(".")[-1]
+        if col and col not in cols:
+            cols.append(col)
+    return cols
+
+
+def _qident(name: str) -> str:
+    q = name.replace('"', '""')
+    return f'"{q}"'
+
+
+def _qpath(parts: List[str]) -> str:
+    return ".".join(_qident(p) for p in parts if p)
+
+
+def _quote_colspec(spec: str) -> str:
+    s = spec.strip()
+    if not s:
+        return s
+    parts = s.split()
+    head = parts[0]
+    rest = " ".join(parts[1:])
+    if "." in head:
+        head_q = _qpath([p for p in head.split(".") if p])
+    else:
+        head_q = _qident(head)
+    return f"{head_q}{(' ' + rest) if rest else ''}"
+
+
+def _check_pg_missing_index(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    if not n.get("Filter"):
+        return None
+    rows = _estimated_rows(n.node)
+    if rows < LARGE_ROWS_THRESHOLD:
+        return None
+    relation = n.get("Relation Name") or n.get("Alias") or "<table>"
+    schema = n.get("Schema") or "public"
+    cols = _filter_columns_text(n.get("Filter"))
+    columns = cols or ["<column>"]
+    ddl_cols = ", ".join(_quote_colspec(c) for c in columns)
+    idx_name = f"idx_{relation}_{_hash_id(''.join(columns))}"
+    ddl = (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_qident(idx_name)} "
+        f"ON {_qpath([schema, relation])}({ddl_cols});"
+    )
+    suggestion = {
+        "kind": "create_index",
+        "args": {"schema": schema, "table": relation, "columns": columns},
+        "ddl": ddl,
+    }
+    pid = f"explain:missing_index:{_hash_id(normalize_sql(sql))}"
+    return {
+        "id": pid,
+        "type": "MISSING_INDEX",
+        "evidence": {
+            "schema": schema,
+            "relation": relation,
+            "estimated_rows": rows,
+            "filter": n.get("Filter"),
+        },
+        "suggestion": suggestion,
+        "explain": {"node": "Seq Scan"},
+    }
+
+
+def _check_pg_sort_without_index(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    below = walk.descendants(n)
+    if any(d.kind in ("Index Scan", "Index Only Scan") for d in below):
+        return None
+    keys = n.get("Sort Key") or []
+    # naive: prefix with equality filters extracted from a child node if any
+    eq_cols: List[str] = []
+    for ch in n.children:
+        eq_cols.extend(_filter_columns_text(ch.get("Filter")))
+    cols = eq_cols + keys
+    ddl_cols = ", ".join(_quote_colspec(c) for c in (cols or ["<columns>"]))
+    idx_name = f"idx_sort_{_hash_id(''.join(cols))}"
+    # Try to find the underlying relation name from descendants
+    rel = None
+    schema = None
+    for ch in below:
+        rel = ch.get("Relation Name") or ch.get("Alias") or rel
+        schema = ch.get("Schema") or schema
+    table = rel or "<table>"
+    schema = schema or "public"
+    ddl = (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_qident(idx_name)} "
+        f"ON {_qpath([schema, table])}({ddl_cols});"
+    )
+    pid = f"explain:sort_without_index:{_hash_id(normalize_sql(sql))}"
+    return {
+        "id": pid,
+        "type": "SORT_WITHOUT_INDEX",
+        "evidence": {"sort_keys": keys},
+        "suggestion": {
+            "kind": "create_index",
+            "args": {"schema": schema, "table": table, "columns": cols or ["<columns>"]},
+            "ddl": ddl,
+        },
+        "explain": {"node": "Sort"},
+    }
+
+
+def _sqlite_index_ddl(table: str, columns: List[str], prefix: str = "idx") -> str:
+    ddl_cols = ", ".join(_quote_colspec(c) for c in columns)
+    idx_name = f"{prefix}_{table}_{_hash_id(''.join(columns))}"
+    return f"CREATE INDEX IF NOT EXISTS {_qident(idx_name)} ON {_qident(table)}({ddl_cols});"
+
+
+def _sqlite_loops(n: PlanNode) -> List[PlanNode]:
+    siblings = n.parent.children if n.parent else [n]
+    return [m for m in siblings if m.kind in ("SCAN", "SEARCH")]
+
+
+def _check_sqlite_missing_index(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    """Flag full scans and automatic indexes in an SQLite EXPLAIN QUERY PLAN tree.
+
+    SQLite reports no row estimates, so a ``SCAN`` is flagged when the
+    statement filters that table, or joins it as an inner loop. An automatic
+    index (or bloom filter) means SQLite built a transient index per run.
     """
-    Analyze EXPLAIN plan and classify query performance issues.
-    
+    table = n.get("table")
+    if not table:
+        return None
+    columns: List[str] = []
+    node = None
+    if n.get("automatic"):
+        columns = constraint_columns(n.get("constraint"))
+        node = n.kind
+    elif n.kind == "SCAN" and not n.get("index"):
+        columns = list(n.get("filter_columns") or [])
+        loops = _sqlite_loops(n)
+        if not columns and loops and loops[0] is not n:
+            columns = list(n.get("join_columns") or [])
+        node = "SCAN"
+    if not columns:
+        return None
+    pid = f"explain:missing_index:{_hash_id(normalize_sql(sql))}"
+    return {
+        "id": pid,
+        "type": "MISSING_INDEX",
+        "evidence": {
+            "relation": table,
+            "estimated_rows": None,
+            "detail": n.get("detail"),
+        },
+        "suggestion": {
+            "kind": "create_index",
+            "args": {"schema": None, "table": table, "columns": columns},
+            "ddl": _sqlite_index_ddl(table, columns),
+        },
+        "explain": {"node": node},
+    }
+
+
+def _check_sqlite_sort_without_index(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    """Flag ``USE TEMP B-TREE FOR ORDER BY`` in an SQLite plan tree."""
+    detail = str(n.get("detail") or "")
+    if not (detail.startswith("USE TEMP B-TREE") and "ORDER BY" in detail):
+        return None
+    # The outermost loop at the same level decides the output order
+    loops = _sqlite_loops(n)
+    table = loops[0].get("table") if loops else None
+    keys = [key for (tbl, key) in walk.plan.get("order_by") or [] if tbl in (None, table)]
+    eq_cols = list(loops[0].get("filter_columns") or []) if loops else []
+    cols = eq_cols + [k for k in keys if k not in eq_cols]
+    table = table or "<table>"
+    pid = f"explain:sort_without_index:{_hash_id(normalize_sql(sql))}"
+    return {
+        "id": pid,
+        "type": "SORT_WITHOUT_INDEX",
+        "evidence": {"sort_keys": keys, "detail": detail},
+        "suggestion": {
+            "kind": "create_index",
+            "args": {"schema": None, "table": table, "columns": cols or ["<columns>"]},
+            "ddl": _sqlite_index_ddl(table, cols or ["<columns>"], prefix="idx_sort"),
+        },
+        "explain": {"node": "USE TEMP B-TREE"},
+    }
+
+
+_MYSQL_COL = r"`([^`]+)`\.`([^`]+)`"
+_re_mysql_predicate = re.compile(
+    _MYSQL_COL + r"\s*(?:=|<=>|<>|!=|<=|>=|<|>|\bin\b|\blike\b|\bbetween\b|\bis\b)(?!\s*(?:`|\(`))",
+    re.IGNORECASE,
+)
+_re_mysql_join_eq = re.compile(_MYSQL_COL + r"\s*=\s*" + _MYSQL_COL)
+_re_order_by = re.compile(r"\bORDER\s+BY\s+(.*?)(?:\bLIMIT\b|\bOFFSET\b|\bFOR\s+UPDATE\b|$)", re.IGNORECASE | re.DOTALL)
+_re_group_by = re.compile(r"\bGROUP\s+BY\s+(.*?)(?:\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+
+
+def _sql_clause_columns(sql: str, clause) -> List[str]:
+    """Column list of an ORDER BY / GROUP BY clause, unqualified and unquoted."""
+    m = clause.search(sql)
+    if not m:
+        return []
+    out: List[str] = []
+    for part in m.group(1).split(","):
+        tokens = part.strip().split()
+        if not tokens:
+            continue
+        col = tokens[0].replace("`", "").replace('"', "").split(".")[-1]
+        if len(tokens) > 1 and tokens[1].upper() == "DESC":
+            col += " DESC"
+        out.append(col)
+    return out
+
+
+def _mysql_index_ddl(table: str, columns: List[str], prefix: str = "idx") -> str:
+    def q(name: str) -> str:
+        return "`" + name.replace("`", "``") + "`"
+
+    ddl_cols = []
+    for c in columns:
+        parts = c.split()
+        ddl_cols.append(q(parts[0]) + ("".join(" " + p for p in parts[1:])))
+    idx_name = f"{prefix}_{table}_{_hash_id(''.join(columns))}"
+    # INPLACE/LOCK=NONE is MySQL's equivalent of CREATE INDEX CONCURRENTLY
+    return f"ALTER TABLE {q(table)} ADD INDEX {q(idx_name)} ({', '.join(ddl_cols)}), ALGORITHM=INPLACE, LOCK=NONE;"
+
+
+def _mysql_condition_columns(condition: Optional[str], table: str) -> Tuple[List[str], List[str]]:
+    """(filter columns, join columns) of ``table`` in an ``attached_condition``."""
+    filters: List[str] = []
+    joins: List[str] = []
+    if not condition:
+        return filters, joins
+    for t1, c1, t2, c2 in _re_mysql_join_eq.findall(condition):
+        for t, c in ((t1, c1), (t2, c2)):
+            if t == table and c not in joins:
+                joins.append(c)
+    for t, c in _re_mysql_predicate.findall(condition):
+        if t == table and c not in filters:
+            filters.append(c)
+    return filters, joins
+
+
+def _check_mysql_missing_index(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    """Flag full table scans and key-less nested-loop joins in a MySQL plan.
+
+    A table with ``access_type: ALL`` is flagged when it examines at least
+    LARGE_ROWS_THRESHOLD rows per scan (or in total, for the inner table of
+    a join) and its attached condition names columns an index could serve.
+    """
+    access = n.get("access_type")
+    # "index" is a full index scan: no key narrows the inner loop either
+    if access != "ALL" and not (n.driver > 1 and access == "index"):
+        return None
+    table = n.get("table_name") or "<table>"
+    rows = int(n.get("rows_examined_per_scan") or 0)
+    filters, joins = _mysql_condition_columns(n.get("attached_condition"), table)
+    node = "ALL"
+    if n.driver > 1 and joins:
+        columns = joins
+        node = "nested_loop"
+        if rows * n.driver < LARGE_ROWS_THRESHOLD:
+            return None
+    elif filters and rows >= LARGE_ROWS_THRESHOLD:
+        columns = filters
+    else:
+        return None
+    pid = f"explain:missing_index:{_hash_id(normalize_sql(sql))}"
+    return {
+        "id": pid,
+        "type": "MISSING_INDEX",
+        "evidence": {
+            "relation": table,
+            "estimated_rows": rows,
+            "access_type": access,
+            "filter": n.get("attached_condition"),
+        },
+        "suggestion": {
+            "kind": "create_index",
+            "args": {"schema": None, "table": table, "columns": columns},
+            "ddl": _mysql_index_ddl(table, columns),
+        },
+        "explain": {"node": node},
+    }
+
+
+def _mysql_sort_problem(sql: str, n: PlanNode, walk: PlanWalk, keys: List[str], kind: str) -> Dict[str, Any]:
+    if n.kind == "table":
+        first = n.node
+    else:
+        tables = [d for d in walk.descendants(n) if d.kind == "table"] or walk.of_kind("table")
+        first = tables[0].node if tables else {}
+    table = first.get("table_name") or "<table>"
+    filters, _joins = _mysql_condition_columns(first.get("attached_condition"), table)
+    cols = filters + [k for k in keys if k not in filters]
+    return {
+        "id": f"explain:{kind}:{_hash_id(normalize_sql(sql))}",
+        "type": "SORT_WITHOUT_INDEX",
+        "evidence": {"sort_keys": keys, "relation": table},
+        "suggestion": {
+            "kind": "create_index",
+            "args": {"schema": None, "table": table, "columns": cols or ["<columns>"]},
+            "ddl": _mysql_index_ddl(table, cols or ["<columns>"], prefix="idx_sort"),
+        },
+        "explain": {"node": "using_filesort" if kind == "sort_without_index" else "using_temporary_table"},
+    }
+
+
+def _check_mysql_filesort(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    """Flag ``using_filesort``; keys come from the statement's ORDER BY."""
+    if not n.get("using_filesort"):
+        return None
+    keys = _sql_clause_columns(sql, _re_order_by)
+    return _mysql_sort_problem(sql, n, walk, keys, "sort_without_index")
+
+
+def _check_mysql_temporary_table(sql: str, n: PlanNode, walk: PlanWalk) -> Optional[Dict[str, Any]]:
+    """Flag ``using_temporary_table`` for GROUP BY / DISTINCT.
+
+    Reported as SORT_WITHOUT_INDEX: an index on the grouping columns lets
+    MySQL group in index order instead of through a temporary table.
+    """
+    if not n.get("using_temporary_table"):
+        return None
+    keys = _sql_clause_columns(sql, _re_group_by)
+    if not keys and n.kind != "grouping_operation":
+        keys = _sql_clause_columns(sql, _re_order_by)
+    return _mysql_sort_problem(sql, n, walk, keys, "temporary_table")
+
+
+def index_ddl(dialect: str, table: str, columns: List[str], schema: Optional[str] = None, prefix: str = "idx") -> str:
+    """CREATE INDEX statement for ``columns`` of ``table`` in the given SQL dialect."""
+    if dialect == "mysql":
+        return _mysql_index_ddl(table, columns, prefix=prefix)
+    if dialect == "sqlite":
+        return _sqlite_index_ddl(table, columns, prefix=prefix)
+    ddl_cols = ", ".join(_quote_colspec(c) for c in columns)
+    idx_name = f"{prefix}_{table}_{_hash_id(''.join(columns))}"
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_qident(idx_name)} "
+        f"ON {_qpath([schema or 'public', table])}({ddl_cols});"
+    )
+
+
+_RULE_PG_MISSING_INDEX = PlanRule("missing_index", ("Seq Scan",), _check_pg_missing_index)
+_RULE_PG_SORT = PlanRule("sort_without_index", ("Sort",), _check_pg_sort_without_index)
+_RULE_SQLITE_MISSING_INDEX = PlanRule(
+    "missing_index", ("SCAN", "SEARCH", "BLOOM FILTER"), _check_sqlite_missing_index
+)
+# The temp b-tree detail varies ("... FOR ORDER BY", "... FOR LAST 2 TERMS OF ORDER BY")
+_RULE_SQLITE_SORT = PlanRule("sort_without_index", (ANY_NODE,), _check_sqlite_sort_without_index)
+_RULE_MYSQL_MISSING_INDEX = PlanRule("missing_index", ("table",), _check_mysql_missing_index)
+# Either flag may sit on any operation object, or on the table itself
+_RULE_MYSQL_FILESORT = PlanRule("filesort", (ANY_NODE,), _check_mysql_filesort)
+_RULE_MYSQL_TEMPORARY = PlanRule("temporary_table", (ANY_NODE,), _check_mysql_temporary_table)
+
+_PLAN_RULES = {
+    "postgresql": PlanRules([_RULE_PG_MISSING_INDEX, _RULE_PG_SORT]),
+    "sqlite": PlanRules([_RULE_SQLITE_MISSING_INDEX, _RULE_SQLITE_SORT]),
+    "mysql": PlanRules([_RULE_MYSQL_MISSING_INDEX, _RULE_MYSQL_FILESORT, _RULE_MYSQL_TEMPORARY]),
+}
+
+
+def _run_rule(sql: str, plan: Dict[str, Any], rule: PlanRule) -> Optional[Dict[str, Any]]:
+    problems = PlanRules([rule]).evaluate(sql, PlanWalk(plan))
+    return problems[0] if problems else None
+
+
+def analyze_plan_missing_index(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_PG_MISSING_INDEX)
+
+
+def analyze_plan_sort_without_index(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_PG_SORT)
+
+
+def analyze_sqlite_missing_index(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_SQLITE_MISSING_INDEX)
+
+
+def analyze_sqlite_sort_without_index(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_SQLITE_SORT)
+
+
+def analyze_mysql_missing_index(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_MYSQL_MISSING_INDEX)
+
+
+def analyze_mysql_filesort(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_MYSQL_FILESORT)
+
+
+def analyze_mysql_temporary_table(sql: str, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _run_rule(sql, plan, _RULE_MYSQL_TEMPORARY)
+
+
+_SCAN_KINDS = ("Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+
+def analyze_select_star_large(
+    sql: str, plan: Optional[Dict[str, Any]], walk: Optional[PlanWalk] = None
+) -> Optional[Dict[str, Any]]:
+    if not _re_select_star.search(sql):
+        return None
+    est_rows = 0
+    relation = None
+    if plan:
+        walk = walk or PlanWalk(plan)
+        if walk.dialect == "mysql":
+            for t in walk.of_kind("table"):
+                est_rows = max(est_rows, int(t.get("rows_examined_per_scan") or 0))
+                relation = relation or t.get("table_name")
+        else:
+            for n in walk.of_kind(*_SCAN_KINDS):
+                est_rows = max(est_rows, _estimated_rows(n.node))
+                relation = relation or n.get("Relation Name")
+    if est_rows >= LARGE_ROWS_THRESHOLD:
+        pid = f"explain:select_star_large:{_hash_id(normalize_sql(sql))}"
+        return {
+            "id": pid,
+            "type": "SELECT_STAR_LARGE",
+            "evidence": {"estimated_rows": est_rows, "relation": relation},
+            "suggestion": {"kind": "avoid_select_star", "args": {"use": "load_only() / .only() or explicit columns"}},
+            "explain": {"node": "*"},
+        }
+    return None
+
+
+def explain_classify(sql: str, plan: Optional[Dict[str, Any]], db_alias: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Classify plan-level problems for one statement.
+
     Args:
-        explain_plan: Dict containing EXPLAIN plan output
-        
+        sql: Normalized statement the plan belongs to
+        plan: Root plan node from one of the explain_* handlers, or None
+        db_alias: Optional database alias to attach to each problem
+
     Returns:
-        List of classified issues with their severity
+        List of MISSING_INDEX / SORT_WITHOUT_INDEX / SELECT_STAR_LARGE problems
     """
-    if not explain_plan:
-        return []
-    
-    issues = []
-    
-    # Check for sequential scans
-    if _has_seq_scan(explain_plan):
-        issues.append({
-            "type": "SEQ_SCAN",
-            "severity": "HIGH",
-            "recommendation": "Add index on frequently scanned columns"
-        })
-    
-    # Check for expensive sorts
-    if _has_expensive_sort(explain_plan):
-        issues.append({
-            "type": "EXPENSIVE_SORT",
-            "severity": "MEDIUM",
-            "recommendation": "Add composite index with sort column"
-        })
-    
-    return issues
-
-
-def _has_seq_scan(explain_plan):
-    """Check if plan contains sequential scan nodes"""
-    if not explain_plan or "Plan" not in explain_plan:
-        return False
-    
-    return _search_plan_node(explain_plan["Plan"], "Seq Scan")
-
-
-def _has_expensive_sort(explain_plan):
-    """Check if plan contains expensive sort operations"""
-    if not explain_plan or "Plan" not in explain_plan:
-        return False
-    
-    return _search_plan_node(explain_plan["Plan"], "Sort")
-
-
-def _search_plan_node(node, node_type):
-    """Recursively search for node type in EXPLAIN plan"""
-    if not node:
-        return False
-    
-    if node.get("Node Type") == node_type:
-        return True
-    
-    # Check nested plans
-    if "Plans" in node:
-        for subplan in node["Plans"]:
-            if _search_plan_node(subplan, node_type):
-                return True
-    
-    return False
+    problems: List[Dict[str, Any]] = []
+    walk = None
+    if plan:
+        # One walk per plan; every rule of the dialect is dispatched from it
+        walk = PlanWalk(plan)
+        problems.extend(_PLAN_RULES[walk.dialect].evaluate(sql, walk))
+    # still allow select * detection even without plan
+    p = analyze_select_star_large(sql, plan, walk)
+    if p:
+        problems.append(p)
+    if db_alias:
+        for p in problems:
+            p["db_alias"] = db_alias
+    return problems
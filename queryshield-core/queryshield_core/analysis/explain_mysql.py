@@ -0,0 +1,47 @@
+"""MySQL EXPLAIN collection"""
+
+import json
+from typing import Any, Dict, Optional
+
+
+def explain_query(conn, sql: str, params, timeout_ms: int = 500) -> Optional[Dict[str, Any]]:
+    """Run EXPLAIN FORMAT=JSON for a MySQL query.
+
+    Requires MySQL 8.0+ with JSON support.
+
+    Args:
+        conn: DB-API connection to a MySQL database
+        sql: Statement in the driver's paramstyle
+        params: Statement parameters
+        timeout_ms: MAX_EXECUTION_TIME hint for the EXPLAIN
+
+    Returns:
+        The ``query_block`` dict or None if unsupported or on error
+    """
+    try:
+        cur = conn.cursor()
+        try:
+            try:
+                # MySQL doesn't support per-statement timeout directly,
+                # but we can use max_execution_time optimizer hint (MySQL 5.7.7+)
+                cur.execute(f"/*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */ EXPLAIN FORMAT=JSON {sql}", params)
+                row = cur.fetchone()
+            except Exception:
+                # Fallback: try without timeout hint if not supported
+                cur.execute(f"EXPLAIN FORMAT=JSON {sql}", params)
+                row = cur.fetchone()
+        finally:
+            cur.close()
+
+        if not row:
+            return None
+
+        # MySQL EXPLAIN FORMAT=JSON returns a single string column
+        data = row[0]
+        if isinstance(data, str):
+            data = json.loads(data)
+
+        # MySQL structure: {"query_block": {...}} at top level
+        return data.get("query_block") or data
+    except Exception:
+        return None
@@ -0,0 +1,235 @@
+"""PostgreSQL EXPLAIN collection and plan helpers"""
+
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+_warned_explain = False
+
+
+def _warn_explain_failed() -> None:
+    global _warned_explain
+    if not _warned_explain and os.getenv("QUERYSHIELD_DEBUG"):
+        print("QueryShield: EXPLAIN not permitted or failed; continuing without plans", file=sys.stderr)
+    _warned_explain = True
+
+
+def _plan_from_row(row) -> Optional[Dict[str, Any]]:
+    if not row:
+        return None
+    # EXPLAIN FORMAT JSON returns a single row with a JSON array
+    data = row[0]
+    if isinstance(data, str):
+        data = json.loads(data)
+    return data[0].get("Plan") if isinstance(data, list) else data.get("Plan")
+
+
+def _rollback(conn) -> None:
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+
+
+class ExplainSession:
+    """Runs EXPLAIN (FORMAT JSON) statements over one DB-API connection.
+
+    The statement timeout and any extra settings are applied once, in a single
+    ``set_config`` round trip, when the session opens. Plans are then issued
+    back-to-back at one round trip each, or pipelined with psycopg 3.
+
+    With ``dedicated=True`` the session owns ``conn``: it is switched to
+    autocommit and closed when the session ends. Otherwise the previous
+    values are restored on close.
+
+    Args:
+        conn: DB-API connection (psycopg 2/3, or a SQLAlchemy pool proxy)
+        timeout_ms: Per-statement timeout applied to every EXPLAIN
+        settings: Extra run-time parameters to set for the session
+        dedicated: Whether the session owns ``conn``
+    """
+
+    def __init__(
+        self,
+        conn,
+        timeout_ms: int = 500,
+        settings: Optional[Dict[str, Any]] = None,
+        dedicated: bool = True,
+    ) -> None:
+        self.conn = conn
+        self.timeout_ms = int(timeout_ms)
+        self.settings: Dict[str, str] = {"statement_timeout": str(self.timeout_ms)}
+        for name, value in (settings or {}).items():
+            self.settings[name] = str(value)
+        self.dedicated = dedicated
+        self._prev: Optional[Dict[str, str]] = None
+
+    def __enter__(self) -> "ExplainSession":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _execute(self, sql: str, params=None):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            return cur.fetchone()
+        finally:
+            cur.close()
+
+    def open(self) -> None:
+        if self.dedicated:
+            # A failed EXPLAIN must not abort a surrounding transaction. Pool
+            # proxies do not forward attribute writes, so switch the driver's
+            # connection
+            try:
+                self._driver_connection().autocommit = True
+            except Exception:
+                pass
+        else:
+            names = list(self.settings)
+            row = self._execute("SELECT " + ", ".join("current_setting(%s)" for _ in names), names)
+            self._prev = dict(zip(names, row))
+        self._set_config(self.settings)
+        if self.dedicated:
+            # Should autocommit be unavailable, a rollback after a failed
+            # EXPLAIN must still not revert the timeout
+            self.conn.commit()
+
+    def close(self) -> None:
+        try:
+            if self.dedicated:
+                self.conn.close()
+            elif self._prev:
+                self._set_config(self._prev)
+        except Exception:
+            pass
+        finally:
+            self._prev = None
+
+    def _set_config(self, values: Dict[str, str]) -> None:
+        params: List[str] = []
+        for name, value in values.items():
+            params.extend([name, value])
+        self._execute("SELECT " + ", ".join("set_config(%s, %s, false)" for _ in values), params)
+
+    def query(self, sql: str, params=None) -> List[Tuple[Any, ...]]:
+        """Run ``sql`` on the session's connection; rows, or [] if it returns none."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            return list(cur.fetchall()) if cur.description else []
+        except Exception:
+            _rollback(self.conn)
+            raise
+        finally:
+            cur.close()
+
+    def explain(self, sql: str, params) -> Optional[Dict[str, Any]]:
+        """Return the root plan node for ``sql`` or None on error."""
+        try:
+            return _plan_from_row(self._execute("EXPLAIN (FORMAT JSON) " + sql, params))
+        except Exception:
+            _rollback(self.conn)
+            _warn_explain_failed()
+            return None
+
+    def _driver_connection(self):
+        for name in ("driver_connection", "dbapi_connection"):
+            raw = getattr(self.conn, name, None)
+            if raw is not None:
+                return raw
+        return self.conn
+
+    def supports_pipeline(self) -> bool:
+        return hasattr(self._driver_connection(), "pipeline")
+
+    def explain_many(
+        self, statements: Sequence[Tuple[str, Any]], pipeline: bool = False
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Explain several statements, in pipeline mode when requested and available.
+
+        A failure inside the pipeline (e.g. one plan hitting the timeout) aborts
+        it, in which case the statements are re-issued one by one.
+        """
+        if pipeline and statements and self.supports_pipeline():
+            try:
+                return self._explain_pipelined(statements)
+            except Exception:
+                _rollback(self.conn)
+        return [self.explain(sql, params) for sql, params in statements]
+
+    def _explain_pipelined(self, statements: Sequence[Tuple[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        raw = self._driver_connection()
+        cursors = []
+        try:
+            with raw.pipeline():
+                for sql, params in statements:
+                    cur = raw.cursor()
+                    cursors.append(cur)
+                    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            return [_plan_from_row(cur.fetchone()) for cur in cursors]
+        finally:
+            for cur in cursors:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+
+
+def explain_query(conn, sql: str, params, timeout_ms: int = 500) -> Optional[Dict[str, Any]]:
+    """Run a single EXPLAIN (FORMAT JSON) with a statement timeout.
+
+    One-shot helper on the caller's connection; prefer ``ExplainSession`` when
+    explaining more than one statement.
+
+    Args:
+        conn: DB-API connection to a PostgreSQL database
+        sql: Statement in the driver's paramstyle
+        params: Statement parameters
+        timeout_ms: Statement timeout for the EXPLAIN
+
+    Returns:
+        The parsed plan dict (root node) or None on error
+    """
+    try:
+        with ExplainSession(conn, timeout_ms=timeout_ms, dedicated=False) as session:
+            return session.explain(sql, params)
+    except Exception:  # pragma: no cover - defensive
+        _rollback(conn)
+        _warn_explain_failed()
+        return None
+
+
+def plan_has_seq_scan_with_filter(plan: Dict[str, Any]) -> bool:
+    node_type = plan.get("Node Type")
+    if node_type == "Seq Scan" and plan.get("Filter"):
+        return True
+    for child in plan.get("Plans", []) or []:
+        if plan_has_seq_scan_with_filter(child):
+            return True
+    return False
+
+
+def plan_has_sort_without_index(plan: Dict[str, Any]) -> bool:
+    node_type = plan.get("Node Type")
+    if node_type == "Sort" and not _has_index_scan_on_sort_key(plan):
+        return True
+    for child in plan.get("Plans", []) or []:
+        if plan_has_sort_without_index(child):
+            return True
+    return False
+
+
+def _has_index_scan_on_sort_key(plan: Dict[str, Any]) -> bool:
+    node_type = plan.get("Node Type")
+    if node_type in {"Index Scan", "Index Only Scan"}:
+        return True
+    for child in plan.get("Plans", []) or []:
+        if _has_index_scan_on_sort_key(child):
+            return True
+    return False
@@ -0,0 +1,198 @@
+"""SQLite EXPLAIN QUERY PLAN collection and parsing"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# SQLite has no per-statement timeout, but EXPLAIN QUERY PLAN only compiles the
+# statement, so it returns in microseconds regardless of table size.
+
+_re_scan = re.compile(
+    r"^(?P<op>SCAN|SEARCH)\s+(?:TABLE\s+)?(?P<name>\S+)(?:\s+AS\s+(?P<alias>\S+))?"
+    r"(?:\s+USING\s+(?P<using>.*?))?(?:\s+\((?P<constraint>[^)]*)\))?\s*$",
+    re.IGNORECASE,
+)
+_re_bloom = re.compile(r"^BLOOM FILTER ON\s+(?P<name>\S+)\s*\((?P<constraint>[^)]*)\)", re.IGNORECASE)
+_re_index_name = re.compile(r"INDEX\s+(\S+)", re.IGNORECASE)
+_re_constraint_col = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)\s*(?:=|>|<|>=|<=)")
+
+_IDENT = r'"?([A-Za-z_][A-Za-z0-9_]*)"?'
+_re_from_join = re.compile(
+    r"(?:\bFROM|\bJOIN|,)\s*" + _IDENT + r"(?:\s+(?:AS\s+)?" + _IDENT + r")?",
+    re.IGNORECASE,
+)
+_re_predicate = re.compile(
+    r"(?:" + _IDENT + r"\.)?" + _IDENT
+    + r"\s*(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bLIKE\b|\bIS\b|\bBETWEEN\b)(?!\s*\"?[A-Za-z_][A-Za-z0-9_]*\"?\.)",
+    re.IGNORECASE,
+)
+_re_join_eq = re.compile(
+    _IDENT + r"\." + _IDENT + r"\s*=\s*" + _IDENT + r"\." + _IDENT,
+    re.IGNORECASE,
+)
+_re_clause_end = re.compile(r"\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|OFFSET)\b", re.IGNORECASE)
+_re_order_by = re.compile(r"\bORDER\s+BY\s+(.*?)(?:\bLIMIT\b|\bOFFSET\b|$)", re.IGNORECASE | re.DOTALL)
+_re_where = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_re_from = re.compile(r"\bFROM\b", re.IGNORECASE)
+
+_SQL_KEYWORDS = {
+    "WHERE", "INNER", "LEFT", "RIGHT", "OUTER", "CROSS", "FULL", "JOIN", "ON", "USING",
+    "GROUP", "ORDER", "LIMIT", "OFFSET", "HAVING", "UNION", "NATURAL", "WINDOW",
+}
+
+
+def explain_query(conn, sql: str, params, timeout_ms: int = 500) -> Optional[Dict[str, Any]]:
+    """Run EXPLAIN QUERY PLAN for an SQLite query and return a node tree.
+
+    Args:
+        conn: DB-API connection to an SQLite database
+        sql: Statement in the driver's paramstyle
+        params: Statement parameters
+        timeout_ms: Accepted for handler compatibility and ignored
+
+    Returns:
+        The root node or None on error
+    """
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute("EXPLAIN QUERY PLAN " + sql, params or ())
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+    except Exception:
+        return None
+    if not rows:
+        return None
+    return annotate_plan(build_plan_tree(rows), sql)
+
+
+def parse_detail(detail: str) -> Dict[str, Any]:
+    """Split one EXPLAIN QUERY PLAN ``detail`` string into structured fields."""
+    node: Dict[str, Any] = {"detail": detail, "op": detail, "children": []}
+    m = _re_scan.match(detail)
+    if m:
+        using = m.group("using") or ""
+        index = _re_index_name.search(using)
+        node.update(
+            {
+                "op": m.group("op").upper(),
+                "table": m.group("alias") or m.group("name"),
+                "index": index.group(1) if index else None,
+                "automatic": "AUTOMATIC" in using.upper(),
+                "covering": "COVERING" in using.upper(),
+                "primary_key": "PRIMARY KEY" in using.upper(),
+                "constraint": m.group("constraint"),
+            }
+        )
+        if node["automatic"]:
+            node["index"] = None
+        return node
+    m = _re_bloom.match(detail)
+    if m:
+        node.update(
+            {
+                "op": "BLOOM FILTER",
+                "table": m.group("name"),
+                "automatic": True,
+                "constraint": m.group("constraint"),
+            }
+        )
+    return node
+
+
+def build_plan_tree(rows: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    """Turn ``(id, parent, notused, detail)`` rows into a nested node tree."""
+    root: Dict[str, Any] = {"dialect": "sqlite", "id": 0, "detail": "QUERY PLAN", "op": "QUERY PLAN", "children": []}
+    by_id: Dict[Any, Dict[str, Any]] = {0: root}
+    for row in rows:
+        node_id, parent, detail = row[0], row[1], row[-1]
+        node = parse_detail(str(detail))
+        node["id"] = node_id
+        node["parent"] = parent
+        by_id[node_id] = node
+        by_id.get(parent, root)["children"].append(node)
+    return root
+
+
+def constraint_columns(constraint: Optional[str]) -> List[str]:
+    if not constraint:
+        return []
+    return [c for c in _re_constraint_col.findall(constraint) if c.lower() != "rowid"]
+
+
+def _table_aliases(sql: str) -> Dict[str, str]:
+    aliases: Dict[str, str] = {}
+    start = _re_from.search(sql)
+    if not start:
+        return aliases
+    where = _re_where.search(sql, start.start())
+    for m in _re_from_join.finditer(sql, start.start(), where.start() if where else len(sql)):
+        table, alias = m.group(1), m.group(2)
+        aliases.setdefault(table, table)
+        if alias and alias.upper() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def _where_text(sql: str) -> str:
+    m = _re_where.search(sql)
+    if not m:
+        return ""
+    rest = sql[m.end():]
+    end = _re_clause_end.search(rest)
+    return rest[: end.start()] if end else rest
+
+
+def _order_by(sql: str) -> List[Tuple[Optional[str], str]]:
+    m = _re_order_by.search(sql)
+    if not m:
+        return []
+    keys: List[Tuple[Optional[str], str]] = []
+    for part in m.group(1).split(","):
+        tokens = part.strip().split()
+        if not tokens:
+            continue
+        head = tokens[0].replace('"', "").split(".")
+        qual, col = (head[0], head[-1]) if len(head) > 1 else (None, head[0])
+        direction = " DESC" if len(tokens) > 1 and tokens[1].upper() == "DESC" else ""
+        keys.append((qual, col + direction))
+    return keys
+
+
+def annotate_plan(root: Dict[str, Any], sql: str) -> Dict[str, Any]:
+    """Attach table names and the predicate/sort columns of ``sql`` to plan nodes.
+
+    SQLite plans carry no filters or sort keys, so they are read from the
+    statement itself: ``filter_columns`` are compared against parameters or
+    literals, ``join_columns`` against another table's column.
+    """
+    aliases = _table_aliases(sql)
+    single = next(iter(set(aliases.values()))) if len(set(aliases.values())) == 1 else None
+    filters: Dict[str, List[str]] = {}
+    for qual, col in _re_predicate.findall(_where_text(sql)):
+        table = aliases.get(qual) if qual else single
+        if table and col not in filters.setdefault(table, []):
+            filters[table].append(col)
+    joins: Dict[str, List[str]] = {}
+    for q1, c1, q2, c2 in _re_join_eq.findall(sql):
+        for qual, col in ((q1, c1), (q2, c2)):
+            table = aliases.get(qual)
+            if table and col not in joins.setdefault(table, []):
+                joins[table].append(col)
+    root["order_by"] = [
+        [aliases.get(qual, qual) if qual else single, key] for qual, key in _order_by(sql)
+    ]
+
+    def visit(node: Dict[str, Any]) -> None:
+        name = node.get("table")
+        if name:
+            table = aliases.get(name, name)
+            node["table"] = table
+            node["filter_columns"] = list(filters.get(table, []))
+            node["join_columns"] = list(joins.get(table, []))
+        for ch in node.get("children", []):
+            visit(ch)
+
+    visit(root)
+    return root
@@ -0,0 +1,190 @@
+"""Workload-wide index advice from EXPLAIN plans"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from queryshield_core.analysis.explain_checks import (
+    _filter_columns_text,
+    _mysql_condition_columns,
+    explain_classify,
+    index_ddl,
+)
+from queryshield_core.analysis.plan_visitor import PlanWalk
+
+
+MAX_ADVISED_INDEXES = 20
+
+_PLACEHOLDERS = {"<column>", "<columns>"}
+_re_qualified_eq = re.compile(r'"?(\w+)"?\."?(\w+)"?\s*=\s*"?(\w+)"?\."?(\w+)"?')
+
+
+def _column_key(spec: str) -> str:
+    """``"books"."created_at" DESC`` -> ``created_at DESC``."""
+    parts = spec.strip().strip("()").split()
+    if not parts:
+        return ""
+    name = parts[0].replace('"', "").replace("`", "").split(".")[-1]
+    direction = " DESC" if len(parts) > 1 and parts[1].upper() == "DESC" else ""
+    return name + direction
+
+
+def _scan_filter_candidates(walk: PlanWalk) -> List[Tuple[Optional[str], str, List[str]]]:
+    """Filter columns of every full scan, whatever its row estimate.
+
+    The per-statement MISSING_INDEX check only fires on large estimates; here
+    the statement's DB time decides how much the candidate matters.
+    """
+    out: List[Tuple[Optional[str], str, List[str]]] = []
+    if walk.dialect == "postgresql":
+        for scan in walk.of_kind("Seq Scan"):
+            cols = _filter_columns_text(scan.get("Filter"))
+            if scan.get("Relation Name") and cols:
+                out.append((scan.get("Schema"), scan.get("Relation Name"), cols))
+    elif walk.dialect == "mysql":
+        for t in walk.of_kind("table"):
+            table = t.get("table_name")
+            if t.get("access_type") != "ALL" or not table:
+                continue
+            cols, _joins = _mysql_condition_columns(t.get("attached_condition"), table)
+            if cols:
+                out.append((None, table, cols))
+    return out
+
+
+def _pg_join_candidates(walk: PlanWalk) -> List[Tuple[Optional[str], str, List[str]]]:
+    """Join columns of Seq Scans driven as the inner side of a Nested Loop.
+
+    Hash and merge joins read each side once, so only nested loops, which
+    rescan the inner relation per outer row, benefit from an index here.
+    """
+    out: List[Tuple[Optional[str], str, List[str]]] = []
+    for loop in walk.of_kind("Nested Loop"):
+        if len(loop.children) < 2:
+            continue
+        inner = loop.children[1]
+        if inner.kind == "Materialize" and inner.children:
+            inner = inner.children[0]
+        if inner.kind != "Seq Scan":
+            continue
+        relation = inner.get("Relation Name")
+        alias = inner.get("Alias") or relation
+        cond = " ".join(str(c) for c in (loop.get("Join Filter"), inner.get("Filter")) if c)
+        cols: List[str] = []
+        for q1, c1, q2, c2 in _re_qualified_eq.findall(cond):
+            for qual, col in ((q1, c1), (q2, c2)):
+                if qual == alias and col not in cols:
+                    cols.append(col)
+        if relation and cols:
+            out.append((inner.get("Schema"), relation, cols))
+    return out
+
+
+def _statement_candidates(sql: str, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    walk = PlanWalk(plan)
+    found: List[Dict[str, Any]] = []
+    for p in explain_classify(sql, plan):
+        sug = p.get("suggestion") or {}
+        args = sug.get("args") or {}
+        if sug.get("kind") != "create_index" or not args.get("table"):
+            continue
+        found.append(
+            {
+                "schema": args.get("schema"),
+                "table": args["table"],
+                "columns": args.get("columns") or [],
+                "problem_id": p.get("id"),
+            }
+        )
+    extra = _scan_filter_candidates(walk)
+    if walk.dialect == "postgresql":
+        extra += _pg_join_candidates(walk)
+    for schema, table, cols in extra:
+        found.append({"schema": schema, "table": table, "columns": cols, "problem_id": None})
+    out = []
+    for c in found:
+        cols: List[str] = []
+        for spec in c["columns"]:
+            key = _column_key(spec)
+            if key and key not in _PLACEHOLDERS and key not in cols:
+                cols.append(key)
+        if cols and c["table"] not in _PLACEHOLDERS and c["table"] != "<table>":
+            c["columns"] = cols
+            c["dialect"] = walk.dialect
+            if walk.dialect == "postgresql":
+                c["schema"] = c["schema"] or "public"
+            out.append(c)
+    return out
+
+
+def _is_prefix(short: List[str], long: List[str]) -> bool:
+    return len(short) <= len(long) and long[: len(short)] == short
+
+
+def advise_indexes(
+    statements: Iterable[Tuple[str, Optional[Dict[str, Any]], float, int]],
+    max_indexes: int = MAX_ADVISED_INDEXES,
+) -> List[Dict[str, Any]]:
+    """Consolidate per-statement index suggestions into a minimal ranked set.
+
+    Candidate columns come from each plan's filters, sort keys and join
+    conditions and are weighted by the statement's total DB time. Per table,
+    a candidate whose columns are a prefix of a wider candidate is served by
+    that wider index, so only indexes that are not a prefix of another are
+    proposed.
+
+    Args:
+        statements: ``(normalized_sql, plan, total_ms, calls)`` for every
+            explained statement of the run
+        max_indexes: Maximum number of indexes to return
+
+    Returns:
+        Indexes ranked by covered DB time, each with its DDL and the
+        statements it serves
+    """
+    candidates: List[Dict[str, Any]] = []
+    for sql, plan, total_ms, calls in statements:
+        if not plan:
+            continue
+        for c in _statement_candidates(sql, plan):
+            c.update({"sql": sql, "weight_ms": float(total_ms or 0.0), "calls": int(calls or 0)})
+            candidates.append(c)
+
+    by_table: Dict[Tuple[str, Optional[str], str], List[Dict[str, Any]]] = {}
+    for c in candidates:
+        by_table.setdefault((c["dialect"], c["schema"], c["table"]), []).append(c)
+
+    advice: List[Dict[str, Any]] = []
+    for (dialect, schema, table), group in by_table.items():
+        # Widest and heaviest first: narrower candidates fold into them
+        group.sort(key=lambda c: (-len(c["columns"]), -c["weight_ms"]))
+        chosen: List[Dict[str, Any]] = []
+        for c in group:
+            target = next((i for i in chosen if _is_prefix(c["columns"], i["columns"])), None)
+            if target is None:
+                target = {
+                    "dialect": dialect,
+                    "schema": schema,
+                    "table": table,
+                    "columns": list(c["columns"]),
+                    "ddl": index_ddl(dialect, table, c["columns"], schema=schema),
+                    "weight_ms": 0.0,
+                    "calls": 0,
+                    "statements": [],
+                    "problem_ids": [],
+                }
+                chosen.append(target)
+            if c["sql"] not in target["statements"]:
+                target["statements"].append(c["sql"])
+                target["weight_ms"] += c["weight_ms"]
+                target["calls"] += c["calls"]
+            if c["problem_id"] and c["problem_id"] not in target["problem_ids"]:
+                target["problem_ids"].append(c["problem_id"])
+        advice.extend(chosen)
+
+    advice.sort(key=lambda i: (-i["weight_ms"], -len(i["statements"]), i["table"]))
+    for rank, item in enumerate(advice[:max_indexes], start=1):
+        item["rank"] = rank
+        item["weight_ms"] = round(item["weight_ms"], 3)
+    return advice[:max_indexes]
@@ -261,7 +261,7 @@ SELECT id, email, name FROM users;""",
         return None
     
     def _check_sequential_queries(self, problem: Dict[str, Any]) -> Optional[Suggestion]:
-        """Detect sequential queries (waterfall pattern)"""
+        """Detect sequential queries (N×M loops and serial lookups)"""
         
         if problem.get("type") != "SEQUENTIAL_QUERIES":
             return None
@@ -0,0 +1,263 @@
+"""Noise-aware latency regression checks over repeated runs
+
+A single run is too noisy to compare timings. Running the suite K times
+gives per-test and per-fingerprint duration distributions, which are
+compared with a baseline's using a non-parametric test plus effect-size
+thresholds, so only significant regressions are reported.
+"""
+
+import math
+from statistics import median
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from queryshield_core.utils import normalize_sql
+
+
+# A timings document holds, per test, the DB time of every run and the
+# duration of every execution of each fingerprint, pooled over the runs:
+# {"version": "1", "kind": "timings", "runs": K,
+#  "tests": {name: {"db_time_ms": [...], "fingerprints": {sql: [...]}}}}
+TIMINGS_VERSION = "1"
+
+MIN_SAMPLES = 5
+ALPHA = 0.01
+MIN_EFFECT = 0.33  # Cliff's delta; ~0.33 is conventionally a medium effect
+MIN_INCREASE_PCT = 10.0
+MIN_INCREASE_MS = 0.5
+
+
+def _empty_timings(runs: int = 0) -> Dict[str, Any]:
+    """Timings document without tests"""
+    return {"version": TIMINGS_VERSION, "kind": "timings", "runs": runs, "tests": {}}
+
+
+def run_timings(events_by_test: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Timings of a single run from recorded events.
+    
+    Args:
+        events_by_test: Test name -> query event dicts with 'sql' and
+            'duration_ms' keys
+        
+    Returns:
+        Timings document with ``runs == 1``
+    """
+    out = _empty_timings(1)
+    for name, events in events_by_test.items():
+        fps: Dict[str, List[float]] = {}
+        for e in events:
+            fps.setdefault(normalize_sql(e.get("sql", "")), []).append(round(e.get("duration_ms", 0.0), 4))
+        out["tests"][name] = {
+            "db_time_ms": [round(sum(e.get("duration_ms", 0.0) for e in events), 4)],
+            "fingerprints": fps,
+        }
+    return out
+
+
+def report_timings(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Timings of a single run from a report.
+    
+    Fingerprint samples only cover the queries kept in the report
+    (``MAX_QUERIES_PER_TEST``); recorded events are exact.
+    
+    Args:
+        report: Report with structure {"tests": [...]}
+        
+    Returns:
+        Timings document with ``runs == 1``
+    """
+    out = _empty_timings(1)
+    for t in report.get("tests", []) or []:
+        fps: Dict[str, List[float]] = {}
+        for q in t.get("queries", []) or []:
+            fps.setdefault(q.get("normalized_sql", ""), []).append(q.get("duration_ms", 0.0))
+        out["tests"][t.get("name", "<unknown>")] = {
+            "db_time_ms": [t.get("duration_ms", 0.0)],
+            "fingerprints": fps,
+        }
+    return out
+
+
+def merge_timings(runs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Pool the samples of several timings documents.
+    
+    Args:
+        runs: Timings documents, e.g. one per run
+        
+    Returns:
+        Timings document holding every sample
+    """
+    out = _empty_timings()
+    for timings in runs:
+        out["runs"] += timings.get("runs", 1)
+        for name, t in (timings.get("tests") or {}).items():
+            dst = out["tests"].setdefault(name, {"db_time_ms": [], "fingerprints": {}})
+            dst["db_time_ms"].extend(t.get("db_time_ms") or [])
+            for fp, samples in (t.get("fingerprints") or {}).items():
+                dst["fingerprints"].setdefault(fp, []).extend(samples)
+    return out
+
+
+def mann_whitney_u(current: List[float], baseline: List[float]) -> Tuple[float, float]:
+    """One-sided Mann-Whitney U test that ``current`` tends to be larger.
+    
+    Uses the normal approximation with tie and continuity correction.
+    
+    Args:
+        current: Samples of the patched code
+        baseline: Samples of the baseline
+        
+    Returns:
+        (U, p_value) where U counts pairs with current > baseline (ties
+        count half)
+    """
+    n1, n2 = len(current), len(baseline)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    pooled = sorted([(v, 0) for v in current] + [(v, 1) for v in baseline])
+    rank_sum = 0.0
+    tie_term = 0.0
+    i = 0
+    n = n1 + n2
+    while i < n:
+        j = i
+        while j + 1 < n and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        avg_rank = (i + j) / 2.0 + 1.0
+        size = j - i + 1
+        tie_term += size ** 3 - size
+        rank_sum += avg_rank * sum(1 for k in range(i, j + 1) if pooled[k][1] == 0)
+        i = j + 1
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    var = n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0.0
+    if var <= 0:
+        return u, 1.0
+    z = (u - mean - 0.5) / math.sqrt(var)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def cliffs_delta(u: float, n1: int, n2: int) -> float:
+    """Cliff's delta from U: P(current > baseline) - P(current < baseline)."""
+    return 2.0 * u / (n1 * n2) - 1.0 if n1 and n2 else 0.0
+
+
+def bh_adjust(p_values: List[float]) -> List[float]:
+    """Benjamini-Hochberg adjusted p-values (false discovery rate)."""
+    m = len(p_values)
+    order = sorted(range(m), key=lambda i: p_values[i], reverse=True)
+    adjusted = [1.0] * m
+    running = 1.0
+    for rank, i in enumerate(order):
+        running = min(running, p_values[i] * m / (m - rank))
+        adjusted[i] = running
+    return adjusted
+
+
+def min_runs(tests: int, alpha: float = ALPHA, limit: int = 50) -> int:
+    """Fewest runs per side at which a test's DB time regression can be reported.
+
+    With K runs per side the smallest p-value is that of complete separation
+    (every current run slower than every baseline run). Test DB times are
+    corrected as one family, so a lone regression among ``tests`` tests
+    needs that p-value times ``tests`` below ``alpha``.
+
+    Args:
+        tests: Number of compared tests
+        alpha: Significance level for the adjusted p-value
+        limit: Largest run count considered
+
+    Returns:
+        Minimum ``--runs`` (``limit`` if none up to it suffices)
+    """
+    for k in range(MIN_SAMPLES, limit + 1):
+        _u, p = mann_whitney_u([float(k + i) for i in range(k)], [float(i) for i in range(k)])
+        if p * max(tests, 1) < alpha:
+            return k
+    return limit
+
+
+def compare_timings(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    *,
+    alpha: float = ALPHA,
+    min_effect: float = MIN_EFFECT,
+    min_increase_pct: float = MIN_INCREASE_PCT,
+    min_increase_ms: float = MIN_INCREASE_MS,
+    min_samples: int = MIN_SAMPLES,
+) -> List[Dict[str, Any]]:
+    """Statistically significant latency regressions of ``current``.
+    
+    Each test's DB time per run, and each fingerprint's execution times,
+    are compared with the baseline's using a one-sided Mann-Whitney U test.
+    P-values are adjusted for the number of comparisons (Benjamini-
+    Hochberg) in two families: the tests' DB times, and all fingerprint
+    comparisons. Fingerprints pool every execution, so their p-values
+    are far smaller than those of K per-run totals, and one family over
+    both would hide test-level regressions; ``min_runs`` gives the K they
+    need. A regression is reported only when the adjusted p-value is
+    below ``alpha``, Cliff's delta reaches ``min_effect`` and the median
+    grew by at least ``min_increase_pct`` percent and ``min_increase_ms``.
+    Distributions with fewer than ``min_samples`` values on either side are
+    not compared.
+    
+    Args:
+        baseline: Timings document of the baseline
+        current: Timings document of the patched code
+        alpha: Significance level for the adjusted p-value
+        min_effect: Minimum Cliff's delta
+        min_increase_pct: Minimum median increase in percent
+        min_increase_ms: Minimum median increase in milliseconds
+        min_samples: Minimum samples per side
+        
+    Returns:
+        Regressions sorted by adjusted p-value, each with medians, effect
+        size, ``p_value`` and ``q_value``; ``fingerprint`` is None for a
+        test's total DB time
+    """
+    candidates: List[Dict[str, Any]] = []
+    for name, cur in (current.get("tests") or {}).items():
+        base = (baseline.get("tests") or {}).get(name)
+        if not base:
+            continue
+        pairs: List[Tuple[Optional[str], List[float], List[float]]] = [
+            (None, cur.get("db_time_ms") or [], base.get("db_time_ms") or [])
+        ]
+        base_fps = base.get("fingerprints") or {}
+        for fp, samples in (cur.get("fingerprints") or {}).items():
+            if fp in base_fps:
+                pairs.append((fp, samples, base_fps[fp]))
+        for fp, cur_samples, base_samples in pairs:
+            if len(cur_samples) < min_samples or len(base_samples) < min_samples:
+                continue
+            u, p = mann_whitney_u(cur_samples, base_samples)
+            base_median = median(base_samples)
+            cur_median = median(cur_samples)
+            candidates.append(
+                {
+                    "test": name,
+                    "fingerprint": fp,
+                    "baseline_median_ms": round(base_median, 4),
+                    "current_median_ms": round(cur_median, 4),
+                    "increase_ms": round(cur_median - base_median, 4),
+                    "increase_pct": round((cur_median - base_median) / base_median * 100.0, 1) if base_median else None,
+                    "effect_size": round(cliffs_delta(u, len(cur_samples), len(base_samples)), 3),
+                    "p_value": p,
+                    "n_baseline": len(base_samples),
+                    "n_current": len(cur_samples),
+                }
+            )
+    for test_level in (True, False):
+        family = [c for c in candidates if (c["fingerprint"] is None) == test_level]
+        for c, q in zip(family, bh_adjust([c["p_value"] for c in family])):
+            c["q_value"] = q
+    regressions = [
+        c
+        for c in candidates
+        if c["q_value"] < alpha
+        and c["effect_size"] >= min_effect
+        and c["increase_ms"] >= min_increase_ms
+        and (c["increase_pct"] is None or c["increase_pct"] >= min_increase_pct)
+    ]
+    regressions.sort(key=lambda c: (c["q_value"], -c["increase_ms"]))
+    return regressions
@@ -0,0 +1,158 @@
+"""Fingerprint-level rollup of a test run.
+
+Aggregates every execution of each normalized statement across the suite
+(count, total / mean / p95 time, rows, tests, call sites, EXPLAIN plan and
+linked problems) into the report's top-level ``fingerprints`` section,
+sorted by total DB time.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from queryshield_core.analysis.explain_checks import explain_classify
+
+
+TOP_CALL_SITES = 5
+TOP_TESTS = 5
+# Problems quote at most this much of the statement (evidence.example_sql)
+_EXAMPLE_SQL_LEN = 200
+
+
+class _Statement:
+    __slots__ = ("sql", "full_sql", "db_alias", "durations", "rows", "tests", "sites", "problems")
+
+    def __init__(self, sql: str, full_sql: str, db_alias: str) -> None:
+        self.sql = sql
+        self.full_sql = full_sql
+        self.db_alias = db_alias
+        self.durations: List[float] = []
+        self.rows: Optional[int] = None
+        self.tests: Dict[str, List[float]] = {}
+        self.sites: Counter = Counter()
+        self.problems: Dict[str, Dict[str, Any]] = {}
+
+
+class FingerprintRollup:
+    """Suite-wide figures per normalized statement (the report's ``fingerprints``).
+
+    ``add_test`` takes every test's events before the tests are written,
+    ``add_problems`` each test's problems as it is built, and
+    ``attach_plans`` the EXPLAIN plans; ``entries`` are sorted by total DB
+    time. Statements are keyed by their normalized SQL (quoted identifiers
+    kept, literals replaced) cut to ``max_sql_len``, as in the per-query
+    entries.
+    """
+
+    def __init__(self, max_sql_len: int = 2048) -> None:
+        self.max_sql_len = max_sql_len
+        self._statements: Dict[str, _Statement] = {}
+        self._by_example: Dict[str, List[_Statement]] = {}
+        self._plan_ids: Dict[str, int] = {}
+
+    def add_test(self, name: str, events: List[Dict[str, Any]], normalized: List[str]) -> None:
+        """Add one test's executions.
+
+        Args:
+            name: Test name
+            events: The test's query events (dicts)
+            normalized: Normalized SQL of each event
+        """
+        for e, norm in zip(events, normalized):
+            sql = norm[: self.max_sql_len]
+            st = self._statements.get(sql)
+            if st is None:
+                st = self._statements[sql] = _Statement(sql, norm, e.get("db_alias", "default"))
+                self._by_example.setdefault(norm[:_EXAMPLE_SQL_LEN], []).append(st)
+            duration_ms = e.get("duration_ms", 0.0)
+            st.durations.append(duration_ms)
+            if e.get("rows") is not None:
+                st.rows = (st.rows or 0) + e["rows"]
+            per_test = st.tests.get(name)
+            if per_test is None:
+                per_test = st.tests[name] = [0, 0.0]
+            per_test[0] += 1
+            per_test[1] += duration_ms
+            stack = e.get("stack")
+            if stack:
+                st.sites[tuple(stack[0])] += 1
+
+    def add_problems(self, problems: List[Dict[str, Any]]) -> None:
+        """Link a test's problems to the statements they quote.
+
+        Args:
+            problems: Problems of one test report
+        """
+        for p in problems:
+            example = (p.get("evidence") or {}).get("example_sql")
+            for st in self._by_example.get(example or "", []):
+                self._link(st, p)
+
+    def _link(self, st: _Statement, problem: Dict[str, Any], tests: int = 1) -> None:
+        pid = problem.get("id") or problem.get("type", "?")
+        seen = st.problems.get(pid)
+        if seen is None:
+            st.problems[pid] = {"id": pid, "type": problem.get("type"), "tests": tests}
+        else:
+            seen["tests"] += tests
+
+    def attach_plans(self, plan_cache: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Reference each statement's EXPLAIN plan and link its plan problems.
+
+        Args:
+            plan_cache: EXPLAIN plans keyed by normalized SQL
+
+        Returns:
+            The report's ``plans``, which ``entries`` refer to by index
+        """
+        plans: List[Dict[str, Any]] = []
+        for st in self._statements.values():
+            plan = plan_cache.get(st.full_sql)
+            if plan is None:
+                continue
+            self._plan_ids[st.sql] = len(plans)
+            plans.append({"db_alias": st.db_alias, "plan": plan})
+            for p in explain_classify(st.full_sql, plan):
+                self._link(st, p, tests=len(st.tests))
+        return plans
+
+    def order(self) -> List[str]:
+        """Statements by total DB time, largest first."""
+        return [
+            st.sql
+            for st in sorted(self._statements.values(), key=lambda st: (-sum(st.durations), st.sql))
+        ]
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """The ``fingerprints`` section, sorted by total DB time.
+
+        Returns:
+            One entry per statement
+        """
+        out: List[Dict[str, Any]] = []
+        for sql in self.order():
+            st = self._statements[sql]
+            ordered = sorted(st.durations)
+            total = sum(ordered)
+            top_tests = sorted(st.tests.items(), key=lambda kv: (-kv[1][1], kv[0]))[:TOP_TESTS]
+            out.append(
+                {
+                    "sql": st.sql,
+                    "count": len(ordered),
+                    "total_ms": round(total, 4),
+                    "mean_ms": round(total / len(ordered), 4),
+                    "p95_ms": round(ordered[max(0, int(0.95 * (len(ordered) - 1)))], 4),
+                    "rows_total": st.rows,
+                    "db_alias": st.db_alias,
+                    "tests": len(st.tests),
+                    "top_tests": [
+                        {"name": name, "count": count, "total_ms": round(ms, 4)} for name, (count, ms) in top_tests
+                    ],
+                    "call_sites": [
+                        {"file": site[0], "function": site[1], "line": site[2], "count": count}
+                        for site, count in st.sites.most_common(TOP_CALL_SITES)
+                    ],
+                    "plan": self._plan_ids.get(sql),
+                    "problems": sorted(st.problems.values(), key=lambda p: (-p["tests"], str(p["id"]))),
+                }
+            )
+        return out
@@ -0,0 +1,448 @@
+"""Per-fingerprint and per-test diff of two reports
+
+Each report is streamed once into a ``ReportSummary``, so neither is held in
+memory: per statement the execution count, DB time, a bounded sample of
+durations and the EXPLAIN plan; per test the query count, DB time and
+problem ids. ``diff_reports`` compares two summaries and ``render_markdown``
+formats the result for a pull request comment.
+"""
+
+import random
+from statistics import median
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from queryshield_core.analysis.plan_visitor import PlanWalk
+from queryshield_core.analysis.regression import (
+    ALPHA,
+    MIN_EFFECT,
+    MIN_INCREASE_MS,
+    MIN_INCREASE_PCT,
+    MIN_SAMPLES,
+    bh_adjust,
+    cliffs_delta,
+    mann_whitney_u,
+)
+from queryshield_core.report_io import ReportReader
+from queryshield_core.report_v2 import is_v2
+
+
+DIFF_VERSION = "1"
+# Durations kept per statement (reservoir sample) for the latency comparison
+MAX_SAMPLES = 1000
+# Plan node fields naming what a node reads, by dialect
+_PLAN_LABEL_KEYS = ("Relation Name", "Index Name", "detail", "table_name", "access_type", "key")
+
+
+class _Statement:
+    __slots__ = ("count", "total_ms", "tests", "samples", "seen", "last_test", "plan")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.tests = 0
+        self.samples: List[float] = []
+        self.seen = 0
+        self.last_test: Optional[str] = None
+        self.plan: Optional[str] = None
+
+
+class ReportSummary:
+    """What the diff needs of one report, gathered in a single streamed pass.
+
+    Statement counts and times come from the report's ``fingerprints``
+    rollup when it has one (it covers every execution), else from the
+    queries kept per test.
+    """
+
+    def __init__(self, path: str, max_samples: int = MAX_SAMPLES) -> None:
+        self.path = path
+        self.max_samples = max_samples
+        self.statements: Dict[str, _Statement] = {}
+        self.tests: Dict[str, Dict[str, Any]] = {}
+        self._random = random.Random(0)
+        with ReportReader(path) as reader:
+            v2 = is_v2(reader.header)
+            by_key: Dict[Any, _Statement] = {}
+            for test in reader.tests():
+                self._add_test(test, by_key, v2)
+            # Tables and rollup normally follow the tests; take them from either side
+            trailer = {**reader.header, **reader.trailer}
+        rollup = trailer.get("fingerprints") or []
+        if v2:
+            sqls = [e.get("sql", "") for e in rollup]
+            by_key = {sqls[i]: st for i, st in by_key.items() if i < len(sqls)}
+        self.statements = by_key
+        self._apply_rollup(rollup, trailer.get("plans") or [])
+
+    def _add_test(self, test: Dict[str, Any], by_key: Dict[Any, _Statement], v2: bool) -> None:
+        name = test.get("name", "")
+        problems: Dict[str, Optional[str]] = {}
+        for p in test.get("problems") or []:
+            problems[str(p.get("id") or p.get("type", "?"))] = p.get("type")
+        self.tests[name] = {
+            "queries_total": test.get("queries_total", 0),
+            "duration_ms": test.get("duration_ms") or 0.0,
+            "problems": problems,
+        }
+        for key, duration_ms in _queries(test, v2):
+            st = by_key.get(key)
+            if st is None:
+                st = by_key[key] = _Statement()
+            st.count += 1
+            st.total_ms += duration_ms
+            if st.last_test != name:
+                st.last_test = name
+                st.tests += 1
+            st.seen += 1
+            if len(st.samples) < self.max_samples:
+                st.samples.append(duration_ms)
+            else:
+                i = self._random.randrange(st.seen)
+                if i < self.max_samples:
+                    st.samples[i] = duration_ms
+
+    def _apply_rollup(self, rollup: List[Dict[str, Any]], plans: List[Dict[str, Any]]) -> None:
+        for entry in rollup:
+            if "count" not in entry:
+                continue
+            st = self.statements.get(entry["sql"])
+            if st is None:
+                st = self.statements[entry["sql"]] = _Statement()
+            st.count = entry.get("count", 0)
+            st.total_ms = entry.get("total_ms", 0.0)
+            st.tests = entry.get("tests", 0)
+            plan_id = entry.get("plan")
+            if plan_id is not None and plan_id < len(plans):
+                st.plan = plan_shape(plans[plan_id].get("plan"))
+
+    @property
+    def queries_total(self) -> int:
+        return sum(t["queries_total"] for t in self.tests.values())
+
+
+def _queries(test: Dict[str, Any], v2: bool) -> Iterator[Tuple[Any, float]]:
+    """(statement key, duration) of each query kept in a test.
+
+    v2 keys are fingerprint ids, resolved once the report's tables are read.
+    """
+    queries = test.get("queries")
+    if not queries:
+        return iter(())
+    if v2:
+        ids = queries.get("fingerprint") or []
+        return zip(ids, queries.get("duration_ms") or [0.0] * len(ids))
+    return ((q.get("normalized_sql", ""), q.get("duration_ms", 0.0)) for q in queries)
+
+
+def plan_shape(plan: Optional[Dict[str, Any]]) -> Optional[str]:
+    """A plan's operators and the relations/indexes they read, one per line.
+
+    Costs and row estimates are left out, so only a different access
+    path changes the shape.
+
+    Args:
+        plan: EXPLAIN plan of any supported dialect
+
+    Returns:
+        The shape, or None without a plan
+    """
+    if not plan:
+        return None
+    lines = []
+    for pn in PlanWalk(plan).nodes:
+        label = " ".join(str(pn.get(k)) for k in _PLAN_LABEL_KEYS if pn.get(k) and str(pn.get(k)) != pn.kind)
+        lines.append("  " * pn.depth + (f"{pn.kind} {label}" if label else pn.kind))
+    return "\n".join(lines)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[max(0, int(q * (len(ordered) - 1)))] if ordered else 0.0
+
+
+def _latency_shifts(
+    pairs: List[Tuple[str, List[float], List[float]]],
+    alpha: float,
+    min_effect: float,
+    min_change_pct: float,
+    min_change_ms: float,
+    min_samples: int,
+) -> List[Dict[str, Any]]:
+    candidates = []
+    for sql, base, cur in pairs:
+        if len(base) < min_samples or len(cur) < min_samples:
+            continue
+        base_median, cur_median = median(base), median(cur)
+        slower = cur_median >= base_median
+        # Two-sided: the one-sided test in the direction of the medians, doubled
+        u, p = mann_whitney_u(cur, base) if slower else mann_whitney_u(base, cur)
+        base_sorted, cur_sorted = sorted(base), sorted(cur)
+        candidates.append(
+            {
+                "sql": sql,
+                "direction": "slower" if slower else "faster",
+                "baseline_median_ms": round(base_median, 4),
+                "current_median_ms": round(cur_median, 4),
+                "baseline_p95_ms": round(_percentile(base_sorted, 0.95), 4),
+                "current_p95_ms": round(_percentile(cur_sorted, 0.95), 4),
+                "change_ms": round(cur_median - base_median, 4),
+                "change_pct": round((cur_median - base_median) / base_median * 100.0, 1) if base_median else None,
+                "effect_size": round(abs(cliffs_delta(u, len(cur), len(base))), 3),
+                "p_value": min(1.0, 2.0 * p),
+            }
+        )
+    for c, q in zip(candidates, bh_adjust([c["p_value"] for c in candidates])):
+        c["q_value"] = q
+    shifts = [
+        c
+        for c in candidates
+        if c["q_value"] < alpha
+        and c["effect_size"] >= min_effect
+        and abs(c["change_ms"]) >= min_change_ms
+        and (c["change_pct"] is None or abs(c["change_pct"]) >= min_change_pct)
+    ]
+    shifts.sort(key=lambda c: (c["q_value"], -abs(c["change_ms"])))
+    return shifts
+
+
+def _statement(sql: str, st: _Statement) -> Dict[str, Any]:
+    return {"sql": sql, "count": st.count, "total_ms": round(st.total_ms, 4), "tests": st.tests}
+
+
+def _problems_by_id(found: Dict[Tuple[str, str], Optional[str]]) -> List[Dict[str, Any]]:
+    grouped: Dict[str, Dict[str, Any]] = {}
+    for (test, pid), ptype in sorted(found.items()):
+        entry = grouped.setdefault(pid, {"id": pid, "type": ptype, "tests": []})
+        entry["tests"].append(test)
+    return sorted(grouped.values(), key=lambda p: (-len(p["tests"]), p["id"]))
+
+
+def summarize_report(path: str, max_samples: int = MAX_SAMPLES) -> ReportSummary:
+    """Stream a report (either schema, any format) into a ``ReportSummary``.
+
+    Args:
+        path: Report file path
+        max_samples: Durations kept per statement
+
+    Returns:
+        The summary
+    """
+    return ReportSummary(path, max_samples)
+
+
+def diff_reports(
+    baseline: Any,
+    current: Any,
+    *,
+    alpha: float = ALPHA,
+    min_effect: float = MIN_EFFECT,
+    min_change_pct: float = MIN_INCREASE_PCT,
+    min_change_ms: float = MIN_INCREASE_MS,
+    min_samples: int = MIN_SAMPLES,
+) -> Dict[str, Any]:
+    """Compare two reports by statement and by test.
+
+    Latency shifts compare each statement's durations with a two-sided
+    Mann-Whitney U test, Benjamini-Hochberg corrected; a shift is reported
+    when the adjusted p-value is below ``alpha``, the absolute Cliff's
+    delta reaches ``min_effect`` and the median moved by at least
+    ``min_change_pct`` percent and ``min_change_ms``. Problems of tests
+    only in the current report count as new; those of removed tests are
+    not counted as fixed.
+
+    Args:
+        baseline: Baseline report path or ``ReportSummary``
+        current: Current report path or ``ReportSummary``
+        alpha: Significance level for the adjusted p-value
+        min_effect: Minimum absolute Cliff's delta
+        min_change_pct: Minimum median change in percent
+        min_change_ms: Minimum median change in milliseconds
+        min_samples: Minimum durations per side
+
+    Returns:
+        Diff document with ``statements`` (new, removed, count_changes,
+        latency_shifts, plan_changes), ``tests`` (added, removed,
+        query_changes) and ``problems`` (new, fixed)
+    """
+    base = baseline if isinstance(baseline, ReportSummary) else summarize_report(baseline)
+    cur = current if isinstance(current, ReportSummary) else summarize_report(current)
+
+    new = [_statement(sql, st) for sql, st in cur.statements.items() if sql not in base.statements]
+    removed = [_statement(sql, st) for sql, st in base.statements.items() if sql not in cur.statements]
+    count_changes = []
+    plan_changes = []
+    pairs = []
+    for sql, st in cur.statements.items():
+        old = base.statements.get(sql)
+        if old is None:
+            continue
+        if st.count != old.count:
+            count_changes.append(
+                {
+                    "sql": sql,
+                    "baseline_count": old.count,
+                    "current_count": st.count,
+                    "change": st.count - old.count,
+                    "baseline_total_ms": round(old.total_ms, 4),
+                    "current_total_ms": round(st.total_ms, 4),
+                }
+            )
+        if old.plan and st.plan and old.plan != st.plan:
+            plan_changes.append({"sql": sql, "baseline_plan": old.plan, "current_plan": st.plan})
+        pairs.append((sql, old.samples, st.samples))
+    new.sort(key=lambda s: (-s["total_ms"], s["sql"]))
+    removed.sort(key=lambda s: (-s["total_ms"], s["sql"]))
+    count_changes.sort(key=lambda c: (-abs(c["change"]), c["sql"]))
+
+    query_changes = []
+    new_problems: Dict[Tuple[str, str], Optional[str]] = {}
+    fixed_problems: Dict[Tuple[str, str], Optional[str]] = {}
+    for name, t in cur.tests.items():
+        old_t = base.tests.get(name)
+        old_problems = old_t["problems"] if old_t else {}
+        for pid, ptype in t["problems"].items():
+            if pid not in old_problems:
+                new_problems[(name, pid)] = ptype
+        if old_t is None:
+            continue
+        for pid, ptype in old_problems.items():
+            if pid not in t["problems"]:
+                fixed_problems[(name, pid)] = ptype
+        if t["queries_total"] != old_t["queries_total"]:
+            query_changes.append(
+                {
+                    "test": name,
+                    "baseline": old_t["queries_total"],
+                    "current": t["queries_total"],
+                    "change": t["queries_total"] - old_t["queries_total"],
+                }
+            )
+    query_changes.sort(key=lambda c: (-abs(c["change"]), c["test"]))
+
+    return {
+        "version": DIFF_VERSION,
+        "kind": "diff",
+        "baseline": {"path": base.path, "tests": len(base.tests), "queries_total": base.queries_total},
+        "current": {"path": cur.path, "tests": len(cur.tests), "queries_total": cur.queries_total},
+        "statements": {
+            "new": new,
+            "removed": removed,
+            "count_changes": count_changes,
+            "latency_shifts": _latency_shifts(pairs, alpha, min_effect, min_change_pct, min_change_ms, min_samples),
+            "plan_changes": plan_changes,
+        },
+        "tests": {
+            "added": sorted(n for n in cur.tests if n not in base.tests),
+            "removed": sorted(n for n in base.tests if n not in cur.tests),
+            "query_changes": query_changes,
+        },
+        "problems": {"new": _problems_by_id(new_problems), "fixed": _problems_by_id(fixed_problems)},
+    }
+
+
+def has_regressions(diff: Dict[str, Any]) -> bool:
+    """Whether a diff has new problems, more executions or slower statements."""
+    statements = diff["statements"]
+    return bool(
+        diff["problems"]["new"]
+        or any(c["change"] > 0 for c in statements["count_changes"])
+        or any(s["direction"] == "slower" for s in statements["latency_shifts"])
+    )
+
+
+def _cell(text: Any, width: int = 80) -> str:
+    text = " ".join(str(text).split())
+    if len(text) > width:
+        text = text[: width - 1] + "…"
+    return text.replace("|", "\\|")
+
+
+def _code(sql: str) -> str:
+    return "`" + _cell(sql).replace("`", "'") + "`"
+
+
+def _table(headers: List[str], rows: List[List[str]], more: int) -> List[str]:
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    if more > 0:
+        lines.append(f"\n_…and {more} more_")
+    return lines + [""]
+
+
+def render_markdown(diff: Dict[str, Any], limit: int = 10) -> str:
+    """Format a diff as Markdown for a pull request comment.
+
+    Args:
+        diff: Result of ``diff_reports``
+        limit: Rows shown per section
+
+    Returns:
+        Markdown text
+    """
+    base, cur = diff["baseline"], diff["current"]
+    statements, tests, problems = diff["statements"], diff["tests"], diff["problems"]
+    change = cur["queries_total"] - base["queries_total"]
+    out = [
+        "## QueryShield Diff",
+        "",
+        f"Queries: {base['queries_total']:,} → {cur['queries_total']:,} ({change:+,})  ·  "
+        f"Tests: {base['tests']:,} → {cur['tests']:,}",
+        "",
+    ]
+    if problems["new"]:
+        out.append("### 🔴 New problems")
+        rows = [[p["type"] or "?", _cell(p["id"]), _cell(", ".join(p["tests"]), 60)] for p in problems["new"][:limit]]
+        out += _table(["Type", "Id", "Tests"], rows, len(problems["new"]) - limit)
+    if statements["latency_shifts"]:
+        out.append("### ⏱️ Latency shifts")
+        rows = [
+            [
+                _code(s["sql"]),
+                s["direction"],
+                f"{s['baseline_median_ms']:.2f} → {s['current_median_ms']:.2f}",
+                f"{s['baseline_p95_ms']:.2f} → {s['current_p95_ms']:.2f}",
+                f"{s['q_value']:.1e}",
+            ]
+            for s in statements["latency_shifts"][:limit]
+        ]
+        out += _table(["Statement", "Shift", "Median (ms)", "p95 (ms)", "q"], rows, len(statements["latency_shifts"]) - limit)
+    if statements["count_changes"]:
+        out.append("### 🔁 Execution count changes")
+        rows = [
+            [_code(c["sql"]), f"{c['baseline_count']:,} → {c['current_count']:,}", f"{c['change']:+,}"]
+            for c in statements["count_changes"][:limit]
+        ]
+        out += _table(["Statement", "Executions", "Change"], rows, len(statements["count_changes"]) - limit)
+    if statements["plan_changes"]:
+        out.append("### 🧭 Plan changes")
+        for c in statements["plan_changes"][:limit]:
+            out += [
+                f"{_code(c['sql'])}",
+                "",
+                "```diff",
+                *("- " + line for line in c["baseline_plan"].splitlines()),
+                *("+ " + line for line in c["current_plan"].splitlines()),
+                "```",
+                "",
+            ]
+    for key, title in (("new", "🆕 New statements"), ("removed", "🗑️ Removed statements")):
+        if statements[key]:
+            out.append(f"### {title}")
+            rows = [
+                [_code(s["sql"]), f"{s['count']:,}", f"{s['total_ms']:.2f}", str(s["tests"])]
+                for s in statements[key][:limit]
+            ]
+            out += _table(["Statement", "Executions", "Total (ms)", "Tests"], rows, len(statements[key]) - limit)
+    if tests["query_changes"]:
+        out.append("### 🧪 Query count changes by test")
+        rows = [
+            [_cell(c["test"]), f"{c['baseline']:,} → {c['current']:,}", f"{c['change']:+,}"]
+            for c in tests["query_changes"][:limit]
+        ]
+        out += _table(["Test", "Queries", "Change"], rows, len(tests["query_changes"]) - limit)
+    if problems["fixed"]:
+        out.append("### ✅ Fixed problems")
+        rows = [[p["type"] or "?", _cell(p["id"]), _cell(", ".join(p["tests"]), 60)] for p in problems["fixed"][:limit]]
+        out += _table(["Type", "Id", "Tests"], rows, len(problems["fixed"]) - limit)
+    if len(out) == 4:
+        out += ["No changes.", ""]
+    return "\n".join(out)
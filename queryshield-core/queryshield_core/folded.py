@@ -0,0 +1,116 @@
+"""Folded-stack export of DB time for flame graphs
+
+Aggregates the duration of every query kept in a report by its captured
+call stack and writes Brendan Gregg's folded format, one line per stack:
+
+    test_books (app/tests.py:30);books (app/views.py:12) 1843
+
+Frames run from the outermost to the innermost, values are microseconds.
+``flamegraph.pl`` and speedscope read it directly. The whole-run view
+merges all tests; the per-test view roots each stack at its test.
+"""
+
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from queryshield_core.report_io import ReportReader
+from queryshield_core.report_v2 import is_v2
+
+
+UNKNOWN_FRAME = "[no stack]"
+_SQL_FRAME_LEN = 120
+
+
+def _label(text: str) -> str:
+    # ';' separates frames and a line ends with " <value>"
+    return " ".join(str(text).split()).replace(";", ":")
+
+
+class _Frames:
+    """Frame labels, with file names relative to the project root."""
+
+    def __init__(self, project_root: Optional[str]) -> None:
+        self.root = (project_root or "").rstrip("/") + "/" if project_root else ""
+
+    def frame(self, frame: List[Any]) -> str:
+        file, function, line = (list(frame) + ["", "", ""])[:3]
+        file = str(file)
+        if self.root and file.startswith(self.root):
+            file = file[len(self.root):]
+        return _label(f"{function} ({file}:{line})")
+
+    def stack(self, frames: Optional[List[List[Any]]]) -> List[str]:
+        # Reports store the innermost frame first
+        return [self.frame(f) for f in reversed(frames or [])] or [UNKNOWN_FRAME]
+
+
+def fold_report(path: str, *, per_test: bool = False, statements: bool = False) -> Dict[str, int]:
+    """Stream a report (either schema, any format) into folded stacks.
+
+    Only the queries kept in the report are counted
+    (``MAX_QUERIES_PER_TEST`` per test).
+
+    Args:
+        path: Report file path
+        per_test: Root every stack at its test instead of merging tests
+        statements: Add the normalized SQL as the innermost frame
+
+    Returns:
+        Folded stack -> DB time in microseconds
+    """
+    # Keyed by (test, stack, statement) until v2 table ids can be resolved
+    totals: Dict[Tuple[Optional[str], Any, Any], float] = {}
+    with ReportReader(path) as reader:
+        header = reader.header
+        v2 = is_v2(header)
+        for test in reader.tests():
+            name = test.get("name", "") if per_test else None
+            queries = test.get("queries")
+            if not queries:
+                continue
+            if v2:
+                ids = queries.get("fingerprint") or []
+                rows = zip(
+                    queries.get("stack") or [],
+                    ids if statements else [None] * len(ids),
+                    queries.get("duration_ms") or [0.0] * len(ids),
+                )
+            else:
+                rows = (
+                    (
+                        tuple(tuple(f) for f in q.get("stack") or []),
+                        q.get("normalized_sql", "") if statements else None,
+                        q.get("duration_ms", 0.0),
+                    )
+                    for q in queries
+                )
+            for stack, sql, duration_ms in rows:
+                key = (name, stack, sql)
+                totals[key] = totals.get(key, 0.0) + (duration_ms or 0.0)
+        tables = {**header, **reader.trailer}
+    frames = _Frames(header.get("project_root"))
+    if v2:
+        callsites = tables.get("callsites") or []
+        stacks = [[callsites[c] for c in s] for s in tables.get("stacks") or []]
+        sqls = [e.get("sql", "") for e in tables.get("fingerprints") or []]
+    folded: Dict[str, int] = {}
+    for (name, stack, sql), ms in totals.items():
+        if v2:
+            stack = stacks[stack]
+            sql = sqls[sql] if sql is not None else None
+        path_frames = ([_label(name)] if name is not None else []) + frames.stack(stack)
+        if sql is not None:
+            path_frames.append(_label(sql)[:_SQL_FRAME_LEN])
+        line = ";".join(path_frames)
+        folded[line] = folded.get(line, 0) + int(round(ms * 1000))
+    return {line: us for line, us in folded.items() if us > 0}
+
+
+def write_folded(folded: Dict[str, int], out: IO[str]) -> None:
+    """Write folded stacks, heaviest first.
+
+    Args:
+        folded: Result of ``fold_report``
+        out: Text stream
+    """
+    for line, us in sorted(folded.items(), key=lambda kv: (-kv[1], kv[0])):
+        out.write(f"{line} {us}\n")
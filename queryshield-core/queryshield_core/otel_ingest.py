@@ -0,0 +1,326 @@
+"""QueryShield reports from OpenTelemetry database spans
+
+Reads the OTLP/JSON written by the OpenTelemetry Collector's ``file``
+exporter (one ``ExportTraceServiceRequest`` per line, optionally gzipped)
+and analyses the database spans in it as if a probe had recorded them, so
+services that are already traced need no probe at all.
+
+Every trace becomes a test named after its root span (a request, a job),
+except that spans exported by QueryShield's own probes keep their
+``queryshield.test``. Database spans are those with ``db.system`` (or
+``db.system.name``); the statement comes from ``db.query.text`` /
+``db.statement``, the call site from the ``code.*`` attributes. Only the
+database spans are kept in memory, the report is written one test at a time.
+"""
+
+import gzip
+import os
+from datetime import datetime, timezone
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from queryshield_core.analysis.classify import NPlusOneTracker, classify_all
+from queryshield_core.analysis.cost_analysis import generate_cost_summary
+from queryshield_core.analysis.pagination import classify_pagination
+from queryshield_core.analysis.rollup import FingerprintRollup
+from queryshield_core.otel import ATTR_DB_ALIAS, ATTR_TEST
+from queryshield_core.report_io import _JsonObjectStream
+
+MAX_QUERIES_PER_TEST = 500
+MAX_SQL_LEN = 2048
+UNTRACED_TEST = "_run"
+
+_STATEMENT_KEYS = ("db.query.text", "db.statement")
+_SYSTEM_KEYS = ("db.system", "db.system.name")
+_ALIAS_KEYS = (ATTR_DB_ALIAS, "db.namespace", "db.name")
+_ROWS_KEYS = ("db.response.returned_rows", "db.rows_affected")
+_FILE_KEYS = ("code.filepath", "code.file.path")
+_FUNCTION_KEYS = ("code.function", "code.function.name")
+_LINE_KEYS = ("code.lineno", "code.line.number")
+_STATUS_ERROR = (2, "STATUS_CODE_ERROR")
+
+
+def _value(v: Dict[str, Any]) -> Any:
+    """Decode an OTLP/JSON ``AnyValue``."""
+    if "stringValue" in v:
+        return v["stringValue"]
+    if "intValue" in v:
+        # int64 values are JSON strings
+        return int(v["intValue"])
+    if "doubleValue" in v:
+        return float(v["doubleValue"])
+    if "boolValue" in v:
+        return bool(v["boolValue"])
+    if "arrayValue" in v:
+        return [_value(x) for x in (v["arrayValue"] or {}).get("values") or []]
+    return None
+
+
+def _attributes(items: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    return {a.get("key"): _value(a.get("value") or {}) for a in items or []}
+
+
+def _first(attrs: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    for k in keys:
+        if attrs.get(k) is not None:
+            return attrs[k]
+    return None
+
+
+def _open(path: str) -> IO[str]:
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_spans(path: str) -> Iterator[Dict[str, Any]]:
+    """Spans of an OTLP/JSON file, flattened.
+
+    Accepts JSON lines as well as one or more (pretty-printed) documents.
+
+    Args:
+        path: OTLP/JSON trace file
+
+    Yields:
+        Dicts with ``trace_id``, ``span_id``, ``parent_id``, ``name``,
+        ``start_ns``, ``end_ns``, ``attributes`` and ``error``
+    """
+    with _open(path) as f:
+        stream = _JsonObjectStream(f)
+        while stream.peek():
+            doc = stream.value()
+            for resource_spans in doc.get("resourceSpans") or []:
+                # "instrumentationLibrarySpans" before OTLP 0.15
+                scopes = resource_spans.get("scopeSpans") or resource_spans.get("instrumentationLibrarySpans") or []
+                for scope_spans in scopes:
+                    for span in scope_spans.get("spans") or []:
+                        status = span.get("status") or {}
+                        yield {
+                            "trace_id": span.get("traceId") or "",
+                            "span_id": span.get("spanId") or "",
+                            "parent_id": span.get("parentSpanId") or "",
+                            "name": span.get("name") or "",
+                            "start_ns": int(span.get("startTimeUnixNano") or 0),
+                            "end_ns": int(span.get("endTimeUnixNano") or 0),
+                            "attributes": _attributes(span.get("attributes")),
+                            "error": (status.get("message") or "error") if status.get("code") in _STATUS_ERROR else None,
+                        }
+
+
+def _event(span: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Query event of a database span, None for other spans."""
+    attrs = span["attributes"]
+    vendor = _first(attrs, _SYSTEM_KEYS)
+    if vendor is None:
+        return None
+    file = _first(attrs, _FILE_KEYS)
+    stack = []
+    if file is not None:
+        stack = [[str(file), str(_first(attrs, _FUNCTION_KEYS) or ""), int(_first(attrs, _LINE_KEYS) or 0)]]
+    return {
+        "sql": str(_first(attrs, _STATEMENT_KEYS) or span["name"]),
+        "params": None,
+        "params_hash": None,
+        "duration_ms": max(0, span["end_ns"] - span["start_ns"]) / 1e6,
+        "rows": _first(attrs, _ROWS_KEYS),
+        "stack": stack,
+        "error": span["error"],
+        "db_alias": str(_first(attrs, _ALIAS_KEYS) or "default"),
+        "db_vendor": str(vendor),
+        "start_ns": span["start_ns"],
+    }
+
+
+class _Group:
+    """Database spans of one test (a trace, or a probe's test)."""
+
+    __slots__ = ("name", "events", "start_ns", "end_ns", "tracker")
+
+    def __init__(self) -> None:
+        self.name: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.start_ns: Optional[int] = None
+        self.end_ns: Optional[int] = None
+        self.tracker: Optional[NPlusOneTracker] = None
+
+    def prepare(self, nplus1_threshold: int) -> None:
+        """Order the events, set their offsets and cluster them."""
+        self.events.sort(key=lambda e: e["start_ns"])
+        origin = self.start_ns if self.start_ns is not None else self.events[0]["start_ns"]
+        self.tracker = NPlusOneTracker(nplus1_threshold)
+        for e in self.events:
+            e["start_ms"] = round((e.pop("start_ns") - origin) / 1e6, 4)
+            self.tracker.add(e["sql"], e["stack"], e["db_alias"])
+
+
+def _collect_tests(path: str) -> Tuple[Dict[str, _Group], int]:
+    """Group the database spans of a file by test.
+
+    Returns:
+        (groups in order of appearance, number of spans read)
+    """
+    groups: Dict[str, _Group] = {}
+    spans = 0
+    for span in iter_spans(path):
+        spans += 1
+        event = _event(span)
+        test = span["attributes"].get(ATTR_TEST)
+        if event is not None:
+            if test is not None:
+                key = f"test:{test}"
+            elif span["parent_id"] and span["trace_id"]:
+                key = span["trace_id"]
+            else:
+                key = UNTRACED_TEST
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group()
+                if test is not None or key == UNTRACED_TEST:
+                    group.name = test or UNTRACED_TEST
+            group.events.append(event)
+        elif not span["parent_id"] and span["trace_id"]:
+            # Root span: names the trace's test and gives its wall time
+            key = f"test:{test}" if test is not None else span["trace_id"]
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group()
+            group.name = test or span["name"] or span["trace_id"]
+            group.start_ns, group.end_ns = span["start_ns"], span["end_ns"]
+    out: Dict[str, _Group] = {}
+    for key, group in groups.items():
+        if not group.events:
+            continue
+        if group.name is None:
+            group.name = f"trace {key[:16]}"
+        elif key != UNTRACED_TEST and not key.startswith("test:"):
+            # Requests to the same endpoint share their root span's name
+            group.name = f"{group.name} [{key[:16]}]"
+        out[key] = group
+    return out, spans
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return float(sorted_values[max(0, int(q * (len(sorted_values) - 1)))])
+
+
+def _test_report(group: _Group, nplus1_threshold: int) -> Dict[str, Any]:
+    """Test entry (v1) of a prepared group."""
+    events = group.events
+    tracker = group.tracker
+    normalized = tracker.normalized
+    probs, tags = classify_all(events, nplus1_threshold=nplus1_threshold, tracker=tracker)
+    paging, paging_tags = classify_pagination(events, None, normalized)
+    probs.extend(paging)
+    for idx, tag in paging_tags.items():
+        tags[idx].append(tag)
+    durations = [e["duration_ms"] for e in events]
+    ordered = sorted(durations)
+    rows = [e["rows"] for e in events if e.get("rows") is not None]
+    top = None
+    if normalized:
+        counts: Dict[str, int] = {}
+        for sql in normalized:
+            counts[sql] = counts.get(sql, 0) + 1
+        sql = max(counts, key=counts.__getitem__)
+        top = {"sql": sql[:MAX_SQL_LEN], "count": counts[sql]}
+    wall_ms = None
+    if group.start_ns is not None and group.end_ns is not None:
+        wall_ms = round((group.end_ns - group.start_ns) / 1e6, 4)
+    test = {
+        "name": group.name,
+        "duration_ms": sum(durations),
+        "wall_ms": wall_ms,
+        "queries_total": len(events),
+        "queries_p95_ms": _percentile(ordered, 0.95),
+        "queries_p99_ms": _percentile(ordered, 0.99),
+        "query_max_ms": ordered[-1] if ordered else 0.0,
+        "rows_total": sum(rows) if rows else None,
+        "top_fingerprint": top,
+        "problems": probs,
+        "queries": [
+            {
+                "normalized_sql": normalized[i][:MAX_SQL_LEN],
+                "duration_ms": e["duration_ms"],
+                "rows": e["rows"],
+                "stack": e["stack"],
+                "error": e["error"],
+                "params": None,
+                "params_hash": None,
+                "tags": tags.get(i, []),
+                "db_alias": e["db_alias"],
+                "db_vendor": e["db_vendor"],
+                "start_ms": e["start_ms"],
+            }
+            for i, e in enumerate(events[:MAX_QUERIES_PER_TEST])
+        ],
+    }
+    test["cost_analysis"] = generate_cost_summary(test, provider="aws_rds_postgres")
+    return test
+
+
+def ingest_otlp(path: str, writer: Any, *, nplus1_threshold: int = 5) -> Dict[str, Any]:
+    """Build a report from the database spans of an OTLP/JSON file.
+
+    ``writer`` is a ``queryshield_core.report_io.ReportWriter`` (optionally
+    wrapped in ``report_v2.V2Writer``) or anything with its ``begin`` /
+    ``write_test`` / ``end`` methods.
+
+    Args:
+        path: OTLP/JSON trace file (the Collector's ``file`` exporter output)
+        writer: Report writer
+        nplus1_threshold: Minimum repeat count to flag as N+1
+
+    Returns:
+        The report without its tests
+    """
+    groups, spans = _collect_tests(path)
+    vendors: Dict[str, int] = {}
+    # Suite-wide figures per statement; the order is needed before the
+    # first test is written
+    rollup = FingerprintRollup(MAX_SQL_LEN)
+    for group in groups.values():
+        group.prepare(nplus1_threshold)
+        rollup.add_test(group.name, group.events, group.tracker.normalized)
+        for e in group.events:
+            vendors[e["db_vendor"]] = vendors.get(e["db_vendor"], 0) + 1
+    reserve = getattr(writer, "reserve_fingerprints", None)
+    if reserve is not None:
+        reserve(rollup.order())
+    header: Dict[str, Any] = {
+        "version": "1",
+        "project_root": os.path.abspath(os.getcwd()),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "framework": {"name": "opentelemetry", "version": ""},
+        "db": {"vendor": max(vendors, key=vendors.__getitem__) if vendors else "unknown", "version": ""},
+        "run": {
+            "mode": "otlp",
+            "source": os.path.abspath(path),
+            "spans": spans,
+            "db_spans": sum(len(g.events) for g in groups.values()),
+            "explain": False,
+            "nplus1_threshold": nplus1_threshold,
+        },
+    }
+    writer.begin(header)
+    total_queries = 0
+    total_duration_ms = 0.0
+    for group in groups.values():
+        test = _test_report(group, nplus1_threshold)
+        rollup.add_problems(test["problems"])
+        total_queries += test["queries_total"]
+        total_duration_ms += test["duration_ms"]
+        writer.write_test(test)
+    trailer: Dict[str, Any] = {
+        "cost_analysis": {
+            "total_queries": total_queries,
+            "total_duration_ms": total_duration_ms,
+            "provider": "aws_rds_postgres",
+            "estimated_monthly_cost": round((total_queries / 1000) * 0.25 + 25.0, 2),
+        },
+        "fingerprints": rollup.entries(),
+    }
+    writer.end(trailer)
+    return {**header, **trailer}
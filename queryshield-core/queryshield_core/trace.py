@@ -0,0 +1,142 @@
+"""Chrome trace export of each test's queries, for Perfetto
+
+Every test becomes a process in the trace: a "test" track spanning its
+wall time and one track per database alias holding its queries at their
+recorded offsets, so bursts, gaps and long single queries are visible and
+a test's time can be split between the database and Python. Query spans
+carry the normalized SQL, the innermost call site and the problem tags.
+
+Open the output in https://ui.perfetto.dev or chrome://tracing.
+"""
+
+import json
+from fnmatch import fnmatchcase
+from typing import IO, Any, Dict, List, Optional
+
+from queryshield_core.report_io import ReportReader
+from queryshield_core.report_v2 import Decoder, _trailer, is_v2
+
+
+_NAME_LEN = 60
+
+
+def _call_site(stack: Optional[List[Any]]) -> Optional[str]:
+    if not stack:
+        return None
+    file, function, line = (list(stack[0]) + ["", "", ""])[:3]
+    return f"{function} ({file}:{line})"
+
+
+def _us(ms: float) -> float:
+    return round(ms * 1000.0, 3)
+
+
+def trace_events(test: Dict[str, Any], pid: int) -> List[Dict[str, Any]]:
+    """Trace events of one (v1) test.
+
+    Queries recorded without a start offset (reports of earlier releases)
+    are laid out back to back, and the test span is stretched to cover them
+    when their DB time exceeds the recorded wall time.
+
+    Args:
+        test: Test entry of a v1 report
+        pid: Trace process id of the test
+
+    Returns:
+        Metadata, test span and query span events
+    """
+    name = test.get("name", "")
+    queries = test.get("queries") or []
+    events: List[Dict[str, Any]] = [
+        {"ph": "M", "name": "process_name", "pid": pid, "args": {"name": name}},
+        {"ph": "M", "name": "process_sort_index", "pid": pid, "args": {"sort_index": pid}},
+        {"ph": "M", "name": "thread_name", "pid": pid, "tid": 0, "args": {"name": "test"}},
+    ]
+    tids: Dict[str, int] = {}
+    cursor = 0.0
+    end = 0.0
+    for q in queries:
+        alias = q.get("db_alias") or "default"
+        tid = tids.get(alias)
+        if tid is None:
+            tid = tids[alias] = len(tids) + 1
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": f"db {alias}"}})
+        start = q.get("start_ms")
+        if start is None:
+            start = cursor
+        duration = q.get("duration_ms") or 0.0
+        cursor = start + duration
+        end = max(end, cursor)
+        sql = q.get("normalized_sql", "")
+        tags = q.get("tags") or []
+        args: Dict[str, Any] = {"fingerprint": sql, "call_site": _call_site(q.get("stack")), "tags": tags}
+        if q.get("rows") is not None:
+            args["rows"] = q["rows"]
+        if q.get("error"):
+            args["error"] = q["error"]
+        events.append(
+            {
+                "ph": "X",
+                "cat": ",".join(["db"] + tags),
+                "name": sql[:_NAME_LEN],
+                "pid": pid,
+                "tid": tid,
+                "ts": _us(start),
+                "dur": _us(duration),
+                "args": args,
+            }
+        )
+    db_ms = test.get("duration_ms") or 0.0
+    wall_ms = test.get("wall_ms") or end
+    events.insert(
+        3,
+        {
+            "ph": "X",
+            "cat": "test",
+            "name": name,
+            "pid": pid,
+            "tid": 0,
+            "ts": 0,
+            "dur": _us(max(wall_ms, end)),
+            "args": {
+                "queries": test.get("queries_total", len(queries)),
+                "db_ms": round(db_ms, 4),
+                "wall_ms": round(wall_ms, 4),
+                "python_ms": round(max(0.0, wall_ms - db_ms), 4) if test.get("wall_ms") else None,
+                "problems": sorted({p.get("type", "?") for p in test.get("problems") or []}),
+            },
+        },
+    )
+    return events
+
+
+def write_trace(path: str, out: IO[str], tests: Optional[str] = None) -> int:
+    """Stream a report (either schema, any format) into a Chrome trace.
+
+    Args:
+        path: Report file path
+        out: Text stream for the trace JSON
+        tests: Only tests whose name matches this glob pattern
+
+    Returns:
+        Number of tests written
+    """
+    with ReportReader(path) as reader:
+        # v2 tests are decoded with the tables, which follow them
+        decoder = Decoder(_trailer(path)) if is_v2(reader.header) else None
+        out.write('{"displayTimeUnit":"ms","otherData":')
+        out.write(json.dumps({"report": path, "project_root": reader.header.get("project_root")}))
+        out.write(',"traceEvents":[')
+        first = True
+        written = 0
+        for test in reader.tests():
+            if tests and not fnmatchcase(test.get("name", ""), tests):
+                continue
+            if decoder is not None:
+                test = decoder.test(test)
+            written += 1
+            for event in trace_events(test, written):
+                out.write(("\n" if first else ",\n") + json.dumps(event, separators=(",", ":")))
+                first = False
+        out.write("\n]}\n")
+    return written
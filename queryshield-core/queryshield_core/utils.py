@@ -1,14 +1,19 @@
+import hashlib
 import re
 from typing import Any
 
 
 _re_multispace = re.compile(r"\s+")
-_re_string_sq = re.compile(r"'([^']|''|\\')*'")
-_re_string_dq = re.compile(r'"([^"]|\"|"")*"')
-_re_numeric = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Double-quoted tokens are identifiers (PostgreSQL, SQLite, Django's
+# quoting) and are kept; only string and numeric literals are replaced
+_re_literal = re.compile(r"""("(?:[^"]|"")*")|'(?:[^']|''|\\')*'|\b\d+(?:\.\d+)?\b""")
 _re_in_list = re.compile(r"IN\s*\((\s*\?(?:\s*,\s*\?)+\s*)\)", re.IGNORECASE)
 
 
+def _literal(m: "re.Match[str]") -> str:
+    return m.group(1) or "?"
+
+
 def normalize_sql(sql: str) -> str:
     """Normalize SQL query for comparison and grouping.
     
@@ -22,9 +27,7 @@ def normalize_sql(sql: str) -> str:
         Normalized SQL suitable for grouping
     """
     s = sql.strip()
-    s = _re_string_sq.sub("?", s)
-    s = _re_string_dq.sub("?", s)
-    s = _re_numeric.sub("?", s)
+    s = _re_literal.sub(_literal, s)
     s = _re_in_list.sub("IN (?)", s)
     s = _re_multispace.sub(" ", s)
     return s
@@ -55,3 +58,20 @@ def redact_params(params: Any) -> Any:
         Type-only representation of parameters
     """
     return _shape(params)
+
+
+def params_hash(params: Any) -> str:
+    """Stable digest of query parameters.
+
+    Identical SQL with the same digest is an exact repeat; only the digest
+    is reported, never the values.
+
+    Args:
+        params: Query parameters (dict, list, tuple, or single value)
+
+    Returns:
+        16-character hex digest
+    """
+    if isinstance(params, dict):
+        params = sorted(params.items(), key=lambda kv: str(kv[0]))
+    return hashlib.blake2b(repr(params).encode("utf-8", "replace"), digest_size=8).hexdigest()
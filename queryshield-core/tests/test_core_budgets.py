@@ -0,0 +1,39 @@
+"""Tests for budget checking"""
+
+from queryshield_core.budgets import check_budgets
+
+
+class TestBudgets:
+    """Tests for budget rules and overrides"""
+
+    def test_module_prefix_and_glob_overrides(self):
+        budgets = {
+            "defaults": {"max_p95_ms": 5},
+            "tests": {"tests/test_api.py": {"max_p95_ms": 50}, "*test_report*": {"max_p95_ms": 100}},
+        }
+        tests = [
+            {"name": "tests/test_api.py::test_list", "queries_p95_ms": 20.0},
+            {"name": "tests/test_api.py::test_report", "queries_p95_ms": 80.0},
+            {"name": "tests/test_other.py::test_list", "queries_p95_ms": 20.0},
+        ]
+        assert check_budgets(budgets, (t for t in tests)) == [
+            "tests/test_other.py::test_list: queries_p95_ms 20.0 > max_p95_ms 5",
+        ]
+
+    def test_rows_limit_skips_unknown_row_counts(self):
+        budgets = {"defaults": {"max_rows": 10}}
+        report = {"tests": [{"name": "a", "rows_total": None}, {"name": "b", "rows_total": 11}]}
+        assert check_budgets(budgets, report) == ["b: rows_total 11 > max_rows 10"]
+
+    def test_v2_statement_is_named_after_the_stream(self):
+        """v2 tests are checked as read; their statement comes from the trailing table"""
+        budgets = {"defaults": {"max_queries_per_fingerprint": 2}}
+        tables = []
+
+        def tests():
+            yield {"name": "t", "top_fingerprint": {"fingerprint": 0, "count": 3}}
+            tables.append("SELECT * FROM books WHERE id = ?")
+
+        assert check_budgets(budgets, tests(), statements=lambda: tables) == [
+            "t: fingerprint_max_count 3 > max_queries_per_fingerprint 2 (SELECT * FROM books WHERE id = ?)",
+        ]
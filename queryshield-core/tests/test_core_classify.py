@@ -0,0 +1,148 @@
+"""Tests for the event-sequence classifiers"""
+
+from queryshield_core.analysis.classify import (
+    NPlusOneTracker,
+    classify_all,
+    classify_duplicates,
+    classify_loop_writes,
+    classify_sequential,
+)
+from queryshield_core.analysis.ml_suggestions import AIAnalyzer
+from queryshield_core.utils import normalize_sql
+
+
+def _ev(sql, line, func="books_view", ms=1.0):
+    return {"sql": sql, "duration_ms": ms, "stack": [["app/views.py", func, line]]}
+
+
+class TestNormalizeSql:
+    """Tests for SQL fingerprinting"""
+
+    def test_django_quoted_tables_get_distinct_fingerprints(self):
+        books = normalize_sql('SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = 3')
+        authors = normalize_sql('SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."author_id" = 3')
+        assert books == 'SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = ?'
+        assert books != authors
+
+
+class TestNPlusOneTracker:
+    """Tests for online N+1 clustering"""
+
+    def test_tracker_fed_while_recording_matches_batch(self):
+        events = [_ev(f"SELECT * FROM authors WHERE id = {i}", 12) for i in range(5)]
+        events.append(_ev("SELECT * FROM books", 20))
+        fired = []
+        tracker = NPlusOneTracker(5, on_cluster=lambda norm, idx: fired.append(idx))
+        for e in events:
+            tracker.add(e["sql"], e["stack"])
+        assert fired == [4]
+        problems, tags = classify_all(events, tracker=tracker)
+        assert (problems, tags) == classify_all(events)
+        assert [p["type"] for p in problems] == ["N+1"]
+        assert problems[0]["evidence"]["top_stack"] == ["app/views.py", "books_view", 12]
+
+
+class TestSequentialQueries:
+    """Tests for SEQUENTIAL_QUERIES detection"""
+
+    def test_loop_body_is_reported_once(self):
+        events = []
+        for i in range(5):
+            events += [
+                _ev(f"SELECT * FROM authors WHERE id = {i}", 12),
+                _ev(f"SELECT * FROM publishers WHERE id = {i}", 13),
+                _ev(f"SELECT * FROM reviews WHERE book_id = {i}", 14),
+            ]
+        problems, tags = classify_sequential(events)
+        assert len(problems) == 1
+        evidence = problems[0]["evidence"]
+        assert evidence["pattern"] == "loop"
+        assert (evidence["iterations"], evidence["queries_per_iteration"]) == (5, 3)
+        assert evidence["db_time_ms"] == 15.0
+        assert len(tags) == 15
+
+    def test_django_quoted_statements(self):
+        lookups = [
+            _ev('SELECT "auth_user"."id" FROM "auth_user" WHERE "auth_user"."id" = %s', 30, "profile"),
+            _ev('SELECT "app_profile"."id" FROM "app_profile" WHERE "app_profile"."user_id" = %s', 31, "profile"),
+            _ev('SELECT "app_order"."id" FROM "app_order" WHERE "app_order"."user_id" = %s', 32, "profile"),
+        ]
+        problems, _tags = classify_sequential(lookups)
+        assert [(p["evidence"]["pattern"], p["count"]) for p in problems] == [("serial_lookups", 3)]
+
+        loop = []
+        for _ in range(3):
+            loop += [
+                _ev('SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = %s', 12),
+                _ev('SELECT "app_publisher"."id" FROM "app_publisher" WHERE "app_publisher"."id" = %s', 13),
+            ]
+        problems, tags = classify_sequential(loop)
+        assert [p["evidence"]["pattern"] for p in problems] == ["loop"]
+        assert problems[0]["evidence"]["queries_per_iteration"] == 2 and len(tags) == 6
+
+    def test_serial_lookups_feed_ai_analyzer(self):
+        events = [
+            _ev("SELECT * FROM users WHERE id = 1", 30, "profile"),
+            _ev("SELECT * FROM profiles WHERE user_id = 1", 31, "profile"),
+            _ev("SELECT * FROM orders WHERE user_id = 1", 32, "profile"),
+        ]
+        problems, tags = classify_all(events)
+        assert [p["evidence"]["pattern"] for p in problems] == ["serial_lookups"]
+        assert tags[0] == ["serial_lookups_1"]
+        suggestion = AIAnalyzer().analyze_problem(problems[0])
+        assert suggestion is not None
+        assert "3 sequential queries" in suggestion.root_cause
+
+    def test_loops_already_reported_as_n_plus_one_are_skipped(self):
+        """A loop made only of N+1 clusters is not reported twice"""
+        events = []
+        for i in range(6):
+            events += [
+                _ev(f"SELECT * FROM authors WHERE id = {i}", 12),
+                _ev(f"SELECT * FROM publishers WHERE id = {i}", 14),
+            ]
+        problems, tags = classify_all(events, nplus1_threshold=5)
+        assert sorted(p["type"] for p in problems) == ["N+1", "N+1"]
+        assert all(not t.startswith("seq_loop") for ts in tags.values() for t in ts)
+        problems, _tags = classify_all(events, nplus1_threshold=10)
+        assert [p["type"] for p in problems] == ["SEQUENTIAL_QUERIES"]
+
+
+class TestDuplicateQueries:
+    """Tests for DUPLICATE_QUERY detection"""
+
+    def test_hash_is_computed_from_params_when_missing(self):
+        sql = "SELECT * FROM users WHERE id = :id"
+        events = [
+            {"sql": sql, "params": {"id": 7}, "duration_ms": 4.0, "stack": [["app/auth.py", "current_user", 9]]},
+            {"sql": sql, "params": {"id": 7}, "duration_ms": 5.0, "stack": [["app/auth.py", "current_user", 9]]},
+            {"sql": sql, "params": {"id": 8}, "duration_ms": 5.0, "stack": [["app/auth.py", "current_user", 9]]},
+        ]
+        problems, tags = classify_duplicates(events)
+        assert len(problems) == 1
+        evidence = problems[0]["evidence"]
+        assert evidence["duplicate_count"] == 1 and evidence["wasted_ms"] == 5.0
+        assert problems[0]["suggestion"]["kind"] == "cached_property"
+        assert sorted(tags) == [0, 1]
+
+
+class TestLoopWrites:
+    """Tests for LOOP_WRITE detection"""
+
+    def test_repeated_inserts_suggest_multi_row_values(self):
+        sql = "INSERT INTO orders (sku, qty) VALUES (:sku, :qty)"
+        events = [
+            {"sql": sql, "params": {"sku": i, "qty": 1}, "duration_ms": 2.0, "stack": [["app/jobs.py", "import_orders", 12]]}
+            for i in range(2500)
+        ]
+        problems, tags = classify_all(events)
+        assert [p["type"] for p in problems] == ["LOOP_WRITE"]
+        assert problems[0]["suggestion"] == {"kind": "insert_values", "args": {"table": "orders"}}
+        evidence = problems[0]["evidence"]
+        assert (evidence["round_trips"], evidence["round_trips_after"]) == (2500, 3)
+        assert evidence["projected_saved_ms"] == 4994.0
+        assert len(tags) == 2500
+
+    def test_executemany_is_already_batched(self):
+        event = {"sql": "UPDATE orders SET qty = :qty WHERE id = :id", "many": True, "duration_ms": 1.0}
+        assert classify_loop_writes([event] * 10) == ([], {})
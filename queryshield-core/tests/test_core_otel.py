@@ -0,0 +1,178 @@
+"""Tests for the OpenTelemetry span export and OTLP ingestion"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+from queryshield_core.otel_ingest import ingest_otlp, iter_spans
+from queryshield_core.report_io import ReportCollector, ReportWriter, read_report
+from queryshield_core.report_v2 import V2Writer, downgrade
+
+TRACE = "5b8efff798038103d269b633813fc60c"
+BASE_NS = 1_700_000_000_000_000_000
+
+
+def _attr(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"stringValue": value}}
+
+
+def _span(span_id, name, start_ms, ms, parent="", trace=TRACE, error=None, **attrs):
+    span = {
+        "traceId": trace,
+        "spanId": span_id,
+        "parentSpanId": parent,
+        "name": name,
+        "kind": 3 if parent else 2,
+        "startTimeUnixNano": str(BASE_NS + int(start_ms * 1e6)),
+        "endTimeUnixNano": str(BASE_NS + int((start_ms + ms) * 1e6)),
+        "attributes": [_attr(k.replace("_", "."), v) for k, v in attrs.items()],
+    }
+    if error:
+        span["status"] = {"code": 2, "message": error}
+    return span
+
+
+def _request(spans):
+    return {"resourceSpans": [{"resource": {"attributes": []}, "scopeSpans": [{"scope": {"name": "x"}, "spans": spans}]}]}
+
+
+def _db(span_id, sql, start_ms, line=12, **attrs):
+    return _span(
+        span_id,
+        "SELECT",
+        start_ms,
+        1.0,
+        parent="00f067aa0ba902b7",
+        db_system="postgresql",
+        db_statement=sql,
+        code_filepath="app/views.py",
+        code_function="books",
+        code_lineno=line,
+        **attrs,
+    )
+
+
+def _write_lines(tmp_path, docs, name="spans.json"):
+    path = os.path.join(str(tmp_path), name)
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(doc) + "\n")
+    return path
+
+
+class TestIngestOtlp:
+    """Tests for ingest_otlp"""
+
+    def _spans(self):
+        root = _span("00f067aa0ba902b7", "GET /books", 0.0, 20.0, http_route="/books")
+        lookups = [_db(f"a{i:015x}", f"SELECT * FROM authors WHERE id = {i}", 2.0 + i, line=14) for i in range(5)]
+        books = _db("b000000000000001", "SELECT * FROM books", 1.0)
+        other = _span("c000000000000001", "worker", 0.0, 1.0)
+        # Spans arrive in batches, children before their root
+        return [_request(lookups[:3]), _request([books, other] + lookups[3:]), _request([root])]
+
+    def test_trace_becomes_test(self, tmp_path):
+        collector = ReportCollector()
+        summary = ingest_otlp(_write_lines(tmp_path, self._spans(), "spans.json.gz"), collector, nplus1_threshold=5)
+        [test] = collector.report["tests"]
+        assert test["name"] == f"GET /books [{TRACE[:16]}]"
+        assert test["queries_total"] == 6 and test["wall_ms"] == 20.0
+        assert [q["start_ms"] for q in test["queries"]] == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+        assert test["queries"][1]["normalized_sql"] == "SELECT * FROM authors WHERE id = ?"
+        assert test["queries"][1]["stack"] == [["app/views.py", "books", 14]]
+        [problem] = [p for p in test["problems"] if p["type"] == "N+1"]
+        assert problem["id"] == "n+1:app/views.py:14"
+        assert summary["run"]["spans"] == 8 and summary["run"]["db_spans"] == 6
+        assert summary["db"]["vendor"] == "postgresql"
+        assert summary["fingerprints"][0]["count"] == 5
+
+    def test_v2_and_untraced_spans(self, tmp_path):
+        docs = self._spans() + [_request([_span("d000000000000001", "SELECT", 0.0, 2.0, db_system="sqlite", error="boom")])]
+        out = os.path.join(str(tmp_path), "report.json")
+        with ReportWriter(out) as raw:
+            ingest_otlp(_write_lines(tmp_path, docs), V2Writer(raw))
+        report = downgrade(read_report(out))
+        tests = {t["name"]: t for t in report["tests"]}
+        assert tests["_run"]["queries"][0]["error"] == "boom"
+        assert tests["_run"]["queries"][0]["normalized_sql"] == "SELECT"
+
+    def test_pretty_printed_document(self, tmp_path):
+        path = os.path.join(str(tmp_path), "spans.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(_request([_db("e000000000000001", "SELECT 1", 0.0)]), f, indent=2)
+        [span] = list(iter_spans(path))
+        assert span["attributes"]["code.lineno"] == 12 and span["end_ns"] - span["start_ns"] == 1_000_000
+
+
+class TestSpanEmitter:
+    """Tests for SpanEmitter"""
+
+    @pytest.fixture
+    def exporter(self):
+        sdk = pytest.importorskip("opentelemetry.sdk.trace")
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        exporter = InMemorySpanExporter()
+        provider = sdk.TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        exporter.provider = provider
+        return exporter
+
+    def test_query_span(self, exporter):
+        from opentelemetry.trace import SpanKind, StatusCode
+
+        from queryshield_core.otel import SpanEmitter, fingerprint_id
+
+        emitter = SpanEmitter(exporter.provider, nplus1_threshold=2)
+        emitter.query(
+            "UPDATE books SET title = ?",
+            2.5,
+            start_ns=BASE_NS,
+            db_system="sqlite",
+            db_alias="default",
+            stack=[("app/views.py", "rename", 40)],
+            repeats=2,
+            rows=1,
+            error="locked",
+        )
+        [span] = exporter.get_finished_spans()
+        assert span.name == "UPDATE default" and span.kind == SpanKind.CLIENT
+        assert span.end_time - span.start_time == 2_500_000
+        assert span.status.status_code == StatusCode.ERROR
+        attrs = span.attributes
+        assert attrs["queryshield.fingerprint"] == fingerprint_id("UPDATE books SET title = ?")
+        assert attrs["queryshield.call_site"] == "rename (app/views.py:40)"
+        assert attrs["queryshield.nplus1"] is True and attrs["db.response.returned_rows"] == 1
+        assert "queryshield.test" not in attrs
+
+    def test_exported_spans_ingest_back(self, exporter, tmp_path):
+        encoder = pytest.importorskip("opentelemetry.exporter.otlp.proto.common.trace_encoder")
+        from google.protobuf.json_format import MessageToDict
+
+        from queryshield_core.otel import SpanEmitter
+
+        emitter = SpanEmitter(exporter.provider)
+        emitter.start_test("t_books", BASE_NS)
+        for i in range(6):
+            emitter.query(
+                "SELECT * FROM authors WHERE id = ?",
+                0.5,
+                start_ns=BASE_NS + i * 1_000_000,
+                db_system="sqlite",
+                stack=[("app/views.py", "books", 14)],
+            )
+        emitter.end_test(BASE_NS + 10_000_000)
+        doc = MessageToDict(encoder.encode_spans(exporter.get_finished_spans()))
+        collector = ReportCollector()
+        ingest_otlp(_write_lines(tmp_path, [doc]), collector)
+        [test] = collector.report["tests"]
+        assert (test["name"], test["queries_total"], test["wall_ms"]) == ("t_books", 6, 10.0)
+        assert any(p["type"] == "N+1" for p in test["problems"])
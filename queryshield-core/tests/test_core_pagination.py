@@ -0,0 +1,45 @@
+"""Tests for the deep OFFSET and COUNT(*) detectors"""
+
+from queryshield_core.analysis.pagination import classify_pagination
+from queryshield_core.utils import normalize_sql
+
+
+class TestPagination:
+    """Tests for classify_pagination"""
+
+    def test_sqlalchemy_style_paging(self):
+        page = "SELECT books.id FROM books ORDER BY books.id LIMIT :param_1 OFFSET :param_2"
+        count = "SELECT count(*) AS count_1 FROM (SELECT books.id FROM books) AS anon_1"
+        events = [
+            {"sql": count, "params": {}, "duration_ms": 30.0},
+            {"sql": page, "params": {"param_1": 25, "param_2": 10000}, "duration_ms": 12.0},
+        ]
+        count_plan = {
+            "Node Type": "Aggregate",
+            "Plans": [{"Node Type": "Seq Scan", "Relation Name": "books", "Plan Rows": 80000}],
+        }
+        problems, tags = classify_pagination(events, {normalize_sql(count): count_plan})
+        by_type = {p["type"]: p for p in problems}
+        assert set(by_type) == {"DEEP_OFFSET", "COUNT_STAR"}
+        deep = by_type["DEEP_OFFSET"]["evidence"]
+        assert (deep["max_offset"], deep["limit"], deep["offset_source"]) == (10000, 25, "parameter")
+        assert by_type["DEEP_OFFSET"]["suggestion"]["args"]["order_by"] == ["id"]
+        assert by_type["COUNT_STAR"]["evidence"]["usage"] == "paging"
+        assert sorted(tags) == [0, 1]
+
+    def test_only_zero_comparisons_are_existence_checks(self, tmp_path):
+        source = tmp_path / "views.py"
+        source.write_text("if session.query(Book).count():\n    n = query.count()\nif query.count() == 0:\n")
+        count = "SELECT count(*) AS count_1 FROM books"
+        plan = {"Node Type": "Aggregate", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "books", "Plan Rows": 80000}]}
+
+        def usage(line, plans):
+            events = [{"sql": count, "duration_ms": 5.0, "stack": [[str(source), "index", line]]}]
+            return [p["evidence"]["usage"] for p in classify_pagination(events, plans)[0]]
+
+        plans = {normalize_sql(count): plan}
+        assert (usage(1, plans), usage(2, plans), usage(3, plans)) == (["existence"], [], ["existence"])
+        small = {"Node Type": "Aggregate", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "books", "Plan Rows": 40}]}
+        assert usage(1, {normalize_sql(count): small}) == []
+        # Without a row estimate the statement shape alone decides
+        assert (usage(1, {}), usage(2, {})) == (["existence"], [])
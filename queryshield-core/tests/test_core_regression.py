@@ -0,0 +1,47 @@
+"""Tests for the statistical regression gate"""
+
+import random
+
+from queryshield_core.analysis.regression import compare_timings, merge_timings, min_runs, run_timings
+
+
+def _timings(rng, runs, lookup_ms):
+    samples = []
+    for _ in range(runs):
+        events = [
+            {"sql": f"SELECT * FROM authors WHERE id = {i}", "duration_ms": rng.gauss(lookup_ms, lookup_ms * 0.1)}
+            for i in range(5)
+        ]
+        samples.append(run_timings({"t": events}))
+    return merge_timings(samples)
+
+
+class TestCompareTimings:
+    """Tests for compare_timings"""
+
+    def test_noise_is_not_a_regression(self):
+        rng = random.Random(11)
+        assert compare_timings(_timings(rng, 10, 2.0), _timings(rng, 10, 2.0)) == []
+
+    def test_slower_fingerprint_is_reported(self):
+        rng = random.Random(11)
+        regressions = compare_timings(_timings(rng, 10, 2.0), _timings(rng, 10, 4.0))
+        assert {r["fingerprint"] for r in regressions} == {None, "SELECT * FROM authors WHERE id = ?"}
+        assert all(r["q_value"] < 0.01 and r["effect_size"] >= 0.33 for r in regressions)
+
+    def test_test_db_time_is_not_drowned_by_fingerprints(self):
+        rng = random.Random(5)
+
+        def suite(slow_ms):
+            tests = {}
+            for j in range(20):
+                db = [rng.gauss(100.0, 2.0) + (slow_ms if j == 0 else 0.0) for _ in range(10)]
+                fps = {f"SELECT * FROM t{j}_{i}": [rng.gauss(1.0, 0.1) for _ in range(50)] for i in range(20)}
+                tests[f"t{j}"] = {"db_time_ms": db, "fingerprints": fps}
+            return {"version": "1", "kind": "timings", "runs": 10, "tests": tests}
+
+        regressions = compare_timings(suite(0.0), suite(50.0))
+        assert [(r["test"], r["fingerprint"]) for r in regressions] == [("t0", None)]
+
+    def test_min_runs(self):
+        assert (min_runs(1), min_runs(100), min_runs(110)) == (5, 10, 11)
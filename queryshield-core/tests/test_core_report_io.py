@@ -0,0 +1,42 @@
+"""Tests for the streaming report reader and writer"""
+
+import json
+
+from queryshield_core.report_io import ReportCollector, ReportReader, ReportWriter, format_for_path, read_report
+
+
+class TestReportIO:
+    """Tests for ReportWriter / ReportReader"""
+
+    def test_streamed_report_reads_back(self, tmp_path):
+        path = str(tmp_path / "report.json")
+        with ReportWriter(path) as writer:
+            writer.begin({"version": "1", "run": {"mode": "tests"}})
+            for i in range(3):
+                writer.write_test({"name": f"t{i}", "queries_total": i})
+            writer.end({"cost_analysis": {"total_queries": 3}})
+        with ReportReader(path) as reader:
+            assert [t["queries_total"] for t in reader.tests()] == [0, 1, 2]
+            assert reader.trailer == {"cost_analysis": {"total_queries": 3}}
+        assert json.load(open(path, encoding="utf-8"))["tests"][2]["name"] == "t2"
+
+    def test_json_paths_default_to_indented_output(self, tmp_path):
+        pretty, compact = str(tmp_path / "pretty.json"), str(tmp_path / "compact.json")
+        for path, fmt in ((pretty, None), (compact, "json")):
+            with ReportWriter(path, fmt) as writer:
+                writer.begin({"version": "1"})
+                writer.write_test({"name": "t"})
+                writer.end()
+        assert format_for_path(pretty) == "pretty"
+        assert "\n  " in open(pretty, encoding="utf-8").read()
+        assert "\n  " not in open(compact, encoding="utf-8").read()
+        assert read_report(pretty) == read_report(compact)
+
+    def test_gzip_and_collector(self, tmp_path):
+        path = str(tmp_path / "report.json.gz")
+        collector = ReportCollector()
+        for target in (ReportWriter(path), collector):
+            target.begin({"version": "1"})
+            target.write_test({"name": "t"})
+            target.end({"index_advice": []})
+        assert read_report(path) == collector.report == {"version": "1", "tests": [{"name": "t"}], "index_advice": []}
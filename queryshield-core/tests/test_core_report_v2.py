@@ -0,0 +1,49 @@
+"""Tests for the dictionary-encoded report schema"""
+
+from queryshield_core.report_io import ReportCollector
+from queryshield_core.report_v2 import V2Writer, downgrade, upgrade
+
+
+def _report():
+    query = {
+        "normalized_sql": "SELECT ? FROM authors",
+        "duration_ms": 1.5,
+        "rows": 3,
+        "stack": [["app/views.py", "index", 4]],
+        "error": None,
+        "params": [],
+        "params_hash": "0",
+        "tags": [],
+        "db_alias": "default",
+    }
+    return {
+        "version": "1",
+        "tests": [{"name": f"t{i}", "queries_total": 2, "queries": [query, dict(query, duration_ms=2.0)]} for i in range(2)],
+    }
+
+
+class TestReportV2:
+    """Tests for upgrade / downgrade and V2Writer"""
+
+    def test_shared_tables(self):
+        v2 = upgrade(_report())
+        assert v2["fingerprints"] == [{"sql": "SELECT ? FROM authors"}]
+        assert v2["callsites"] == [["app/views.py", "index", 4]] and v2["stacks"] == [[0]]
+        assert v2["tests"][1]["queries"] == {
+            "fingerprint": [0, 0],
+            "stack": [0, 0],
+            "duration_ms": [1.5, 2.0],
+            "rows": [3, 3],
+            "params": [[], []],
+            "params_hash": ["0", "0"],
+        }
+        assert downgrade(v2) == _report()
+
+    def test_writer_matches_upgrade(self):
+        collector = ReportCollector()
+        writer = V2Writer(collector)
+        writer.begin({"version": "1"})
+        for t in _report()["tests"]:
+            writer.write_test(t)
+        writer.end()
+        assert collector.report == upgrade(_report())
@@ -0,0 +1,63 @@
+"""Tests for the per-statement fingerprint rollup"""
+
+from queryshield_core.analysis.classify import NPlusOneTracker
+from queryshield_core.analysis.rollup import FingerprintRollup
+from queryshield_core.report_v2 import downgrade, upgrade
+
+
+def _event(sql, ms=1.0, line=12, rows=None):
+    return {"sql": sql, "duration_ms": ms, "rows": rows, "stack": [["app/views.py", "index", line]]}
+
+
+def _rollup():
+    rollup = FingerprintRollup()
+    events = [_event("SELECT * FROM books", rows=20)] + [_event(f"SELECT * FROM authors WHERE id = {i}", 2.0) for i in range(6)]
+    tracker = NPlusOneTracker(5)
+    for e in events:
+        tracker.add(e["sql"], e["stack"])
+    rollup.add_test("t_list", events, tracker.normalized)
+    rollup.add_test("t_detail", [_event("SELECT * FROM books", 3.0, line=30)], ["SELECT * FROM books"])
+    rollup.add_problems(tracker.finish()[0])
+    return rollup
+
+
+class TestFingerprintRollup:
+    """Tests for FingerprintRollup"""
+
+    def test_entries(self):
+        authors, books = _rollup().entries()
+        assert authors["sql"] == "SELECT * FROM authors WHERE id = ?"
+        assert (authors["count"], authors["total_ms"], authors["p95_ms"], authors["tests"]) == (6, 12.0, 2.0, 1)
+        assert [p["type"] for p in authors["problems"]] == ["N+1"]
+        assert (books["count"], books["total_ms"], books["tests"], books["rows_total"]) == (2, 4.0, 2, 20)
+        assert [s["line"] for s in books["call_sites"]] == [12, 30]
+
+    def test_plans(self):
+        rollup = _rollup()
+        plan = {"Node Type": "Seq Scan", "Relation Name": "books", "Plan Rows": 20000}
+        assert rollup.attach_plans({"SELECT * FROM books": plan}) == [{"db_alias": "default", "plan": plan}]
+        books = rollup.entries()[1]
+        assert books["plan"] == 0
+        assert [(p["type"], p["tests"]) for p in books["problems"]] == [("SELECT_STAR_LARGE", 2)]
+
+    def test_django_quoted_tables_are_separate_statements(self):
+        rollup = FingerprintRollup()
+        events = [_event(f'SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = {i}') for i in range(3)]
+        events += [_event(f'SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = {i}', 2.0) for i in range(2)]
+        tracker = NPlusOneTracker(5)
+        for e in events:
+            tracker.add(e["sql"], e["stack"])
+        rollup.add_test("t_list", events, tracker.normalized)
+        assert [(e["sql"], e["count"]) for e in rollup.entries()] == [
+            ('SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = ?', 2),
+            ('SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = ?', 3),
+        ]
+
+    def test_v2_round_trip(self):
+        report = {"version": "1", "tests": [], "fingerprints": _rollup().entries()}
+        v2 = upgrade(report)
+        assert v2["fingerprints"] == report["fingerprints"]
+        # Tables follow the tests even when the rollup came first
+        moved = upgrade({"version": "1", "fingerprints": report["fingerprints"], "tests": []})
+        assert list(moved) == ["version", "tests", "fingerprints", "callsites", "stacks"]
+        assert downgrade(v2) == report
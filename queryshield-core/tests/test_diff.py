@@ -0,0 +1,96 @@
+"""Tests for the report diff engine"""
+
+import os
+
+from queryshield_core.diff import diff_reports, has_regressions, plan_shape, render_markdown, summarize_report
+from queryshield_core.report_io import write_report
+from queryshield_core.report_v2 import upgrade
+
+BOOKS = "SELECT * FROM books WHERE author_id = %s"
+AUTHORS = "SELECT * FROM authors WHERE id = %s"
+SEQ_SCAN = {"Node Type": "Seq Scan", "Relation Name": "books", "Filter": "(author_id = $1)", "Total Cost": 944.0}
+INDEX_SCAN = {"Node Type": "Index Scan", "Relation Name": "books", "Index Name": "books_author_idx", "Total Cost": 8.3}
+
+
+def _test(name, queries, problems=()):
+    return {
+        "name": name,
+        "queries_total": len(queries),
+        "problems": [{"id": pid, "type": ptype} for pid, ptype in problems],
+        "queries": [{"normalized_sql": sql, "duration_ms": ms, "stack": [], "tags": []} for sql, ms in queries],
+    }
+
+
+def _report(book_ms, authors, problems=(), plan=SEQ_SCAN, extra_test=False):
+    tests = [
+        _test("t_books", [(BOOKS, book_ms + i * 0.01) for i in range(20)]),
+        _test("t_authors", [(AUTHORS, 0.3)] * authors, problems),
+    ]
+    if extra_test:
+        tests.append(_test("t_new", [("SELECT 1", 0.1)]))
+    return {
+        "version": "1",
+        "tests": tests,
+        "fingerprints": [
+            {"sql": BOOKS, "count": 20, "total_ms": 20 * book_ms, "tests": 1, "plan": 0},
+            {"sql": AUTHORS, "count": authors, "total_ms": 0.3 * authors, "tests": 1, "plan": None},
+        ],
+        "plans": [{"db_alias": "default", "plan": plan}],
+    }
+
+
+def _write(tmp_path, name, report):
+    path = os.path.join(str(tmp_path), name)
+    write_report(report, path)
+    return path
+
+
+class TestDiffReports:
+    """Tests for diff_reports and render_markdown"""
+
+    def test_identical_reports(self, tmp_path):
+        path = _write(tmp_path, "r.json", _report(1.0, 3))
+        diff = diff_reports(path, path)
+        assert not any(diff["statements"].values()) and not has_regressions(diff)
+        assert "No changes." in render_markdown(diff)
+
+    def test_changes(self, tmp_path):
+        base = _write(tmp_path, "base.json", _report(1.0, 3, problems=[("dup:1", "DUPLICATE_QUERY")]))
+        current = upgrade(_report(4.0, 8, problems=[("n+1:views.py:12", "N+1")], plan=INDEX_SCAN, extra_test=True))
+        cur = _write(tmp_path, "cur.json.gz", current)
+        diff = diff_reports(base, cur)
+        statements = diff["statements"]
+        assert [s["sql"] for s in statements["new"]] == ["SELECT 1"] and statements["removed"] == []
+        assert [(c["sql"], c["change"]) for c in statements["count_changes"]] == [(AUTHORS, 5)]
+        [shift] = statements["latency_shifts"]
+        assert shift["sql"] == BOOKS and shift["direction"] == "slower"
+        assert shift["current_median_ms"] > shift["baseline_median_ms"] + 2.9
+        [plan] = statements["plan_changes"]
+        assert plan["baseline_plan"] == "Seq Scan books"
+        assert plan["current_plan"] == "Index Scan books books_author_idx"
+        assert diff["tests"]["added"] == ["t_new"]
+        assert diff["tests"]["query_changes"][0] == {"test": "t_authors", "baseline": 3, "current": 8, "change": 5}
+        assert diff["problems"]["new"] == [{"id": "n+1:views.py:12", "type": "N+1", "tests": ["t_authors"]}]
+        assert diff["problems"]["fixed"] == [{"id": "dup:1", "type": "DUPLICATE_QUERY", "tests": ["t_authors"]}]
+        assert has_regressions(diff)
+        text = render_markdown(diff)
+        assert "### 🔴 New problems" in text and "+ Index Scan books books_author_idx" in text
+
+    def test_reverse_is_faster(self, tmp_path):
+        base = _write(tmp_path, "base.json", _report(1.0, 3))
+        cur = _write(tmp_path, "cur.json", _report(4.0, 3))
+        [shift] = diff_reports(cur, base)["statements"]["latency_shifts"]
+        assert shift["direction"] == "faster"
+        assert not has_regressions(diff_reports(cur, base))
+
+    def test_summary_without_rollup_uses_queries(self, tmp_path):
+        report = _report(1.0, 3)
+        del report["fingerprints"], report["plans"]
+        summary = summarize_report(_write(tmp_path, "r.json", report), max_samples=5)
+        books = summary.statements[BOOKS]
+        assert (books.count, books.tests, len(books.samples)) == (20, 1, 5)
+        assert summary.queries_total == 23
+
+    def test_plan_shape_ignores_costs(self):
+        assert plan_shape(dict(SEQ_SCAN, **{"Total Cost": 1.0})) == plan_shape(SEQ_SCAN)
+        assert plan_shape(None) is None
@@ -0,0 +1,181 @@
+"""Tests for the DB-API EXPLAIN handlers"""
+
+import json
+import sqlite3
+
+import pytest
+from queryshield_core.analysis.explain_checks import explain_classify
+from queryshield_core.analysis.explain_pg import ExplainSession
+from queryshield_core.analysis.explain_sqlite import explain_query as explain_query_sqlite
+from queryshield_core.analysis.index_advisor import advise_indexes
+from queryshield_core.analysis.plan_visitor import PlanRule, PlanRules, PlanWalk
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._row = None
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+        if "fail" in sql:
+            raise RuntimeError("canceling statement due to statement timeout")
+        if sql.startswith("EXPLAIN"):
+            self._row = (json.dumps([{"Plan": {"Node Type": "Result"}}]),)
+        else:
+            if "set_config" in sql:
+                # Transactional, like PostgreSQL's set_config(..., false)
+                target = self.conn.settings if self.conn.autocommit else self.conn.pending
+                target.update(zip(params[::2], params[1::2]))
+            self._row = tuple("0" for _ in params or ())
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.autocommit = False
+        self.closed = False
+        self.settings = {}
+        self.pending = {}
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.settings.update(self.pending)
+        self.pending = {}
+
+    def rollback(self):
+        self.pending = {}
+
+    def close(self):
+        self.closed = True
+
+
+class _NoAutocommitConnection(_FakeConnection):
+    autocommit = property(lambda self: False, lambda self, value: None)
+
+
+class _FakePoolProxy:
+    """Like SQLAlchemy's pool proxy: reads are forwarded, writes are not."""
+
+    def __init__(self, conn):
+        self.driver_connection = conn
+
+    def __getattr__(self, name):
+        return getattr(self.driver_connection, name)
+
+
+class TestExplainSession:
+    """Tests for the PostgreSQL EXPLAIN session"""
+
+    def test_dedicated_session_sets_timeout_once(self):
+        conn = _FakeConnection()
+        with ExplainSession(conn, timeout_ms=200) as session:
+            plans = session.explain_many([("SELECT 1", None), ("SELECT 2", None)], pipeline=True)
+        assert [p["Node Type"] for p in plans] == ["Result", "Result"]
+        assert conn.autocommit is True
+        assert conn.closed is True
+        assert sum(1 for s in conn.executed if "set_config" in s) == 1
+
+    def test_timeout_survives_a_failed_explain_through_a_pool_proxy(self):
+        conn = _FakeConnection()
+        with ExplainSession(_FakePoolProxy(conn), timeout_ms=200) as session:
+            assert session.explain("SELECT fail", None) is None
+            assert conn.autocommit is True
+            assert conn.settings == {"statement_timeout": "200"}
+            assert session.explain("SELECT 1", None) == {"Node Type": "Result"}
+
+    def test_timeout_is_committed_without_autocommit(self):
+        conn = _NoAutocommitConnection()
+        with ExplainSession(conn, timeout_ms=200) as session:
+            assert session.explain("SELECT fail", None) is None
+            assert conn.settings == {"statement_timeout": "200"}
+
+
+class TestSQLiteExplain:
+    """Tests for SQLite EXPLAIN QUERY PLAN analysis"""
+
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(
+            "CREATE TABLE books (id INTEGER PRIMARY KEY, author_id INT, title TEXT, created_at TEXT);"
+        )
+        yield conn
+        conn.close()
+
+    def test_scan_and_temp_btree(self, conn):
+        sql = "SELECT books.id FROM books WHERE books.author_id = ? ORDER BY books.created_at"
+        plan = explain_query_sqlite(conn, sql, (1,))
+        problems = explain_classify(sql, plan)
+        assert sorted(p["type"] for p in problems) == ["MISSING_INDEX", "SORT_WITHOUT_INDEX"]
+        missing = next(p for p in problems if p["type"] == "MISSING_INDEX")
+        assert missing["suggestion"]["args"]["columns"] == ["author_id"]
+
+    def test_index_advice_merges_prefixes(self, conn):
+        filtered = "SELECT books.id FROM books WHERE books.author_id = ?"
+        sorted_sql = filtered + " ORDER BY books.created_at"
+        advice = advise_indexes(
+            [
+                (filtered, explain_query_sqlite(conn, filtered, (1,)), 40.0, 4),
+                (sorted_sql, explain_query_sqlite(conn, sorted_sql, (1,)), 10.0, 1),
+            ]
+        )
+        assert len(advice) == 1
+        assert advice[0]["columns"] == ["author_id", "created_at"]
+        assert advice[0]["weight_ms"] == 50.0
+        assert advice[0]["ddl"].startswith('CREATE INDEX IF NOT EXISTS "idx_books_')
+
+    def test_invalid_sql_returns_none(self, conn):
+        assert explain_query_sqlite(conn, "SELECT * FROM nope", ()) is None
+
+
+class TestMySQLPlanChecks:
+    """Tests for MySQL query_block analysis"""
+
+    def test_full_scan_and_filesort(self):
+        plan = {
+            "select_id": 1,
+            "ordering_operation": {
+                "using_filesort": True,
+                "table": {
+                    "table_name": "books",
+                    "access_type": "ALL",
+                    "rows_examined_per_scan": 20000,
+                    "attached_condition": "(`app`.`books`.`author_id` = 7)",
+                },
+            },
+        }
+        sql = "SELECT `books`.`id` FROM `books` WHERE `books`.`author_id` = ? ORDER BY `books`.`created_at`"
+        problems = explain_classify(sql, plan)
+        assert sorted(p["type"] for p in problems) == ["MISSING_INDEX", "SORT_WITHOUT_INDEX"]
+        sort = next(p for p in problems if p["type"] == "SORT_WITHOUT_INDEX")
+        assert sort["suggestion"]["args"]["columns"] == ["author_id", "created_at"]
+        assert sort["suggestion"]["ddl"].startswith("ALTER TABLE `books` ADD INDEX `idx_sort_books_")
+
+
+class TestPlanWalk:
+    """Tests for the single-pass plan visitor"""
+
+    def test_rules_share_one_walk(self):
+        plan = {
+            "Node Type": "Sort",
+            "Sort Key": ["created_at"],
+            "Plans": [{"Node Type": "Seq Scan", "Relation Name": "books", "Filter": "(author_id = 1)", "Plan Rows": 50000}],
+        }
+        walk = PlanWalk(plan)
+        assert [n.kind for n in walk.nodes] == ["Sort", "Seq Scan"]
+        assert walk.descendants(walk.root)[0].parent is walk.root
+        calls = []
+        rule = PlanRule("scan", ("Seq Scan",), lambda sql, n, w: calls.append(n.kind) or {"id": "x"})
+        assert PlanRules([rule]).evaluate("SELECT 1", walk) == [{"id": "x"}]
+        assert calls == ["Seq Scan"]
+        problems = explain_classify("SELECT * FROM books WHERE author_id = 1 ORDER BY created_at", plan)
+        assert [p["type"] for p in problems] == ["MISSING_INDEX", "SORT_WITHOUT_INDEX", "SELECT_STAR_LARGE"]
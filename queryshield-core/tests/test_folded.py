@@ -0,0 +1,65 @@
+"""Tests for the folded-stack export"""
+
+import io
+import os
+
+from queryshield_core.folded import fold_report, write_folded
+from queryshield_core.report_io import write_report
+from queryshield_core.report_v2 import upgrade
+
+VIEW = ["/srv/app/views.py", "books", 12]
+TEST = ["/srv/app/tests.py", "test_books", 30]
+
+
+def _report():
+    def query(sql, ms, stack):
+        return {"normalized_sql": sql, "duration_ms": ms, "stack": stack, "tags": []}
+
+    return {
+        "version": "1",
+        "project_root": "/srv",
+        "tests": [
+            {
+                "name": "t1",
+                "queries_total": 3,
+                "queries": [
+                    query("SELECT ?", 1.5, [VIEW, TEST]),
+                    query("SELECT ?", 0.5, [VIEW, TEST]),
+                    query("SELECT 1", 0.25, []),
+                ],
+            },
+            {"name": "t2", "queries_total": 1, "queries": [query("SELECT 1; --", 1.0, [VIEW, TEST])]},
+        ],
+    }
+
+
+class TestFoldedStacks:
+    """Tests for fold_report and write_folded"""
+
+    def test_whole_run(self, tmp_path):
+        path = os.path.join(str(tmp_path), "r.json")
+        write_report(_report(), path)
+        assert fold_report(path) == {
+            "test_books (app/tests.py:30);books (app/views.py:12)": 3000,
+            "[no stack]": 250,
+        }
+
+    def test_per_test_with_statements(self, tmp_path):
+        path = os.path.join(str(tmp_path), "r.json")
+        write_report(_report(), path)
+        folded = fold_report(path, per_test=True, statements=True)
+        assert folded == {
+            "t1;test_books (app/tests.py:30);books (app/views.py:12);SELECT ?": 2000,
+            "t1;[no stack];SELECT 1": 250,
+            "t2;test_books (app/tests.py:30);books (app/views.py:12);SELECT 1: --": 1000,
+        }
+        out = io.StringIO()
+        write_folded(folded, out)
+        assert out.getvalue().splitlines()[0].endswith("SELECT ? 2000")
+
+    def test_v2_matches_v1(self, tmp_path):
+        v1, v2 = (os.path.join(str(tmp_path), n) for n in ("v1.json", "v2.json.gz"))
+        write_report(_report(), v1)
+        write_report(upgrade(_report()), v2)
+        for options in ({}, {"per_test": True, "statements": True}):
+            assert fold_report(v2, **options) == fold_report(v1, **options)
@@ -0,0 +1,84 @@
+"""Tests for the Chrome trace export"""
+
+import io
+import json
+import os
+
+from queryshield_core.report_io import write_report
+from queryshield_core.report_v2 import upgrade
+from queryshield_core.trace import trace_events, write_trace
+
+
+def _query(sql, start, ms, alias="default", tags=()):
+    return {
+        "normalized_sql": sql,
+        "duration_ms": ms,
+        "start_ms": start,
+        "stack": [["app/views.py", "books", 12], ["app/tests.py", "test_books", 30]],
+        "tags": list(tags),
+        "db_alias": alias,
+    }
+
+
+def _test(name="t_books"):
+    return {
+        "name": name,
+        "duration_ms": 3.0,
+        "wall_ms": 10.0,
+        "queries_total": 3,
+        "problems": [{"id": "n+1:views.py:12", "type": "N+1"}],
+        "queries": [
+            _query("SELECT * FROM books", 1.0, 1.0),
+            _query("SELECT * FROM authors WHERE id = %s", 4.0, 1.5, tags=["n+1_cluster_1"]),
+            _query("SELECT 1", 6.0, 0.5, alias="replica"),
+        ],
+    }
+
+
+class TestTrace:
+    """Tests for trace_events and write_trace"""
+
+    def test_tracks_and_spans(self):
+        events = trace_events(_test(), 1)
+        threads = {e["tid"]: e["args"]["name"] for e in events if e["name"] == "thread_name"}
+        assert threads == {0: "test", 1: "db default", 2: "db replica"}
+        spans = [e for e in events if e["ph"] == "X"]
+        test_span = spans[0]
+        assert (test_span["dur"], test_span["args"]["python_ms"], test_span["args"]["problems"]) == (10000.0, 7.0, ["N+1"])
+        lookup = spans[2]
+        assert (lookup["ts"], lookup["dur"], lookup["tid"], lookup["cat"]) == (4000.0, 1500.0, 1, "db,n+1_cluster_1")
+        assert lookup["args"]["call_site"] == "books (app/views.py:12)"
+        assert lookup["args"]["fingerprint"] == "SELECT * FROM authors WHERE id = %s"
+        assert spans[3]["tid"] == 2
+
+    def test_queries_without_offsets_are_laid_out_back_to_back(self):
+        test = _test()
+        for q in test["queries"]:
+            q["start_ms"] = None
+        del test["wall_ms"]
+        spans = [e for e in trace_events(test, 1) if e["ph"] == "X"]
+        assert [s["ts"] for s in spans[1:]] == [0.0, 1000.0, 2500.0]
+        assert spans[0]["dur"] == 3000.0 and spans[0]["args"]["python_ms"] is None
+
+    def test_test_span_covers_laid_out_queries(self):
+        test = _test()
+        for q in test["queries"]:
+            q.pop("start_ms")
+        test["wall_ms"] = 2.0
+        spans = [e for e in trace_events(test, 1) if e["ph"] == "X"]
+        assert spans[-1]["ts"] + spans[-1]["dur"] == 3000.0
+        assert spans[0]["dur"] == 3000.0
+        assert (spans[0]["args"]["wall_ms"], spans[0]["args"]["python_ms"]) == (2.0, 0.0)
+
+    def test_write_trace_from_v2(self, tmp_path):
+        report = {"version": "1", "tests": [_test("a.t1"), _test("b.t2")]}
+        v1, v2 = (os.path.join(str(tmp_path), n) for n in ("v1.json", "v2.json.gz"))
+        write_report(report, v1)
+        write_report(upgrade(report), v2)
+        traces = []
+        for path in (v1, v2):
+            out = io.StringIO()
+            assert write_trace(path, out, tests="b.*") == 1
+            traces.append(json.loads(out.getvalue())["traceEvents"])
+        assert traces[0] == traces[1]
+        assert traces[0][0]["args"]["name"] == "b.t2"
@@ -8,6 +8,7 @@ from .middleware import (
     MonitoringConfig,
     ProductionMonitor,
 )
+from .pg_stat_statements import PgStatStatementsCollector, StatementAggregate
 from .fastapi_middleware import QueryShieldFastAPIMiddleware, install_queryshield_fastapi
 from .django_middleware import QueryShieldDjangoMiddleware, install_queryshield_django
 
@@ -21,6 +22,9 @@ __all__ = [
     "SaaSUploader",
     "MonitoringConfig",
     "ProductionMonitor",
+    # pg_stat_statements collector
+    "PgStatStatementsCollector",
+    "StatementAggregate",
     # FastAPI
     "QueryShieldFastAPIMiddleware",
     "install_queryshield_fastapi",
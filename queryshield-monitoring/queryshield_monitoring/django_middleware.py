@@ -49,7 +49,7 @@ class QueryShieldDjangoMiddleware:
                     return original_execute(sql, params)
                 finally:
                     duration_ms = (time.time() - start_time) * 1000
-                    self.monitor.record_query(sql, duration_ms)
+                    self.monitor.record_query(sql, duration_ms, connection.vendor)
             
             # This approach is limited; better to use middleware + signals
             logger.debug("QueryShield Django monitoring initialized")
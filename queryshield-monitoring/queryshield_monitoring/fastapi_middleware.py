@@ -46,7 +46,7 @@ class QueryShieldFastAPIMiddleware(BaseHTTPMiddleware):
             start_time = conn.info.get("query_start_time", {}).pop(id(cursor), None)
             if start_time is not None:
                 duration_ms = (time.time() - start_time) * 1000
-                self.monitor.record_query(statement, duration_ms)
+                self.monitor.record_query(statement, duration_ms, conn.dialect.name)
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """Middleware dispatch - pass through with monitoring active"""
@@ -1,18 +1,35 @@
 """Production monitoring middleware for capturing and reporting queries"""
 
+import os
+import re
+import sys
 import time
 import random
 import threading
 import logging
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timezone
 import asyncio
 
 import httpx
 
+from queryshield_core.utils import normalize_sql
+
 logger = logging.getLogger(__name__)
 
+# Traces whose queries are clustered for N+1 tagging at any one time
+MAX_TRACKED_TRACES = 1024
+# Distinct (statement, call site) pairs counted per trace; a trace that
+# runs more keeps counting the pairs it has and reports no repeats for others
+MAX_TRACE_STATEMENTS = 256
+# Repeated writes are not N+1 lookups
+_re_write = re.compile(r"^\s*(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+# Frames skipped when looking for a query's call site: the standard
+# library, this package and (by path) anything installed
+_LIBRARY_DIRS = (os.path.dirname(os.__file__), os.path.dirname(__file__))
+
 
 @dataclass
 class QueryMetric:
@@ -142,6 +159,8 @@ class MonitoringConfig:
         batch_size: int = 100,
         batch_timeout_seconds: int = 30,
         enabled: bool = True,
+        otel_spans: bool = False,
+        nplus1_threshold: int = 5,
     ):
         self.api_url = api_url
         self.api_key = api_key
@@ -152,12 +171,13 @@ class MonitoringConfig:
         self.batch_size = batch_size
         self.batch_timeout_seconds = batch_timeout_seconds
         self.enabled = enabled
+        # Export every query as an OpenTelemetry span (queryshield-core[otel])
+        self.otel_spans = otel_spans
+        self.nplus1_threshold = nplus1_threshold
     
     @classmethod
     def from_env(cls) -> "MonitoringConfig":
         """Load configuration from environment variables"""
-        import os
-        
         return cls(
             api_url=os.getenv("QUERYSHIELD_API_URL", "https://api.queryshield.app"),
             api_key=os.getenv("QUERYSHIELD_API_KEY", ""),
@@ -168,23 +188,60 @@ class MonitoringConfig:
             batch_size=int(os.getenv("QUERYSHIELD_BATCH_SIZE", "100")),
             batch_timeout_seconds=int(os.getenv("QUERYSHIELD_BATCH_TIMEOUT", "30")),
             enabled=os.getenv("QUERYSHIELD_ENABLED", "true").lower() == "true",
+            otel_spans=os.getenv("QUERYSHIELD_OTEL", "false").lower() == "true",
+            nplus1_threshold=int(os.getenv("QUERYSHIELD_NPLUS1_THRESHOLD", "5")),
         )
 
 
+def _caller() -> Optional[Tuple[str, str, int]]:
+    """Innermost application frame (outside the standard library and
+    installed packages) of the current call stack"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        file = frame.f_code.co_filename
+        if not file.startswith(_LIBRARY_DIRS) and "-packages" not in file and not file.startswith("<"):
+            return (file, frame.f_code.co_name, frame.f_lineno)
+        frame = frame.f_back
+    return None
+
+
 class ProductionMonitor:
-    """Main monitoring coordinator"""
+    """Main monitoring coordinator
+    
+    With ``config.otel_spans``, every query is also exported as an
+    OpenTelemetry span through the application's tracer provider, as a
+    child of the active (request) span. Its call site is the innermost
+    application frame; it is tagged N+1 once the same statement from the
+    same call site has run ``config.nplus1_threshold`` times in one trace.
+    Span sampling is left to the provider's sampler.
+    """
     
     def __init__(self, config: MonitoringConfig):
         self.config = config
         self.sampler = QuerySampler(config.sample_rate)
         self.batcher = QueryBatcher(config.batch_size, config.batch_timeout_seconds)
         self.uploader = SaaSUploader(config.api_url, config.api_key) if config.api_key else None
+        self.spans = None
+        if config.otel_spans:
+            from queryshield_core.otel import SpanEmitter
+
+            self.spans = SpanEmitter(nplus1_threshold=config.nplus1_threshold)
+        # Per trace, the run count of each (statement, call site) pair
+        self._trace_counts: "OrderedDict[int, Dict[Tuple[str, Any], int]]" = OrderedDict()
+        self._counts_lock = threading.Lock()
         self._background_thread = None
         self._stop_event = threading.Event()
     
-    def record_query(self, sql: str, duration_ms: float) -> None:
+    def record_query(self, sql: str, duration_ms: float, db_system: Optional[str] = None) -> None:
         """Record a query metric"""
-        if not self.config.enabled or not self.sampler.should_sample():
+        if not self.config.enabled:
+            return
+        if self.spans is not None:
+            try:
+                self._emit_span(sql, duration_ms, db_system)
+            except Exception as e:
+                logger.debug(f"Cannot export query span: {e}")
+        if not self.sampler.should_sample():
             return
         
         metric = QueryMetric(
@@ -198,6 +255,28 @@ class ProductionMonitor:
         if should_flush and self.uploader:
             self._flush_async()
     
+    def _emit_span(self, sql: str, duration_ms: float, db_system: Optional[str]) -> None:
+        """Export a query as a span, clustered with its trace's queries"""
+        from queryshield_core.otel import current_trace_id
+        
+        frame = _caller()
+        stack = [frame] if frame is not None else []
+        trace_id = current_trace_id()
+        normalized = normalize_sql(sql)
+        repeats = 0
+        if trace_id is not None and not _re_write.match(normalized):
+            key = (normalized, frame)
+            with self._counts_lock:
+                counts = self._trace_counts.get(trace_id)
+                if counts is None:
+                    counts = self._trace_counts[trace_id] = {}
+                    if len(self._trace_counts) > MAX_TRACKED_TRACES:
+                        self._trace_counts.popitem(last=False)
+                seen = counts.get(key)
+                if seen is not None or len(counts) < MAX_TRACE_STATEMENTS:
+                    repeats = counts[key] = (seen or 0) + 1
+        self.spans.query(normalized, duration_ms, db_system=db_system, stack=stack, repeats=repeats)
+    
     def _flush_async(self) -> None:
         """Flush batch asynchronously"""
         batch = self.batcher.get_batch()
@@ -216,3 +295,5 @@ class ProductionMonitor:
                 loop.run_until_complete(self.uploader.upload_async(batch, self.config.org_id, self.config.environment))
                 loop.close()
             self.uploader.close()
+        if self.spans is not None:
+            self.spans.close()
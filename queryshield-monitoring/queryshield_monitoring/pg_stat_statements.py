@@ -0,0 +1,260 @@
+"""Agentless production collector reading PostgreSQL's pg_stat_statements
+
+Instead of sampling inside every app process, the collector periodically
+snapshots ``pg_stat_statements`` and uploads the per-fingerprint deltas
+between snapshots: every statement the server executed is covered and the
+application pays nothing.
+"""
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from queryshield_core.utils import normalize_sql
+
+from .middleware import MonitoringConfig, SaaSUploader
+
+logger = logging.getLogger(__name__)
+
+# (userid, dbid, queryid) -> counters
+StatementKey = Tuple[Any, Any, Any]
+
+_COUNTERS = ("calls", "total_ms", "rows", "shared_blks_hit", "shared_blks_read", "plan_ms")
+
+# PostgreSQL 13 split total_time into execution and planning time
+_SQL_PG13 = """
+SELECT userid, dbid, queryid, query, calls, total_exec_time, rows,
+       shared_blks_hit, shared_blks_read, total_plan_time
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+_SQL_LEGACY = """
+SELECT userid, dbid, queryid, query, calls, total_time, rows,
+       shared_blks_hit, shared_blks_read, 0
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+
+@dataclass
+class StatementStats:
+    """Cumulative pg_stat_statements counters of one statement"""
+    query: str
+    calls: int = 0
+    total_ms: float = 0.0
+    rows: int = 0
+    shared_blks_hit: int = 0
+    shared_blks_read: int = 0
+    plan_ms: float = 0.0
+
+
+@dataclass
+class StatementAggregate:
+    """Per-fingerprint activity between two snapshots.
+
+    ``to_dict`` keeps the ``QueryMetric`` keys (``duration_ms`` is the mean
+    execution time) so aggregates upload in the existing production format.
+    """
+    sql: str
+    fingerprint: str
+    timestamp: datetime
+    calls: int = 0
+    total_ms: float = 0.0
+    rows: int = 0
+    shared_blks_hit: int = 0
+    shared_blks_read: int = 0
+    plan_ms: float = 0.0
+    slow: bool = False
+
+    @property
+    def duration_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    @property
+    def cache_hit_ratio(self) -> Optional[float]:
+        blocks = self.shared_blks_hit + self.shared_blks_read
+        return self.shared_blks_hit / blocks if blocks else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        hit_ratio = self.cache_hit_ratio
+        return {
+            "sql": self.sql,
+            "duration_ms": round(self.duration_ms, 3),
+            "timestamp": self.timestamp.isoformat(),
+            "slow": self.slow,
+            "source": "pg_stat_statements",
+            "fingerprint": self.fingerprint,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.duration_ms, 3),
+            "rows": self.rows,
+            "shared_blks_hit": self.shared_blks_hit,
+            "shared_blks_read": self.shared_blks_read,
+            "cache_hit_ratio": round(hit_ratio, 4) if hit_ratio is not None else None,
+            "plan_ms": round(self.plan_ms, 3),
+        }
+
+
+def read_statements(cur) -> Dict[StatementKey, StatementStats]:
+    """Snapshot pg_stat_statements for the current database"""
+    cur.execute("SELECT current_setting('server_version_num')::int")
+    version = cur.fetchone()[0]
+    cur.execute(_SQL_PG13 if version >= 130000 else _SQL_LEGACY)
+    snapshot: Dict[StatementKey, StatementStats] = {}
+    for userid, dbid, queryid, query, calls, total, rows, hit, read, plan in cur.fetchall():
+        if queryid is None:
+            # Statements of other users are hidden without pg_read_all_stats
+            continue
+        snapshot[(userid, dbid, queryid)] = StatementStats(
+            query=query or "",
+            calls=int(calls or 0),
+            total_ms=float(total or 0.0),
+            rows=int(rows or 0),
+            shared_blks_hit=int(hit or 0),
+            shared_blks_read=int(read or 0),
+            plan_ms=float(plan or 0.0),
+        )
+    return snapshot
+
+
+def diff_statements(
+    before: Dict[StatementKey, StatementStats],
+    after: Dict[StatementKey, StatementStats],
+) -> Dict[StatementKey, StatementStats]:
+    """Counter deltas between two snapshots, statements without calls omitted.
+
+    A statement whose call count went down was reset or evicted and
+    re-added in between; its current counters are taken as the delta.
+    """
+    out: Dict[StatementKey, StatementStats] = {}
+    for key, cur in after.items():
+        prev = before.get(key)
+        if prev is None or cur.calls < prev.calls:
+            delta = cur
+        else:
+            delta = StatementStats(
+                query=cur.query,
+                **{name: getattr(cur, name) - getattr(prev, name) for name in _COUNTERS},
+            )
+        if delta.calls > 0:
+            out[key] = delta
+    return out
+
+
+def aggregate_statements(
+    deltas: Dict[StatementKey, StatementStats],
+    slow_query_threshold_ms: float = 500,
+    timestamp: Optional[datetime] = None,
+) -> List[StatementAggregate]:
+    """Fold statement deltas into one aggregate per fingerprint, by total time.
+
+    The same statement run by several roles has several queryids; they share
+    a fingerprint and are reported together.
+    """
+    timestamp = timestamp or datetime.now(timezone.utc)
+    by_fp: Dict[str, StatementAggregate] = {}
+    for stats in deltas.values():
+        fp = normalize_sql(stats.query)
+        agg = by_fp.get(fp)
+        if agg is None:
+            agg = by_fp[fp] = StatementAggregate(sql=stats.query, fingerprint=fp, timestamp=timestamp)
+        for name in _COUNTERS:
+            setattr(agg, name, getattr(agg, name) + getattr(stats, name))
+    out = sorted(by_fp.values(), key=lambda a: -a.total_ms)
+    for agg in out:
+        agg.slow = agg.duration_ms > slow_query_threshold_ms
+    return out
+
+
+class PgStatStatementsCollector:
+    """Turns successive pg_stat_statements snapshots into upload batches"""
+
+    def __init__(self, connect: Callable[[], Any], config: MonitoringConfig):
+        """
+        Args:
+            connect: Returns a DB-API connection; opened lazily, reopened after an error
+            config: Upload target, batch size and slow query threshold
+        """
+        self.connect = connect
+        self.config = config
+        self._conn: Any = None
+        self._previous: Optional[Dict[StatementKey, StatementStats]] = None
+
+    def snapshot(self) -> Dict[StatementKey, StatementStats]:
+        if self._conn is None:
+            self._conn = self.connect()
+            self._conn.autocommit = True
+        try:
+            cur = self._conn.cursor()
+            try:
+                return read_statements(cur)
+            finally:
+                cur.close()
+        except Exception:
+            self.close()
+            raise
+
+    def collect(self) -> List[StatementAggregate]:
+        """Aggregates since the previous call; the first call only records a baseline"""
+        current = self.snapshot()
+        previous, self._previous = self._previous, current
+        if previous is None:
+            return []
+        return aggregate_statements(
+            diff_statements(previous, current),
+            slow_query_threshold_ms=self.config.slow_query_threshold_ms,
+        )
+
+    def upload(self, batch: List[StatementAggregate], uploader: SaaSUploader) -> None:
+        """Upload aggregates in ``config.batch_size`` chunks"""
+        for start in range(0, len(batch), self.config.batch_size):
+            chunk = batch[start:start + self.config.batch_size]
+            asyncio.run(uploader.upload_async(chunk, self.config.org_id, self.config.environment))
+
+    def run(
+        self,
+        interval_seconds: float = 60,
+        stop_event: Optional[threading.Event] = None,
+        sink: Optional[Callable[[List[StatementAggregate]], None]] = None,
+        iterations: Optional[int] = None,
+    ) -> None:
+        """Collect every ``interval_seconds`` until ``stop_event`` is set.
+
+        Each non-empty batch goes to ``sink``, or is uploaded when no sink is
+        given. ``iterations`` bounds the number of batches after the baseline.
+        """
+        stop_event = stop_event or threading.Event()
+        uploader = None
+        if sink is None and self.config.api_key:
+            uploader = SaaSUploader(self.config.api_url, self.config.api_key)
+            sink = lambda batch: self.upload(batch, uploader)  # noqa: E731
+        done = -1
+        try:
+            while True:
+                try:
+                    batch = self.collect()
+                except Exception as e:
+                    logger.error(f"Error reading pg_stat_statements: {e}")
+                    batch = []
+                if batch and sink:
+                    sink(batch)
+                done += 1
+                if iterations is not None and done >= iterations:
+                    break
+                if stop_event.wait(interval_seconds):
+                    break
+        finally:
+            if uploader:
+                uploader.close()
+            self.close()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
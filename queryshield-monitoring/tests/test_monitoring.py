@@ -2,6 +2,7 @@
 
 import pytest
 import asyncio
+import os
 import time
 from datetime import datetime, timezone
 from unittest.mock import Mock, patch, AsyncMock
@@ -13,6 +14,7 @@ from queryshield_monitoring.middleware import (
     MonitoringConfig,
     ProductionMonitor,
 )
+from queryshield_monitoring.pg_stat_statements import PgStatStatementsCollector, read_statements
 
 
 class TestQueryMetric:
@@ -192,6 +194,178 @@ class TestProductionMonitor:
         monitor.record_query("SELECT 1", 10.0)
         batch = monitor.batcher.get_batch()
         assert len(batch) == 0
+    
+    def test_monitor_otel_spans(self):
+        """Test query spans are children of the request span and tagged N+1 per trace"""
+        sdk = pytest.importorskip("opentelemetry.sdk.trace")
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        from queryshield_core.otel import SpanEmitter
+        
+        exporter = InMemorySpanExporter()
+        provider = sdk.TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        config = MonitoringConfig(sample_rate=0.0, nplus1_threshold=3)
+        monitor = ProductionMonitor(config)
+        monitor.spans = SpanEmitter(provider, nplus1_threshold=3)
+        
+        with provider.get_tracer("app").start_as_current_span("GET /books") as request:
+            for i in range(3):
+                monitor.record_query(f"SELECT * FROM authors WHERE id = {i}", 1.0, "postgresql")
+        monitor.record_query("SELECT * FROM authors WHERE id = 9", 1.0)
+        
+        *in_request, untraced = [s for s in exporter.get_finished_spans() if s.name != "GET /books"]
+        assert [s.attributes["queryshield.nplus1"] for s in in_request] == [False, False, True]
+        assert in_request[0].parent.span_id == request.get_span_context().span_id
+        assert in_request[0].attributes["code.function"] == "test_monitor_otel_spans"
+        assert in_request[0].attributes["db.system"] == "postgresql"
+        assert untraced.parent is None and untraced.attributes["queryshield.repeats"] == 0
+        assert monitor.batcher.get_batch() == []
+
+
+    def test_monitor_trace_counts_are_bounded(self):
+        """Test a long trace counts a bounded set of statements and skips writes"""
+        config = MonitoringConfig(sample_rate=0.0, nplus1_threshold=3)
+        monitor = ProductionMonitor(config)
+        monitor.spans = Mock()
+        
+        with patch("queryshield_core.otel.current_trace_id", return_value=7), \
+                patch("queryshield_monitoring.middleware.MAX_TRACE_STATEMENTS", 2):
+            for sql in ["SELECT a", "SELECT b", "SELECT c", "SELECT a", "UPDATE t SET x = 1", "UPDATE t SET x = 1"]:
+                monitor.record_query(sql, 1.0)
+        
+        repeats = [c.kwargs["repeats"] for c in monitor.spans.query.call_args_list]
+        assert repeats == [1, 1, 0, 2, 0, 0]
+        assert len(monitor._trace_counts[7]) == 2
+
+class _FakeStatementsConnection:
+    """Serves successive pg_stat_statements snapshots, one per collect()"""
+
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.autocommit = False
+        self.closed = False
+
+    def cursor(self):
+        conn = self
+
+        class _Cursor:
+            def execute(self, sql):
+                self.sql = sql
+
+            def fetchone(self):
+                return (160000,)
+
+            def fetchall(self):
+                return conn.snapshots.pop(0)
+
+            def close(self):
+                pass
+
+        return _Cursor()
+
+    def close(self):
+        self.closed = True
+
+
+class TestPgStatStatementsCollector:
+    """Tests for the pg_stat_statements collector"""
+
+    # userid, dbid, queryid, query, calls, exec ms, rows, blks hit, blks read, plan ms
+    BASELINE = [
+        (10, 5, 111, "SELECT * FROM users WHERE id = $1", 100, 200.0, 100, 900, 100, 5.0),
+        (10, 5, 222, "SELECT 1", 50, 1.0, 50, 0, 0, 0.0),
+    ]
+
+    def test_first_collect_is_baseline(self):
+        conn = _FakeStatementsConnection([self.BASELINE])
+        collector = PgStatStatementsCollector(lambda: conn, MonitoringConfig())
+        assert collector.collect() == []
+        assert conn.autocommit is True
+
+    def test_deltas_aggregate_per_fingerprint(self):
+        after = [
+            (10, 5, 111, "SELECT * FROM users WHERE id = $1", 150, 1200.0, 150, 1000, 200, 6.0),
+            # Same statement from another role, first seen in this interval
+            (20, 5, 333, "SELECT * FROM users WHERE id = $1", 10, 300.0, 10, 10, 0, 0.0),
+            (10, 5, 222, "SELECT 1", 50, 1.0, 50, 0, 0, 0.0),
+        ]
+        conn = _FakeStatementsConnection([self.BASELINE, after])
+        collector = PgStatStatementsCollector(lambda: conn, MonitoringConfig(slow_query_threshold_ms=20))
+        collector.collect()
+        batch = collector.collect()
+        # Idle statements are not reported
+        assert len(batch) == 1
+        d = batch[0].to_dict()
+        assert d["calls"] == 60
+        assert d["total_ms"] == 1300.0
+        assert d["duration_ms"] == pytest.approx(21.667, abs=0.001)
+        assert d["slow"] is True
+        assert d["shared_blks_hit"] == 110 and d["shared_blks_read"] == 100
+        assert d["plan_ms"] == 1.0
+        assert d["source"] == "pg_stat_statements"
+
+    def test_reset_counters_are_taken_as_is(self):
+        after = [(10, 5, 111, "SELECT * FROM users WHERE id = $1", 3, 6.0, 3, 3, 0, 0.0)]
+        conn = _FakeStatementsConnection([self.BASELINE, after])
+        collector = PgStatStatementsCollector(lambda: conn, MonitoringConfig())
+        collector.collect()
+        batch = collector.collect()
+        assert [(a.calls, a.total_ms) for a in batch] == [(3, 6.0)]
+
+    def test_run_uploads_each_interval(self):
+        conn = _FakeStatementsConnection([self.BASELINE, [(10, 5, 222, "SELECT 1", 60, 2.0, 60, 0, 0, 0.0)]])
+        collector = PgStatStatementsCollector(lambda: conn, MonitoringConfig())
+        batches = []
+        collector.run(interval_seconds=0, sink=batches.append, iterations=1)
+        assert [[a.calls for a in b] for b in batches] == [[10]]
+        assert conn.closed
+
+
+def _postgres_connect():
+    """Connection factory for QUERYSHIELD_TEST_POSTGRES_DSN; skips the test without one"""
+    dsn = os.environ.get("QUERYSHIELD_TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("QUERYSHIELD_TEST_POSTGRES_DSN not set")
+    try:
+        import psycopg2 as driver
+    except ImportError:
+        driver = pytest.importorskip("psycopg")
+    try:
+        driver.connect(dsn).close()
+    except Exception as e:
+        pytest.skip(f"Postgres not reachable: {e}")
+    return lambda: driver.connect(dsn)
+
+
+class TestPgStatStatementsPostgres:
+    """pg_stat_statements read from a real server (needs it in shared_preload_libraries)"""
+
+    def test_collects_statements_of_the_current_database(self):
+        connect = _postgres_connect()
+        conn = connect()
+        conn.autocommit = True
+        cur = conn.cursor()
+        collector = PgStatStatementsCollector(connect, MonitoringConfig())
+        try:
+            try:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+                cur.execute("SELECT 1 FROM pg_stat_statements LIMIT 1")
+            except Exception as e:
+                pytest.skip(f"pg_stat_statements unavailable: {e}")
+            assert collector.collect() == []
+            for i in range(3):
+                cur.execute("SELECT %s::int AS queryshield_test_marker", (i,))
+            batch = collector.collect()
+            cur.execute("SELECT oid FROM pg_database WHERE datname = current_database()")
+            dbid = cur.fetchone()[0]
+            assert {key[1] for key in read_statements(cur)} == {dbid}
+        finally:
+            collector.close()
+            conn.close()
+        [marker] = [a for a in batch if "queryshield_test_marker" in a.sql]
+        assert (marker.calls, marker.rows) == (3, 3)
+        assert marker.total_ms > 0 and marker.plan_ms >= 0
 
 
 class TestIntegration:
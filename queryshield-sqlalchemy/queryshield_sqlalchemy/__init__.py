@@ -22,12 +22,13 @@ __author__ = "QueryShield"
 __email__ = "dev@queryshield.io"
 
 from queryshield_sqlalchemy.probe import Recorder, QueryEvent, install_probe
-from queryshield_sqlalchemy.report import build_report, write_report
+from queryshield_sqlalchemy.report import build_report, stream_report, write_report
 
 __all__ = [
     "Recorder",
     "QueryEvent",
     "install_probe",
     "build_report",
+    "stream_report",
     "write_report",
 ]
@@ -1,15 +1,21 @@
 """SQLAlchemy query interception and recording"""
 
+import re
 import time
 import inspect
 import threading
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from contextlib import contextmanager
 
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 
+from queryshield_core.analysis.classify import NPlusOneTracker
+from queryshield_core.analysis.pg_stats import StatsTracker, read_stats
+from queryshield_core.utils import normalize_sql, params_hash
+
 _local = threading.local()
+_re_returning = re.compile(r"\bRETURNING\b", re.IGNORECASE)
 
 
 class QueryEvent:
@@ -18,10 +24,15 @@ class QueryEvent:
     def __init__(self):
         self.sql: str = ""
         self.params: Optional[Dict[str, Any]] = None
+        self.params_hash: str = ""
         self.duration_ms: float = 0.0
+        self.many: bool = False
+        self.rows: Optional[int] = None
         self.stack: List[Tuple[str, str, int]] = []
         self.error: Optional[str] = None
         self.db_vendor: str = "unknown"
+        # Offset of the query's start from the start of its test
+        self.start_ms: Optional[float] = None
 
 
 def _stack_signature(skip: int = 0, depth: int = 8) -> List[Tuple[str, str, int]]:
@@ -37,11 +48,45 @@ def _stack_signature(skip: int = 0, depth: int = 8) -> List[Tuple[str, str, int]
     return out
 
 
+def _rowcount(cursor, statement: str, dialect: str) -> Optional[int]:
+    """Rows returned or affected; None when the driver does not know yet.
+
+    SQLite counts rows as they are fetched: -1 for SELECT, 0 for
+    ``RETURNING`` statements right after execution.
+    """
+    if dialect == "sqlite" and _re_returning.search(statement or ""):
+        return None
+    rowcount = getattr(cursor, "rowcount", -1)
+    return rowcount if isinstance(rowcount, int) and rowcount >= 0 else None
+
+
 class Recorder:
     """Records query events organized by test"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        nplus1_threshold: Optional[int] = None,
+        on_test_end: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+        spans: Any = None,
+    ):
+        """
+        Args:
+            nplus1_threshold: Track N+1 clusters per test as queries are
+                recorded, so they are final when the test ends
+            on_test_end: Called with the test name and its N+1 problems
+                when a tracked test ends
+            spans: ``queryshield_core.otel.SpanEmitter`` exporting every
+                test and query as an OpenTelemetry span
+        """
         self._events_by_test: Dict[str, List[QueryEvent]] = {}
+        self.nplus1_threshold = nplus1_threshold
+        self.on_test_end = on_test_end
+        self.trackers: Dict[str, NPlusOneTracker] = {}
+        # Wall time of each finished test
+        self.test_wall_ms: Dict[str, float] = {}
+        self.spans = spans
+        self._started = time.perf_counter()
+        self._started_ns = time.time_ns()
     
     def current_test(self) -> str:
         """Get current test name"""
@@ -53,18 +98,69 @@ class Recorder:
     def start_test(self, name: str) -> None:
         """Mark start of test"""
         _local.current_test = name
+        _local.test_start = time.perf_counter()
         self._events_by_test.setdefault(name, [])
+        if self.spans is not None:
+            self.spans.start_test(name, self.epoch_ns(_local.test_start))
     
     def end_test(self, name: Optional[str] = None) -> None:
         """Mark end of test"""
         if name is None:
             name = getattr(_local, "current_test", None)
         _local.current_test = None
+        start = getattr(_local, "test_start", None)
+        _local.test_start = None
+        end = time.perf_counter()
+        if name and start is not None:
+            self.test_wall_ms[name] = (end - start) * 1000.0
+        if self.spans is not None:
+            self.spans.end_test(self.epoch_ns(end))
+        tracker = self.trackers.get(name) if name else None
+        if tracker is not None:
+            problems, _tags = tracker.finish()
+            if self.on_test_end is not None:
+                self.on_test_end(name, problems)
+    
+    def offset_ms(self, t: float) -> float:
+        """``perf_counter`` time relative to the current test's start (the
+        recorder's creation outside tests)"""
+        start = getattr(_local, "test_start", None)
+        return (t - (self._started if start is None else start)) * 1000.0
+    
+    def epoch_ns(self, t: float) -> int:
+        """``perf_counter`` time in nanoseconds since the epoch"""
+        return self._started_ns + int((t - self._started) * 1e9)
     
     def record(self, event: QueryEvent) -> None:
         """Record a query event"""
         test_name = self.current_test()
         self._events_by_test.setdefault(test_name, []).append(event)
+        repeats = 0
+        tracker = None
+        if self.nplus1_threshold is not None:
+            tracker = self.trackers.get(test_name)
+            if tracker is None:
+                tracker = self.trackers[test_name] = NPlusOneTracker(self.nplus1_threshold)
+            repeats = tracker.add(event.sql, event.stack)
+        if self.spans is not None:
+            self._emit(event, tracker, repeats)
+    
+    def _emit(self, event: QueryEvent, tracker: Optional[NPlusOneTracker], repeats: int) -> None:
+        """Export a recorded query as a span"""
+        start_ns = None
+        if event.start_ms is not None:
+            start = getattr(_local, "test_start", None)
+            start_ns = self.epoch_ns((self._started if start is None else start) + event.start_ms / 1000.0)
+        self.spans.query(
+            tracker.normalized[-1] if tracker is not None else normalize_sql(event.sql),
+            event.duration_ms,
+            start_ns=start_ns,
+            db_system=event.db_vendor,
+            stack=event.stack,
+            repeats=repeats,
+            rows=event.rows,
+            error=event.error,
+        )
     
     @property
     def events_by_test(self) -> Dict[str, List[QueryEvent]]:
@@ -80,20 +176,24 @@ class ProbeListener:
     
     def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
         """Called before query execution"""
-        # Store start time on connection
-        if not hasattr(cursor, "_qs_start_time"):
-            cursor._qs_start_time = time.perf_counter()
+        # Store start time on connection (DB-API cursors may not accept attributes)
+        conn.info.setdefault("_qs_start_time", []).append(time.perf_counter())
     
     def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
         """Called after query execution"""
+        starts = conn.info.get("_qs_start_time")
+        start_time = starts.pop() if starts else time.perf_counter()
         try:
-            start_time = getattr(cursor, "_qs_start_time", time.perf_counter())
             duration_ms = (time.perf_counter() - start_time) * 1000.0
             
             event = QueryEvent()
             event.sql = statement
             event.params = dict(parameters) if isinstance(parameters, dict) else parameters
+            event.params_hash = params_hash(event.params)
             event.duration_ms = duration_ms
+            event.start_ms = self.recorder.offset_ms(start_time)
+            event.many = bool(executemany)
+            event.rows = _rowcount(cursor, statement, conn.dialect.name)
             event.stack = _stack_signature(skip=2)
             event.db_vendor = conn.dialect.name
             
@@ -101,9 +201,23 @@ class ProbeListener:
         except Exception:
             # Silently ignore recording errors
             pass
-        finally:
-            if hasattr(cursor, "_qs_start_time"):
-                delattr(cursor, "_qs_start_time")
+    
+    def on_handle_error(self, exception_context):
+        """SQLAlchemy 2.x ``handle_error`` hook"""
+        ctx = exception_context
+        conn = ctx.connection
+        if conn is not None:
+            starts = conn.info.get("_qs_start_time")
+            if starts:
+                starts.pop()
+        self.handle_error(
+            conn,
+            getattr(ctx, "cursor", None),
+            ctx.statement,
+            ctx.parameters,
+            ctx.execution_context,
+            ctx.original_exception,
+        )
     
     def handle_error(self, conn, cursor, statement, parameters, context, err):
         """Called on query error"""
@@ -111,10 +225,11 @@ class ProbeListener:
             event = QueryEvent()
             event.sql = statement
             event.params = dict(parameters) if isinstance(parameters, dict) else parameters
+            event.params_hash = params_hash(event.params)
             event.duration_ms = 0.0
             event.stack = _stack_signature(skip=2)
             event.error = repr(err)
-            event.db_vendor = conn.dialect.name
+            event.db_vendor = conn.dialect.name if conn is not None else "unknown"
             
             self.recorder.record(event)
         except Exception:
@@ -137,7 +252,7 @@ def install_probe(engine: Engine, recorder: Recorder):
     # Register listeners
     event.listen(engine, "before_cursor_execute", listener.before_cursor_execute)
     event.listen(engine, "after_cursor_execute", listener.after_cursor_execute)
-    event.listen(engine, "dbapi_error", listener.handle_error)
+    event.listen(engine, "handle_error", listener.on_handle_error)
     
     try:
         yield
@@ -145,4 +260,57 @@ def install_probe(engine: Engine, recorder: Recorder):
         # Clean up listeners
         event.remove(engine, "before_cursor_execute", listener.before_cursor_execute)
         event.remove(engine, "after_cursor_execute", listener.after_cursor_execute)
-        event.remove(engine, "dbapi_error", listener.handle_error)
+        event.remove(engine, "handle_error", listener.on_handle_error)
+
+
+def _flush_pg_stats(dbapi_connection, connection_record) -> None:
+    """Pool ``checkin`` hook: publish the backend's pending usage counters.
+
+    PostgreSQL 15+ flushes them at most once a second otherwise, which
+    would let a test's scans show up under the next test.
+    """
+    try:
+        cur = dbapi_connection.cursor()
+        try:
+            cur.execute("SELECT pg_stat_force_next_flush()")
+        finally:
+            cur.close()
+        # Flushing happens once the backend is idle outside a transaction
+        dbapi_connection.rollback()
+    except Exception:
+        try:
+            dbapi_connection.rollback()
+        except Exception:
+            pass
+
+
+def pg_stats_tracker(engine: Engine) -> Optional[StatsTracker]:
+    """Index/table usage tracker for a PostgreSQL engine, else None.
+
+    Snapshots are read on a connection detached from the pool; pooled
+    connections flush their counters when checked back in, so per-test
+    figures hold as long as tests run serially and return their connections.
+    """
+    if getattr(getattr(engine, "dialect", None), "name", None) != "postgresql":
+        return None
+    try:
+        fairy = engine.raw_connection()
+        raw = fairy.driver_connection
+        fairy.detach()
+        raw.autocommit = True
+    except Exception:
+        return None
+    event.listen(engine, "checkin", _flush_pg_stats)
+
+    def snapshot():
+        cur = raw.cursor()
+        try:
+            return read_stats(cur)
+        finally:
+            cur.close()
+
+    def close() -> None:
+        event.remove(engine, "checkin", _flush_pg_stats)
+        raw.close()
+
+    return StatsTracker(snapshot, close=close)
@@ -1,29 +1,176 @@
 """Report generation from recorded SQLAlchemy queries"""
 
-import json
 import os
+import time
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from sqlalchemy.engine import Engine
-from queryshield_core.analysis.classify import classify_all
+from queryshield_core import report_io
+from queryshield_core.analysis.classify import NPlusOneTracker, classify_all
 from queryshield_core.analysis.cost_analysis import generate_cost_summary
+from queryshield_core.analysis.explain_checks import explain_classify
+from queryshield_core.analysis.explain_mysql import explain_query as explain_query_mysql
+from queryshield_core.analysis.explain_pg import ExplainSession, explain_query as explain_query_pg
+from queryshield_core.analysis.explain_sqlite import explain_query as explain_query_sqlite
+from queryshield_core.analysis.hypopg import hypopg_available, validate_index_advice
+from queryshield_core.analysis.index_advisor import advise_indexes
+from queryshield_core.analysis.pagination import classify_pagination
+from queryshield_core.analysis.rollup import FingerprintRollup
+from queryshield_core.report_io import ReportCollector
 from queryshield_core.utils import normalize_sql, redact_params
 
 from queryshield_sqlalchemy.probe import Recorder
 
 
-def _p95(values: List[float]) -> float:
-    """Calculate 95th percentile"""
-    if not values:
+def _get_explain_handler(vendor: str):
+    """Route explain queries to the appropriate handler based on dialect name"""
+    if vendor == "postgresql":
+        return explain_query_pg
+    elif vendor in ("mysql", "mariadb"):
+        return explain_query_mysql
+    elif vendor == "sqlite":
+        return explain_query_sqlite
+    return None
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
         return 0.0
-    s = sorted(values)
-    k = max(0, int(0.95 * (len(s) - 1)))
-    return float(s[k])
+    k = max(0, int(q * (len(sorted_values) - 1)))
+    return float(sorted_values[k])
+
+
+def _rows_total(events: List[Dict[str, Any]]) -> Optional[int]:
+    """Rows returned or affected, None when the driver reported none"""
+    rows = [e["rows"] for e in events if e.get("rows") is not None]
+    return sum(rows) if rows else None
+
+
+def _top_fingerprint(normalized: List[str]) -> Optional[Dict[str, Any]]:
+    """Most executed normalized statement and its count"""
+    if not normalized:
+        return None
+    sql, count = Counter(normalized).most_common(1)[0]
+    return {"sql": sql[:MAX_SQL_LEN], "count": count}
 
 
 MAX_QUERIES_PER_TEST = 500
 MAX_SQL_LEN = 2048
+MAX_CONSECUTIVE_EXPLAIN_FAILURES = 5
+
+
+def _explain_candidates(recorder: Recorder, max_plans: int) -> Dict[str, Tuple[str, Any]]:
+    """First (sql, params) seen for each distinct SELECT, bounded by max_plans"""
+    candidates: Dict[str, Tuple[str, Any]] = {}
+    for events in recorder.events_by_test.values():
+        for e in events:
+            if len(candidates) >= max_plans:
+                return candidates
+            if not e.sql.strip().upper().startswith("SELECT"):
+                continue
+            norm = normalize_sql(e.sql)
+            if norm not in candidates:
+                candidates[norm] = (e.sql, e.params)
+    return candidates
+
+
+def _collect_plans(
+    recorder: Recorder,
+    engine: Engine,
+    explain_handler,
+    *,
+    timeout_ms: int,
+    max_plans: int,
+    pipeline: bool = False,
+) -> Dict[str, Any]:
+    """EXPLAIN each candidate statement once on a dedicated connection.
+
+    On PostgreSQL the connection is detached from the engine's pool so the
+    session settings never reach application code. Collection stops after
+    a run of consecutive failures.
+    """
+    items = list(_explain_candidates(recorder, max_plans).items())
+    plan_cache: Dict[str, Any] = {}
+    if not items:
+        return plan_cache
+    raw = engine.raw_connection()
+    session = None
+    if engine.dialect.name == "postgresql":
+        raw.detach()
+        session = ExplainSession(raw, timeout_ms=timeout_ms)
+        try:
+            session.open()
+        except Exception:
+            session = None
+    try:
+        if session is not None and pipeline and session.supports_pipeline():
+            plans = session.explain_many([stmt for _norm, stmt in items], pipeline=True)
+            plan_cache.update((norm, plan) for (norm, _stmt), plan in zip(items, plans))
+            return plan_cache
+        consec_null = 0
+        for norm, (sql, params) in items:
+            if session is not None:
+                plan = session.explain(sql, params)
+            else:
+                plan = explain_handler(raw, sql, params, timeout_ms=timeout_ms)
+            plan_cache[norm] = plan
+            if plan is None:
+                consec_null += 1
+                if consec_null >= MAX_CONSECUTIVE_EXPLAIN_FAILURES:
+                    break
+            else:
+                consec_null = 0
+        return plan_cache
+    finally:
+        if session is not None:
+            session.close()
+        else:
+            raw.close()
+
+
+def _validate_advice(
+    recorder: Recorder,
+    engine: Engine,
+    advice: List[Dict[str, Any]],
+    plan_cache: Dict[str, Any],
+    *,
+    timeout_ms: int,
+    max_plans: int,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], bool]:
+    """Validate advised indexes with HypoPG on a dedicated connection
+
+    Hypothetical indexes only exist in the backend that created them, so all
+    of them are created and re-explained on one detached connection.
+    Returns ``(kept, rejected, validated)``.
+    """
+    statements = _explain_candidates(recorder, max_plans)
+    raw = engine.raw_connection()
+    raw.detach()
+    session = ExplainSession(raw, timeout_ms=timeout_ms)
+    try:
+        session.open()
+        if not hypopg_available(session):
+            return advice, [], False
+        kept, rejected = validate_index_advice(session, advice, statements, plan_cache)
+        return kept, rejected, True
+    except Exception:
+        return advice, [], False
+    finally:
+        session.close()
+
+
+def _statement_time(recorder: Recorder) -> Dict[str, List[float]]:
+    """Total duration and call count of every normalized statement in the run"""
+    totals: Dict[str, List[float]] = {}
+    for events in recorder.events_by_test.values():
+        for e in events:
+            acc = totals.setdefault(normalize_sql(e.sql), [0.0, 0])
+            acc[0] += e.duration_ms
+            acc[1] += 1
+    return totals
 
 
 def _test_report(
@@ -31,74 +178,191 @@ def _test_report(
     events: List[Dict[str, Any]],
     *,
     nplus1_threshold: int,
+    plan_map: Optional[Dict[str, Any]] = None,
+    tracker: Optional[NPlusOneTracker] = None,
+    wall_ms: Optional[float] = None,
 ) -> Dict[str, Any]:
     """Generate report for a single test"""
-    probs, tags = classify_all(events, nplus1_threshold=nplus1_threshold)
+    if tracker is None or len(tracker.normalized) != len(events):
+        tracker = NPlusOneTracker(nplus1_threshold)
+        for e in events:
+            tracker.add(e.get("sql", ""), e.get("stack", []), e.get("db_alias", "default"))
+    normalized = tracker.normalized
+    probs, tags = classify_all(events, nplus1_threshold=nplus1_threshold, tracker=tracker)
+    paging, paging_tags = classify_pagination(events, plan_map, normalized)
+    probs.extend(paging)
+    for idx, tag in paging_tags.items():
+        tags[idx].append(tag)
     durations = [e.get("duration_ms", 0) for e in events]
+    ordered = sorted(durations)
     
     items: List[Dict[str, Any]] = []
     for i, e in enumerate(events[:MAX_QUERIES_PER_TEST]):
         items.append(
             {
-                "normalized_sql": normalize_sql(e.get("sql", ""))[:MAX_SQL_LEN],
+                "normalized_sql": normalized[i][:MAX_SQL_LEN],
                 "duration_ms": e.get("duration_ms", 0),
+                "rows": e.get("rows"),
                 "stack": e.get("stack", []),
                 "error": e.get("error"),
                 "params": redact_params(e.get("params")),
+                "params_hash": e.get("params_hash"),
                 "tags": tags.get(i, []),
                 "db_vendor": e.get("db_vendor", "unknown"),
+                "start_ms": None if e.get("start_ms") is None else round(e["start_ms"], 4),
             }
         )
     
+    # EXPLAIN-driven problems: one set per distinct normalized SQL
+    if plan_map:
+        seen_ids = set(p.get("id") for p in probs if isinstance(p, dict))
+        for norm_sql, plan in plan_map.items():
+            for p in explain_classify(norm_sql, plan):
+                if p.get("id") not in seen_ids:
+                    probs.append(p)
+                    seen_ids.add(p.get("id"))
+    
     return {
         "name": name,
         "duration_ms": sum(durations),
+        "wall_ms": wall_ms,
         "queries_total": len(events),
-        "queries_p95_ms": _p95(durations),
+        "queries_p95_ms": _percentile(ordered, 0.95),
+        "queries_p99_ms": _percentile(ordered, 0.99),
+        "query_max_ms": ordered[-1] if ordered else 0.0,
+        "rows_total": _rows_total(events),
+        "top_fingerprint": _top_fingerprint(normalized),
         "problems": probs,
         "queries": items,
     }
 
 
-def build_report(
+def _event_dicts(raw_events: List[Any]) -> List[Dict[str, Any]]:
+    """Convert QueryEvent objects to the dicts the core analysis takes"""
+    return [
+        {
+            "sql": e.sql,
+            "params": e.params,
+            "params_hash": e.params_hash,
+            "duration_ms": e.duration_ms,
+            "many": e.many,
+            "rows": e.rows,
+            "stack": e.stack,
+            "error": e.error,
+            "db_vendor": e.db_vendor,
+            "start_ms": e.start_ms,
+        }
+        for e in raw_events
+    ]
+
+
+def _trackers(recorder: Recorder, nplus1_threshold: int) -> Dict[str, NPlusOneTracker]:
+    """N+1 trackers of every test, reusing those maintained while the tests ran"""
+    online = recorder.trackers if recorder.nplus1_threshold == nplus1_threshold else {}
+    trackers: Dict[str, NPlusOneTracker] = {}
+    for name, raw_events in recorder.events_by_test.items():
+        tracker = online.get(name)
+        if tracker is None or len(tracker.normalized) != len(raw_events):
+            tracker = NPlusOneTracker(nplus1_threshold)
+            for e in raw_events:
+                tracker.add(e.sql, e.stack)
+        trackers[name] = tracker
+    return trackers
+
+
+def iter_test_reports(
     recorder: Recorder,
-    engine: Engine,
     *,
-    mode: str = "tests",
     nplus1_threshold: int = 5,
-    run_duration_ms: Optional[float] = None,
-) -> Dict[str, Any]:
-    """Build comprehensive report from recorded events"""
-    
-    tests: List[Dict[str, Any]] = []
-    vendor = engine.dialect.name
+    plan_cache: Optional[Dict[str, Any]] = None,
+    trackers: Optional[Dict[str, NPlusOneTracker]] = None,
+    rollup: Optional[FingerprintRollup] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Per-test reports, built one at a time in recording order
     
+    Each test's problems are also linked into ``rollup`` when given.
+    """
+    if trackers is None:
+        trackers = _trackers(recorder, nplus1_threshold)
     for name, raw_events in recorder.events_by_test.items():
-        # Convert QueryEvent objects to dicts
-        events = [
-            {
-                "sql": e.sql,
-                "params": e.params,
-                "duration_ms": e.duration_ms,
-                "stack": e.stack,
-                "error": e.error,
-                "db_vendor": e.db_vendor,
-            }
-            for e in raw_events
-        ]
+        events = _event_dicts(raw_events)
         
-        test_report = _test_report(name, events, nplus1_threshold=nplus1_threshold)
+        plan_map = None
+        if plan_cache is not None:
+            plan_map = {}
+            for e in raw_events:
+                norm = normalize_sql(e.sql)
+                if norm in plan_cache:
+                    plan_map[norm] = plan_cache[norm]
+        
+        test_report = _test_report(
+            name,
+            events,
+            nplus1_threshold=nplus1_threshold,
+            plan_map=plan_map,
+            tracker=trackers.get(name),
+            wall_ms=recorder.test_wall_ms.get(name),
+        )
         
         # Add cost analysis
         test_report["cost_analysis"] = generate_cost_summary(test_report, provider="aws_rds_postgres")
+        if rollup is not None:
+            rollup.add_problems(test_report["problems"])
         
-        tests.append(test_report)
+        yield test_report
+
+
+def stream_report(
+    recorder: Recorder,
+    engine: Engine,
+    writer: Any,
+    *,
+    mode: str = "tests",
+    explain: Optional[bool] = None,
+    explain_timeout_ms: int = 500,
+    explain_max_plans: int = 50,
+    explain_pipeline: bool = False,
+    validate_indexes: bool = True,
+    nplus1_threshold: int = 5,
+    run_duration_ms: Optional[float] = None,
+    index_usage: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Build the report and hand it to ``writer`` one test at a time
     
-    # Build report structure
-    total_queries = sum(t.get("queries_total", 0) for t in tests)
-    total_duration_ms = sum(t.get("duration_ms", 0) for t in tests)
+    ``writer`` is a ``queryshield_core.report_io.ReportWriter`` (or anything
+    with its ``begin`` / ``write_test`` / ``end`` methods). Returns the
+    report without its tests. EXPLAIN runs by default on PostgreSQL and
+    SQLite; pass ``explain=True`` to enable it on MySQL as well. On
+    PostgreSQL with HypoPG, advised indexes the planner would not use are
+    dropped unless ``validate_indexes=False``. ``index_usage`` is the result
+    of ``StatsTracker.finish()`` (see ``pg_stats_tracker``).
+    """
+    vendor = engine.dialect.name
     
-    report = {
+    if explain is None:
+        explain = vendor in ("postgresql", "sqlite")
+    explain_handler = _get_explain_handler(vendor) if explain else None
+    do_explain = explain_handler is not None
+    
+    plan_cache: Dict[str, Any] = {}
+    explain_elapsed_ms = 0.0
+    if do_explain:
+        t0 = time.perf_counter()
+        try:
+            plan_cache = _collect_plans(
+                recorder,
+                engine,
+                explain_handler,
+                timeout_ms=explain_timeout_ms,
+                max_plans=explain_max_plans,
+                pipeline=explain_pipeline,
+            )
+        except Exception:
+            # Database unreachable for EXPLAIN; report without plans
+            plan_cache = {}
+        explain_elapsed_ms = (time.perf_counter() - t0) * 1000.0
+    
+    header: Dict[str, Any] = {
         "version": "1",
         "project_root": os.path.abspath(os.getcwd()),
         "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
@@ -106,24 +370,90 @@ def build_report(
         "db": {"vendor": vendor, "version": ""},
         "run": {
             "mode": mode,
-            "explain": False,  # SQLAlchemy doesn't have built-in EXPLAIN support yet
+            "explain": do_explain,
+            "explain_timeout_ms": explain_timeout_ms,
+            "explain_max_plans": explain_max_plans,
+            "explain_pipeline": bool(do_explain and explain_pipeline),
             "nplus1_threshold": nplus1_threshold,
             "duration_ms": run_duration_ms,
+            "explain_runtime_ms": explain_elapsed_ms,
         },
-        "tests": tests,
+    }
+    # Index advice only needs the recorded events; settle it before the
+    # tests so ``run.hypopg`` can be written with the header
+    advice_keys: Dict[str, Any] = {}
+    if plan_cache:
+        totals = _statement_time(recorder)
+        advice = advise_indexes(
+            (norm, plan, *totals.get(norm, (0.0, 0))) for norm, plan in plan_cache.items()
+        )
+        if advice and vendor == "postgresql" and validate_indexes:
+            advice, rejected, validated = _validate_advice(
+                recorder,
+                engine,
+                advice,
+                plan_cache,
+                timeout_ms=explain_timeout_ms,
+                max_plans=explain_max_plans,
+            )
+            header["run"]["hypopg"] = validated
+            if rejected:
+                advice_keys["index_advice_rejected"] = rejected
+        advice_keys["index_advice"] = advice
+    
+    # Suite-wide figures per statement; the order (by total DB time) is
+    # known before the tests are written, the problems only after
+    trackers = _trackers(recorder, nplus1_threshold)
+    rollup = FingerprintRollup(MAX_SQL_LEN)
+    for name, raw_events in recorder.events_by_test.items():
+        rollup.add_test(name, _event_dicts(raw_events), trackers[name].normalized)
+    plans = rollup.attach_plans(plan_cache) if plan_cache else []
+    reserve = getattr(writer, "reserve_fingerprints", None)
+    if reserve is not None:
+        reserve(rollup.order())
+    
+    writer.begin(header)
+    total_queries = 0
+    total_duration_ms = 0.0
+    for test_report in iter_test_reports(
+        recorder,
+        nplus1_threshold=nplus1_threshold,
+        plan_cache=plan_cache if do_explain else None,
+        trackers=trackers,
+        rollup=rollup,
+    ):
+        total_queries += test_report.get("queries_total", 0)
+        total_duration_ms += test_report.get("duration_ms", 0)
+        writer.write_test(test_report)
+    
+    trailer: Dict[str, Any] = {
         "cost_analysis": {
             "total_queries": total_queries,
             "total_duration_ms": total_duration_ms,
             "provider": "aws_rds_postgres",
             "estimated_monthly_cost": round((total_queries / 1000) * 0.25 + 25.0, 2),
         },
+        **advice_keys,
     }
+    if index_usage:
+        trailer["index_usage"] = index_usage
+    trailer["fingerprints"] = rollup.entries()
+    if plans:
+        trailer["plans"] = plans
+    writer.end(trailer)
+    return {**header, **trailer}
+
+
+def build_report(recorder: Recorder, engine: Engine, **options: Any) -> Dict[str, Any]:
+    """Build comprehensive report from recorded events
     
-    return report
+    Takes the options of ``stream_report`` and keeps every test in memory.
+    """
+    collector = ReportCollector()
+    stream_report(recorder, engine, collector, **options)
+    return collector.report
 
 
-def write_report(report: Dict[str, Any], output_path: str) -> None:
-    """Write report to JSON file"""
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+def write_report(report: Dict[str, Any], output_path: str, fmt: Optional[str] = None) -> None:
+    """Write report to a file (format implied by the path unless ``fmt`` is given)"""
+    report_io.write_report(report, output_path, fmt)
@@ -5,7 +5,7 @@ Activate with: pytest -p queryshield_sqlalchemy.runners.pytest_plugin
 
 from typing import Any
 
-from queryshield_sqlalchemy.probe import Recorder, install_probe
+from queryshield_sqlalchemy.probe import Recorder, install_probe, pg_stats_tracker
 
 
 def pytest_addoption(parser):
@@ -22,12 +22,31 @@ def pytest_addoption(parser):
         default=".queryshield/queryshield_report.json",
         help="Output path for QueryShield report",
     )
+    parser.addoption(
+        "--queryshield-schema-version",
+        action="store",
+        default="2",
+        choices=("1", "2"),
+        help="QueryShield report schema (2 stores each SQL and call site once)",
+    )
+    parser.addoption(
+        "--queryshield-otel",
+        action="store_true",
+        default=False,
+        help="Also export tests and queries as OpenTelemetry spans (OTLP)",
+    )
 
 
 def pytest_configure(config: Any) -> None:
     """Configure pytest plugin"""
     # Store recorder in config for use in hooks
-    config._queryshield_recorder = Recorder()
+    config._queryshield_spans = None
+    if config.getoption("--queryshield-otel"):
+        from queryshield_core.otel import SpanEmitter
+
+        config._queryshield_spans = SpanEmitter(nplus1_threshold=5)
+    # N+1 clusters are tracked while tests run; build_report reuses them
+    config._queryshield_recorder = Recorder(nplus1_threshold=5, spans=config._queryshield_spans)
     config._queryshield_engine = config.getoption("--queryshield-engine")
     config._queryshield_report = config.getoption("--queryshield-report")
     
@@ -38,6 +57,12 @@ def pytest_configure(config: Any) -> None:
             config._queryshield_recorder,
         )
         config._queryshield_cm.__enter__()
+    # Per-test usage figures need a serial run (no xdist)
+    config._queryshield_stats = None
+    if config._queryshield_engine and not config.getoption("numprocesses", default=None):
+        config._queryshield_stats = pg_stats_tracker(config._queryshield_engine)
+        if config._queryshield_stats is not None:
+            config._queryshield_stats.start()
 
 
 def pytest_runtest_setup(item: Any) -> None:
@@ -45,29 +70,45 @@ def pytest_runtest_setup(item: Any) -> None:
     recorder = item.config._queryshield_recorder
     test_name = item.nodeid
     recorder.start_test(test_name)
+    stats = item.config._queryshield_stats
+    if stats is not None:
+        stats.start_test(test_name)
 
 
 def pytest_runtest_teardown(item: Any) -> None:
     """Teardown for each test"""
     recorder = item.config._queryshield_recorder
     test_name = item.nodeid
+    stats = item.config._queryshield_stats
+    if stats is not None:
+        stats.end_test(test_name)
     recorder.end_test(test_name)
 
 
 def pytest_sessionfinish(session: Any) -> None:
     """Generate report at end of session"""
-    from queryshield_sqlalchemy.report import build_report, write_report
+    from queryshield_core.report_io import ReportWriter
+    from queryshield_core.report_v2 import SCHEMA_VERSION, V2Writer
+    from queryshield_sqlalchemy.report import stream_report
     
     recorder = session.config._queryshield_recorder
     engine = session.config._queryshield_engine
     
     if engine:
-        report = build_report(recorder, engine)
+        stats = session.config._queryshield_stats
+        usage = stats.finish() if stats is not None else None
         report_path = session.config._queryshield_report
-        write_report(report, report_path)
+        # Tests are written as they are built (format from the file extension)
+        with ReportWriter(report_path) as raw:
+            schema = session.config.getoption("--queryshield-schema-version")
+            writer = V2Writer(raw) if schema == SCHEMA_VERSION else raw
+            stream_report(recorder, engine, writer, index_usage=usage)
         print(f"\nQueryShield report saved to {report_path}")
     
     # Clean up probe
     cm = getattr(session.config, "_queryshield_cm", None)
     if cm:
         cm.__exit__(None, None, None)
+    spans = getattr(session.config, "_queryshield_spans", None)
+    if spans is not None:
+        spans.close()
@@ -4,7 +4,7 @@ import json
 import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import typer
 from rich import print as rprint
@@ -16,12 +16,29 @@ except Exception:  # pragma: no cover - allows importing CLI without Django pres
     run_django_tests = None  # type: ignore[assignment]
 
 from queryshield_probe.budgets import check_budgets, load_budgets
+from queryshield_probe.report_io import FORMATS, ReportReader, check_format, copy_report, format_for_path
+from queryshield_probe.report_v2 import SCHEMA_VERSION, Decoder, convert_report, load_report
 from .production_monitor import app as production_app
 
 
 app = typer.Typer(help="QueryShield - Database Query Performance Analysis")
 
 
+def _suggested_ddl(report: dict) -> list:
+    """Advisor DDL when the report has it, else the first five per-problem DDLs."""
+    advice = report.get("index_advice")
+    if advice:
+        return [i["ddl"] for i in advice if i.get("ddl")]
+    ddls = []
+    for t in report.get("tests", []) or []:
+        for p in t.get("problems", []) or []:
+            sug = p.get("suggestion") or {}
+            ddl = sug.get("ddl")
+            if ddl and ddl not in ddls:
+                ddls.append(ddl)
+    return ddls[:5]
+
+
 def _print_summary(report: dict) -> None:
     table = Table(title="QueryShield Summary")
     table.add_column("Test", style="cyan", no_wrap=True)
@@ -42,6 +59,28 @@ def _print_summary(report: dict) -> None:
         )
     rprint(table)
     
+    # Statements costing the most DB time across the suite (v2 reports list
+    # them first in the fingerprint table)
+    statements = [f for f in report.get("fingerprints") or [] if "count" in f][:5]
+    if statements:
+        top = Table(title="Top Statements by DB Time")
+        top.add_column("Statement", style="cyan")
+        top.add_column("Calls", justify="right")
+        top.add_column("Total (ms)", justify="right")
+        top.add_column("p95 (ms)", justify="right")
+        top.add_column("Tests", justify="right")
+        top.add_column("Problems", justify="left")
+        for f in statements:
+            top.add_row(
+                f.get("sql", "")[:60],
+                str(f.get("count", 0)),
+                f"{f.get('total_ms', 0):.1f}",
+                f"{f.get('p95_ms', 0):.1f}",
+                str(f.get("tests", 0)),
+                ", ".join(sorted({p.get("type", "?") for p in f.get("problems") or []})),
+            )
+        rprint(top)
+    
     # Print cost analysis summary
     cost_analysis = report.get("cost_analysis", {})
     if cost_analysis.get("estimated_monthly_cost"):
@@ -49,33 +88,70 @@ def _print_summary(report: dict) -> None:
         rprint(f"  Estimated Monthly Cost: ${cost_analysis.get('estimated_monthly_cost')}")
         rprint(f"  Total Queries: {cost_analysis.get('total_queries'):,}")
     
+    usage = report.get("index_usage") or {}
+    unused = usage.get("unused_indexes") or []
+    if unused:
+        rprint(f"[bold]Indexes not used by any test ({len(unused)}):[/bold]")
+        for i in unused[:5]:
+            rprint(f"  {i['schema']}.{i['index']} on {i['table']}")
+
     # Print suggested DDL snippets if present
-    ddls = []
-    for t in report.get("tests", []) or []:
-        for p in t.get("problems", []) or []:
-            sug = p.get("suggestion") or {}
-            ddl = sug.get("ddl")
-            if ddl and ddl not in ddls:
-                ddls.append(ddl)
-    if ddls:
-        rprint("[bold]Suggested indexes (DDL):[/bold]")
-        for d in ddls[:5]:
-            rprint(f"  {d}")
-    report.setdefault("_suggested_ddl", ddls)
+    advice = report.get("index_advice") or []
+    if advice:
+        rprint("[bold]Suggested indexes (DDL), ranked by DB time covered:[/bold]")
+        for i in advice[:5]:
+            n = len(i.get("statements") or [])
+            rprint(f"  {i['ddl']}  [grey]-- {i.get('weight_ms', 0):.1f} ms, {n} statement{'s' if n != 1 else ''}[/grey]")
+        if (report.get("run") or {}).get("hypopg"):
+            rejected = len(report.get("index_advice_rejected") or [])
+            rprint(f"[grey]Checked with HypoPG; {rejected} suggestion(s) the planner would not use were dropped[/grey]")
+    else:
+        ddls = _suggested_ddl(report)
+        if ddls:
+            rprint("[bold]Suggested indexes (DDL):[/bold]")
+            for d in ddls:
+                rprint(f"  {d}")
+
+
+def _summary_report(path: str) -> Dict[str, Any]:
+    """The report at ``path`` without per-query detail, read in one pass."""
+    with ReportReader(path) as reader:
+        tests = [{k: v for k, v in t.items() if k != "queries"} for t in reader.tests()]
+        return {**reader.header, "tests": tests, **reader.trailer}
+
+
+def _print_live_problems(test_name: str, problems: List[Dict[str, Any]]) -> None:
+    for p in problems:
+        ev = p.get("evidence", {})
+        file, _func, line = ev.get("top_stack") or ["<unknown>", "<unknown>", 0]
+        rprint(
+            f"[yellow]N+1[/yellow] {test_name}: {ev.get('cluster_count')}x at {file}:{line} "
+            f"- {ev.get('example_sql', '')[:80]}"
+        )
 
 
 @app.command()
 def analyze(
     runner: str = typer.Option("django", help="Test runner to use: django|pytest"),
-    explain: Optional[bool] = typer.Option(None, "--explain/--no-explain", help="Enable EXPLAIN on Postgres (default on)"),
+    explain: Optional[bool] = typer.Option(None, "--explain/--no-explain", help="Enable EXPLAIN (default on for Postgres and SQLite)"),
     budgets: str = typer.Option("queryshield.yml", help="Budgets YAML"),
     output: str = typer.Option(".queryshield/queryshield_report.json", help="Output report path"),
+    output_format: Optional[str] = typer.Option(
+        None, "--format", help=f"Report format: {'|'.join(FORMATS)} (default from the output extension)"
+    ),
+    schema_version: str = typer.Option(SCHEMA_VERSION, "--schema-version", help="Report schema: 2 (fingerprint tables) or 1"),
     nplus1_threshold: int = typer.Option(5, help="N+1 cluster threshold"),
     explain_timeout_ms: int = typer.Option(500, help="Per-EXPLAIN timeout (ms)"),
     explain_max_plans: int = typer.Option(50, help="Max EXPLAIN plans per run"),
+    explain_pipeline: bool = typer.Option(False, "--explain-pipeline", help="Pipeline EXPLAINs (Postgres, psycopg 3)"),
+    index_usage: bool = typer.Option(True, "--index-usage/--no-index-usage", help="Snapshot index/table usage stats (Postgres)"),
+    live: bool = typer.Option(False, "--live", help="Print N+1 findings as each test finishes"),
     api_key: Optional[str] = typer.Option(None, "--api-key", help="QueryShield API key for uploading to SaaS"),
     submit: bool = typer.Option(False, "--submit", help="Submit report to QueryShield dashboard"),
     save_baseline: bool = typer.Option(False, "--save-baseline", help="Save report as local baseline"),
+    otel: bool = typer.Option(
+        False, "--otel", help="Also export tests and queries as OpenTelemetry spans (OTLP, OTEL_EXPORTER_OTLP_* settings)"
+    ),
 ):
     """Run tests under the probe and write a report."""
     if os.getenv("QUERYSHIELD_DEBUG"):
@@ -89,28 +165,44 @@ def analyze(
         rprint("[red]Django not available in this environment[/red]")
         raise typer.Exit(code=1)
     try:
-        report = run_django_tests(
+        check_format(output_format or format_for_path(output))
+        if schema_version not in ("1", SCHEMA_VERSION):
+            raise ValueError(f"Unknown report schema version {schema_version!r}")
+        if otel:
+            from queryshield_probe.otel import check_otel
+
+            check_otel()
+    except (ValueError, RuntimeError) as e:
+        rprint(f"[red]{e}[/red]")
+        raise typer.Exit(code=2)
+    try:
+        run_django_tests(
             explain=explain,
             budgets_file=budgets,
             explain_timeout_ms=explain_timeout_ms,
             explain_max_plans=explain_max_plans,
+            explain_pipeline=explain_pipeline,
             nplus1_threshold=nplus1_threshold,
+            index_usage=index_usage,
+            on_test_problems=_print_live_problems if live else None,
+            output=output,
+            output_format=output_format,
+            schema_version=schema_version,
+            otel=otel,
         )
     except Exception as e:  # pragma: no cover
         rprint(f"[red]Runtime error:[/red] {e}")
         raise typer.Exit(code=1)
     
-    # Persist report
-    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
-    with open(output, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+    # The report was streamed to disk; the summary only needs per-test totals
+    report = _summary_report(output)
     
     # Write DDL suggestions file
-    ddls = report.get("_suggested_ddl", []) or []
+    ddls = _suggested_ddl(report)
     ddl_path = os.path.join(os.path.dirname(output) or ".", "ddl-suggestions.txt")
     try:
         with open(ddl_path, "w", encoding="utf-8") as df:
-            for line in ddls[:5]:
+            for line in ddls:
                 df.write(line + "\n")
     except Exception:
         pass
@@ -119,7 +211,7 @@ def analyze(
     if save_baseline:
         from queryshield_probe.api_client import LocalBaseline
         baseline = LocalBaseline()
-        baseline.save_baseline(report)
+        baseline.save_baseline(load_report(output))
         rprint("[green]✓ Baseline saved locally[/green]")
     
     # Submit to SaaS if requested or API key provided
@@ -135,7 +227,7 @@ def analyze(
             try:
                 rprint("[dim]📤 Uploading report to QueryShield dashboard...[/dim]")
                 with QueryShieldAPIClient(api_key=api_key) as client:
-                    response = client.submit_report(report)
+                    response = client.submit_report(load_report(output))
                     report_id = response.get("id", "unknown")
                     rprint(f"[green]✓ Report uploaded: {report_id}[/green]")
                     rprint(f"[cyan]📊 View at: https://app.queryshield.io/reports/{report_id}[/cyan]")
@@ -158,6 +250,24 @@ def analyze(
     rprint(f"[green]✓ Report saved: {output}[/green]")
 
 
+@app.command()
+def convert(
+    src: str = typer.Argument(..., help="Report to convert (any schema and format)"),
+    dst: str = typer.Argument(..., help="Output path"),
+    schema_version: str = typer.Option(SCHEMA_VERSION, "--schema-version", help="Target schema: 2 or 1"),
+    output_format: Optional[str] = typer.Option(
+        None, "--format", help=f"Report format: {'|'.join(FORMATS)} (default from the output extension)"
+    ),
+):
+    """Convert a report between schema versions and formats."""
+    try:
+        convert_report(src, dst, schema_version, output_format)
+    except (OSError, ValueError, RuntimeError) as e:
+        rprint(f"[red]Cannot convert {src}:[/red] {e}")
+        raise typer.Exit(code=1)
+    rprint(f"[green]✓ Report saved: {dst}[/green]")
+
+
 @app.command("budget-check")
 def budget_check(
     budgets: str = typer.Option("queryshield.yml", help="Budgets YAML"),
@@ -169,8 +279,10 @@ def budget_check(
     except Exception as e:
         rprint(f"[red]Invalid budgets config:[/red] {e}")
         raise typer.Exit(code=3)
-    data = json.load(open(report, "r", encoding="utf-8"))
-    violations = check_budgets(rules, data)
+    with ReportReader(report) as reader:
+        # One pass: v2 tests carry the aggregates, and the statements named
+        # in violations come from the tables that follow them
+        violations = check_budgets(rules, reader.tests(), statements=lambda: Decoder(reader.trailer).fingerprints)
     if violations:
         table = Table(title="Budget Violations")
         table.add_column("Test")
@@ -189,36 +301,123 @@ def budget_check(
     rprint("[green]Budgets OK[/green]")
 
 
+def _run_timings(runs: int, tests: Optional[List[str]]) -> Dict[str, Any]:
+    try:
+        from queryshield_probe.runners.django_runner import run_django_timings
+    except Exception:
+        rprint("[red]Django not available in this environment[/red]")
+        raise typer.Exit(code=1)
+    rprint(f"[dim]Running the suite {runs} times...[/dim]")
+    try:
+        return run_django_timings(runs, test_labels=tests)
+    except Exception as e:  # pragma: no cover
+        rprint(f"[red]Runtime error:[/red] {e}")
+        raise typer.Exit(code=1)
+
+
 @app.command("record-baseline")
 def record_baseline(
     report: str = typer.Option(".queryshield/queryshield_report.json", help="Current report path"),
-    output: str = typer.Option(".queryshield/baseline.json", help="Baseline output path"),
+    output: Optional[str] = typer.Option(
+        None, help="Baseline output path (default .queryshield/baseline.json, or --timings-output with --runs)"
+    ),
+    runs: int = typer.Option(0, help="Run the suite this many times and record timing distributions instead"),
+    tests: Optional[List[str]] = typer.Option(None, "--tests", help="Test labels to run (with --runs)"),
+    timings_output: str = typer.Option(".queryshield/baseline_timings.json", help="Timings baseline path (with --runs)"),
 ):
-    data = json.load(open(report, "r", encoding="utf-8"))
-    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
-    with open(output, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    if runs > 0:
+        data = _run_timings(runs, tests)
+        output = output or timings_output
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    else:
+        output = output or ".queryshield/baseline.json"
+        # Streamed, so large reports are never held in memory
+        copy_report(report, output)
     rprint(f"[green]Baseline saved to {output}[/green]")
 
 
+def _verify_timings(
+    timings_baseline: str,
+    runs: int,
+    tests: Optional[List[str]],
+    alpha: float,
+    min_effect: float,
+    min_increase_pct: float,
+    min_increase_ms: float,
+) -> None:
+    from queryshield_probe.regression import compare_timings, min_runs
+
+    base = json.load(open(timings_baseline, "r", encoding="utf-8"))
+    needed = min_runs(len(base.get("tests") or {}), alpha)
+    if min(runs, base.get("runs", runs)) < needed:
+        rprint(
+            f"[yellow]⚠ Fewer than {needed} runs per side: test DB time regressions cannot reach "
+            f"significance over {len(base.get('tests') or {})} tests (fingerprints still can)[/yellow]"
+        )
+    current = _run_timings(runs, tests)
+    regressions = compare_timings(
+        base,
+        current,
+        alpha=alpha,
+        min_effect=min_effect,
+        min_increase_pct=min_increase_pct,
+        min_increase_ms=min_increase_ms,
+    )
+    if regressions:
+        table = Table(title="Significant latency regressions")
+        table.add_column("Test", style="cyan")
+        table.add_column("Query")
+        table.add_column("Median (ms)", justify="right")
+        table.add_column("Change", justify="right")
+        table.add_column("Effect", justify="right")
+        table.add_column("q", justify="right")
+        for r in regressions:
+            pct = f" ({r['increase_pct']:+.0f}%)" if r["increase_pct"] is not None else ""
+            table.add_row(
+                r["test"],
+                (r["fingerprint"] or "<test DB time>")[:60],
+                f"{r['baseline_median_ms']:.2f} -> {r['current_median_ms']:.2f}",
+                f"{r['increase_ms']:+.2f}{pct}",
+                f"{r['effect_size']:.2f}",
+                f"{r['q_value']:.1e}",
+            )
+        rprint(table)
+        raise typer.Exit(code=2)
+    rprint(f"[green]Patch verification OK[/green] (no significant latency regression over {runs} runs)")
+
+
+def _query_totals(path: str) -> Dict[str, int]:
+    with ReportReader(path) as reader:
+        return {t["name"]: t.get("queries_total", 0) for t in reader.tests()}
+
+
 @app.command("verify-patch")
 def verify_patch(
     baseline: str = typer.Option(".queryshield/baseline.json", help="Baseline JSON"),
     report: str = typer.Option(".queryshield/queryshield_report.json", help="Current report JSON"),
     max_queries_increase: int = typer.Option(0, help="Allowed queries increase per test"),
+    runs: int = typer.Option(0, help="Run the suite this many times and test timings against --timings-baseline"),
+    timings_baseline: str = typer.Option(".queryshield/baseline_timings.json", help="Timings baseline (record-baseline --runs)"),
+    tests: Optional[List[str]] = typer.Option(None, "--tests", help="Test labels to run (with --runs)"),
+    alpha: float = typer.Option(0.01, help="Significance level after multiple-comparison correction"),
+    min_effect: float = typer.Option(0.33, help="Minimum Cliff's delta to report"),
+    min_increase_pct: float = typer.Option(10.0, help="Minimum median increase (%)"),
+    min_increase_ms: float = typer.Option(0.5, help="Minimum median increase (ms)"),
 ):
-    base = json.load(open(baseline, "r", encoding="utf-8"))
-    cur = json.load(open(report, "r", encoding="utf-8"))
-    base_map = {t["name"]: t for t in base.get("tests", [])}
-    cur_map = {t["name"]: t for t in cur.get("tests", [])}
+    if runs > 0:
+        _verify_timings(timings_baseline, runs, tests, alpha, min_effect, min_increase_pct, min_increase_ms)
+        return
+    base_map = _query_totals(baseline)
+    cur_map = _query_totals(report)
     failures = []
-    for name, ct in cur_map.items():
-        bt = base_map.get(name)
-        if not bt:
+    for name, current in cur_map.items():
+        if name not in base_map:
             continue
-        if ct.get("queries_total", 0) > bt.get("queries_total", 0) + max_queries_increase:
+        if current > base_map[name] + max_queries_increase:
             failures.append(
-                f"{name}: queries_total {ct.get('queries_total')} > baseline {bt.get('queries_total')} + {max_queries_increase}"
+                f"{name}: queries_total {current} > baseline {base_map[name]} + {max_queries_increase}"
             )
     if failures:
         rprint("[red]Patch verification failed:[/red]")
@@ -228,6 +427,170 @@ def verify_patch(
     rprint("[green]Patch verification OK[/green]")
 
 
+@app.command("diff")
+def diff(
+    baseline: str = typer.Option(".queryshield/baseline.json", help="Baseline report"),
+    report: str = typer.Option(".queryshield/queryshield_report.json", help="Current report"),
+    output_format: str = typer.Option("markdown", "--format", help="Output format: markdown|json"),
+    output: Optional[str] = typer.Option(None, help="Write the diff here instead of stdout"),
+    limit: int = typer.Option(10, help="Rows per Markdown section"),
+    fail_on_regression: bool = typer.Option(
+        False, help="Exit with code 2 on new problems, more executions or slower statements"
+    ),
+):
+    """Compare two reports by statement and by test (Markdown for PR comments, or JSON)."""
+    from queryshield_core.diff import diff_reports, has_regressions, render_markdown
+
+    if output_format not in ("markdown", "json"):
+        rprint(f"[red]Unknown diff format {output_format!r}[/red] (expected markdown or json)")
+        raise typer.Exit(code=1)
+    try:
+        result = diff_reports(baseline, report)
+    except (OSError, ValueError) as e:
+        rprint(f"[red]Cannot diff reports:[/red] {e}")
+        raise typer.Exit(code=1)
+    text = json.dumps(result, indent=2) if output_format == "json" else render_markdown(result, limit=limit)
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        rprint(f"[green]✓ Diff saved: {output}[/green]")
+    else:
+        sys.stdout.write(text + "\n")
+    if fail_on_regression and has_regressions(result):
+        raise typer.Exit(code=2)
+
+
+@app.command("flamegraph")
+def flamegraph(
+    report: str = typer.Option(".queryshield/queryshield_report.json", help="Report path"),
+    output: str = typer.Option(".queryshield/db_time.folded", help="Folded stacks output path"),
+    per_test: bool = typer.Option(False, "--per-test", help="Root each stack at its test instead of merging the run"),
+    statements: bool = typer.Option(False, "--statements", help="Add the normalized SQL as the innermost frame"),
+):
+    """Export DB time by call stack as folded stacks (flamegraph.pl, speedscope)."""
+    from queryshield_core.folded import fold_report, write_folded
+
+    try:
+        folded = fold_report(report, per_test=per_test, statements=statements)
+    except (OSError, ValueError) as e:
+        rprint(f"[red]Cannot read {report}:[/red] {e}")
+        raise typer.Exit(code=1)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        write_folded(folded, f)
+    rprint(f"[green]✓ {len(folded)} stacks saved: {output}[/green] (flamegraph.pl {output} > db.svg, or open in speedscope)")
+
+
+@app.command("trace")
+def trace(
+    report: str = typer.Option(".queryshield/queryshield_report.json", help="Report path"),
+    output: str = typer.Option(".queryshield/trace.json", help="Chrome trace output path"),
+    tests: Optional[str] = typer.Option(None, "--tests", help="Only tests matching this glob pattern"),
+):
+    """Export each test's query timeline as a Chrome trace (open in Perfetto)."""
+    from queryshield_core.trace import write_trace
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    try:
+        with open(output, "w", encoding="utf-8") as f:
+            written = write_trace(report, f, tests=tests)
+    except (OSError, ValueError) as e:
+        rprint(f"[red]Cannot read {report}:[/red] {e}")
+        raise typer.Exit(code=1)
+    rprint(f"[green]✓ Trace of {written} tests saved: {output}[/green] (open in https://ui.perfetto.dev)")
+
+
+@app.command("ingest-otel")
+def ingest_otel(
+    spans: str = typer.Argument(..., help="OTLP/JSON trace file (OpenTelemetry Collector file exporter)"),
+    output: str = typer.Option(".queryshield/queryshield_report.json", help="Output report path"),
+    output_format: Optional[str] = typer.Option(
+        None, "--format", help=f"Report format: {'|'.join(FORMATS)} (default from the output extension)"
+    ),
+    schema_version: str = typer.Option(SCHEMA_VERSION, "--schema-version", help="Report schema: 2 (fingerprint tables) or 1"),
+    nplus1_threshold: int = typer.Option(5, help="N+1 cluster threshold"),
+):
+    """Build a report from the database spans of an OTLP trace file (one test per trace)."""
+    from queryshield_core.otel_ingest import ingest_otlp
+    from queryshield_core.report_io import ReportWriter
+    from queryshield_core.report_v2 import V2Writer
+
+    try:
+        check_format(output_format or format_for_path(output))
+        if schema_version not in ("1", SCHEMA_VERSION):
+            raise ValueError(f"Unknown report schema version {schema_version!r}")
+    except (ValueError, RuntimeError) as e:
+        rprint(f"[red]{e}[/red]")
+        raise typer.Exit(code=2)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    try:
+        with ReportWriter(output, output_format) as raw:
+            writer = V2Writer(raw) if schema_version == SCHEMA_VERSION else raw
+            summary = ingest_otlp(spans, writer, nplus1_threshold=nplus1_threshold)
+    except (OSError, ValueError) as e:
+        rprint(f"[red]Cannot read {spans}:[/red] {e}")
+        raise typer.Exit(code=1)
+    run = summary["run"]
+    rprint(f"[green]✓ Report of {run['db_spans']} database spans ({run['spans']} spans read) saved: {output}[/green]")
+
+
+@app.command("bench")
+def bench(
+    tests: List[str] = typer.Argument(..., help="Test ids or labels to benchmark"),
+    iterations: int = typer.Option(20, help="Measured iterations per test"),
+    warmup: int = typer.Option(3, help="Unmeasured warmup iterations per test"),
+    output: str = typer.Option(".queryshield/bench.json", help="Bench result JSON path"),
+    compare: Optional[str] = typer.Option(None, "--compare", help="Previous bench result to compare with"),
+):
+    """Benchmark tests' DB behaviour: query count, DB time, wall time and probe overhead."""
+    try:
+        from queryshield_probe.runners.django_runner import run_django_bench
+    except Exception:
+        rprint("[red]Django not available in this environment[/red]")
+        raise typer.Exit(code=1)
+    try:
+        result = run_django_bench(tests, iterations=iterations, warmup=warmup)
+    except Exception as e:  # pragma: no cover
+        rprint(f"[red]Runtime error:[/red] {e}")
+        raise typer.Exit(code=1)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    table = Table(title=f"QueryShield Bench ({iterations} iterations, {warmup} warmup)")
+    table.add_column("Test", style="cyan")
+    table.add_column("Queries", justify="right")
+    table.add_column("DB ms (median / p95)", justify="right")
+    table.add_column("Wall ms (median / p95)", justify="right")
+    table.add_column("Probe ms", justify="right")
+    for name, t in result["tests"].items():
+        if not t["queries"]["n"]:
+            continue
+        table.add_row(
+            name,
+            f"{t['queries']['median']:g}",
+            f"{t['db_time_ms']['median']:.2f} / {t['db_time_ms']['p95']:.2f}",
+            f"{t['wall_ms']['median']:.2f} / {t['wall_ms']['p95']:.2f}",
+            f"{t['probe_overhead_ms']['median']:.2f}",
+        )
+    rprint(table)
+    for name, err in result["errors"].items():
+        rprint(f"[yellow]{name} failed while benchmarking:[/yellow] {err}")
+
+    if compare:
+        from queryshield_probe.bench import compare_bench
+
+        previous = json.load(open(compare, "r", encoding="utf-8"))
+        rows = [r for r in compare_bench(previous, result) if r["significant"]]
+        if not rows:
+            rprint("[green]No significant change against the previous result[/green]")
+        for r in rows:
+            pct = f" ({r['change_pct']:+.1f}%)" if r["change_pct"] is not None else ""
+            rprint(f"  {r['test']}: {r['metric']} {r['before']:g} -> {r['after']:g}{pct}")
+    rprint(f"[green]✓ Bench result saved: {output}[/green]")
+
+
 # Add production monitoring subcommand
 app.add_typer(production_app, name="production-monitor", help="Manage production query monitoring")
 
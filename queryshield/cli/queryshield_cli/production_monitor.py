@@ -5,6 +5,7 @@ import sys
 import signal
 import logging
 import time
+import threading
 from typing import Optional
 from pathlib import Path
 
@@ -15,7 +16,7 @@ from rich.panel import Panel
 from rich.live import Live
 from rich.text import Text
 
-from queryshield_monitoring import MonitoringConfig, ProductionMonitor
+from queryshield_monitoring import MonitoringConfig, PgStatStatementsCollector, ProductionMonitor
 
 logger = logging.getLogger(__name__)
 console = Console()
@@ -142,6 +143,93 @@ def start(
         shutdown_handler(None, None)
 
 
+def _pg_connect(dsn: str):
+    """DB-API connection factory for the collector (psycopg 3, else psycopg2)"""
+    try:
+        import psycopg
+        return lambda: psycopg.connect(dsn)
+    except ImportError:
+        pass
+    try:
+        import psycopg2
+        return lambda: psycopg2.connect(dsn)
+    except ImportError:
+        console.print("[red]❌ psycopg (or psycopg2) is required to read pg_stat_statements[/red]")
+        sys.exit(1)
+
+
+def _print_statements(batch) -> None:
+    """Print one collector batch"""
+    table = Table(title=f"pg_stat_statements ({len(batch)} fingerprints)")
+    table.add_column("SQL", style="cyan")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right", style="green")
+    table.add_column("Mean", justify="right")
+    table.add_column("Rows", justify="right")
+    table.add_column("Cache hit", justify="right")
+    for agg in batch[:20]:
+        ratio = agg.cache_hit_ratio
+        table.add_row(
+            agg.sql[:60],
+            str(agg.calls),
+            f"{agg.total_ms:.1f}ms",
+            f"{agg.duration_ms:.2f}ms",
+            str(agg.rows),
+            f"{ratio * 100:.1f}%" if ratio is not None else "-",
+        )
+    console.print(table)
+
+
+@app.command()
+def collect(
+    dsn: str = typer.Option(
+        ...,
+        "--dsn",
+        envvar="QUERYSHIELD_DATABASE_URL",
+        help="PostgreSQL connection string (needs the pg_stat_statements extension)",
+    ),
+    config_file: Optional[str] = typer.Option(
+        "queryshield.yml",
+        "--config",
+        help="Path to queryshield.yml config file"
+    ),
+    interval: float = typer.Option(60.0, "--interval", help="Seconds between pg_stat_statements snapshots"),
+    once: bool = typer.Option(False, "--once", help="Stop after the first interval"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Print aggregates instead of uploading them"),
+):
+    """Collect per-fingerprint aggregates from pg_stat_statements (agentless, no sampling)"""
+
+    config = _load_config(config_file)
+    if not dry_run and (not config.api_key or not config.org_id):
+        console.print("[red]❌ API key and org ID required (or use --dry-run)[/red]")
+        sys.exit(1)
+
+    collector = PgStatStatementsCollector(_pg_connect(dsn), config)
+    try:
+        collector.snapshot()
+    except Exception as e:
+        console.print(f"[red]❌ Cannot read pg_stat_statements: {e}[/red]")
+        console.print("Enable it with shared_preload_libraries = 'pg_stat_statements' and")
+        console.print("  CREATE EXTENSION pg_stat_statements;")
+        sys.exit(1)
+    finally:
+        collector.close()
+
+    console.print(f"[green]✅ Collecting pg_stat_statements every {interval:g}s[/green]\n")
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        collector.run(
+            interval_seconds=interval,
+            stop_event=stop,
+            sink=_print_statements if dry_run else None,
+            iterations=1 if once else None,
+        )
+    except KeyboardInterrupt:
+        stop.set()
+    console.print("[green]✅ Collector stopped[/green]")
+
+
 @app.command()
 def status(
     config_file: Optional[str] = typer.Option(
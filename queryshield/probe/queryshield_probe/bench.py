@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from statistics import mean, median, pstdev
+from typing import Any, Dict, List, Optional
+
+from .capture import ProbeWrapper, Recorder
+from .regression import mann_whitney_u
+
+
+BENCH_VERSION = "1"
+METRICS = ("queries", "db_time_ms", "wall_ms", "probe_overhead_ms")
+
+
+class TimedProbeWrapper(ProbeWrapper):
+    """Probe that also measures its own bookkeeping time.
+
+    Everything the wrapper spends outside ``execute`` (stack capture,
+    hashing, recording) is added to ``overhead_ms`` of the current test.
+    """
+
+    def __init__(self, recorder: Recorder):
+        super().__init__(recorder)
+        self.overhead_ms: Dict[str, float] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return super().__call__(execute, sql, params, many, context)
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000.0
+            name = self.recorder.current_test()
+            events = self.recorder.events_by_test.get(name)
+            db_ms = events[-1].duration_ms if events else 0.0
+            self.overhead_ms[name] = self.overhead_ms.get(name, 0.0) + max(total_ms - db_ms, 0.0)
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """Distribution summary; the raw samples are kept for later comparisons."""
+    if not values:
+        return {"n": 0, "samples": []}
+    ordered = sorted(values)
+    return {
+        "n": len(ordered),
+        "min": round(ordered[0], 4),
+        "median": round(median(ordered), 4),
+        "mean": round(mean(ordered), 4),
+        "p95": round(ordered[max(0, int(0.95 * (len(ordered) - 1)))], 4),
+        "max": round(ordered[-1], 4),
+        "stdev": round(pstdev(ordered), 4),
+        "samples": [round(v, 4) for v in values],
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        )
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def bench_result(
+    samples: Dict[str, Dict[str, List[float]]],
+    *,
+    iterations: int,
+    warmup: int,
+    vendor: str = "unknown",
+    errors: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """JSON-ready bench result.
+
+    ``samples`` maps test id -> metric -> one value per measured iteration.
+    The commit, interpreter and database vendor are recorded so results
+    from different commits can be compared like for like.
+    """
+    return {
+        "version": BENCH_VERSION,
+        "kind": "bench",
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "project_root": os.path.abspath(os.getcwd()),
+        "commit": _git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db_vendor": vendor,
+        },
+        "iterations": iterations,
+        "warmup": warmup,
+        "tests": {
+            name: {metric: summarize(values.get(metric, [])) for metric in METRICS}
+            for name, values in samples.items()
+        },
+        "errors": errors or {},
+    }
+
+
+def compare_bench(previous: Dict[str, Any], current: Dict[str, Any], alpha: float = 0.01) -> List[Dict[str, Any]]:
+    """Per test and metric, the median change and whether it is significant.
+
+    Significance is a two-sided Mann-Whitney U test on the raw samples;
+    query counts usually do not vary between iterations, so any change in
+    them is flagged.
+    """
+    rows: List[Dict[str, Any]] = []
+    for name, cur in (current.get("tests") or {}).items():
+        prev = (previous.get("tests") or {}).get(name)
+        if not prev:
+            continue
+        for metric in METRICS:
+            a = (prev.get(metric) or {}).get("samples") or []
+            b = (cur.get(metric) or {}).get("samples") or []
+            if not a or not b:
+                continue
+            before, after = median(a), median(b)
+            if metric == "queries":
+                significant = before != after
+                p = None
+            else:
+                p = min(1.0, 2 * min(mann_whitney_u(b, a)[1], mann_whitney_u(a, b)[1]))
+                significant = p < alpha
+            rows.append(
+                {
+                    "test": name,
+                    "metric": metric,
+                    "before": round(before, 4),
+                    "after": round(after, 4),
+                    "change_pct": round((after - before) / before * 100.0, 1) if before else None,
+                    "p_value": p,
+                    "significant": significant,
+                }
+            )
+    return rows
@@ -1,20 +1,72 @@
+from collections import Counter
 from fnmatch import fnmatch
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import yaml
 
 
+# Budget key -> the per-test figure it caps
+LIMITS: Dict[str, str] = {
+    "max_queries": "queries_total",
+    "max_total_db_time_ms": "duration_ms",
+    "max_p95_ms": "queries_p95_ms",
+    "max_p99_ms": "queries_p99_ms",
+    "max_query_ms": "query_max_ms",
+    "max_rows": "rows_total",
+    "max_queries_per_fingerprint": "fingerprint_max_count",
+    "max_nplus1_cluster": "nplus1_max_cluster",
+}
+
+_GLOB_CHARS = set("*?[")
+
+
 def load_budgets(path: str) -> Dict[str, Any]:
     with open(path, "r", encoding="utf-8") as f:
         data = yaml.safe_load(f) or {}
     return data
 
 
-def _rules_for_test(budgets: Dict[str, Any], test_name: str) -> Dict[str, Any]:
-    rules = dict(budgets.get("defaults", {}))
-    tests = budgets.get("tests", {}) or {}
-    if test_name in tests:
-        rules.update(tests[test_name] or {})
+class _Overrides:
+    """Per-test rule overrides keyed by exact name, glob or module prefix.
+
+    ``app.tests.test_books`` applies to every test below that module or
+    class (``.``, ``::`` and ``/`` separate the parts). When several
+    entries match, module prefixes apply first (shortest first), then
+    globs in file order, then the exact name, so more specific entries win.
+    """
+
+    def __init__(self, tests: Dict[str, Any]) -> None:
+        self.exact: Dict[str, Dict[str, Any]] = {}
+        self.globs: List[Tuple[str, Dict[str, Any]]] = []
+        self.prefixes: List[Tuple[str, Dict[str, Any]]] = []
+        for key, rules in (tests or {}).items():
+            rules = rules or {}
+            if _GLOB_CHARS & set(key):
+                self.globs.append((key, rules))
+            else:
+                self.exact[key] = rules
+                self.prefixes.append((key, rules))
+        self.prefixes.sort(key=lambda p: len(p[0]))
+
+    def matching(self, test_name: str) -> Iterator[Dict[str, Any]]:
+        for prefix, rules in self.prefixes:
+            if len(test_name) > len(prefix) and test_name.startswith(prefix) and (
+                test_name[len(prefix)] in "./" or test_name.startswith("::", len(prefix))
+            ):
+                yield rules
+        for pattern, rules in self.globs:
+            if fnmatch(test_name, pattern):
+                yield rules
+        if test_name in self.exact:
+            yield self.exact[test_name]
+
+
+def _rules_for_test(budgets: Dict[str, Any], test_name: str, overrides: Optional[_Overrides] = None) -> Dict[str, Any]:
+    rules = dict(budgets.get("defaults", {}) or {})
+    if overrides is None:
+        overrides = _Overrides(budgets.get("tests", {}) or {})
+    for more in overrides.matching(test_name):
+        rules.update(more)
     return rules
 
 
@@ -27,25 +79,118 @@ def _problem_ignored(p: Dict[str, Any], ignore_rules: List[str]) -> bool:
     return False
 
 
-def check_budgets(budgets: Dict[str, Any], report: Dict[str, Any]) -> List[str]:
-    violations: List[str] = []
-    forb_types = set(
-        [(x.get("type") if isinstance(x, dict) else x) for x in (budgets.get("defaults", {}).get("forbid", []) or [])]
-    )
-    for t in report.get("tests", []) or []:
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return float(sorted_values[max(0, int(q * (len(sorted_values) - 1)))])
+
+
+def _test_metrics(t: Dict[str, Any], ignore_rules: List[str]) -> Dict[str, Any]:
+    """Budgeted figures of one test report.
+
+    Reports carry the aggregates; older reports without them fall back to
+    the (possibly truncated) query list.
+    """
+    metrics = {
+        "queries_total": t.get("queries_total", 0),
+        "duration_ms": t.get("duration_ms", 0),
+        "queries_p95_ms": t.get("queries_p95_ms"),
+        "queries_p99_ms": t.get("queries_p99_ms"),
+        "query_max_ms": t.get("query_max_ms"),
+        "rows_total": t.get("rows_total"),
+        "fingerprint_max_count": (t.get("top_fingerprint") or {}).get("count"),
+    }
+    # Schema v2 keeps queries as columns and always carries the aggregates
+    queries = t.get("queries") if isinstance(t.get("queries"), list) else []
+    if queries and (metrics["queries_p99_ms"] is None or metrics["fingerprint_max_count"] is None):
+        durations = sorted(q.get("duration_ms", 0) for q in queries)
+        for key, value in (
+            ("queries_p95_ms", _percentile(durations, 0.95)),
+            ("queries_p99_ms", _percentile(durations, 0.99)),
+            ("query_max_ms", durations[-1]),
+        ):
+            if metrics[key] is None:
+                metrics[key] = value
+        if metrics["fingerprint_max_count"] is None:
+            metrics["fingerprint_max_count"] = Counter(q.get("normalized_sql") for q in queries).most_common(1)[0][1]
+    clusters = [
+        (p.get("evidence") or {}).get("cluster_count", 0)
+        for p in t.get("problems", []) or []
+        if p.get("type") == "N+1" and not _problem_ignored(p, ignore_rules)
+    ]
+    metrics["nplus1_max_cluster"] = max(clusters) if clusters else 0
+    return metrics
+
+
+def _forbidden_types(rules: Dict[str, Any]) -> set:
+    return set((x.get("type") if isinstance(x, dict) else x) for x in (rules.get("forbid", []) or []))
+
+
+def _statement(top: Dict[str, Any], statements: Optional[Sequence[str]]) -> str:
+    """SQL of a test's top fingerprint; v2 tests only carry its table id."""
+    if "sql" in top:
+        return top.get("sql") or ""
+    fp = top.get("fingerprint")
+    if statements is not None and isinstance(fp, int) and 0 <= fp < len(statements):
+        return statements[fp]
+    return f"fingerprint #{fp}"
+
+
+def _violations(
+    budgets: Dict[str, Any], tests: Iterable[Dict[str, Any]]
+) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """Violation messages, each with the top fingerprint it should name."""
+    overrides = _Overrides(budgets.get("tests", {}) or {})
+    forb_types = _forbidden_types(budgets.get("defaults", {}) or {})
+    for t in tests:
         name = t.get("name", "<unknown>")
-        rules = _rules_for_test(budgets, name)
+        rules = _rules_for_test(budgets, name, overrides)
         ignore_rules = rules.get("ignore", []) or []
-        if "max_queries" in rules and t.get("queries_total", 0) > rules["max_queries"]:
-            violations.append(f"{name}: queries_total {t.get('queries_total')} > max_queries {rules['max_queries']}")
-        if "max_total_db_time_ms" in rules and t.get("duration_ms", 0) > rules["max_total_db_time_ms"]:
-            violations.append(
-                f"{name}: duration_ms {t.get('duration_ms')} > max_total_db_time_ms {rules['max_total_db_time_ms']}"
-            )
+        metrics = _test_metrics(t, ignore_rules)
+        for key, metric in LIMITS.items():
+            if key not in rules or rules[key] is None:
+                continue
+            value = metrics.get(metric)
+            if value is not None and value > rules[key]:
+                top = t.get("top_fingerprint") if metric == "fingerprint_max_count" else None
+                yield f"{name}: {metric} {value} > {key} {rules[key]}", top or None
         if forb_types:
             for p in t.get("problems", []) or []:
                 if _problem_ignored(p, ignore_rules):
                     continue
                 if p.get("type") in forb_types:
-                    violations.append(f"{name}: forbidden problem {p.get('type')} detected (id={p.get('id')})")
-    return violations
+                    yield f"{name}: forbidden problem {p.get('type')} detected (id={p.get('id')})", None
+
+
+def _message(message: str, top: Optional[Dict[str, Any]], statements: Optional[Sequence[str]]) -> str:
+    return f"{message} ({_statement(top, statements)[:80]})" if top else message
+
+
+def iter_violations(budgets: Dict[str, Any], tests: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Budget violations of ``tests``, checked one test at a time.
+
+    ``tests`` may be any iterable (e.g. a streaming report reader); each
+    test report is looked at once and not kept. Schema v2 tests are checked
+    as they are, from their aggregates.
+    """
+    for message, top in _violations(budgets, tests):
+        yield _message(message, top, None)
+
+
+def check_budgets(
+    budgets: Dict[str, Any],
+    report: Union[Dict[str, Any], Iterable[Dict[str, Any]]],
+    statements: Optional[Callable[[], Sequence[str]]] = None,
+) -> List[str]:
+    """Violations of a report, or of an iterable of test reports.
+
+    ``statements`` returns the fingerprint table of a streamed v2 report.
+    It is called once the tests have been read (the tables follow them),
+    and only when a violation has to name a statement.
+    """
+    tests = (report.get("tests", []) or []) if isinstance(report, dict) else report
+    found = list(_violations(budgets, tests))
+    names = None
+    if statements is not None and any(top and "sql" not in top for _, top in found):
+        names = statements()
+    return [_message(message, top, names) for message, top in found]
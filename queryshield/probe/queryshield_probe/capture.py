@@ -1,36 +1,48 @@
 import inspect
+import re
 import threading
 import time
 from contextlib import contextmanager
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from django.db import connection
 
+from .classify import NPlusOneTracker
+from .utils import normalize_sql, params_hash
+
 
 _local = threading.local()
+_re_returning = re.compile(r"\bRETURNING\b", re.IGNORECASE)
 
 
 class QueryEvent:
     __slots__ = (
         "sql",
         "params",
+        "params_hash",
         "duration_ms",
         "many",
+        "rows",
         "stack",
         "error",
         "db_alias",
         "db_vendor",
+        "start_ms",
     )
 
     def __init__(self) -> None:
         self.sql: str = ""
         self.params = None
+        self.params_hash: str = ""
         self.duration_ms: float = 0.0
         self.many: bool = False
+        self.rows: Optional[int] = None
         self.stack: List[Tuple[str, str, int]] = []
         self.error: Optional[str] = None
         self.db_alias: str = "default"
         self.db_vendor: str = "unknown"
+        # Offset of the query's start from the start of its test
+        self.start_ms: Optional[float] = None
 
 
 def _stack_signature(skip: int = 0, depth: int = 8) -> List[Tuple[str, str, int]]:
@@ -44,9 +56,47 @@ def _stack_signature(skip: int = 0, depth: int = 8) -> List[Tuple[str, str, int]
     return out
 
 
+def _rowcount(context: Any, sql: str, vendor: str) -> Optional[int]:
+    """Rows the statement returned or affected; None when the driver does not say.
+
+    SQLite only counts rows as they are fetched: -1 for SELECT, 0 for
+    ``RETURNING`` statements at this point.
+    """
+    if vendor == "sqlite" and _re_returning.search(sql or ""):
+        return None
+    try:
+        cursor = context.get("cursor") if isinstance(context, dict) else getattr(context, "cursor", None)
+        rows = getattr(cursor, "rowcount", -1)
+    except Exception:
+        return None
+    return rows if isinstance(rows, int) and rows >= 0 else None
+
+
 class Recorder:
-    def __init__(self) -> None:
+    """Collects query events per test.
+
+    With ``nplus1_threshold`` set, each test's N+1 clusters are maintained
+    while it runs and finalized by ``end_test``; ``on_test_end`` then
+    receives the test name and its problems right away. With ``spans`` (an
+    ``otel.SpanEmitter``), every test and query is also exported as an
+    OpenTelemetry span.
+    """
+
+    def __init__(
+        self,
+        nplus1_threshold: Optional[int] = None,
+        on_test_end: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+        spans: Any = None,
+    ) -> None:
         self._events_by_test: Dict[str, List[QueryEvent]] = {}
+        self.nplus1_threshold = nplus1_threshold
+        self.on_test_end = on_test_end
+        self.trackers: Dict[str, NPlusOneTracker] = {}
+        # Wall time of each finished test, setUp and tearDown included
+        self.test_wall_ms: Dict[str, float] = {}
+        self.spans = spans
+        self._started = time.perf_counter()
+        self._started_ns = time.time_ns()
 
     def current_test(self) -> str:
         name = getattr(_local, "current_test", None)
@@ -56,16 +106,67 @@ class Recorder:
 
     def start_test(self, name: str) -> None:
         _local.current_test = name
+        _local.test_start = time.perf_counter()
         self._events_by_test.setdefault(name, [])
+        if self.spans is not None:
+            self.spans.start_test(name, self.epoch_ns(_local.test_start))
 
     def end_test(self, name: Optional[str] = None) -> None:
         if name is None:
             name = getattr(_local, "current_test", None)
         _local.current_test = None
+        start = getattr(_local, "test_start", None)
+        _local.test_start = None
+        end = time.perf_counter()
+        if name and start is not None:
+            self.test_wall_ms[name] = (end - start) * 1000.0
+        if self.spans is not None:
+            self.spans.end_test(self.epoch_ns(end))
+        tracker = self.trackers.get(name) if name else None
+        if tracker is not None:
+            problems, _tags = tracker.finish()
+            if self.on_test_end is not None:
+                self.on_test_end(name, problems)
+
+    def offset_ms(self, t: float) -> float:
+        """``perf_counter`` time ``t`` relative to the current test's start
+        (the recorder's creation outside tests)."""
+        start = getattr(_local, "test_start", None)
+        return (t - (self._started if start is None else start)) * 1000.0
+
+    def epoch_ns(self, t: float) -> int:
+        """``perf_counter`` time ``t`` in nanoseconds since the epoch."""
+        return self._started_ns + int((t - self._started) * 1e9)
 
     def record(self, ev: QueryEvent) -> None:
         name = self.current_test()
         self._events_by_test.setdefault(name, []).append(ev)
+        repeats = 0
+        tracker = None
+        if self.nplus1_threshold is not None:
+            tracker = self.trackers.get(name)
+            if tracker is None:
+                tracker = self.trackers[name] = NPlusOneTracker(self.nplus1_threshold)
+            repeats = tracker.add(ev.sql, ev.stack, ev.db_alias)
+        if self.spans is not None:
+            self._emit(ev, tracker, repeats)
+
+    def _emit(self, ev: QueryEvent, tracker: Optional[NPlusOneTracker], repeats: int) -> None:
+        start_ns = None
+        if ev.start_ms is not None:
+            start = getattr(_local, "test_start", None)
+            start_ns = self.epoch_ns((self._started if start is None else start) + ev.start_ms / 1000.0)
+        self.spans.query(
+            tracker.normalized[-1] if tracker is not None else normalize_sql(ev.sql),
+            ev.duration_ms,
+            start_ns=start_ns,
+            db_system=ev.db_vendor,
+            db_alias=ev.db_alias,
+            stack=ev.stack,
+            repeats=repeats,
+            rows=ev.rows,
+            error=ev.error,
+        )
 
     @property
     def events_by_test(self) -> Dict[str, List[QueryEvent]]:
@@ -85,10 +186,15 @@ class ProbeWrapper:
             err = repr(e)
             raise
         finally:
+            duration_ms = (time.perf_counter() - start) * 1000.0
             ev = QueryEvent()
             ev.sql = sql
             ev.params = params
-            ev.duration_ms = (time.perf_counter() - start) * 1000.0
+            # executemany batches can be large; their digest is taken on demand
+            if not many:
+                ev.params_hash = params_hash(params)
+            ev.duration_ms = duration_ms
+            ev.start_ms = self.recorder.offset_ms(start)
             ev.many = bool(many)
             ev.stack = _stack_signature(skip=1)
             ev.error = err
@@ -104,6 +210,8 @@ class ProbeWrapper:
             if conn is not None:
                 ev.db_alias = getattr(conn, "alias", ev.db_alias)
                 ev.db_vendor = getattr(conn, "vendor", ev.db_vendor)
+            if err is None:
+                ev.rows = _rowcount(context, sql, ev.db_vendor)
             self.recorder.record(ev)
 
 
@@ -1,8 +1,99 @@
+from __future__ import annotations
+
+import re
 from collections import defaultdict
-from typing import Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .utils import normalize_sql, params_hash
+
+
+_re_read = re.compile(r"^\s*\(?\s*(SELECT|WITH)\b", re.IGNORECASE)
+_re_write = re.compile(r"^\s*(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_re_where = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_re_write_table = re.compile(
+    r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+((?:[`\"\[]?[\w$]+[`\"\]]?\.)?[`\"\[]?[\w$]+[`\"\]]?)",
+    re.IGNORECASE,
+)
+_re_values_rows = re.compile(r"\)\s*,\s*\(")
+
+_UNKNOWN_FRAME = ("<unknown>", "?", 0)
 
-from .capture import QueryEvent
-from .utils import normalize_sql
+if TYPE_CHECKING:
+    from .capture import QueryEvent
+
+
+class NPlusOneTracker:
+    """Incremental N+1 clustering for one test, fed as queries are recorded.
+
+    Keeps a counter per ``(normalized SQL, top frame)`` so the test's
+    problems are known the moment it ends (see ``Recorder``), instead of
+    re-clustering every event when the report is built. ``on_cluster`` is
+    called once per cluster, as soon as it reaches ``threshold``.
+    """
+
+    def __init__(self, threshold: int = 5, on_cluster: Optional[Callable[[str, int], None]] = None) -> None:
+        self.threshold = threshold
+        self.on_cluster = on_cluster
+        self.normalized: List[str] = []
+        self._clusters: Dict[Tuple[str, Tuple[str, str, int]], Tuple[str, List[int]]] = {}
+        self._result: Optional[Tuple[List[Dict[str, Any]], Dict[int, str]]] = None
+
+    def add(self, sql: str, stack: List[Tuple[str, str, int]], db_alias: str = "default") -> int:
+        """Record the next query event; returns the size of its cluster so
+        far (0 for writes)."""
+        idx = len(self.normalized)
+        norm = normalize_sql(sql)
+        self.normalized.append(norm)
+        if _re_write.match(norm):
+            # Repeated writes are LOOP_WRITE problems
+            return 0
+        top = stack[0] if stack else _UNKNOWN_FRAME
+        cluster = self._clusters.get((norm, top))
+        if cluster is None:
+            cluster = self._clusters[(norm, top)] = (db_alias, [])
+        cluster[1].append(idx)
+        self._result = None
+        if self.on_cluster is not None and len(cluster[1]) == self.threshold:
+            self.on_cluster(norm, idx)
+        return len(cluster[1])
+
+    def finish(self) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+        """``(problems, event_tags)`` as ``classify_n_plus_one`` returns them."""
+        if self._result is not None:
+            return self._result
+        problems: List[Dict[str, Any]] = []
+        event_tags: Dict[int, str] = {}
+        tag_counter = 1
+
+        for (norm_sql, top), (db_alias, idxs) in self._clusters.items():
+            if len(idxs) >= self.threshold:
+                tag = f"n+1_cluster_{tag_counter}"
+                tag_counter += 1
+                for i in idxs:
+                    event_tags[i] = tag
+                top_file, top_func, top_line = top
+                problem_id = f"n+1:{top_file}:{top_line}"
+                # basic heuristic: if normalized SQL references a *_id column, prefer select_related
+                suggestion_kind = "select_related" if ("_id = ?" in norm_sql or "_id = $" in norm_sql) else "prefetch_related"
+                problems.append(
+                    {
+                        "id": problem_id,
+                        "type": "N+1",
+                        "evidence": {
+                            "cluster_count": len(idxs),
+                            "example_sql": norm_sql[:200],
+                            "top_stack": [top_file, top_func, top_line],
+                        },
+                        "suggestion": {
+                            "kind": suggestion_kind,
+                            "args": [],
+                        },
+                        "explain": None,
+                        "db_alias": db_alias,
+                    }
+                )
+        self._result = (problems, event_tags)
+        return self._result
 
 
 def classify_n_plus_one(
@@ -12,52 +103,367 @@ def classify_n_plus_one(
 
     Returns: (problems, event_tags) where event_tags maps event index to a tag id.
     """
-    clusters: Dict[Tuple[str, Tuple[str, str, int]], List[int]] = defaultdict(list)
-    normalized: List[str] = [normalize_sql(e.sql) for e in events]
+    tracker = NPlusOneTracker(threshold)
+    for e in events:
+        tracker.add(e.sql, e.stack, getattr(e, "db_alias", "default"))
+    return tracker.finish()
+
+
+SEQUENTIAL_MIN_ITERATIONS = 3
+SEQUENTIAL_MIN_RUN = 3
+SEQUENTIAL_MAX_BODY = 8
+
+
+
+def _find_loops(tokens: List[Tuple[Any, ...]], min_iterations: int, max_body: int) -> List[Tuple[int, int, int]]:
+    """``(start, body_len, iterations)`` of back-to-back repeats of a multi-statement body.
+
+    Scans left to right; at each position the body length covering the most
+    statements wins (the shortest on ties, so ``ABAB`` is two ``AB``).
+    """
+    loops: List[Tuple[int, int, int]] = []
+    n = len(tokens)
+    i = 0
+    while i < n:
+        best: Optional[Tuple[int, int]] = None  # (covered, body_len)
+        for p in range(2, max_body + 1):
+            if i + p * min_iterations > n:
+                break
+            if len(set(tokens[i : i + p])) < 2:
+                continue
+            run = 0
+            while i + p + run < n and tokens[i + run] == tokens[i + p + run]:
+                run += 1
+            iterations = (run + p) // p
+            if iterations >= min_iterations and (best is None or iterations * p > best[0]):
+                best = (iterations * p, p)
+        if best is None:
+            i += 1
+            continue
+        covered, p = best
+        loops.append((i, p, covered // p))
+        i += covered
+    return loops
+
+
+def _loop_site(events: List[QueryEvent]) -> Tuple[str, str, int]:
+    """Innermost function on every statement's stack: where the loop runs."""
+    stacks = [e.stack or [] for e in events]
+    for file, func, line in stacks[0]:
+        if all(any(f == file and fn == func for f, fn, _ in st) for st in stacks[1:]):
+            return (file, func, line)
+    return stacks[0][0] if stacks[0] else _UNKNOWN_FRAME
+
+
+def _sequential_problem(
+    kind: str,
+    site: Tuple[str, str, int],
+    pattern: List[str],
+    covered: List[QueryEvent],
+    iterations: int,
+) -> Dict[str, Any]:
+    file, func, line = site
+    return {
+        "id": f"sequential:{file}:{line}",
+        "type": "SEQUENTIAL_QUERIES",
+        "count": len(covered),
+        "evidence": {
+            "pattern": kind,
+            "statements": [sql[:200] for sql in pattern],
+            "iterations": iterations,
+            "queries_per_iteration": len(pattern),
+            "query_count": len(covered),
+            "db_time_ms": round(sum(e.duration_ms for e in covered), 3),
+            "top_stack": [file, func, line],
+        },
+        "suggestion": {
+            # A loop body is fetched up front; serial lookups are folded into joins
+            "kind": "prefetch_related" if kind == "loop" else "select_related",
+            "args": [],
+        },
+        "explain": None,
+        "db_alias": getattr(covered[0], "db_alias", "default"),
+    }
+
+
+def classify_sequential(
+    events: List[QueryEvent],
+    normalized: Optional[List[str]] = None,
+    min_iterations: int = SEQUENTIAL_MIN_ITERATIONS,
+    min_run: int = SEQUENTIAL_MIN_RUN,
+    max_body: int = SEQUENTIAL_MAX_BODY,
+    nplus1_tags: Optional[Dict[int, str]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """Detect N×M loops and serial lookups among a test's reads, in execution order.
+
+    * loop: a body of two or more different statements (up to ``max_body``)
+      repeated back to back at least ``min_iterations`` times, i.e. a loop
+      issuing several queries per iteration. A loop whose queries are all
+      in N+1 clusters (``nplus1_tags``) is already reported as such.
+    * serial_lookups: ``min_run`` or more consecutive filtered SELECTs with
+      distinct fingerprints issued from the same function, each a separate
+      round trip. Result rows are not captured, so whether a lookup uses
+      the one before (a waterfall) is not known.
+
+    Writes and transaction control are skipped, so they neither break nor
+    form a pattern. Returns ``(problems, event_tags)`` like
+    ``classify_n_plus_one``.
+    """
+    if normalized is None:
+        normalized = [normalize_sql(e.sql) for e in events]
+    reads = [i for i, sql in enumerate(normalized) if _re_read.match(sql)]
+    tokens = [(normalized[i], events[i].stack[0] if events[i].stack else _UNKNOWN_FRAME) for i in reads]
+
+    problems: List[Dict[str, Any]] = []
+    event_tags: Dict[int, str] = {}
+    seen_ids = set()
+    in_loop = [False] * len(reads)
+
+    def add(problem: Dict[str, Any], idxs: List[int], tag: str) -> None:
+        if problem["id"] in seen_ids:
+            problem["id"] += f":{len(problems) + 1}"
+        seen_ids.add(problem["id"])
+        problems.append(problem)
+        for i in idxs:
+            event_tags[i] = tag
+
+    for start, body, iterations in _find_loops(tokens, min_iterations, max_body):
+        span = range(start, start + body * iterations)
+        idxs = [reads[k] for k in span]
+        for k in span:
+            in_loop[k] = True
+        if nplus1_tags is not None and all(i in nplus1_tags for i in idxs):
+            continue
+        covered = [events[i] for i in idxs]
+        pattern = [normalized[i] for i in idxs[:body]]
+        add(
+            _sequential_problem("loop", _loop_site(covered[:body]), pattern, covered, iterations),
+            idxs,
+            f"seq_loop_{len(problems) + 1}",
+        )
+
+    k = 0
+    while k < len(reads):
+        if in_loop[k]:
+            k += 1
+            continue
+        run = [k]
+        fps = {tokens[k][0]}
+        site = tokens[k][1][:2]
+        nxt = k + 1
+        while nxt < len(reads) and not in_loop[nxt] and tokens[nxt][0] not in fps and tokens[nxt][1][:2] == site:
+            run.append(nxt)
+            fps.add(tokens[nxt][0])
+            nxt += 1
+        idxs = [reads[j] for j in run]
+        if len(run) >= min_run and all(_re_where.search(normalized[i]) for i in idxs):
+            covered = [events[i] for i in idxs]
+            add(
+                _sequential_problem("serial_lookups", tokens[k][1], [normalized[i] for i in idxs], covered, 1),
+                idxs,
+                f"serial_lookups_{len(problems) + 1}",
+            )
+        k = run[-1] + 1
+    return problems, event_tags
+
+
+DUPLICATE_MIN_EXECUTIONS = 2
+
+
+def classify_duplicates(
+    events: List[QueryEvent],
+    normalized: Optional[List[str]] = None,
+    min_executions: int = DUPLICATE_MIN_EXECUTIONS,
+) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """Detect reads repeated with identical SQL and parameters within a test.
+
+    Every execution after the first returns data the code already had, so
+    the repeats' DB time is what a per-request memo would save; repeats from
+    the same call site are what a cached property on the caller would save.
+    Returns ``(problems, event_tags)`` like ``classify_n_plus_one``.
+    """
+    if normalized is None:
+        normalized = [normalize_sql(e.sql) for e in events]
+    groups: Dict[Tuple[str, str, str], List[int]] = defaultdict(list)
     for idx, e in enumerate(events):
-        top = e.stack[0] if e.stack else ("<unknown>", "?", 0)
-        key = (normalized[idx], top)
-        clusters[key].append(idx)
+        if not _re_read.match(normalized[idx]):
+            continue
+        digest = getattr(e, "params_hash", "") or params_hash(e.params)
+        groups[(getattr(e, "db_alias", "default"), e.sql, digest)].append(idx)
 
     problems: List[Dict[str, Any]] = []
     event_tags: Dict[int, str] = {}
-    tag_counter = 1
-
-    for (norm_sql, top), idxs in clusters.items():
-        if len(idxs) >= threshold:
-            tag = f"n+1_cluster_{tag_counter}"
-            tag_counter += 1
-            for i in idxs:
-                event_tags[i] = tag
-            sample = events[idxs[0]]
-            top_file, top_func, top_line = sample.stack[0] if sample.stack else ("<unknown>", "?", 0)
-            problem_id = f"n+1:{top_file}:{top_line}"
-            # basic heuristic: if normalized SQL references a *_id column, prefer select_related
-            suggestion_kind = "select_related" if ("_id = ?" in norm_sql or "_id = $" in norm_sql) else "prefetch_related"
-            problems.append(
-                {
-                    "id": problem_id,
-                    "type": "N+1",
-                    "evidence": {
-                        "cluster_count": len(idxs),
-                        "example_sql": norm_sql[:200],
-                        "top_stack": [top_file, top_func, top_line],
+    seen_ids = set()
+    for (alias, _sql, digest), idxs in groups.items():
+        if len(idxs) < min_executions:
+            continue
+        by_site: Dict[Tuple[str, str, int], List[float]] = defaultdict(list)
+        for i in idxs:
+            top = tuple(events[i].stack[0]) if events[i].stack else _UNKNOWN_FRAME
+            by_site[top].append(events[i].duration_ms)
+        durations = [events[i].duration_ms for i in idxs]
+        wasted = sum(durations) - durations[0]
+        same_site = sum(sum(d) - d[0] for d in by_site.values())
+        first_site = next(iter(by_site))
+        problem_id = f"duplicate:{first_site[0]}:{first_site[2]}"
+        if problem_id in seen_ids:
+            problem_id += f":{len(problems) + 1}"
+        seen_ids.add(problem_id)
+        tag = f"duplicate_{len(problems) + 1}"
+        for i in idxs:
+            event_tags[i] = tag
+        problems.append(
+            {
+                "id": problem_id,
+                "type": "DUPLICATE_QUERY",
+                "count": len(idxs),
+                "evidence": {
+                    "executions": len(idxs),
+                    "duplicate_count": len(idxs) - 1,
+                    "wasted_ms": round(wasted, 3),
+                    "example_sql": normalized[idxs[0]][:200],
+                    "params_hash": digest,
+                    "call_sites": [
+                        {"file": f, "function": fn, "line": ln, "count": len(d)}
+                        for (f, fn, ln), d in by_site.items()
+                    ],
+                    "estimated_savings_ms": {
+                        "per_request_memoization": round(wasted, 3),
+                        "cached_property": round(same_site, 3),
                     },
-                    "suggestion": {
-                        "kind": suggestion_kind,
-                        "args": [],
-                    },
-                    "explain": None,
-                    "db_alias": getattr(sample, "db_alias", "default"),
-                }
-            )
+                    "top_stack": list(first_site),
+                },
+                "suggestion": {
+                    "kind": "cached_property" if len(by_site) == 1 else "memoize",
+                    "args": [],
+                },
+                "explain": None,
+                "db_alias": alias,
+            }
+        )
+    problems.sort(key=lambda p: -p["evidence"]["wasted_ms"])
+    return problems, event_tags
+
 
+LOOP_WRITE_BATCH_SIZE = 1000
+
+_LOOP_WRITE_SUGGESTIONS = {
+    "insert": "bulk_create",
+    "update": "bulk_update",
+    "delete": "queryset_delete",
+}
+
+
+def _single_row_write(norm_sql: str) -> bool:
+    """INSERT of one VALUES row, or any UPDATE/DELETE."""
+    if norm_sql.lstrip()[:6].upper() != "INSERT":
+        return True
+    values = norm_sql.upper().split(" VALUES ", 1)
+    return len(values) == 2 and not _re_values_rows.search(values[1])
+
+
+def _same_values_update(events: List[QueryEvent]) -> bool:
+    """UPDATEs that differ only in their last parameter (the row key)."""
+    first = events[0].params
+    if not isinstance(first, (list, tuple)) or len(first) < 2:
+        return False
+    head = list(first[:-1])
+    return all(isinstance(e.params, (list, tuple)) and list(e.params[:-1]) == head for e in events[1:])
+
+
+def classify_loop_writes(
+    events: List[QueryEvent],
+    normalized: Optional[List[str]] = None,
+    threshold: int = 5,
+    batch_size: int = LOOP_WRITE_BATCH_SIZE,
+) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """Detect single-row INSERT/UPDATE/DELETE repeated at the same call site.
+
+    The write-side twin of ``classify_n_plus_one``: each execution is one
+    round trip that a bulk operation folds into ``ceil(n / batch_size)``
+    (or one, for a set-based ``QuerySet.update``/``delete``). Statements run
+    through ``executemany`` are already batched and never reported.
+    """
+    if normalized is None:
+        normalized = [normalize_sql(e.sql) for e in events]
+    clusters: Dict[Tuple[str, str, Tuple[str, str, int]], List[int]] = defaultdict(list)
+    for idx, e in enumerate(events):
+        norm = normalized[idx]
+        if getattr(e, "many", False) or not _re_write.match(norm) or not _single_row_write(norm):
+            continue
+        top = tuple(e.stack[0]) if e.stack else _UNKNOWN_FRAME
+        clusters[(getattr(e, "db_alias", "default"), norm, top)].append(idx)
+
+    problems: List[Dict[str, Any]] = []
+    event_tags: Dict[int, str] = {}
+    for (alias, norm_sql, top), idxs in clusters.items():
+        if len(idxs) < threshold:
+            continue
+        writes = [events[i] for i in idxs]
+        kind = norm_sql.lstrip().split(None, 1)[0].lower()
+        suggestion = _LOOP_WRITE_SUGGESTIONS[kind]
+        if kind == "update" and _same_values_update(writes):
+            suggestion = "queryset_update"
+        n = len(writes)
+        after = 1 if suggestion in ("queryset_update", "queryset_delete") else -(-n // batch_size)
+        fastest = min(e.duration_ms for e in writes)
+        m = _re_write_table.match(writes[0].sql)
+        table = m.group(1).replace('"', "").replace("`", "").strip("[]") if m else None
+        tag = f"loop_write_{len(problems) + 1}"
+        for i in idxs:
+            event_tags[i] = tag
+        top_file, top_func, top_line = top
+        problems.append(
+            {
+                "id": f"loop_write:{top_file}:{top_line}",
+                "type": "LOOP_WRITE",
+                "count": n,
+                "evidence": {
+                    "statement": kind,
+                    "table": table,
+                    "cluster_count": n,
+                    "example_sql": norm_sql[:200],
+                    "db_time_ms": round(sum(e.duration_ms for e in writes), 3),
+                    "round_trips": n,
+                    "round_trips_after": after,
+                    # The fastest execution approximates the fixed per-statement cost
+                    "projected_saved_ms": round((n - after) * fastest, 3),
+                    "top_stack": [top_file, top_func, top_line],
+                },
+                "suggestion": {"kind": suggestion, "args": {"table": table}},
+                "explain": None,
+                "db_alias": alias,
+            }
+        )
     return problems, event_tags
 
 
-def classify_all(events: List[QueryEvent], nplus1_threshold: int = 5) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
-    probs, tag_map = classify_n_plus_one(events, threshold=nplus1_threshold)
+def classify_all(
+    events: List[QueryEvent],
+    nplus1_threshold: int = 5,
+    tracker: Optional[NPlusOneTracker] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+    """All event classifiers for one test.
+
+    With the ``tracker`` that saw these events during capture, N+1 clusters
+    and normalized SQL are taken from it instead of a second pass.
+    """
+    if tracker is None or len(tracker.normalized) != len(events):
+        tracker = NPlusOneTracker(nplus1_threshold)
+        for e in events:
+            tracker.add(e.sql, e.stack, getattr(e, "db_alias", "default"))
+    normalized = tracker.normalized
+    probs, tag_map = tracker.finish()
+    probs = list(probs)
     tags: Dict[int, List[str]] = defaultdict(list)
     for idx, tag in tag_map.items():
         tags[idx].append(tag)
+    for more, more_tags in (
+        classify_loop_writes(events, normalized, threshold=nplus1_threshold),
+        classify_sequential(events, normalized, nplus1_tags=tag_map),
+        classify_duplicates(events, normalized),
+    ):
+        probs.extend(more)
+        for idx, tag in more_tags.items():
+            tags[idx].append(tag)
     return probs, tags
@@ -82,6 +82,9 @@ def estimate_fix_time(
     """
     base_times = {
         "N+1": 0.5,  # Usually quick fix: add select_related/prefetch_related
+        "LOOP_WRITE": 0.5,  # Collect rows, then one bulk statement
+        "DEEP_OFFSET": 2.0,  # Keyset pagination changes the API's page tokens
+        "COUNT_STAR": 0.25,  # .exists() or an estimate instead of an exact count
         "MISSING_INDEX": 0.25,  # Index creation is usually straightforward
         "SORT_WITHOUT_INDEX": 0.5,  # Requires understanding of query pattern
         "SELECT_STAR_LARGE": 0.25,  # Usually just narrowing column selection
@@ -1,59 +1,173 @@
 import json
 import os
 import sys
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 
 _warned_explain = False
 
 
+def _warn_explain_failed() -> None:
+    global _warned_explain
+    if not _warned_explain and os.getenv("QUERYSHIELD_DEBUG"):
+        print("QueryShield: EXPLAIN not permitted or failed; continuing without plans", file=sys.stderr)
+    _warned_explain = True
+
+
+def _plan_from_row(row) -> Optional[Dict[str, Any]]:
+    if not row:
+        return None
+    # EXPLAIN FORMAT JSON returns a single row with a JSON array
+    data = row[0]
+    if isinstance(data, str):
+        data = json.loads(data)
+    return data[0].get("Plan") if isinstance(data, list) else data.get("Plan")
+
+
+class ExplainSession:
+    """Runs EXPLAIN (FORMAT JSON) statements over one PostgreSQL connection.
+
+    The statement timeout and any extra settings are applied once, in a single
+    ``set_config`` round trip, when the session opens. Plans are then issued
+    back-to-back at one round trip each, or pipelined with psycopg 3.
+
+    By default the session works on a dedicated copy of ``conn`` so the
+    settings never leak into the connection used by the tests. With
+    ``dedicated=False`` the previous values are restored on close instead.
+
+    Usage:
+        with ExplainSession(connection, timeout_ms=500) as session:
+            plans = session.explain_many([(sql, params), ...], pipeline=True)
+    """
+
+    def __init__(
+        self,
+        conn,
+        timeout_ms: int = 500,
+        settings: Optional[Dict[str, Any]] = None,
+        dedicated: bool = True,
+    ) -> None:
+        self.conn = conn
+        self.timeout_ms = int(timeout_ms)
+        self.settings: Dict[str, str] = {"statement_timeout": str(self.timeout_ms)}
+        for name, value in (settings or {}).items():
+            self.settings[name] = str(value)
+        self.dedicated = dedicated
+        self._conn = None
+        self._prev: Optional[Dict[str, str]] = None
+
+    def __enter__(self) -> "ExplainSession":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self._conn = self.conn.copy() if self.dedicated else self.conn
+        names = list(self.settings)
+        with self._conn.cursor() as cur:
+            if not self.dedicated:
+                cur.execute(
+                    "SELECT " + ", ".join("current_setting(%s)" for _ in names),
+                    names,
+                )
+                self._prev = dict(zip(names, cur.fetchone()))
+            self._set_config(cur, self.settings)
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            if self.dedicated:
+                self._conn.close()
+            elif self._prev:
+                with self._conn.cursor() as cur:
+                    self._set_config(cur, self._prev)
+        except Exception:
+            pass
+        finally:
+            self._conn = None
+            self._prev = None
+
+    @staticmethod
+    def _set_config(cur, values: Dict[str, str]) -> None:
+        params: List[str] = []
+        for name, value in values.items():
+            params.extend([name, value])
+        cur.execute(
+            "SELECT " + ", ".join("set_config(%s, %s, false)" for _ in values),
+            params,
+        )
+
+    def query(self, sql: str, params=None) -> List[Tuple[Any, ...]]:
+        """Run ``sql`` on the session's connection; rows, or [] if it returns none."""
+        with self._conn.cursor() as cur:
+            cur.execute(sql, params)
+            return list(cur.fetchall()) if cur.description else []
+
+    def explain(self, sql: str, params) -> Optional[Dict[str, Any]]:
+        """Return the root plan node for ``sql`` or None on error."""
+        try:
+            with self._conn.cursor() as cur:
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                return _plan_from_row(cur.fetchone())
+        except Exception:
+            _warn_explain_failed()
+            return None
+
+    def supports_pipeline(self) -> bool:
+        raw = getattr(self._conn, "connection", None)
+        return raw is not None and hasattr(raw, "pipeline")
+
+    def explain_many(
+        self, statements: Sequence[Tuple[str, Any]], pipeline: bool = False
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Explain several statements, in pipeline mode when requested and available.
+
+        A failure inside the pipeline (e.g. one plan hitting the timeout) aborts
+        it, in which case the statements are re-issued one by one.
+        """
+        if pipeline and statements and self.supports_pipeline():
+            try:
+                return self._explain_pipelined(statements)
+            except Exception:
+                pass
+        return [self.explain(sql, params) for sql, params in statements]
+
+    def _explain_pipelined(self, statements: Sequence[Tuple[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        raw = self._conn.connection
+        cursors = []
+        try:
+            with raw.pipeline():
+                for sql, params in statements:
+                    cur = raw.cursor()
+                    cursors.append(cur)
+                    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            return [_plan_from_row(cur.fetchone()) for cur in cursors]
+        finally:
+            for cur in cursors:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+
+
 def explain_query(conn, sql: str, params, timeout_ms: int = 500) -> Optional[Dict[str, Any]]:
     """Run EXPLAIN (FORMAT JSON) if vendor is PostgreSQL with a statement timeout.
 
+    One-shot helper on the caller's connection; prefer ``ExplainSession`` when
+    explaining more than one statement.
+
     Returns the parsed plan dict (root node) or None if unsupported or on error.
     """
     if getattr(conn, "vendor", "") != "postgresql":
         return None
     try:
-        # EXPLAIN FORMAT JSON returns a single row with a JSON array
-        with conn.cursor() as cur:
-            prev = None
-            try:
-                cur.execute("SHOW statement_timeout")
-                prev = cur.fetchone()[0]
-            except Exception:
-                prev = None
-            try:
-                local_set = False
-                try:
-                    cur.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
-                    local_set = True
-                except Exception:
-                    # Fallback to session-level set if LOCAL not allowed
-                    cur.execute(f"SET statement_timeout TO {int(timeout_ms)}")
-                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
-                row = cur.fetchone()
-            finally:
-                try:
-                    if not local_set:
-                        if prev is not None:
-                            cur.execute(f"SET statement_timeout TO {prev}")
-                        else:
-                            cur.execute("SET statement_timeout TO DEFAULT")
-                except Exception:
-                    pass
-        if not row:
-            return None
-        data = row[0]
-        if isinstance(data, str):
-            data = json.loads(data)
-        plan = data[0].get("Plan") if isinstance(data, list) else data.get("Plan")
-        return plan
+        with ExplainSession(conn, timeout_ms=timeout_ms, dedicated=False) as session:
+            return session.explain(sql, params)
     except Exception:  # pragma: no cover - defensive
-        global _warned_explain
-        if not _warned_explain and os.getenv("QUERYSHIELD_DEBUG"):
-            print("QueryShield: EXPLAIN not permitted or failed; continuing without plans", file=sys.stderr)
-        _warned_explain = True
+        _warn_explain_failed()
         return None
 
 
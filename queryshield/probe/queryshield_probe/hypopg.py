@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .explain_checks import _qpath, _quote_colspec
+from .explain_pg import ExplainSession
+from .plan_visitor import PlanWalk
+
+
+def hypopg_available(session: ExplainSession) -> bool:
+    """Whether hypothetical indexes can be created on the session's database.
+
+    Only an installed extension is used; QueryShield never creates it. Run
+    ``CREATE EXTENSION hypopg`` on the test database (e.g. in a migration)
+    to enable validation.
+    """
+    try:
+        return bool(session.query("SELECT 1 FROM pg_extension WHERE extname = 'hypopg'"))
+    except Exception:
+        return False
+
+
+def hypothetical_ddl(item: Dict[str, Any]) -> str:
+    # hypopg_create_index() accepts plain CREATE INDEX only (no CONCURRENTLY / IF NOT EXISTS)
+    cols = ", ".join(_quote_colspec(c) for c in item["columns"])
+    return f"CREATE INDEX ON {_qpath([item.get('schema') or 'public', item['table']])}({cols})"
+
+
+def _total_cost(plan: Optional[Dict[str, Any]]) -> Optional[float]:
+    if not plan or plan.get("Total Cost") is None:
+        return None
+    return float(plan["Total Cost"])
+
+
+def _uses_index(plan: Dict[str, Any], index_name: str) -> bool:
+    return any(n.get("Index Name") == index_name for n in PlanWalk(plan, "postgresql").nodes)
+
+
+def _validate_item(
+    session: ExplainSession,
+    item: Dict[str, Any],
+    statements: Dict[str, Tuple[str, Any]],
+    plans: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    rows = session.query("SELECT indexrelid, indexname FROM hypopg_create_index(%s)", [hypothetical_ddl(item)])
+    if not rows:
+        return None
+    oid, index_name = rows[0]
+    checked: List[Dict[str, Any]] = []
+    try:
+        for norm in item.get("statements") or []:
+            before = _total_cost(plans.get(norm))
+            if norm not in statements or before is None:
+                continue
+            sql, params = statements[norm]
+            after_plan = session.explain(sql, params)
+            if after_plan is None:
+                continue
+            checked.append(
+                {
+                    "sql": norm,
+                    "cost_before": before,
+                    "cost_after": _total_cost(after_plan),
+                    "uses_index": _uses_index(after_plan, index_name),
+                }
+            )
+    finally:
+        session.query("SELECT hypopg_drop_index(%s)", [oid])
+    if not checked:
+        return None
+    return {
+        "method": "hypopg",
+        "cost_before": round(sum(c["cost_before"] for c in checked), 2),
+        "cost_after": round(sum(c["cost_before"] if c["cost_after"] is None else c["cost_after"] for c in checked), 2),
+        "used_by": sum(1 for c in checked if c["uses_index"]),
+        "statements": checked,
+    }
+
+
+def validate_index_advice(
+    session: ExplainSession,
+    advice: List[Dict[str, Any]],
+    statements: Dict[str, Tuple[str, Any]],
+    plans: Dict[str, Any],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Check advised indexes against the planner using HypoPG.
+
+    Each index is created hypothetically, the statements it covers are
+    re-explained on the same connection, and the estimated total cost is
+    compared with the original plan. ``statements`` maps normalized SQL to
+    the executable ``(sql, params)``; ``plans`` holds the original plans.
+
+    Returns ``(kept, rejected)``. An index is rejected when no covered
+    statement uses it or the estimated cost does not go down; indexes that
+    could not be checked are kept without a ``validation`` entry.
+    """
+    kept: List[Dict[str, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    for item in advice:
+        if item.get("dialect", "postgresql") != "postgresql":
+            kept.append(item)
+            continue
+        try:
+            validation = _validate_item(session, item, statements, plans)
+        except Exception:
+            validation = None
+        if validation is None:
+            kept.append(item)
+            continue
+        item["validation"] = validation
+        if validation["used_by"] and validation["cost_after"] < validation["cost_before"]:
+            kept.append(item)
+        else:
+            rejected.append(item)
+    # Proven indexes first, then unchecked ones, each group still by DB time
+    kept.sort(key=lambda i: ("validation" not in i, -i.get("weight_ms", 0.0)))
+    for rank, item in enumerate(kept, start=1):
+        item["rank"] = rank
+    return kept, rejected
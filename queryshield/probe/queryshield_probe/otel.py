@@ -0,0 +1,218 @@
+"""OpenTelemetry export of recorded queries as DB client spans
+
+Each query becomes a ``CLIENT`` span carrying the standard database and
+code attributes plus QueryShield's findings, so they show up next to the
+rest of a service's traces:
+
+    db.system            vendor (``postgresql``, ``sqlite``, ...)
+    db.statement         normalized SQL; parameter values are never exported
+    db.operation         first keyword of the statement
+    code.filepath/function/lineno   innermost application frame
+    queryshield.fingerprint    stable id of the normalized statement
+    queryshield.call_site      ``function (file:line)``
+    queryshield.repeats        size of the query's N+1 cluster so far
+    queryshield.nplus1         True once that cluster reaches the threshold
+    queryshield.test           test the query ran in (probes)
+    queryshield.db_alias       database alias
+
+Spans go through the application's tracer provider when one is configured,
+otherwise through an OTLP/HTTP exporter set up from the standard
+``OTEL_EXPORTER_OTLP_*`` environment variables. Needs the ``otel`` extra
+(``pip install "queryshield-probe[otel]"``).
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, List, Optional, Sequence
+
+ATTR_FINGERPRINT = "queryshield.fingerprint"
+ATTR_CALL_SITE = "queryshield.call_site"
+ATTR_REPEATS = "queryshield.repeats"
+ATTR_NPLUS1 = "queryshield.nplus1"
+ATTR_TEST = "queryshield.test"
+ATTR_DB_ALIAS = "queryshield.db_alias"
+
+INSTRUMENTATION_NAME = "queryshield"
+
+
+def _otel_trace():
+    try:
+        from opentelemetry import trace  # type: ignore[import-not-found]
+    except ImportError as e:
+        raise RuntimeError(
+            'OpenTelemetry export needs the opentelemetry packages (pip install "queryshield-probe[otel]")'
+        ) from e
+    return trace
+
+
+def fingerprint_id(normalized_sql: str) -> str:
+    """Stable 16 hex digit id of a normalized statement."""
+    return hashlib.sha1(normalized_sql.encode("utf-8", "replace")).hexdigest()[:16]
+
+
+def call_site(frame: Sequence[Any]) -> str:
+    """``function (file:line)`` label of a captured frame."""
+    file, function, line = (list(frame) + ["", "", ""])[:3]
+    return f"{function} ({file}:{line})"
+
+
+def _sdk():
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter  # type: ignore[import-not-found]
+        from opentelemetry.sdk.resources import Resource  # type: ignore[import-not-found]
+        from opentelemetry.sdk.trace import TracerProvider  # type: ignore[import-not-found]
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor  # type: ignore[import-not-found]
+    except ImportError as e:
+        raise RuntimeError(
+            'OTLP export needs opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http (pip install "queryshield-probe[otel]")'
+        ) from e
+    return OTLPSpanExporter, Resource, TracerProvider, BatchSpanProcessor
+
+
+def check_otel() -> None:
+    """Raise if spans cannot be exported over OTLP here.
+
+    Raises:
+        RuntimeError: The ``otel`` extra is not installed
+    """
+    _otel_trace()
+    _sdk()
+
+
+def configure_otlp(endpoint: Optional[str] = None) -> Any:
+    """SDK tracer provider exporting over OTLP/HTTP in batches.
+
+    Args:
+        endpoint: Traces endpoint; defaults to ``OTEL_EXPORTER_OTLP_TRACES_ENDPOINT``
+            / ``OTEL_EXPORTER_OTLP_ENDPOINT`` or ``http://localhost:4318/v1/traces``
+
+    Returns:
+        ``opentelemetry.sdk.trace.TracerProvider``; call ``shutdown()`` to flush it
+    """
+    _otel_trace()
+    exporter, resource, tracer_provider, processor = _sdk()
+    # Resource.create() honours OTEL_SERVICE_NAME / OTEL_RESOURCE_ATTRIBUTES
+    provider = tracer_provider(resource=resource.create())
+    provider.add_span_processor(processor(exporter(endpoint=endpoint)))
+    return provider
+
+
+def current_trace_id() -> Optional[int]:
+    """Trace id of the active span, None outside a recorded trace."""
+    context = _otel_trace().get_current_span().get_span_context()
+    return context.trace_id if context.is_valid else None
+
+
+class SpanEmitter:
+    """Turns recorded queries into OpenTelemetry spans.
+
+    Queries recorded between ``start_test`` and ``end_test`` on a thread are
+    children of that test's span; others are children of whatever span is
+    active (the request span in production).
+    """
+
+    def __init__(self, tracer_provider: Any = None, *, nplus1_threshold: int = 5) -> None:
+        """
+        Args:
+            tracer_provider: Provider to export through; defaults to the
+                globally configured one, or ``configure_otlp()`` when the
+                application has none
+            nplus1_threshold: Cluster size from which spans are tagged N+1
+        """
+        trace = _otel_trace()
+        self._owned = False
+        if tracer_provider is None:
+            tracer_provider = trace.get_tracer_provider()
+            if isinstance(tracer_provider, (trace.ProxyTracerProvider, trace.NoOpTracerProvider)):
+                tracer_provider = configure_otlp()
+                self._owned = True
+        self.tracer_provider = tracer_provider
+        self.nplus1_threshold = nplus1_threshold
+        self._trace = trace
+        self._tracer = tracer_provider.get_tracer(INSTRUMENTATION_NAME)
+        self._local = threading.local()
+
+    def start_test(self, name: str, start_ns: Optional[int] = None) -> None:
+        """Open the span of a test on this thread."""
+        span = self._tracer.start_span(
+            name,
+            kind=self._trace.SpanKind.INTERNAL,
+            attributes={ATTR_TEST: name},
+            start_time=start_ns,
+        )
+        self._local.test = (name, span, self._trace.set_span_in_context(span))
+
+    def end_test(self, end_ns: Optional[int] = None) -> None:
+        """Close this thread's test span."""
+        test = getattr(self._local, "test", None)
+        self._local.test = None
+        if test is not None:
+            test[1].end(end_time=end_ns)
+
+    def query(
+        self,
+        normalized_sql: str,
+        duration_ms: float,
+        *,
+        start_ns: Optional[int] = None,
+        db_system: Optional[str] = None,
+        db_alias: Optional[str] = None,
+        stack: Optional[List[Any]] = None,
+        repeats: int = 0,
+        rows: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Emit the span of one query.
+
+        Args:
+            normalized_sql: Statement with its literals replaced
+            duration_ms: Execution time
+            start_ns: Start in ns since the epoch; defaults to now minus the duration
+            db_system: Database vendor
+            db_alias: Database alias
+            stack: Captured frames, innermost first
+            repeats: Size of the query's N+1 cluster so far (0 for writes)
+            rows: Rows returned or affected
+            error: Error the query raised
+        """
+        if start_ns is None:
+            start_ns = time.time_ns() - int(duration_ms * 1e6)
+        operation = normalized_sql.split(None, 1)[0].upper() if normalized_sql.strip() else "QUERY"
+        attributes = {
+            "db.statement": normalized_sql,
+            "db.operation": operation,
+            ATTR_FINGERPRINT: fingerprint_id(normalized_sql),
+            ATTR_REPEATS: repeats,
+            ATTR_NPLUS1: repeats >= self.nplus1_threshold,
+        }
+        if db_system:
+            attributes["db.system"] = db_system
+        if db_alias:
+            attributes[ATTR_DB_ALIAS] = db_alias
+        if stack:
+            file, function, line = (list(stack[0]) + ["", "", 0])[:3]
+            attributes["code.filepath"] = str(file)
+            attributes["code.function"] = str(function)
+            attributes["code.lineno"] = int(line or 0)
+            attributes[ATTR_CALL_SITE] = call_site(stack[0])
+        if rows is not None:
+            attributes["db.response.returned_rows"] = rows
+        test = getattr(self._local, "test", None)
+        if test is not None:
+            attributes[ATTR_TEST] = test[0]
+        span = self._tracer.start_span(
+            f"{operation} {db_alias}" if db_alias else operation,
+            context=test[2] if test is not None else None,
+            kind=self._trace.SpanKind.CLIENT,
+            attributes=attributes,
+            start_time=start_ns,
+        )
+        if error:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, error))
+        span.end(end_time=start_ns + int(duration_ms * 1e6))
+
+    def close(self) -> None:
+        """Flush and shut down the provider if this emitter configured it."""
+        if self._owned:
+            self.tracer_provider.shutdown()
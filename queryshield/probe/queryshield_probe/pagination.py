@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import linecache
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .capture import QueryEvent
+from .explain_checks import LARGE_ROWS_THRESHOLD, _hash_id, _re_order_by, _sql_clause_columns
+from .plan_visitor import PlanWalk
+from .utils import normalize_sql
+
+
+DEEP_OFFSET_THRESHOLD = 1000
+
+_VALUE = r"(%s|%\(\w+\)s|\?|:\w+|\$\d+|\d+)"
+_re_offset = re.compile(r"\bOFFSET\s+" + _VALUE, re.IGNORECASE)
+# LIMIT n, or MySQL's LIMIT offset, n
+_re_limit = re.compile(r"\bLIMIT\s+" + _VALUE + r"(?:\s*,\s*" + _VALUE + r")?", re.IGNORECASE)
+_re_positional = re.compile(r"%s|\?")
+_re_sq_string = re.compile(r"'(?:[^']|'')*'")
+_re_count_star = re.compile(
+    r"^\s*SELECT\s+COUNT\s*\(\s*(?:\*|1)\s*\)(?:\s+AS\s+\S+)?\s+FROM\b(?!.*\bGROUP\s+BY\b)",
+    re.IGNORECASE | re.DOTALL,
+)
+_re_tables = re.compile(r"\b(?:FROM|JOIN)\s+([`\"\[]?[\w$.]+[`\"\]]?)", re.IGNORECASE)
+# The calling line only tests the count for zero: ``count() > 0``,
+# ``== 0``, ``!= 0`` or a bare ``if qs.count():``
+_re_existence = re.compile(
+    r"\.count\(\)\s*(?:>|==|!=)\s*0(?![\w.])|^\s*(?:el)?if\s+(?:[\w.]|\([^()#]*\))+\.count\(\)\s*:",
+)
+
+
+def _param_value(sql: str, params: Any, token: str, pos: int) -> Optional[int]:
+    """Resolve a LIMIT/OFFSET operand: a literal or the captured parameter."""
+    if token.isdigit():
+        value: Any = token
+    elif token in ("%s", "?"):
+        if not isinstance(params, (list, tuple)):
+            return None
+        # Blank out string literals so a '?' inside them is not counted
+        blanked = _re_sq_string.sub(lambda m: "'" + " " * (len(m.group(0)) - 2) + "'", sql[:pos])
+        idx = len(_re_positional.findall(blanked))
+        if idx >= len(params):
+            return None
+        value = params[idx]
+    elif token.startswith("$"):
+        idx = int(token[1:]) - 1
+        if not isinstance(params, (list, tuple)) or not 0 <= idx < len(params):
+            return None
+        value = params[idx]
+    else:
+        name = token[2:-2] if token.startswith("%(") else token[1:]
+        if not isinstance(params, dict) or name not in params:
+            return None
+        value = params[name]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _offset_limit(sql: str, params: Any) -> Tuple[Optional[int], Optional[int], bool]:
+    """``(offset, limit, from_literal)`` of the statement's last LIMIT/OFFSET."""
+    offset = limit = None
+    literal = False
+    offsets = list(_re_offset.finditer(sql))
+    limits = list(_re_limit.finditer(sql))
+    if offsets:
+        m = offsets[-1]
+        offset = _param_value(sql, params, m.group(1), m.start(1))
+        literal = m.group(1).isdigit()
+    if limits:
+        m = limits[-1]
+        if m.group(2) and not offsets:
+            offset = _param_value(sql, params, m.group(1), m.start(1))
+            literal = m.group(1).isdigit()
+            limit = _param_value(sql, params, m.group(2), m.start(2))
+        else:
+            limit = _param_value(sql, params, m.group(1), m.start(1))
+    return offset, limit, literal
+
+
+def _tables(sql: str) -> Set[str]:
+    return {t.strip("`\"[]").split(".")[-1].lower() for t in _re_tables.findall(sql)}
+
+
+def _scanned_rows(plan: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Largest per-relation row estimate of a plan (None without estimates)."""
+    if not plan:
+        return None
+    walk = PlanWalk(plan)
+    if walk.dialect == "postgresql":
+        rows = [float(n.get("Plan Rows") or 0) for n in walk.nodes if n.get("Relation Name")]
+    elif walk.dialect == "mysql":
+        rows = [float(n.get("rows_examined_per_scan") or 0) for n in walk.of_kind("table")]
+    else:
+        return None
+    return max(rows) if rows else None
+
+
+def _limit_input_rows(plan: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Rows the planner expects to feed a PostgreSQL Limit node."""
+    if not plan:
+        return None
+    for n in PlanWalk(plan).of_kind("Limit"):
+        if n.children:
+            return float(n.children[0].get("Plan Rows") or 0)
+    return None
+
+
+def _existence_check(e: QueryEvent) -> bool:
+    for file, _func, line in e.stack or []:
+        source = linecache.getline(file, line)
+        if source:
+            return bool(_re_existence.search(source))
+    return False
+
+
+def classify_pagination(
+    events: List[QueryEvent],
+    plan_map: Optional[Dict[str, Any]] = None,
+    normalized: Optional[List[str]] = None,
+    offset_threshold: int = DEEP_OFFSET_THRESHOLD,
+    count_rows_threshold: int = LARGE_ROWS_THRESHOLD,
+) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """Detect deep OFFSET pagination and COUNT(*) used for paging or existence.
+
+    * DEEP_OFFSET: an OFFSET (literal or bound parameter) of at least
+      ``offset_threshold``. The database reads and discards the skipped
+      rows, so that share of the statement time is attributed to it.
+    * COUNT_STAR: an ungrouped ``COUNT(*)`` whose result is only compared
+      with zero on the calling line or that accompanies a LIMIT query on
+      the same tables. A plan estimating fewer than ``count_rows_threshold``
+      rows clears it; without an estimate (no plan, or SQLite, whose plans
+      have none) the statement's shape alone decides, so counts of small
+      tables are reported too.
+
+    ``plan_map`` maps normalized SQL to its EXPLAIN plan. Returns
+    ``(problems, event_tags)`` like ``classify_n_plus_one``.
+    """
+    plan_map = plan_map or {}
+    if normalized is None:
+        normalized = [normalize_sql(e.sql) for e in events]
+    problems: List[Dict[str, Any]] = []
+    event_tags: Dict[int, str] = {}
+
+    pages: Dict[str, List[Tuple[int, int, Optional[int], bool]]] = defaultdict(list)
+    counts: Dict[str, List[int]] = defaultdict(list)
+    paged_tables: List[Set[str]] = []
+    for idx, e in enumerate(events):
+        if _re_count_star.match(e.sql):
+            counts[normalized[idx]].append(idx)
+            continue
+        offset, limit, literal = _offset_limit(e.sql, e.params)
+        if limit is not None or offset is not None:
+            paged_tables.append(_tables(e.sql))
+        if offset is not None:
+            pages[normalized[idx]].append((idx, offset, limit, literal))
+
+    for norm, hits in pages.items():
+        deep = [h for h in hits if h[1] >= offset_threshold]
+        if not deep:
+            continue
+        db_time = sum(events[i].duration_ms for i, _o, _l, _lit in deep)
+        attributable = sum(
+            events[i].duration_ms * (off / (off + lim) if lim else 1.0) for i, off, lim, _lit in deep
+        )
+        sample = events[deep[0][0]]
+        tables = sorted(_tables(sample.sql))
+        tag = f"deep_offset_{len(problems) + 1}"
+        for i, _o, _l, _lit in deep:
+            event_tags[i] = tag
+        problems.append(
+            {
+                "id": f"deep_offset:{_hash_id(norm)}",
+                "type": "DEEP_OFFSET",
+                "count": len(deep),
+                "evidence": {
+                    "example_sql": norm[:200],
+                    "max_offset": max(h[1] for h in deep),
+                    "limit": deep[0][2],
+                    "offset_source": "literal" if deep[0][3] else "parameter",
+                    "executions": len(hits),
+                    "deep_executions": len(deep),
+                    "db_time_ms": round(db_time, 3),
+                    "attributable_ms": round(attributable, 3),
+                    "input_rows_estimate": _limit_input_rows(plan_map.get(norm)),
+                },
+                "suggestion": {
+                    "kind": "keyset_pagination",
+                    "args": {
+                        "table": tables[0] if len(tables) == 1 else None,
+                        "order_by": _sql_clause_columns(sample.sql, _re_order_by),
+                    },
+                },
+                "explain": None,
+                "db_alias": getattr(sample, "db_alias", "default"),
+            }
+        )
+
+    for norm, idxs in counts.items():
+        sample = events[idxs[0]]
+        tables = _tables(sample.sql)
+        rows = _scanned_rows(plan_map.get(norm))
+        if rows is not None and rows < count_rows_threshold:
+            continue
+        if any(_existence_check(events[i]) for i in idxs):
+            usage, kind = "existence", "exists"
+        elif tables and any(tables <= t for t in paged_tables):
+            usage, kind = "paging", "estimated_count"
+        else:
+            continue
+        db_time = sum(events[i].duration_ms for i in idxs)
+        tag = f"count_star_{len(problems) + 1}"
+        for i in idxs:
+            event_tags[i] = tag
+        problems.append(
+            {
+                "id": f"count_star:{_hash_id(norm)}",
+                "type": "COUNT_STAR",
+                "count": len(idxs),
+                "evidence": {
+                    "example_sql": norm[:200],
+                    "usage": usage,
+                    "executions": len(idxs),
+                    "rows_estimate": rows,
+                    "db_time_ms": round(db_time, 3),
+                    "attributable_ms": round(db_time, 3),
+                },
+                "suggestion": {
+                    "kind": kind,
+                    "args": {"table": next(iter(tables)) if len(tables) == 1 else None},
+                },
+                "explain": None,
+                "db_alias": getattr(sample, "db_alias", "default"),
+            }
+        )
+    return problems, event_tags
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Cumulative counters plus this backend's pending ones (pg_stat_get_xact_*):
+# inside a test transaction nothing has been flushed to the views yet.
+# On PostgreSQL 15+ the pending counters cover everything not yet flushed,
+# so a snapshot taken on the test connection is exact.
+STATS_SNAPSHOT_SQL = """
+SELECT 'i', s.indexrelid, s.schemaname, s.relname, s.indexrelname,
+       s.idx_scan + pg_stat_get_xact_numscans(s.indexrelid),
+       s.idx_tup_read + pg_stat_get_xact_tuples_returned(s.indexrelid),
+       i.indisunique, i.indisprimary
+FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid
+UNION ALL
+SELECT 't', s.relid, s.schemaname, s.relname, NULL,
+       s.seq_scan + pg_stat_get_xact_numscans(s.relid),
+       s.seq_tup_read + pg_stat_get_xact_tuples_returned(s.relid),
+       NULL, NULL
+FROM pg_stat_user_tables s
+"""
+
+# oid -> (kind, schema, table, index, scans, tuples_read, unique, primary)
+Snapshot = Dict[int, Tuple[Any, ...]]
+
+
+def read_stats(cur) -> Snapshot:
+    cur.execute(STATS_SNAPSHOT_SQL)
+    return {int(row[1]): (row[0], row[2], row[3], row[4], int(row[5] or 0), int(row[6] or 0), row[7], row[8])
+            for row in cur.fetchall()}
+
+
+def diff_stats(before: Snapshot, after: Snapshot) -> Dict[int, Tuple[int, int]]:
+    """(scans, tuples_read) deltas per relation; relations created in between count from zero."""
+    out: Dict[int, Tuple[int, int]] = {}
+    for oid, row in after.items():
+        prev = before.get(oid)
+        scans = row[4] - (prev[4] if prev else 0)
+        tuples = row[5] - (prev[5] if prev else 0)
+        out[oid] = (max(scans, 0), max(tuples, 0))
+    return out
+
+
+def _index_key(row: Tuple[Any, ...]) -> str:
+    return f"{row[1]}.{row[3]}"
+
+
+def _table_key(row: Tuple[Any, ...]) -> str:
+    return f"{row[1]}.{row[2]}"
+
+
+def usage_between(before: Snapshot, after: Snapshot) -> Dict[str, Dict[str, int]]:
+    """Non-zero index scans and sequential scans between two snapshots."""
+    indexes: Dict[str, int] = {}
+    seq_scans: Dict[str, int] = {}
+    for oid, (scans, _tuples) in diff_stats(before, after).items():
+        if not scans:
+            continue
+        row = after[oid]
+        if row[0] == "i":
+            indexes[_index_key(row)] = scans
+        else:
+            seq_scans[_table_key(row)] = scans
+    return {"index_scans": indexes, "seq_scans": seq_scans}
+
+
+def usage_report(
+    before: Snapshot,
+    after: Snapshot,
+    per_test: Optional[Dict[str, Dict[str, Dict[str, int]]]] = None,
+) -> Dict[str, Any]:
+    """Suite-wide index and table usage between two snapshots.
+
+    ``unused_indexes`` lists indexes no test scanned. Primary-key and unique
+    indexes are left out: they enforce constraints whether or not queries
+    read them.
+    """
+    deltas = diff_stats(before, after)
+    indexes: List[Dict[str, Any]] = []
+    tables: Dict[str, Dict[str, Any]] = {}
+    for oid, row in after.items():
+        scans, tuples = deltas[oid]
+        if row[0] == "t":
+            entry = tables.setdefault(_table_key(row), {"schema": row[1], "table": row[2], "idx_scan": 0})
+            entry.update({"seq_scan": scans, "seq_tup_read": tuples})
+            continue
+        indexes.append(
+            {
+                "schema": row[1],
+                "table": row[2],
+                "index": row[3],
+                "scans": scans,
+                "tuples_read": tuples,
+                "unique": bool(row[6]),
+                "primary": bool(row[7]),
+            }
+        )
+        entry = tables.setdefault(_table_key(row), {"schema": row[1], "table": row[2], "seq_scan": 0, "seq_tup_read": 0})
+        entry["idx_scan"] = entry.get("idx_scan", 0) + scans
+    indexes.sort(key=lambda i: (-i["scans"], i["schema"], i["index"]))
+    unused = [
+        {k: i[k] for k in ("schema", "table", "index")}
+        for i in indexes
+        if not i["scans"] and not i["unique"] and not i["primary"]
+    ]
+    return {
+        "indexes": indexes,
+        "unused_indexes": unused,
+        "tables": sorted(tables.values(), key=lambda t: (-t.get("seq_scan", 0), t["schema"], t["table"])),
+        "per_test": per_test or {},
+    }
+
+
+class StatsTracker:
+    """Snapshots usage counters around the suite and around each test.
+
+    ``snapshot`` returns a ``Snapshot`` or raises; after the first failure
+    (e.g. missing privileges) tracking stops quietly. Per-test figures are
+    only meaningful when tests run serially.
+    """
+
+    def __init__(self, snapshot: Callable[[], Snapshot], close: Optional[Callable[[], None]] = None) -> None:
+        self._snapshot = snapshot
+        self._close = close
+        self.enabled = True
+        self._first: Optional[Snapshot] = None
+        self._last: Optional[Snapshot] = None
+        self._test_start: Optional[Snapshot] = None
+        self.per_test: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def _take(self) -> Optional[Snapshot]:
+        if not self.enabled:
+            return None
+        try:
+            snap = self._snapshot()
+        except Exception:
+            self.enabled = False
+            return None
+        if self._first is None:
+            self._first = snap
+        self._last = snap
+        return snap
+
+    def start(self) -> None:
+        self._take()
+
+    def start_test(self, name: str) -> None:
+        self._test_start = self._take()
+
+    def end_test(self, name: str) -> None:
+        start, self._test_start = self._test_start, None
+        end = self._take()
+        if start is not None and end is not None:
+            usage = usage_between(start, end)
+            if usage["index_scans"] or usage["seq_scans"]:
+                self.per_test[name] = usage
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        self._take()
+        if self._close is not None:
+            try:
+                self._close()
+            except Exception:
+                pass
+        if self._first is None or self._last is None or not self.enabled:
+            return None
+        return usage_report(self._first, self._last, self.per_test)
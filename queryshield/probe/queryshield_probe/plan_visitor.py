@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Handlers registered under this kind see every node
+ANY_NODE = "*"
+
+
+def plan_dialect(plan: Dict[str, Any]) -> str:
+    if plan.get("dialect") == "sqlite":
+        return "sqlite"
+    if "select_id" in plan or "query_block" in plan:
+        return "mysql"
+    return "postgresql"
+
+
+class PlanNode:
+    """One node of a plan tree plus its position in the walk.
+
+    ``index``/``end`` delimit the node's subtree in ``PlanWalk.nodes`` so
+    descendants are a slice rather than another recursive walk.
+    """
+
+    __slots__ = ("node", "kind", "parent", "children", "depth", "index", "end", "driver")
+
+    def __init__(self, node: Dict[str, Any], kind: str, parent: Optional["PlanNode"], index: int) -> None:
+        self.node = node
+        self.kind = kind
+        self.parent = parent
+        self.children: List["PlanNode"] = []
+        self.depth = parent.depth + 1 if parent else 0
+        self.index = index
+        self.end = index + 1
+        # Rows feeding each execution of this node (MySQL nested loops), else 1
+        self.driver = 1.0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.node.get(key, default)
+
+
+def _pg_children(node: Dict[str, Any]) -> Iterable[Tuple[Dict[str, Any], str, Optional[float]]]:
+    for ch in node.get("Plans", []) or []:
+        yield ch, str(ch.get("Node Type") or ""), None
+
+
+def _sqlite_children(node: Dict[str, Any]) -> Iterable[Tuple[Dict[str, Any], str, Optional[float]]]:
+    for ch in node.get("children", []) or []:
+        yield ch, str(ch.get("op") or ""), None
+
+
+def _mysql_children(node: Dict[str, Any]) -> Iterable[Tuple[Dict[str, Any], str, Optional[float]]]:
+    # MySQL plans are nested objects keyed by operation; the key is the kind.
+    # A ``table`` inherits the driver of the nested-loop entry wrapping it.
+    for key, value in node.items():
+        if isinstance(value, dict):
+            yield value, key, None if key == "table" else 1.0
+        elif isinstance(value, list):
+            driver = 1.0
+            for item in value:
+                if not isinstance(item, dict):
+                    continue
+                yield item, key, driver
+                table = item.get("table")
+                if key == "nested_loop" and isinstance(table, dict):
+                    driver *= float(table.get("rows_produced_per_join") or 1)
+
+
+_CHILDREN = {
+    "postgresql": _pg_children,
+    "sqlite": _sqlite_children,
+    "mysql": _mysql_children,
+}
+
+_ROOT_KIND = {
+    "postgresql": lambda plan: str(plan.get("Node Type") or ""),
+    "sqlite": lambda plan: str(plan.get("op") or ""),
+    "mysql": lambda plan: "query_block",
+}
+
+
+class PlanWalk:
+    """A plan tree flattened in pre-order by a single walk.
+
+    Built once per plan; every rule then reads ``nodes``, ``of_kind`` and the
+    parent/child links instead of re-walking the tree.
+    """
+
+    def __init__(self, plan: Dict[str, Any], dialect: Optional[str] = None) -> None:
+        self.plan = plan
+        self.dialect = dialect or plan_dialect(plan)
+        self.nodes: List[PlanNode] = []
+        self._by_kind: Dict[str, List[PlanNode]] = {}
+        children = _CHILDREN[self.dialect]
+        root = self._add(plan, _ROOT_KIND[self.dialect](plan), None)
+        # Explicit stack: (node, iterator over its children)
+        stack = [(root, iter(children(plan)))]
+        while stack:
+            parent, it = stack[-1]
+            nxt = next(it, None)
+            if nxt is None:
+                parent.end = len(self.nodes)
+                stack.pop()
+                continue
+            child, kind, driver = nxt
+            pn = self._add(child, kind, parent)
+            pn.driver = parent.driver if driver is None else driver
+            stack.append((pn, iter(children(child))))
+
+    def _add(self, node: Dict[str, Any], kind: str, parent: Optional[PlanNode]) -> PlanNode:
+        pn = PlanNode(node, kind, parent, len(self.nodes))
+        self.nodes.append(pn)
+        self._by_kind.setdefault(kind, []).append(pn)
+        if parent is not None:
+            parent.children.append(pn)
+        return pn
+
+    @property
+    def root(self) -> PlanNode:
+        return self.nodes[0]
+
+    def of_kind(self, *kinds: str) -> List[PlanNode]:
+        out: List[PlanNode] = []
+        for kind in kinds:
+            out.extend(self._by_kind.get(kind, ()))
+        if len(kinds) > 1:
+            out.sort(key=lambda pn: pn.index)
+        return out
+
+    def descendants(self, pn: PlanNode) -> List[PlanNode]:
+        return self.nodes[pn.index + 1 : pn.end]
+
+
+RuleCheck = Callable[[str, PlanNode, PlanWalk], Optional[Dict[str, Any]]]
+
+
+class PlanRule:
+    """A named check run on every node whose kind is in ``kinds``.
+
+    A rule reports at most one problem per plan: the first node it matches.
+    """
+
+    __slots__ = ("name", "kinds", "check")
+
+    def __init__(self, name: str, kinds: Sequence[str], check: RuleCheck) -> None:
+        self.name = name
+        self.kinds = tuple(kinds)
+        self.check = check
+
+
+class PlanRules:
+    """Rules for one dialect, indexed by node kind for dispatch."""
+
+    def __init__(self, rules: Sequence[PlanRule]) -> None:
+        self.rules = tuple(rules)
+        self._wildcard = tuple(r for r in self.rules if ANY_NODE in r.kinds)
+        self._by_kind: Dict[str, Tuple[PlanRule, ...]] = {}
+        for rule in self.rules:
+            for kind in rule.kinds:
+                if kind != ANY_NODE:
+                    self._by_kind[kind] = self._by_kind.get(kind, ()) + (rule,)
+
+    def for_kind(self, kind: str) -> Tuple[PlanRule, ...]:
+        handlers = self._by_kind.get(kind)
+        if handlers is None:
+            return self._wildcard
+        return handlers + self._wildcard if self._wildcard else handlers
+
+    def evaluate(self, sql: str, walk: PlanWalk) -> List[Dict[str, Any]]:
+        """Dispatch every node of ``walk`` to its rules; problems in rule order."""
+        found: Dict[str, Dict[str, Any]] = {}
+        pending = len(self.rules)
+        for pn in walk.nodes:
+            for rule in self.for_kind(pn.kind):
+                if rule.name in found:
+                    continue
+                problem = rule.check(sql, pn, walk)
+                if problem:
+                    found[rule.name] = problem
+                    pending -= 1
+            if not pending:
+                break
+        return [found[r.name] for r in self.rules if r.name in found]
@@ -1,18 +1,25 @@
-import json
 import os
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from django import get_version as django_version
 from django.db import connection, connections
 
+from . import report_io
 from .capture import QueryEvent, Recorder
-from .classify import classify_all
-from .explain_pg import explain_query as explain_query_pg
+from .classify import NPlusOneTracker, classify_all
+from .explain_pg import ExplainSession, explain_query as explain_query_pg
 from .explain_mysql import explain_query as explain_query_mysql
+from .explain_sqlite import explain_query as explain_query_sqlite
 from .explain_checks import explain_classify
+from .hypopg import hypopg_available, validate_index_advice
+from .index_advisor import advise_indexes
+from .pagination import classify_pagination
+from .report_io import ReportCollector
+from .rollup import FingerprintRollup
 from .cost_analysis import generate_cost_summary
-from .utils import normalize_sql, redact_params
+from .utils import normalize_sql, params_hash, redact_params
 
 
 def _get_explain_handler(vendor: str):
@@ -21,19 +28,166 @@ def _get_explain_handler(vendor: str):
         return explain_query_pg
     elif vendor == "mysql":
         return explain_query_mysql
+    elif vendor == "sqlite":
+        return explain_query_sqlite
     return None
 
 
-def _p95(values: List[float]) -> float:
-    if not values:
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
         return 0.0
-    s = sorted(values)
-    k = max(0, int(0.95 * (len(s) - 1)))
-    return float(s[k])
+    k = max(0, int(q * (len(sorted_values) - 1)))
+    return float(sorted_values[k])
+
+
+def _rows_total(events: List[QueryEvent]) -> Optional[int]:
+    """Rows returned or affected, None when the driver reported none."""
+    rows = [e.rows for e in events if e.rows is not None]
+    return sum(rows) if rows else None
+
+
+def _top_fingerprint(normalized: List[str]) -> Optional[Dict[str, Any]]:
+    if not normalized:
+        return None
+    sql, count = Counter(normalized).most_common(1)[0]
+    return {"sql": sql[:MAX_SQL_LEN], "count": count}
 
 
 MAX_QUERIES_PER_TEST = 500
 MAX_SQL_LEN = 2048
+MAX_CONSECUTIVE_EXPLAIN_FAILURES = 5
+
+
+def _explain_candidates(recorder: Recorder, max_plans: int) -> Dict[Tuple[str, str], Tuple[str, Any]]:
+    """First (sql, params) seen for each distinct SELECT, bounded by max_plans."""
+    candidates: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+    for _tname, events in recorder.events_by_test.items():
+        for e in events:
+            if len(candidates) >= max_plans:
+                return candidates
+            sql_up = e.sql.strip().upper()
+            if not sql_up.startswith("SELECT"):
+                continue
+            key = (getattr(e, "db_alias", "default"), normalize_sql(e.sql))
+            if key not in candidates:
+                candidates[key] = (e.sql, e.params)
+    return candidates
+
+
+def _collect_plans(
+    recorder: Recorder,
+    vendor: str,
+    explain_handler,
+    *,
+    timeout_ms: int,
+    max_plans: int,
+    pipeline: bool = False,
+) -> Dict[Tuple[str, str], Any]:
+    """EXPLAIN each candidate statement once.
+
+    PostgreSQL statements go through one ``ExplainSession`` per alias so the
+    timeout is configured once per connection rather than once per plan.
+    Collection stops after a run of consecutive failures.
+    """
+    by_alias: Dict[str, List[Tuple[Tuple[str, str], Tuple[str, Any]]]] = {}
+    for key, stmt in _explain_candidates(recorder, max_plans).items():
+        by_alias.setdefault(key[0], []).append((key, stmt))
+
+    plan_cache: Dict[Tuple[str, str], Any] = {}
+    consec_null = 0
+    for alias, items in by_alias.items():
+        conn = connections[alias]
+        session = None
+        if vendor == "postgresql":
+            session = ExplainSession(conn, timeout_ms=timeout_ms)
+            try:
+                session.open()
+            except Exception:
+                # No dedicated connection available; fall back to one-shot EXPLAINs
+                session = None
+        try:
+            if session is not None and pipeline and session.supports_pipeline():
+                plans = session.explain_many([stmt for _key, stmt in items], pipeline=True)
+                plan_cache.update((key, plan) for (key, _stmt), plan in zip(items, plans))
+                continue
+            for key, (sql, params) in items:
+                if session is not None:
+                    plan = session.explain(sql, params)
+                else:
+                    plan = explain_handler(conn, sql, params, timeout_ms=timeout_ms)
+                plan_cache[key] = plan
+                if plan is None:
+                    consec_null += 1
+                    if consec_null >= MAX_CONSECUTIVE_EXPLAIN_FAILURES:
+                        return plan_cache
+                else:
+                    consec_null = 0
+        finally:
+            if session is not None:
+                session.close()
+    return plan_cache
+
+
+def _validate_advice(
+    recorder: Recorder,
+    advice: List[Dict[str, Any]],
+    plan_cache: Dict[Tuple[str, str], Any],
+    *,
+    timeout_ms: int,
+    max_plans: int,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], bool]:
+    """Validate advised indexes with HypoPG, one session per alias.
+
+    Hypothetical indexes only exist in the backend that created them, so each
+    index is created and re-explained on the same dedicated connection.
+    Returns ``(kept, rejected, validated)``.
+    """
+    statements: Dict[str, Tuple[str, Any]] = {}
+    alias_of: Dict[str, str] = {}
+    for (alias, norm), stmt in _explain_candidates(recorder, max_plans).items():
+        statements.setdefault(norm, stmt)
+        alias_of.setdefault(norm, alias)
+    plans = {norm: plan for (_alias, norm), plan in plan_cache.items()}
+    by_alias: Dict[str, List[Dict[str, Any]]] = {}
+    for item in advice:
+        first = next((n for n in item.get("statements") or [] if n in alias_of), None)
+        by_alias.setdefault(alias_of.get(first, "default"), []).append(item)
+
+    kept: List[Dict[str, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    validated = False
+    for alias, items in by_alias.items():
+        session = ExplainSession(connections[alias], timeout_ms=timeout_ms)
+        try:
+            session.open()
+        except Exception:
+            kept.extend(items)
+            continue
+        try:
+            if not hypopg_available(session):
+                kept.extend(items)
+                continue
+            validated = True
+            ok, bad = validate_index_advice(session, items, statements, plans)
+            kept.extend(ok)
+            rejected.extend(bad)
+        finally:
+            session.close()
+    for rank, item in enumerate(kept, start=1):
+        item["rank"] = rank
+    return kept, rejected, validated
+
+
+def _statement_time(recorder: Recorder) -> Dict[Tuple[str, str], List[float]]:
+    """Total duration and call count of every (db_alias, normalized SQL) in the run."""
+    totals: Dict[Tuple[str, str], List[float]] = {}
+    for events in recorder.events_by_test.values():
+        for e in events:
+            key = (getattr(e, "db_alias", "default"), normalize_sql(e.sql))
+            acc = totals.setdefault(key, [0.0, 0])
+            acc[0] += e.duration_ms
+            acc[1] += 1
+    return totals
 
 
 def _test_report(
@@ -42,20 +196,35 @@ def _test_report(
     *,
     nplus1_threshold: int,
     plan_map: Optional[Dict[str, Any]] = None,
+    tracker: Optional[NPlusOneTracker] = None,
+    wall_ms: Optional[float] = None,
 ) -> Dict[str, Any]:
-    probs, tags = classify_all(events, nplus1_threshold=nplus1_threshold)
+    if tracker is None or len(tracker.normalized) != len(events):
+        tracker = NPlusOneTracker(nplus1_threshold)
+        for e in events:
+            tracker.add(e.sql, e.stack, getattr(e, "db_alias", "default"))
+    normalized = tracker.normalized
+    probs, tags = classify_all(events, nplus1_threshold=nplus1_threshold, tracker=tracker)
+    paging, paging_tags = classify_pagination(events, plan_map, normalized)
+    probs.extend(paging)
+    for idx, tag in paging_tags.items():
+        tags[idx].append(tag)
     durations = [e.duration_ms for e in events]
+    ordered = sorted(durations)
     items: List[Dict[str, Any]] = []
     for i, e in enumerate(events[:MAX_QUERIES_PER_TEST]):
         items.append(
             {
-                "normalized_sql": normalize_sql(e.sql)[:MAX_SQL_LEN],
+                "normalized_sql": normalized[i][:MAX_SQL_LEN],
                 "duration_ms": e.duration_ms,
+                "rows": e.rows,
                 "stack": e.stack,
                 "error": e.error,
                 "params": redact_params(e.params),
+                "params_hash": e.params_hash or params_hash(e.params),
                 "tags": tags.get(i, []),
                 "db_alias": getattr(e, "db_alias", "default"),
+                "start_ms": None if e.start_ms is None else round(e.start_ms, 4),
             }
         )
     # EXPLAIN-driven problems: group by normalized SQL and attach unique problems
@@ -72,82 +241,115 @@ def _test_report(
     return {
         "name": name,
         "duration_ms": sum(durations),
+        "wall_ms": wall_ms,
         "queries_total": len(events),
-        "queries_p95_ms": _p95(durations),
+        "queries_p95_ms": _percentile(ordered, 0.95),
+        "queries_p99_ms": _percentile(ordered, 0.99),
+        "query_max_ms": ordered[-1] if ordered else 0.0,
+        "rows_total": _rows_total(events),
+        "top_fingerprint": _top_fingerprint(normalized),
         "problems": probs,
         "queries": items,
     }
 
 
-def build_report(
+def _trackers(recorder: Recorder, nplus1_threshold: int) -> Dict[str, NPlusOneTracker]:
+    """N+1 trackers of every test, reusing those maintained while the tests ran."""
+    online = recorder.trackers if recorder.nplus1_threshold == nplus1_threshold else {}
+    trackers: Dict[str, NPlusOneTracker] = {}
+    for name, events in recorder.events_by_test.items():
+        tracker = online.get(name)
+        if tracker is None or len(tracker.normalized) != len(events):
+            tracker = NPlusOneTracker(nplus1_threshold)
+            for e in events:
+                tracker.add(e.sql, e.stack, getattr(e, "db_alias", "default"))
+        trackers[name] = tracker
+    return trackers
+
+
+def iter_test_reports(
+    recorder: Recorder,
+    *,
+    nplus1_threshold: int = 5,
+    plan_cache: Optional[Dict[Tuple[str, str], Any]] = None,
+    trackers: Optional[Dict[str, NPlusOneTracker]] = None,
+    rollup: Optional[FingerprintRollup] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Per-test reports, built one at a time in recording order.
+
+    Each test's problems are also linked into ``rollup`` when given.
+    """
+    if trackers is None:
+        trackers = _trackers(recorder, nplus1_threshold)
+    for name, events in recorder.events_by_test.items():
+        # Restrict plan_map to the normalized SQLs present in this test
+        plan_map = None
+        if plan_cache is not None:
+            plan_map = {}
+            for e in events:
+                norm = normalize_sql(e.sql)
+                key = (getattr(e, "db_alias", "default"), norm)
+                if key in plan_cache:
+                    plan_map[norm] = plan_cache[key]
+        test_report = _test_report(
+            name,
+            events,
+            nplus1_threshold=nplus1_threshold,
+            plan_map=plan_map,
+            tracker=trackers.get(name),
+            wall_ms=recorder.test_wall_ms.get(name),
+        )
+        test_report["cost_analysis"] = generate_cost_summary(test_report, provider="aws_rds_postgres")
+        if rollup is not None:
+            rollup.add_problems(test_report["problems"])
+        yield test_report
+
+
+def stream_report(
     recorder: Recorder,
+    writer: Any,
     *,
     mode: str = "tests",
     budgets_file: str = "queryshield.yml",
     explain: bool = False,
     explain_timeout_ms: int = 500,
     explain_max_plans: int = 50,
+    explain_pipeline: bool = False,
+    validate_indexes: bool = True,
     nplus1_threshold: int = 5,
     run_duration_ms: Optional[float] = None,
+    index_usage: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    tests: List[Dict[str, Any]] = []
+    """Build the report and hand it to ``writer`` test by test.
+
+    ``writer`` is a ``ReportWriter`` (or anything with its ``begin`` /
+    ``write_test`` / ``end`` methods). Returns the report without its
+    tests.
+    """
     vendor = getattr(connection, "vendor", "unknown")
     
     # Determine if we should run EXPLAIN based on vendor support
-    do_explain = explain and vendor in ("postgresql", "mysql")
+    do_explain = explain and vendor in ("postgresql", "mysql", "sqlite")
     explain_handler = _get_explain_handler(vendor) if do_explain else None
     
     # Build a plan cache keyed by (db_alias, normalized SQL), bounded by explain_max_plans
     plan_cache: Dict[Tuple[str, str], Any] = {}
     explain_elapsed_ms = 0.0
-    consec_null = 0
     
     if do_explain and explain_handler:
         import time as _t
-        for _tname, events in recorder.events_by_test.items():
-            for e in events:
-                if len(plan_cache) >= explain_max_plans:
-                    break
-                sql_up = e.sql.strip().upper()
-                if not sql_up.startswith("SELECT"):
-                    continue
-                norm = normalize_sql(e.sql)
-                key = (getattr(e, "db_alias", "default"), norm)
-                if key in plan_cache:
-                    continue
-                t0 = _t.perf_counter()
-                conn = connections[getattr(e, "db_alias", "default")]
-                plan = explain_handler(conn, e.sql, e.params, timeout_ms=explain_timeout_ms)
-                explain_elapsed_ms += (_t.perf_counter() - t0) * 1000.0
-                plan_cache[key] = plan
-                if plan is None:
-                    consec_null += 1
-                    if consec_null >= 5:
-                        break
-                else:
-                    consec_null = 0
-            if len(plan_cache) >= explain_max_plans:
-                break
-    
-    for name, events in recorder.events_by_test.items():
-        # Restrict plan_map to the normalized SQLs present in this test
-        plan_map = None
-        if do_explain and explain_handler:
-            plan_map = {}
-            for e in events:
-                norm = normalize_sql(e.sql)
-                key = (getattr(e, "db_alias", "default"), norm)
-                if key in plan_cache:
-                    plan_map[norm] = plan_cache[key]
-        tests.append(
-            _test_report(
-                name,
-                events,
-                nplus1_threshold=nplus1_threshold,
-                plan_map=plan_map,
-            )
+        t0 = _t.perf_counter()
+        plan_cache = _collect_plans(
+            recorder,
+            vendor,
+            explain_handler,
+            timeout_ms=explain_timeout_ms,
+            max_plans=explain_max_plans,
+            pipeline=explain_pipeline,
         )
-    report = {
+        explain_elapsed_ms = (_t.perf_counter() - t0) * 1000.0
+    
+    header: Dict[str, Any] = {
         "version": "1",
         "project_root": os.path.abspath(os.getcwd()),
         "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
@@ -159,23 +361,66 @@ def build_report(
             "explain": do_explain,
             "explain_timeout_ms": explain_timeout_ms,
             "explain_max_plans": explain_max_plans,
+            "explain_pipeline": bool(do_explain and explain_pipeline),
             "nplus1_threshold": nplus1_threshold,
             "duration_ms": run_duration_ms,
             "explain_runtime_ms": explain_elapsed_ms,
         },
-        "tests": tests,
     }
+    # Index advice only needs the recorded events, so it is settled before
+    # any test is written and ``run.hypopg`` can go in the header
+    trailer: Dict[str, Any] = {}
+    if plan_cache:
+        totals = _statement_time(recorder)
+        advice = advise_indexes(
+            (key[1], plan, *totals.get(key, (0.0, 0))) for key, plan in plan_cache.items()
+        )
+        if advice and vendor == "postgresql" and validate_indexes:
+            advice, rejected, validated = _validate_advice(
+                recorder,
+                advice,
+                plan_cache,
+                timeout_ms=explain_timeout_ms,
+                max_plans=explain_max_plans,
+            )
+            header["run"]["hypopg"] = validated
+            if rejected:
+                trailer["index_advice_rejected"] = rejected
+        trailer["index_advice"] = advice
+    if index_usage:
+        trailer["index_usage"] = index_usage
     
-    # Add cost analysis to each test
-    for test_report in tests:
-        cost_summary = generate_cost_summary(test_report, provider="aws_rds_postgres")
-        test_report["cost_analysis"] = cost_summary
+    # Suite-wide figures per statement; the order (by total DB time) is
+    # known before the tests are written, the problems only after
+    trackers = _trackers(recorder, nplus1_threshold)
+    rollup = FingerprintRollup(MAX_SQL_LEN)
+    for name, events in recorder.events_by_test.items():
+        rollup.add_test(name, events, trackers[name].normalized)
+    plans = rollup.attach_plans(plan_cache) if plan_cache else []
+    reserve = getattr(writer, "reserve_fingerprints", None)
+    if reserve is not None:
+        reserve(rollup.order())
     
-    # Add aggregate cost analysis
-    total_queries = sum(t.get("queries_total", 0) for t in tests)
-    total_duration_ms = sum(t.get("duration_ms", 0) for t in tests)
+    writer.begin(header)
+    total_queries = 0
+    total_duration_ms = 0.0
+    for test_report in iter_test_reports(
+        recorder,
+        nplus1_threshold=nplus1_threshold,
+        plan_cache=plan_cache if do_explain and explain_handler else None,
+        trackers=trackers,
+        rollup=rollup,
+    ):
+        total_queries += test_report.get("queries_total", 0)
+        total_duration_ms += test_report.get("duration_ms", 0)
+        writer.write_test(test_report)
     
-    report["cost_analysis"] = {
+    trailer["fingerprints"] = rollup.entries()
+    if plans:
+        trailer["plans"] = plans
+    
+    # Add aggregate cost analysis
+    trailer["cost_analysis"] = {
         "total_queries": total_queries,
         "total_duration_ms": total_duration_ms,
         "provider": "aws_rds_postgres",
@@ -183,11 +428,17 @@ def build_report(
             (total_queries / 1000) * 0.25 + 25.0, 2
         ),  # AWS RDS estimate
     }
-    
-    return report
+    writer.end(trailer)
+    return {**header, **trailer}
+
+
+def build_report(recorder: Recorder, **options: Any) -> Dict[str, Any]:
+    """The whole report in memory; takes the options of ``stream_report``."""
+    collector = ReportCollector()
+    stream_report(recorder, collector, **options)
+    return collector.report
 
 
-def write_report(report: Dict[str, Any], output_path: str) -> None:
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+def write_report(report: Dict[str, Any], output_path: str, fmt: Optional[str] = None) -> None:
+    """Write a built report; ``fmt`` defaults to the one implied by the path."""
+    report_io.write_report(report, output_path, fmt)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+from typing import Any, Dict, IO, Iterator, List, Optional
+
+# Output formats. "pretty" is the indented layout of earlier releases and
+# the default for ``.json`` paths, "json" compact, "gzip" compact JSON
+# compressed, and "msgpack" a stream of MessagePack records (needs the
+# optional ``msgpack`` package).
+FORMATS = ("json", "pretty", "gzip", "msgpack")
+
+_CHUNK = 1 << 16
+_GZIP_MAGIC = b"\x1f\x8b"
+# msgpack records: [kind, payload] with kind "h" (header), "t" (test), "e" (end)
+_MSGPACK_RECORD = 0x92
+
+
+def format_for_path(path: str) -> str:
+    """Output format implied by a file name (indented JSON by default)."""
+    lower = path.lower()
+    if lower.endswith(".gz"):
+        return "gzip"
+    if lower.endswith((".msgpack", ".mpk")):
+        return "msgpack"
+    return "pretty"
+
+
+def _msgpack():
+    try:
+        import msgpack  # type: ignore[import-not-found]
+    except ImportError as e:
+        raise RuntimeError("The msgpack report format needs the msgpack package (pip install msgpack)") from e
+    return msgpack
+
+
+def check_format(fmt: str) -> None:
+    """Raise if reports cannot be written in ``fmt`` here."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown report format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    if fmt == "msgpack":
+        _msgpack()
+
+
+class ReportWriter:
+    """Writes a report incrementally: header, then one test at a time, then the trailer.
+
+    Only the test being written is held in memory. Keys of ``begin`` come
+    before ``"tests"`` in the document, keys of ``end`` after it.
+
+        with ReportWriter(path) as w:
+            w.begin({"version": "1", ...})
+            for t in tests:
+                w.write_test(t)
+            w.end({"cost_analysis": ...})
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None) -> None:
+        self.path = path
+        self.format = fmt or format_for_path(path)
+        check_format(self.format)
+        self._packer = _msgpack().Packer() if self.format == "msgpack" else None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.format == "gzip":
+            self._f: IO[Any] = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+        elif self.format == "msgpack":
+            self._f = open(path, "wb")
+        else:
+            self._f = open(path, "w", encoding="utf-8")
+        self._tests = 0
+        self._closed = False
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _dumps(self, value: Any, level: int) -> str:
+        if self.format != "pretty":
+            return json.dumps(value, separators=(",", ":"))
+        return json.dumps(value, indent=2).replace("\n", "\n" + "  " * level)
+
+    def _members(self, items: Dict[str, Any]) -> List[str]:
+        colon = ": " if self.format == "pretty" else ":"
+        return [f"{json.dumps(k)}{colon}{self._dumps(v, 1)}" for k, v in items.items()]
+
+    def begin(self, header: Dict[str, Any]) -> None:
+        header = {k: v for k, v in header.items() if k != "tests"}
+        if self._packer is not None:
+            self._f.write(self._packer.pack(["h", header]))
+        elif self.format == "pretty":
+            self._f.write("{\n  " + ",\n  ".join(self._members(header) + ['"tests": [']))
+        else:
+            self._f.write("{" + ",".join(self._members(header) + ['"tests":[']))
+
+    def write_test(self, test: Dict[str, Any]) -> None:
+        if self._packer is not None:
+            self._f.write(self._packer.pack(["t", test]))
+        elif self.format == "pretty":
+            self._f.write(("," if self._tests else "") + "\n    " + self._dumps(test, 2))
+        else:
+            self._f.write(("," if self._tests else "") + "\n" + self._dumps(test, 0))
+        self._tests += 1
+
+    def end(self, trailer: Optional[Dict[str, Any]] = None) -> None:
+        members = self._members(trailer or {}) if self._packer is None else []
+        if self._packer is not None:
+            self._f.write(self._packer.pack(["e", trailer or {}]))
+        elif self.format == "pretty":
+            self._f.write(("\n  ]" if self._tests else "]") + "".join(",\n  " + m for m in members) + "\n}\n")
+        else:
+            self._f.write("\n]" + "".join("," + m for m in members) + "}\n")
+        self.close()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._f.close()
+
+
+class ReportCollector:
+    """``ReportWriter`` stand-in that assembles the report in memory."""
+
+    def __init__(self) -> None:
+        self.report: Dict[str, Any] = {}
+
+    def begin(self, header: Dict[str, Any]) -> None:
+        self.report = dict(header)
+        self.report["tests"] = []
+
+    def write_test(self, test: Dict[str, Any]) -> None:
+        self.report["tests"].append(test)
+
+    def end(self, trailer: Optional[Dict[str, Any]] = None) -> None:
+        self.report.update(trailer or {})
+
+
+class _JsonObjectStream:
+    """Incremental parser for a top-level JSON object read from a text stream."""
+
+    def __init__(self, f: IO[str]) -> None:
+        self._f = f
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # Read at least as much as is buffered so a long value is re-parsed
+        # a logarithmic number of times
+        more = self._f.read(max(_CHUNK, len(self._buf) - self._pos))
+        self._buf = self._buf[self._pos:] + more
+        self._pos = 0
+        if not more:
+            self._eof = True
+        return bool(more)
+
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"Malformed report: expected {chars!r}, got {c!r}")
+        self._pos += 1
+        return c
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end >= len(self._buf) and not self._eof:
+                self._fill()
+                continue
+            self._pos = end
+            return value
+
+
+class ReportReader:
+    """Reads a report written in any supported format without loading all tests.
+
+    ``header`` holds the keys before ``"tests"``; ``tests()`` yields the
+    tests one at a time, after which ``trailer`` holds the keys that follow.
+    Reports written by ``json.dump`` (any indentation) are read the same way.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as probe:
+            magic = probe.read(2)
+        if magic == _GZIP_MAGIC:
+            self.format = "gzip"
+            self._f: IO[Any] = gzip.open(path, "rt", encoding="utf-8")
+        elif magic[:1] and magic[0] == _MSGPACK_RECORD:
+            self.format = "msgpack"
+            self._f = open(path, "rb")
+        else:
+            self.format = "json"
+            self._f = io.open(path, "r", encoding="utf-8")
+        self.header: Dict[str, Any] = {}
+        self.trailer: Dict[str, Any] = {}
+        self._consumed = False
+        self._pending: Optional[str] = None
+        if self.format == "msgpack":
+            self._unpacker = _msgpack().Unpacker(self._f, raw=False, strict_map_key=False)
+            kind, payload = next(self._unpacker)
+            if kind != "h":
+                raise ValueError("Malformed report: missing header record")
+            self.header = payload
+        else:
+            self._json = _JsonObjectStream(self._f)
+            self._json.expect("{")
+            self._read_members(self.header, stop_at_tests=True)
+
+    def __enter__(self) -> "ReportReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _read_members(self, into: Dict[str, Any], stop_at_tests: bool) -> None:
+        s = self._json
+        if s.peek() == "}":
+            s.expect("}")
+            return
+        while True:
+            key = s.value()
+            s.expect(":")
+            if stop_at_tests and key == "tests" and s.peek() == "[":
+                self._pending = key
+                return
+            into[key] = s.value()
+            if s.expect(",}") == "}":
+                return
+
+    def tests(self) -> Iterator[Dict[str, Any]]:
+        if self._consumed:
+            raise RuntimeError("Report tests can only be iterated once")
+        self._consumed = True
+        if self.format == "msgpack":
+            for kind, payload in self._unpacker:
+                if kind == "t":
+                    yield payload
+                elif kind == "e":
+                    self.trailer = payload
+            return
+        if self._pending is None:
+            return
+        s = self._json
+        s.expect("[")
+        if s.peek() == "]":
+            s.expect("]")
+        else:
+            while True:
+                yield s.value()
+                if s.expect(",]") == "]":
+                    break
+        if s.expect(",}") == ",":
+            self._read_members(self.trailer, stop_at_tests=False)
+
+    def read(self) -> Dict[str, Any]:
+        """The whole report as one dict."""
+        tests: List[Dict[str, Any]] = list(self.tests())
+        report = dict(self.header)
+        report["tests"] = tests
+        report.update(self.trailer)
+        return report
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def read_report(path: str) -> Dict[str, Any]:
+    with ReportReader(path) as r:
+        return r.read()
+
+
+def write_report(report: Dict[str, Any], path: str, fmt: Optional[str] = None) -> None:
+    """Write a materialized report; keys after ``"tests"`` go to the trailer."""
+    header: Dict[str, Any] = {}
+    trailer: Dict[str, Any] = {}
+    target = header
+    for k, v in report.items():
+        if k == "tests":
+            target = trailer
+            continue
+        target[k] = v
+    with ReportWriter(path, fmt) as w:
+        w.begin(header)
+        for t in report.get("tests", []) or []:
+            w.write_test(t)
+        w.end(trailer)
+
+
+def copy_report(src: str, dst: str, fmt: Optional[str] = None) -> None:
+    """Stream a report into another file, converting its format."""
+    with ReportReader(src) as r, ReportWriter(dst, fmt) as w:
+        w.begin(r.header)
+        for t in r.tests():
+            w.write_test(t)
+        w.end(r.trailer)
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .report_io import ReportReader, ReportWriter, copy_report
+
+
+# Schema v2 (schema/queryshield_report_v2.json) stores every distinct
+# normalized SQL and call site once, in report-level tables:
+#   "fingerprints": [{"sql": normalized_sql, ...rollup figures}, ...]
+#   "callsites": [[file, function, line], ...]
+#   "stacks": [[callsite id, ...], ...]
+# A test's "queries" is an object of parallel columns, one value per
+# query, with "fingerprint" and "stack" holding table ids:
+#   {"fingerprint": [0, 0, 3], "stack": [1, 1, 2], "duration_ms": [...], ...}
+# Columns whose values are all at the default (rows and error None, no
+# tags, db_alias "default") are left out. The fingerprint table doubles as
+# the v1 "fingerprints" rollup: statements come first in rollup order
+# (total DB time) and carry its figures. The tables follow the tests, so a
+# report is still written in one pass.
+SCHEMA_VERSION = "2"
+TABLES = ("fingerprints", "callsites", "stacks")
+
+_V1_QUERY_KEYS = (
+    "normalized_sql", "duration_ms", "rows", "stack", "error", "params", "params_hash", "tags", "db_alias",
+)
+_QUERY_DEFAULTS: Dict[str, Any] = {"rows": None, "error": None, "tags": [], "db_alias": "default"}
+
+
+def is_v2(report: Dict[str, Any]) -> bool:
+    """Whether a report (or just its header) uses schema v2."""
+    return str(report.get("version")) == SCHEMA_VERSION
+
+
+class Encoder:
+    """Converts v1 tests to v2, growing the fingerprint and call-site tables."""
+
+    def __init__(self) -> None:
+        self.fingerprints: List[str] = []
+        self.callsites: List[List[Any]] = []
+        self.stacks: List[List[int]] = []
+        self._rollup: Dict[str, Dict[str, Any]] = {}
+        self._fingerprint_ids: Dict[str, int] = {}
+        self._callsite_ids: Dict[Tuple[Any, ...], int] = {}
+        self._stack_ids: Dict[Tuple[int, ...], int] = {}
+
+    def fingerprint(self, sql: str) -> int:
+        i = self._fingerprint_ids.get(sql)
+        if i is None:
+            i = self._fingerprint_ids[sql] = len(self.fingerprints)
+            self.fingerprints.append(sql)
+        return i
+
+    def reserve(self, sqls: List[str]) -> None:
+        """Give these statements the first ids, in this order."""
+        for sql in sqls:
+            self.fingerprint(sql)
+
+    def describe(self, entries: List[Dict[str, Any]]) -> None:
+        """Attach rollup entries (``fingerprints`` of a v1 report) to the table."""
+        for entry in entries:
+            self.fingerprint(entry["sql"])
+            self._rollup[entry["sql"]] = entry
+
+    def stack(self, frames: Optional[List[Any]]) -> int:
+        sites: List[int] = []
+        for frame in frames or []:
+            key = tuple(frame)
+            i = self._callsite_ids.get(key)
+            if i is None:
+                i = self._callsite_ids[key] = len(self.callsites)
+                self.callsites.append(list(frame))
+            sites.append(i)
+        key = tuple(sites)
+        i = self._stack_ids.get(key)
+        if i is None:
+            i = self._stack_ids[key] = len(self.stacks)
+            self.stacks.append(sites)
+        return i
+
+    def queries(self, queries: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        columns: Dict[str, List[Any]] = {
+            "fingerprint": [self.fingerprint(q.get("normalized_sql", "")) for q in queries],
+            "stack": [self.stack(q.get("stack")) for q in queries],
+        }
+        keys: Dict[str, None] = {}
+        for q in queries:
+            keys.update(dict.fromkeys(q))
+        for k in keys:
+            if k in ("normalized_sql", "stack"):
+                continue
+            default = _QUERY_DEFAULTS.get(k)
+            values = [q.get(k, default) for q in queries]
+            if k in _QUERY_DEFAULTS and all(v == default for v in values):
+                continue
+            columns[k] = values
+        return columns
+
+    def test(self, test: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(test)
+        top = test.get("top_fingerprint")
+        if top:
+            out["top_fingerprint"] = {"fingerprint": self.fingerprint(top.get("sql", "")), "count": top.get("count", 0)}
+        if "queries" in test:
+            out["queries"] = self.queries(test.get("queries") or [])
+        return out
+
+    def tables(self) -> Dict[str, Any]:
+        return {
+            "fingerprints": [self._rollup.get(sql) or {"sql": sql} for sql in self.fingerprints],
+            "callsites": self.callsites,
+            "stacks": self.stacks,
+        }
+
+
+class Decoder:
+    """Converts v2 tests back to v1 using the report's tables."""
+
+    def __init__(self, tables: Dict[str, Any]) -> None:
+        self.entries: List[Dict[str, Any]] = tables.get("fingerprints") or []
+        self.fingerprints: List[str] = [e.get("sql", "") for e in self.entries]
+        self.callsites: List[List[Any]] = tables.get("callsites") or []
+        self.stacks: List[List[int]] = tables.get("stacks") or []
+
+    def queries(self, columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+        fingerprints = columns.get("fingerprint") or []
+        stacks = columns.get("stack") or []
+        keys = [k for k in _V1_QUERY_KEYS if k == "normalized_sql" or k in columns or k in _QUERY_DEFAULTS]
+        keys += [k for k in columns if k not in _V1_QUERY_KEYS and k != "fingerprint"]
+        out: List[Dict[str, Any]] = []
+        for i, fp in enumerate(fingerprints):
+            q: Dict[str, Any] = {}
+            for k in keys:
+                if k == "normalized_sql":
+                    q[k] = self.fingerprints[fp]
+                elif k == "stack":
+                    q[k] = [list(self.callsites[c]) for c in self.stacks[stacks[i]]]
+                elif k in columns:
+                    q[k] = columns[k][i]
+                else:
+                    q[k] = list(_QUERY_DEFAULTS[k]) if k == "tags" else _QUERY_DEFAULTS[k]
+            out.append(q)
+        return out
+
+    def rollup(self) -> List[Dict[str, Any]]:
+        """The v1 ``fingerprints`` section: table entries with rollup figures."""
+        return [e for e in self.entries if "count" in e]
+
+    def test(self, test: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(test)
+        top = test.get("top_fingerprint")
+        if top:
+            out["top_fingerprint"] = {"sql": self.fingerprints[top["fingerprint"]], "count": top.get("count", 0)}
+        if "queries" in test:
+            out["queries"] = self.queries(test.get("queries") or {})
+        return out
+
+
+class V2Writer:
+    """Wraps a ``ReportWriter`` (or ``ReportCollector``) to write schema v2."""
+
+    def __init__(self, writer: Any) -> None:
+        self.writer = writer
+        self.encoder = Encoder()
+
+    def reserve_fingerprints(self, sqls: List[str]) -> None:
+        """Called before ``begin`` with the rollup order of the statements."""
+        self.encoder.reserve(sqls)
+
+    def begin(self, header: Dict[str, Any]) -> None:
+        self.writer.begin({**header, "version": SCHEMA_VERSION})
+
+    def write_test(self, test: Dict[str, Any]) -> None:
+        self.writer.write_test(self.encoder.test(test))
+
+    def end(self, trailer: Optional[Dict[str, Any]] = None) -> None:
+        trailer = dict(trailer or {})
+        self.encoder.describe(trailer.pop("fingerprints", None) or [])
+        self.writer.end({**trailer, **self.encoder.tables()})
+
+
+def upgrade(report: Dict[str, Any]) -> Dict[str, Any]:
+    """A v1 report as v2; v2 reports are returned unchanged."""
+    if is_v2(report):
+        return report
+    encoder = Encoder()
+    encoder.describe(report.get("fingerprints") or [])
+    # The tables follow the tests, wherever the v1 rollup was
+    out: Dict[str, Any] = {}
+    for k, v in report.items():
+        if k == "tests":
+            out[k] = [encoder.test(t) for t in v or []]
+        elif k not in TABLES:
+            out[k] = v
+    out["version"] = SCHEMA_VERSION
+    out.update(encoder.tables())
+    return out
+
+
+def downgrade(report: Dict[str, Any]) -> Dict[str, Any]:
+    """A v2 report as v1; v1 reports are returned unchanged."""
+    if not is_v2(report):
+        return report
+    decoder = Decoder(report)
+    out = {k: v for k, v in report.items() if k not in TABLES}
+    out["version"] = "1"
+    out["tests"] = [decoder.test(t) for t in report.get("tests") or []]
+    if decoder.rollup():
+        out["fingerprints"] = decoder.rollup()
+    return out
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    """Read a report of either schema, in any format, as v1."""
+    with ReportReader(path) as reader:
+        return downgrade(reader.read())
+
+
+def _trailer(path: str) -> Dict[str, Any]:
+    with ReportReader(path) as reader:
+        for _ in reader.tests():
+            pass
+        return reader.trailer
+
+
+def convert_report(src: str, dst: str, version: str = SCHEMA_VERSION, fmt: Optional[str] = None) -> None:
+    """Stream a report into ``dst`` using schema ``version`` ("1" or "2").
+
+    ``src`` is read twice when the schema changes, since the tables (and
+    the rollup fixing the fingerprint order) follow the tests.
+    """
+    if version not in ("1", SCHEMA_VERSION):
+        raise ValueError(f"Unknown report schema version {version!r}")
+    with ReportReader(src) as reader:
+        source_v2 = is_v2(reader.header)
+    if source_v2 == (version == SCHEMA_VERSION):
+        copy_report(src, dst, fmt)
+        return
+    trailer = _trailer(src)
+    with ReportReader(src) as reader, ReportWriter(dst, fmt) as raw:
+        if source_v2:
+            decoder = Decoder(trailer)
+            raw.begin({**reader.header, "version": "1"})
+            for t in reader.tests():
+                raw.write_test(decoder.test(t))
+            rest = {k: v for k, v in reader.trailer.items() if k not in TABLES}
+            if decoder.rollup():
+                rest["fingerprints"] = decoder.rollup()
+            raw.end(rest)
+        else:
+            writer = V2Writer(raw)
+            writer.encoder.describe(trailer.get("fingerprints") or [])
+            writer.begin(reader.header)
+            for t in reader.tests():
+                writer.write_test(t)
+            writer.end(reader.trailer)
@@ -1,29 +1,69 @@
+import io
 import os
+import time
 import unittest
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional
 
 from django.conf import settings as dj_settings
 from django.test.runner import DiscoverRunner
 
+from ..bench import METRICS as BENCH_METRICS, TimedProbeWrapper, bench_result
 from ..capture import Recorder, install_probe
-from ..report import build_report
+from ..otel import SpanEmitter
+from ..pg_stats import Snapshot, StatsTracker, read_stats
+from ..regression import merge_timings, run_timings
+from ..report import build_report, stream_report
+from ..report_io import ReportWriter
+from ..report_v2 import SCHEMA_VERSION, V2Writer
 
 
 class _InstrumentedResult(unittest.TextTestResult):
-    def __init__(self, *args, recorder: Recorder, **kwargs):
+    def __init__(self, *args, recorder: Recorder, stats: Optional[StatsTracker] = None, **kwargs):
         super().__init__(*args, **kwargs)
         self._recorder = recorder
+        self._stats = stats
 
     def startTest(self, test):  # noqa: N802
         name = getattr(test, "id", lambda: str(test))()
         self._recorder.start_test(name)
+        if self._stats is not None:
+            self._stats.start_test(name)
         super().startTest(test)
 
     def stopTest(self, test):  # noqa: N802
+        name = getattr(test, "id", lambda: str(test))()
         try:
             super().stopTest(test)
         finally:
-            self._recorder.end_test(getattr(test, "id", lambda: str(test))())
+            if self._stats is not None:
+                self._stats.end_test(name)
+            self._recorder.end_test(name)
+
+
+def _pg_stats_snapshot() -> Snapshot:
+    """Read usage counters on the test connection itself.
+
+    The raw DB-API cursor bypasses the probe, and a savepoint keeps a failed
+    read from aborting the transaction a TestCase is running in.
+    """
+    from django.db import connection
+
+    connection.ensure_connection()
+    raw = connection.connection
+    cur = raw.cursor()
+    try:
+        if not connection.in_atomic_block:
+            return read_stats(cur)
+        cur.execute("SAVEPOINT queryshield_stats")
+        try:
+            snap = read_stats(cur)
+        except Exception:
+            cur.execute("ROLLBACK TO SAVEPOINT queryshield_stats")
+            raise
+        cur.execute("RELEASE SAVEPOINT queryshield_stats")
+        return snap
+    finally:
+        cur.close()
 
 
 def _ensure_django_setup():
@@ -41,41 +81,188 @@ def run_django_tests(
     budgets_file: str = "queryshield.yml",
     explain_timeout_ms: int = 500,
     explain_max_plans: int = 50,
+    explain_pipeline: bool = False,
     nplus1_threshold: int = 5,
+    index_usage: bool = True,
+    on_test_problems: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+    output: Optional[str] = None,
+    output_format: Optional[str] = None,
+    schema_version: str = SCHEMA_VERSION,
+    otel: bool = False,
 ) -> Dict[str, Any]:
+    """Run the suite under the probe and build its report.
+
+    With ``output`` the report is streamed to that file one test at a time
+    (``output_format`` defaults to the one implied by the file name, schema
+    ``schema_version``) and the returned report has no ``tests``. With
+    ``otel`` every test and query is also exported as an OpenTelemetry span
+    (see ``otel.SpanEmitter``).
+    """
     _ensure_django_setup()
-    recorder = Recorder()
+    from django.db import connection
+
+    spans = SpanEmitter(nplus1_threshold=nplus1_threshold) if otel else None
+    # N+1 clusters are tracked as queries are recorded; ``on_test_problems``
+    # gets each test's findings as soon as it ends
+    recorder = Recorder(nplus1_threshold=nplus1_threshold, on_test_end=on_test_problems, spans=spans)
     runner = DiscoverRunner(verbosity=1)
     runner.setup_test_environment()
     old_config = runner.setup_databases()
     try:
-        import time
+        stats = None
+        if index_usage and connection.vendor == "postgresql":
+            # Per-test figures assume the serial runner used here
+            stats = StatsTracker(_pg_stats_snapshot)
+            stats.start()
         start = time.perf_counter()
         suite = runner.build_suite()
         test_runner = runner.test_runner(  # type: ignore[call-arg]
             verbosity=1,
-            resultclass=lambda *a, **kw: _InstrumentedResult(*a, recorder=recorder, **kw),
+            resultclass=lambda *a, **kw: _InstrumentedResult(*a, recorder=recorder, stats=stats, **kw),
         )
         with install_probe(recorder):
             test_runner.run(suite)
         run_duration_ms = (time.perf_counter() - start) * 1000.0
+        usage = stats.finish() if stats is not None else None
+        # Decide on explain default based on DB vendor
+
+        do_explain = explain
+        if do_explain is None:
+            do_explain = getattr(connection, "vendor", "") in ("postgresql", "sqlite")
+        # Build the report while the test databases still exist so EXPLAIN
+        # sees the migrated schema (in-memory SQLite is gone after teardown)
+        options: Dict[str, Any] = dict(
+            mode="tests",
+            budgets_file=budgets_file,
+            explain=bool(do_explain),
+            explain_timeout_ms=explain_timeout_ms,
+            explain_max_plans=explain_max_plans,
+            explain_pipeline=explain_pipeline,
+            nplus1_threshold=nplus1_threshold,
+            run_duration_ms=run_duration_ms,
+            index_usage=usage,
+        )
+        if output is None:
+            return build_report(recorder, **options)
+        with ReportWriter(output, output_format) as raw:
+            writer = V2Writer(raw) if schema_version == SCHEMA_VERSION else raw
+            return stream_report(recorder, writer, **options)
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+        if spans is not None:
+            spans.close()
+
+
+def run_django_timings(runs: int, test_labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the suite (or ``test_labels``) ``runs`` times and pool the timings.
+
+    The test databases are set up once; EXPLAIN and usage snapshots are
+    skipped so every run measures the same work. See ``regression``.
+    """
+    _ensure_django_setup()
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        samples = []
+        for _ in range(runs):
+            recorder = Recorder()
+            # A suite drops its tests as they run; build a fresh one each time
+            suite = runner.build_suite(test_labels or None)
+            test_runner = runner.test_runner(  # type: ignore[call-arg]
+                verbosity=0,
+                stream=io.StringIO(),
+                resultclass=lambda *a, **kw: _InstrumentedResult(*a, recorder=recorder, **kw),
+            )
+            with install_probe(recorder):
+                test_runner.run(suite)
+            samples.append(run_timings(recorder.events_by_test))
+        return merge_timings(samples)
     finally:
         runner.teardown_databases(old_config)
         runner.teardown_test_environment()
-    # Decide on explain default based on DB vendor
+
+
+class _BenchResult(_InstrumentedResult):
+    """Records wall time and failures per test on top of the query events."""
+
+    def __init__(self, *args, wall_ms: Dict[str, float], errors: Dict[str, str], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wall_ms = wall_ms
+        self._errors = errors
+        self._started = 0.0
+
+    def startTest(self, test):  # noqa: N802
+        super().startTest(test)
+        self._started = time.perf_counter()
+
+    def stopTest(self, test):  # noqa: N802
+        self._wall_ms[test.id()] = (time.perf_counter() - self._started) * 1000.0
+        super().stopTest(test)
+
+    def addError(self, test, err):  # noqa: N802
+        super().addError(test, err)
+        self._errors.setdefault(test.id(), self._exc_info_to_string(err, test).strip().splitlines()[-1])
+
+    def addFailure(self, test, err):  # noqa: N802
+        super().addFailure(test, err)
+        self._errors.setdefault(test.id(), self._exc_info_to_string(err, test).strip().splitlines()[-1])
+
+
+def _iter_tests(suite) -> List[unittest.TestCase]:
+    out: List[unittest.TestCase] = []
+    for item in suite:
+        if isinstance(item, unittest.TestSuite):
+            out.extend(_iter_tests(item))
+        else:
+            out.append(item)
+    return out
+
+
+def run_django_bench(test_labels: List[str], iterations: int = 20, warmup: int = 3) -> Dict[str, Any]:
+    """Benchmark the database behaviour of individual tests.
+
+    The test databases are set up once. Each selected test then runs
+    ``warmup`` unmeasured times and ``iterations`` measured times, alone,
+    under a probe that also times its own bookkeeping. Returns a
+    ``bench.bench_result`` document.
+    """
+    _ensure_django_setup()
     from django.db import connection
 
-    do_explain = explain
-    if do_explain is None:
-        do_explain = getattr(connection, "vendor", "") == "postgresql"
-    # Build machine-readable report structure
-    return build_report(
-        recorder,
-        mode="tests",
-        budgets_file=budgets_file,
-        explain=bool(do_explain),
-        explain_timeout_ms=explain_timeout_ms,
-        explain_max_plans=explain_max_plans,
-        nplus1_threshold=nplus1_threshold,
-        run_duration_ms=run_duration_ms,
-    )
+    runner = DiscoverRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        test_ids = [t.id() for t in _iter_tests(runner.build_suite(test_labels or None))]
+        samples: Dict[str, Dict[str, List[float]]] = {}
+        errors: Dict[str, str] = {}
+        for test_id in test_ids:
+            values = samples.setdefault(test_id, {m: [] for m in BENCH_METRICS})
+            for i in range(warmup + iterations):
+                recorder = Recorder()
+                probe = TimedProbeWrapper(recorder)
+                wall_ms: Dict[str, float] = {}
+                test_runner = runner.test_runner(  # type: ignore[call-arg]
+                    verbosity=0,
+                    stream=io.StringIO(),
+                    resultclass=lambda *a, **kw: _BenchResult(
+                        *a, recorder=recorder, wall_ms=wall_ms, errors=errors, **kw
+                    ),
+                )
+                with connection.execute_wrapper(probe):
+                    test_runner.run(runner.build_suite([test_id]))
+                if i < warmup:
+                    continue
+                events = recorder.events_by_test.get(test_id, [])
+                values["queries"].append(len(events))
+                values["db_time_ms"].append(sum(e.duration_ms for e in events))
+                values["wall_ms"].append(wall_ms.get(test_id, 0.0))
+                values["probe_overhead_ms"].append(probe.overhead_ms.get(test_id, 0.0))
+        return bench_result(
+            samples, iterations=iterations, warmup=warmup, vendor=connection.vendor, errors=errors
+        )
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
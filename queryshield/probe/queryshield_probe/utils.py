@@ -1,19 +1,22 @@
+import hashlib
 import re
 from typing import Any
 
 
 _re_multispace = re.compile(r"\s+")
-_re_string_sq = re.compile(r"'([^']|''|\\')*'")
-_re_string_dq = re.compile(r'"([^"]|\"|"")*"')
-_re_numeric = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Double-quoted tokens are identifiers (PostgreSQL, SQLite, Django's
+# quoting) and are kept; only string and numeric literals are replaced
+_re_literal = re.compile(r"""("(?:[^"]|"")*")|'(?:[^']|''|\\')*'|\b\d+(?:\.\d+)?\b""")
 _re_in_list = re.compile(r"IN\s*\((\s*\?(?:\s*,\s*\?)+\s*)\)", re.IGNORECASE)
 
 
+def _literal(m: "re.Match[str]") -> str:
+    return m.group(1) or "?"
+
+
 def normalize_sql(sql: str) -> str:
     s = sql.strip()
-    s = _re_string_sq.sub("?", s)
-    s = _re_string_dq.sub("?", s)
-    s = _re_numeric.sub("?", s)
+    s = _re_literal.sub(_literal, s)
     s = _re_in_list.sub("IN (?)", s)
     s = _re_multispace.sub(" ", s)
     return s
@@ -33,3 +36,9 @@ def _shape(v: Any) -> Any:
 def redact_params(params: Any) -> Any:
     return _shape(params)
 
+
+def params_hash(params: Any) -> str:
+    """Stable digest of a statement's parameters; the values are not kept."""
+    if isinstance(params, dict):
+        params = sorted(params.items(), key=lambda kv: str(kv[0]))
+    return hashlib.blake2b(repr(params).encode("utf-8", "replace"), digest_size=8).hexdigest()
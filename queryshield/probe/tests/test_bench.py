@@ -0,0 +1,54 @@
+import time
+import unittest
+
+from queryshield_probe.bench import TimedProbeWrapper, bench_result, compare_bench, summarize
+from queryshield_probe.capture import Recorder
+
+
+def _result(db_times, queries=5):
+    samples = {"t": {"queries": [queries] * len(db_times), "db_time_ms": db_times,
+                     "wall_ms": [d * 2 for d in db_times], "probe_overhead_ms": [0.1] * len(db_times)}}
+    return bench_result(samples, iterations=len(db_times), warmup=1)
+
+
+class BenchTest(unittest.TestCase):
+    def test_summary_keeps_samples(self):
+        s = summarize([3.0, 1.0, 2.0])
+        assert (s["n"], s["min"], s["median"], s["max"]) == (3, 1.0, 2.0, 3.0)
+        assert s["samples"] == [3.0, 1.0, 2.0]
+        assert summarize([]) == {"n": 0, "samples": []}
+
+    def test_result_is_comparable(self):
+        before = _result([10.0 + i * 0.1 for i in range(10)])
+        assert before["kind"] == "bench" and before["tests"]["t"]["db_time_ms"]["n"] == 10
+        rows = {r["metric"]: r for r in compare_bench(before, _result([20.0 + i * 0.1 for i in range(10)], queries=6))}
+        assert rows["db_time_ms"]["significant"] and rows["db_time_ms"]["change_pct"] == 95.7
+        assert rows["queries"]["significant"] and rows["queries"]["p_value"] is None
+        assert not rows["probe_overhead_ms"]["significant"]
+        same = compare_bench(before, _result([10.0 + i * 0.1 for i in range(10)]))
+        assert not any(r["significant"] for r in same)
+
+    def test_probe_overhead_excludes_query_time(self):
+        recorder = Recorder()
+        probe = TimedProbeWrapper(recorder)
+
+        def execute(sql, params, many, context):
+            time.sleep(0.02)
+
+        recorder.start_test("t")
+        start = time.perf_counter()
+        probe(execute, "SELECT 1", None, False, {})
+        first_ms = probe.overhead_ms["t"]
+        probe(execute, "SELECT 2", None, False, {})
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        recorder.end_test("t")
+        recorder.start_test("u")
+        probe(lambda *args: None, "SELECT 3", None, False, {})
+        recorder.end_test("u")
+        # Both 20 ms sleeps are DB time, not probe overhead
+        assert 0.0 < first_ms < probe.overhead_ms["t"] < elapsed_ms - 40.0 + 1.0
+        assert set(probe.overhead_ms) == {"t", "u"} and probe.overhead_ms["u"] > 0.0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,7 @@ import os
 import tempfile
 import unittest
 
-from queryshield_probe.budgets import check_budgets
+from queryshield_probe.budgets import check_budgets, iter_violations
 from queryshield_probe.cost_analysis import (
     calculate_monthly_cost,
     estimate_fix_time,
@@ -27,6 +27,82 @@ class BudgetsTests(unittest.TestCase):
         violations = check_budgets(budgets, report)
         assert not violations
 
+    def test_overrides_by_glob_and_module_prefix(self):
+        budgets = {
+            "defaults": {"max_queries": 1},
+            "tests": {
+                "app.tests.test_books": {"max_queries": 10},
+                "*::test_slow_*": {"max_queries": 20},
+                "app.tests.test_books.BooksTest.test_list": {"max_queries": 3},
+            },
+        }
+        report = {"tests": [
+            {"name": "app.tests.test_books.BooksTest.test_list", "queries_total": 4},
+            {"name": "app.tests.test_books.BooksTest.test_detail", "queries_total": 4},
+            {"name": "app.tests.test_books_extra.T.test_x", "queries_total": 4},
+            {"name": "tests/test_api.py::test_slow_export", "queries_total": 15},
+        ]}
+        violations = check_budgets(budgets, report)
+        assert violations == [
+            "app.tests.test_books.BooksTest.test_list: queries_total 4 > max_queries 3",
+            "app.tests.test_books_extra.T.test_x: queries_total 4 > max_queries 1",
+        ]
+
+    def test_latency_rows_and_cluster_limits(self):
+        budgets = {"defaults": {
+            "max_p99_ms": 50, "max_query_ms": 80, "max_rows": 1000,
+            "max_queries_per_fingerprint": 5, "max_nplus1_cluster": 8,
+        }}
+        test = {
+            "name": "t", "queries_total": 12, "queries_p95_ms": 10.0, "queries_p99_ms": 60.0,
+            "query_max_ms": 60.0, "rows_total": 5000,
+            "top_fingerprint": {"sql": "SELECT * FROM authors WHERE id = ?", "count": 10},
+            "problems": [{"id": "n+1:v.py:3", "type": "N+1", "evidence": {"cluster_count": 10}}],
+        }
+        violations = check_budgets(budgets, iter([test]))
+        assert [v.split(" > ")[1].split()[0] for v in violations] == [
+            "max_p99_ms", "max_rows", "max_queries_per_fingerprint", "max_nplus1_cluster",
+        ]
+        assert "SELECT * FROM authors" in violations[2]
+        # Ignored clusters do not count towards the limit
+        budgets["tests"] = {"t": {"ignore": ["n+1:*"]}}
+        assert not any("max_nplus1_cluster" in v for v in check_budgets(budgets, {"tests": [test]}))
+
+    def test_limits_fall_back_to_query_list(self):
+        test = {"name": "t", "queries_total": 3, "queries": [
+            {"normalized_sql": "SELECT ?", "duration_ms": 1.0},
+            {"normalized_sql": "SELECT ?", "duration_ms": 2.0},
+            {"normalized_sql": "SELECT x", "duration_ms": 90.0},
+        ]}
+        violations = check_budgets({"defaults": {"max_query_ms": 50, "max_queries_per_fingerprint": 1}}, {"tests": [test]})
+        assert violations == [
+            "t: query_max_ms 90.0 > max_query_ms 50",
+            "t: fingerprint_max_count 2 > max_queries_per_fingerprint 1",
+        ]
+
+    def test_v2_tests_are_checked_from_their_aggregates(self):
+        budgets = {"defaults": {"max_p99_ms": 50, "max_queries_per_fingerprint": 2}}
+        test = {
+            "name": "t", "queries_total": 3, "queries_p99_ms": 60.0,
+            "top_fingerprint": {"fingerprint": 1, "count": 3},
+            "queries": {"fingerprint": [1, 1, 1], "stack": [0, 0, 0], "duration_ms": [1.0, 1.0, 60.0]},
+        }
+        tables = []
+
+        def statements():
+            assert tables, "statements are looked up after the tests are read"
+            return tables
+
+        def tests():
+            yield test
+            tables.extend(["SELECT ?", "SELECT * FROM books WHERE id = ?"])
+
+        assert check_budgets(budgets, tests(), statements=statements) == [
+            "t: queries_p99_ms 60.0 > max_p99_ms 50",
+            "t: fingerprint_max_count 3 > max_queries_per_fingerprint 2 (SELECT * FROM books WHERE id = ?)",
+        ]
+        assert list(iter_violations(budgets, [test]))[1].endswith("(fingerprint #1)")
+
     def test_caps_truncate_queries(self):
         # Indirectly validate by constructing a report via private function
         from queryshield_probe.report import _test_report
@@ -40,6 +116,9 @@ class BudgetsTests(unittest.TestCase):
         rep = _test_report("t", evs, nplus1_threshold=999, plan_map=None)
         assert rep["queries_total"] == 600
         assert len(rep["queries"]) == 500
+        # Aggregates cover every query, not only the kept ones
+        assert rep["top_fingerprint"] == {"sql": "SELECT ?", "count": 600}
+        assert rep["query_max_ms"] == 1.0 and rep["rows_total"] is None
 
 
 class ExitCodesTests(unittest.TestCase):
@@ -64,6 +143,25 @@ class ExitCodesTests(unittest.TestCase):
             r = runner.invoke(app, ["budget-check", "--budgets", budgets, "--report", report])  # type: ignore
             assert r.exit_code == 2
 
+    def test_budget_check_v2_report_names_the_statement(self):
+        from typer.testing import CliRunner
+        from queryshield_cli.main import app
+        from queryshield_probe.report_v2 import upgrade
+        with tempfile.TemporaryDirectory() as td:
+            budgets = os.path.join(td, "b.yml")
+            report = os.path.join(td, "r.json")
+            with open(budgets, "w") as f:
+                f.write("defaults:\n  max_queries_per_fingerprint: 2\n")
+            sql = 'SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = ?'
+            test = {"name": "t", "queries_total": 3, "top_fingerprint": {"sql": sql, "count": 3}, "problems": []}
+            with open(report, "w") as f:
+                json.dump(upgrade({"version": "1", "tests": [test]}), f)
+            args = ["budget-check", "--budgets", budgets, "--report", report, "--json-out"]
+            r = CliRunner().invoke(app, args, env={"COLUMNS": "400"})
+            assert r.exit_code == 2
+            violations = json.loads(r.output[r.output.index('{"violations"'):])["violations"]
+            assert violations == [f"t: fingerprint_max_count 3 > max_queries_per_fingerprint 2 ({sql})"]
+
     def test_budget_check_ok_exit_0(self):
         from typer.testing import CliRunner
         from queryshield_cli.main import app
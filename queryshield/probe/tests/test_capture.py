@@ -0,0 +1,49 @@
+import time
+import unittest
+from unittest import mock
+
+from queryshield_probe.capture import ProbeWrapper, Recorder
+
+
+class ProbeTimelineTest(unittest.TestCase):
+    def test_queries_record_offsets_from_test_start(self):
+        recorder = Recorder()
+        probe = ProbeWrapper(recorder)
+        recorder.start_test("t")
+        time.sleep(0.01)
+        probe(lambda *args: None, "SELECT 1", None, False, {})
+        probe(lambda *args: None, "SELECT 2", None, False, {})
+        recorder.end_test("t")
+        first, second = recorder.events_by_test["t"]
+        assert 10.0 <= first.start_ms <= second.start_ms <= recorder.test_wall_ms["t"]
+
+    def test_params_digest_is_not_counted_as_query_time(self):
+        recorder = Recorder()
+        probe = ProbeWrapper(recorder)
+        recorder.start_test("t")
+
+        def slow_hash(params):
+            time.sleep(0.05)
+            return "digest"
+
+        with mock.patch("queryshield_probe.capture.params_hash", slow_hash):
+            probe(lambda *args: None, "SELECT %s", (1,), False, {})
+        recorder.end_test("t")
+        (ev,) = recorder.events_by_test["t"]
+        assert ev.params_hash == "digest"
+        assert ev.duration_ms < 50.0
+
+    def test_executemany_params_are_not_hashed_on_the_hot_path(self):
+        recorder = Recorder()
+        probe = ProbeWrapper(recorder)
+        recorder.start_test("t")
+        with mock.patch("queryshield_probe.capture.params_hash") as digest:
+            probe(lambda *args: None, "INSERT INTO t VALUES (%s)", [(1,), (2,)], True, {})
+        recorder.end_test("t")
+        digest.assert_not_called()
+        (ev,) = recorder.events_by_test["t"]
+        assert ev.many and ev.params_hash == ""
+
+
+if __name__ == "__main__":
+    unittest.main()
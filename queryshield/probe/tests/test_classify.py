@@ -0,0 +1,206 @@
+import unittest
+
+from queryshield_probe.capture import QueryEvent, Recorder
+from queryshield_probe.classify import (
+    NPlusOneTracker,
+    classify_all,
+    classify_duplicates,
+    classify_loop_writes,
+    classify_n_plus_one,
+    classify_sequential,
+)
+from queryshield_probe.utils import normalize_sql, params_hash
+
+
+def _ev(sql, line=10, func="books_view", ms=1.0, params=None):
+    e = QueryEvent()
+    e.sql = sql
+    e.params = params
+    e.params_hash = params_hash(params)
+    e.duration_ms = ms
+    e.stack = [("app/views.py", func, line), ("app/tests.py", "test_view", 5)]
+    return e
+
+
+class NormalizeSqlTest(unittest.TestCase):
+    def test_quoted_identifiers_are_kept(self):
+        books = normalize_sql('SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = 3')
+        authors = normalize_sql('SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."author_id" = 3')
+        assert books == 'SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = ?'
+        assert books != authors
+        assert normalize_sql("SELECT * FROM t WHERE a = 'x' AND b IN (1, 2.5)") == "SELECT * FROM t WHERE a = ? AND b IN (?)"
+
+
+class NPlusOneTrackerTest(unittest.TestCase):
+    def _events(self):
+        events = [_ev("SELECT * FROM books")]
+        events += [_ev(f"SELECT * FROM authors WHERE id = {i}", 12) for i in range(6)]
+        events += [_ev(f"INSERT INTO log VALUES ({i})", 20) for i in range(6)]
+        return events
+
+    def test_online_clusters_match_batch_classification(self):
+        events = self._events()
+        fired = []
+        tracker = NPlusOneTracker(5, on_cluster=lambda norm, idx: fired.append((norm, idx)))
+        for e in events:
+            tracker.add(e.sql, e.stack)
+        assert tracker.finish() == classify_n_plus_one(events, threshold=5)
+        # Called once, when the fifth lookup was recorded
+        assert fired == [("SELECT * FROM authors WHERE id = ?", 5)]
+        assert classify_all(events, tracker=tracker) == classify_all(events)
+
+    def test_recorder_reports_problems_when_test_ends(self):
+        seen = {}
+        recorder = Recorder(nplus1_threshold=5, on_test_end=lambda name, probs: seen.setdefault(name, probs))
+        recorder.start_test("t1")
+        for e in self._events():
+            recorder.record(e)
+        assert not seen
+        recorder.end_test("t1")
+        assert [p["type"] for p in seen["t1"]] == ["N+1"]
+        assert seen["t1"][0]["evidence"]["cluster_count"] == 6
+        assert recorder.trackers["t1"].finish()[0] is seen["t1"]
+
+
+class SequentialQueriesTest(unittest.TestCase):
+    def test_loop_with_several_statements_per_iteration(self):
+        events = [_ev("SELECT * FROM books")]
+        for i in range(4):
+            events += [
+                _ev(f"SELECT * FROM authors WHERE id = {i}", 12),
+                _ev("SAVEPOINT s1", 13),
+                _ev(f"SELECT * FROM publishers WHERE id = {i}", 14, ms=2.0),
+            ]
+        problems, tags = classify_sequential(events)
+        assert len(problems) == 1
+        p = problems[0]
+        assert p["type"] == "SEQUENTIAL_QUERIES" and p["count"] == 8
+        ev = p["evidence"]
+        assert ev["pattern"] == "loop"
+        assert ev["iterations"] == 4 and ev["queries_per_iteration"] == 2
+        assert ev["statements"] == ["SELECT * FROM authors WHERE id = ?", "SELECT * FROM publishers WHERE id = ?"]
+        assert ev["db_time_ms"] == 12.0
+        assert ev["top_stack"] == ["app/views.py", "books_view", 12]
+        # The initial listing and the savepoints are not part of the loop
+        assert 0 not in tags and 2 not in tags and len(tags) == 8
+
+    def test_serial_lookups_from_one_function(self):
+        events = [
+            _ev("SELECT * FROM users WHERE id = 1", 30, "profile"),
+            _ev("SELECT * FROM profiles WHERE user_id = 1", 31, "profile"),
+            _ev("SELECT * FROM orders WHERE user_id = 1", 32, "profile"),
+            _ev("SELECT * FROM coupons WHERE code = 'x'", 40, "checkout"),
+        ]
+        problems, tags = classify_sequential(events)
+        assert [p["evidence"]["pattern"] for p in problems] == ["serial_lookups"]
+        assert problems[0]["count"] == 3
+        assert problems[0]["evidence"]["top_stack"][1] == "profile"
+        assert sorted(tags) == [0, 1, 2]
+
+    def test_django_quoted_serial_lookups_and_loop(self):
+        user = 'SELECT "auth_user"."id" FROM "auth_user" WHERE "auth_user"."id" = %s'
+        profile = 'SELECT "app_profile"."id" FROM "app_profile" WHERE "app_profile"."user_id" = %s'
+        orders = 'SELECT "app_order"."id" FROM "app_order" WHERE "app_order"."user_id" = %s'
+        lookups = [_ev(user, 30, "profile"), _ev(profile, 31, "profile"), _ev(orders, 32, "profile")]
+        problems, tags = classify_sequential(lookups)
+        assert [(p["evidence"]["pattern"], p["count"]) for p in problems] == [("serial_lookups", 3)]
+        assert problems[0]["evidence"]["statements"] == [user, profile, orders]
+
+        author = 'SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = %s'
+        publisher = 'SELECT "app_publisher"."id" FROM "app_publisher" WHERE "app_publisher"."id" = %s'
+        loop = [e for _ in range(4) for e in (_ev(author, 12), _ev(publisher, 14))]
+        problems, tags = classify_sequential(loop)
+        assert [p["evidence"]["pattern"] for p in problems] == ["loop"]
+        assert (problems[0]["evidence"]["iterations"], problems[0]["evidence"]["queries_per_iteration"]) == (4, 2)
+        assert len(tags) == 8
+
+    def test_short_or_unfiltered_sequences_are_ignored(self):
+        loop_twice = [_ev("SELECT * FROM a WHERE id = 1"), _ev("SELECT * FROM b WHERE id = 1")] * 2
+        listings = [_ev("SELECT * FROM a"), _ev("SELECT * FROM b"), _ev("SELECT * FROM c")]
+        assert classify_sequential(loop_twice) == ([], {})
+        assert classify_sequential(listings) == ([], {})
+
+    def test_classify_all_includes_sequential_problems(self):
+        events = [_ev(f"SELECT * FROM authors WHERE id = {i}", 12 + i % 3) for i in range(9)]
+        problems, tags = classify_all(events)
+        assert [p["type"] for p in problems] == ["SEQUENTIAL_QUERIES"]
+        assert problems[0]["evidence"]["iterations"] == 3
+        assert tags[0] == ["seq_loop_1"]
+
+    def test_loops_already_reported_as_n_plus_one_are_skipped(self):
+        author = "SELECT * FROM authors WHERE id = %s"
+        publisher = "SELECT * FROM publishers WHERE id = %s"
+        events = [e for i in range(6) for e in (_ev(author, 12, params=(i,)), _ev(publisher, 14, params=(i,)))]
+        problems, tags = classify_all(events, nplus1_threshold=5)
+        assert sorted(p["type"] for p in problems) == ["N+1", "N+1"]
+        assert not any(t.startswith("seq_loop") for ts in tags.values() for t in ts)
+        # Below the N+1 threshold the loop is the only report
+        problems, _tags = classify_all(events[:8], nplus1_threshold=5)
+        assert [p["type"] for p in problems] == ["SEQUENTIAL_QUERIES"]
+
+
+class DuplicateQueriesTest(unittest.TestCase):
+    SQL = 'SELECT * FROM "app_settings" WHERE "key" = %s'
+
+    def test_identical_sql_and_params_are_duplicates(self):
+        events = [
+            _ev(self.SQL, 20, "get_setting", ms=2.0, params=("theme",)),
+            _ev(self.SQL, 20, "get_setting", ms=3.0, params=("theme",)),
+            _ev(self.SQL, 20, "get_setting", ms=2.0, params=("locale",)),
+            _ev(self.SQL, 44, "render_header", ms=1.0, params=("theme",)),
+            _ev("UPDATE app_settings SET value = 'x'", 50, "save", params=None),
+            _ev("UPDATE app_settings SET value = 'x'", 50, "save", params=None),
+        ]
+        problems, tags = classify_duplicates(events)
+        assert len(problems) == 1
+        p = problems[0]
+        assert p["type"] == "DUPLICATE_QUERY"
+        ev = p["evidence"]
+        assert (ev["executions"], ev["duplicate_count"]) == (3, 2)
+        assert ev["wasted_ms"] == 4.0
+        assert ev["estimated_savings_ms"] == {"per_request_memoization": 4.0, "cached_property": 3.0}
+        assert [(c["function"], c["count"]) for c in ev["call_sites"]] == [("get_setting", 2), ("render_header", 1)]
+        assert ev["params_hash"] == params_hash(("theme",))
+        assert p["suggestion"]["kind"] == "memoize"
+        assert sorted(tags) == [0, 1, 3]
+
+    def test_param_values_are_not_reported(self):
+        events = [_ev(self.SQL, params=("s3cr3t",)) for _ in range(2)]
+        problems, _tags = classify_all(events)
+        assert [p["type"] for p in problems] == ["DUPLICATE_QUERY"]
+        assert "s3cr3t" not in repr(problems)
+
+
+class LoopWriteTest(unittest.TestCase):
+    def test_repeated_inserts_suggest_bulk_create(self):
+        sql = 'INSERT INTO "app_book" ("title", "author_id") VALUES (%s, %s) RETURNING "app_book"."id"'
+        events = [_ev(sql, 60, "import_books", ms=1.0 + i, params=(f"t{i}", 1)) for i in range(6)]
+        problems, tags = classify_all(events)
+        assert [p["type"] for p in problems] == ["LOOP_WRITE"]
+        p = problems[0]
+        assert p["suggestion"] == {"kind": "bulk_create", "args": {"table": "app_book"}}
+        ev = p["evidence"]
+        assert ev["statement"] == "insert" and ev["table"] == "app_book"
+        assert (ev["round_trips"], ev["round_trips_after"]) == (6, 1)
+        assert ev["projected_saved_ms"] == 5.0
+        assert ev["db_time_ms"] == 21.0
+        assert all(tags[i] == ["loop_write_1"] for i in range(6))
+
+    def test_update_kind_depends_on_set_values(self):
+        sql = 'UPDATE "app_book" SET "price" = %s WHERE "app_book"."id" = %s'
+        same = [_ev(sql, 70, params=(10, i)) for i in range(5)]
+        varying = [_ev(sql, 71, params=(i, i)) for i in range(5)]
+        problems, _tags = classify_loop_writes(same + varying)
+        kinds = {p["evidence"]["top_stack"][2]: p["suggestion"]["kind"] for p in problems}
+        assert kinds == {70: "queryset_update", 71: "bulk_update"}
+        assert {p["evidence"]["round_trips_after"] for p in problems} == {1}
+
+    def test_batched_and_multi_row_writes_are_ignored(self):
+        multi = _ev('INSERT INTO "t" ("a") VALUES (%s), (%s)', params=(1, 2))
+        many = _ev('INSERT INTO "t" ("a") VALUES (%s)', params=[(1,), (2,)])
+        many.many = True
+        assert classify_loop_writes([multi] * 6 + [many] * 6) == ([], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,13 @@
+import sqlite3
 import unittest
 
 from queryshield_probe.explain_checks import (
     analyze_plan_missing_index,
     analyze_plan_sort_without_index,
     analyze_select_star_large,
+    explain_classify,
 )
+from queryshield_probe.explain_sqlite import annotate_plan, build_plan_tree
 from queryshield_probe.report import _get_explain_handler
 
 
@@ -39,6 +42,104 @@ class ExplainChecksTest(unittest.TestCase):
         assert p["suggestion"]["kind"] == "avoid_select_star"
 
 
+class SQLitePlanChecksTest(unittest.TestCase):
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.executescript(
+            "CREATE TABLE app_author (id INTEGER PRIMARY KEY, name TEXT);"
+            "CREATE TABLE app_book (id INTEGER PRIMARY KEY, author_id INT, title TEXT, created_at TEXT);"
+            "CREATE INDEX app_book_author_id ON app_book (author_id);"
+        )
+
+    def _plan(self, sql):
+        rows = self.db.execute("EXPLAIN QUERY PLAN " + sql.replace("%s", "?"), (1,)).fetchall()
+        return annotate_plan(build_plan_tree(rows), sql)
+
+    def test_scan_with_filter_is_missing_index(self):
+        sql = 'SELECT * FROM "app_book" WHERE "app_book"."title" = %s'
+        probs = explain_classify(sql, self._plan(sql))
+        assert [p["type"] for p in probs] == ["MISSING_INDEX"]
+        assert probs[0]["suggestion"]["args"]["columns"] == ["title"]
+        assert probs[0]["suggestion"]["ddl"].startswith('CREATE INDEX IF NOT EXISTS "idx_app_book_')
+
+    def test_temp_btree_for_order_by(self):
+        sql = 'SELECT * FROM "app_book" WHERE "app_book"."author_id" = %s ORDER BY "app_book"."created_at" DESC'
+        probs = explain_classify(sql, self._plan(sql))
+        assert [p["type"] for p in probs] == ["SORT_WITHOUT_INDEX"]
+        assert probs[0]["suggestion"]["args"]["columns"] == ["author_id", "created_at DESC"]
+
+    def test_indexed_search_is_clean(self):
+        sql = 'SELECT * FROM "app_book" WHERE "app_book"."author_id" = %s'
+        assert explain_classify(sql, self._plan(sql)) == []
+
+    def test_automatic_index(self):
+        plan = build_plan_tree(
+            [(3, 0, 0, "SCAN a"), (8, 0, 0, "SEARCH b USING AUTOMATIC COVERING INDEX (author_id=?)")]
+        )
+        probs = explain_classify("SELECT * FROM a, b WHERE b.author_id = a.id", plan)
+        assert probs[0]["type"] == "MISSING_INDEX"
+        assert probs[0]["suggestion"]["args"] == {"schema": None, "table": "b", "columns": ["author_id"]}
+
+
+class MySQLPlanChecksTest(unittest.TestCase):
+    """Synthetic EXPLAIN FORMAT=JSON ``query_block`` trees."""
+
+    def test_full_scan_is_missing_index(self):
+        plan = {
+            "select_id": 1,
+            "table": {
+                "table_name": "books",
+                "access_type": "ALL",
+                "rows_examined_per_scan": 50000,
+                "rows_produced_per_join": 5000,
+                "attached_condition": "(`app`.`books`.`author_id` = 42)",
+            },
+        }
+        probs = explain_classify("SELECT `books`.`id` FROM `books` WHERE `books`.`author_id` = ?", plan)
+        mi = next(p for p in probs if p["type"] == "MISSING_INDEX")
+        assert mi["suggestion"]["args"]["columns"] == ["author_id"]
+        assert mi["suggestion"]["ddl"].startswith("ALTER TABLE `books` ADD INDEX")
+        assert "ALGORITHM=INPLACE, LOCK=NONE" in mi["suggestion"]["ddl"]
+
+    def test_nested_loop_without_key(self):
+        plan = {
+            "select_id": 1,
+            "nested_loop": [
+                {"table": {"table_name": "a", "access_type": "ALL", "rows_examined_per_scan": 200,
+                           "rows_produced_per_join": 200}},
+                {"table": {"table_name": "b", "access_type": "ALL", "rows_examined_per_scan": 300,
+                           "rows_produced_per_join": 600,
+                           "attached_condition": "(`app`.`b`.`author_id` = `app`.`a`.`id`)"}},
+            ],
+        }
+        probs = explain_classify("SELECT `a`.`id` FROM `a` JOIN `b` ON `b`.`author_id` = `a`.`id`", plan)
+        mi = next(p for p in probs if p["type"] == "MISSING_INDEX")
+        assert mi["evidence"]["relation"] == "b"
+        assert mi["suggestion"]["args"]["columns"] == ["author_id"]
+        assert mi["explain"]["node"] == "nested_loop"
+
+    def test_filesort_and_temporary_table(self):
+        plan = {
+            "select_id": 1,
+            "ordering_operation": {
+                "using_filesort": True,
+                "grouping_operation": {
+                    "using_temporary_table": True,
+                    "table": {"table_name": "books", "access_type": "ref", "key": "books_author_id",
+                              "rows_examined_per_scan": 10},
+                },
+            },
+        }
+        sql = "SELECT `books`.`genre`, COUNT(*) FROM `books` GROUP BY `books`.`genre` ORDER BY `books`.`genre` DESC"
+        probs = explain_classify(sql, plan)
+        sorts = [p for p in probs if p["type"] == "SORT_WITHOUT_INDEX"]
+        assert len(sorts) == 2
+        assert sorts[0]["suggestion"]["args"]["columns"] == ["genre DESC"]
+        assert sorts[1]["id"].startswith("explain:temporary_table:")
+        assert sorts[1]["suggestion"]["args"]["columns"] == ["genre"]
+        assert not [p for p in probs if p["type"] == "MISSING_INDEX"]
+
+
 class VendorDetectionTest(unittest.TestCase):
     def test_get_explain_handler_postgresql(self):
         handler = _get_explain_handler("postgresql")
@@ -52,7 +153,8 @@ class VendorDetectionTest(unittest.TestCase):
 
     def test_get_explain_handler_sqlite(self):
         handler = _get_explain_handler("sqlite")
-        assert handler is None
+        assert handler is not None
+        assert handler.__module__.endswith("explain_sqlite")
 
     def test_get_explain_handler_unknown(self):
         handler = _get_explain_handler("unknown")
@@ -0,0 +1,84 @@
+import json
+import unittest
+
+from queryshield_probe.explain_pg import ExplainSession, explain_query
+
+
+PLAN = [{"Plan": {"Node Type": "Seq Scan", "Relation Name": "books", "Plan Rows": 10}}]
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+        if sql.startswith("EXPLAIN"):
+            self._row = (json.dumps(PLAN),)
+        elif "current_setting" in sql:
+            self._row = tuple("0" for _ in params)
+        else:
+            self._row = (None,)
+
+    def fetchone(self):
+        return self._row
+
+
+class _FakeConnection:
+    vendor = "postgresql"
+
+    def __init__(self):
+        self.executed = []
+        self.copies = []
+        self.closed = False
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def copy(self):
+        c = _FakeConnection()
+        self.copies.append(c)
+        return c
+
+    def close(self):
+        self.closed = True
+
+
+class ExplainSessionTest(unittest.TestCase):
+    def test_settings_applied_once_on_dedicated_connection(self):
+        conn = _FakeConnection()
+        with ExplainSession(conn, timeout_ms=250, settings={"enable_seqscan": "on"}) as session:
+            plans = [session.explain(f"SELECT * FROM books WHERE id = {i}", None) for i in range(3)]
+        assert conn.executed == []
+        dedicated = conn.copies[0]
+        assert dedicated.closed
+        set_calls = [s for s in dedicated.executed if "set_config" in s]
+        explains = [s for s in dedicated.executed if s.startswith("EXPLAIN")]
+        assert len(set_calls) == 1
+        assert len(explains) == 3
+        assert plans[0]["Node Type"] == "Seq Scan"
+
+    def test_pipeline_falls_back_without_psycopg3(self):
+        conn = _FakeConnection()
+        with ExplainSession(conn) as session:
+            assert not session.supports_pipeline()
+            plans = session.explain_many([("SELECT 1", None), ("SELECT 2", None)], pipeline=True)
+        assert len(plans) == 2 and all(p for p in plans)
+
+    def test_explain_query_restores_previous_settings(self):
+        conn = _FakeConnection()
+        plan = explain_query(conn, "SELECT * FROM books", None, timeout_ms=100)
+        assert plan["Relation Name"] == "books"
+        assert not conn.copies
+        assert sum(1 for s in conn.executed if "set_config" in s) == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from queryshield_probe.hypopg import hypopg_available, hypothetical_ddl, validate_index_advice
+
+
+SEQ_PLAN = {"Node Type": "Seq Scan", "Relation Name": "books", "Total Cost": 944.0, "Filter": "(author_id = 1)"}
+
+
+class _FakeSession:
+    """Answers the HypoPG calls; the planner picks an index on ``useful`` columns only."""
+
+    def __init__(self, installed=True, useful=("author_id",)):
+        self.installed = installed
+        self.useful = useful
+        self.calls = []
+        self.hypo = None
+
+    def query(self, sql, params=None):
+        self.calls.append(sql)
+        if "FROM pg_extension" in sql:
+            return [(1,)] if self.installed else []
+        if "CREATE EXTENSION" in sql:
+            self.installed = True
+            return []
+        if "hypopg_create_index" in sql:
+            self.hypo = params[0]
+            return [(13543, "<13543>btree_books_author_id")]
+        if "hypopg_drop_index" in sql:
+            self.hypo = None
+            return [(True,)]
+        raise AssertionError(sql)
+
+    def explain(self, sql, params):
+        if self.hypo and any(f'("{c}"' in self.hypo for c in self.useful):
+            return {"Node Type": "Index Scan", "Index Name": "<13543>btree_books_author_id", "Total Cost": 8.3}
+        return dict(SEQ_PLAN)
+
+
+def _item(columns, sql):
+    return {"dialect": "postgresql", "schema": "public", "table": "books", "columns": columns,
+            "statements": [sql], "weight_ms": 10.0}
+
+
+class HypoPGTest(unittest.TestCase):
+    def test_only_an_installed_extension_is_used(self):
+        assert hypopg_available(_FakeSession())
+        session = _FakeSession(installed=False)
+        assert not hypopg_available(session)
+        assert not any("CREATE EXTENSION" in c for c in session.calls)
+
+    def test_plain_ddl_for_hypopg(self):
+        ddl = hypothetical_ddl(_item(["author_id", "created_at DESC"], "q"))
+        assert ddl == 'CREATE INDEX ON "public"."books"("author_id", "created_at" DESC)'
+
+    def test_ignored_index_is_rejected(self):
+        session = _FakeSession()
+        statements = {"q1": ("SELECT id FROM books WHERE author_id = %s", (1,)),
+                      "q2": ("SELECT id FROM books WHERE isbn = %s", ("x",))}
+        plans = {"q1": SEQ_PLAN, "q2": SEQ_PLAN}
+        kept, rejected = validate_index_advice(
+            session, [_item(["isbn"], "q2"), _item(["author_id"], "q1")], statements, plans
+        )
+        assert [i["columns"] for i in kept] == [["author_id"]]
+        assert kept[0]["rank"] == 1
+        assert kept[0]["validation"]["cost_before"] == 944.0
+        assert kept[0]["validation"]["cost_after"] == 8.3
+        assert [i["columns"] for i in rejected] == [["isbn"]]
+        assert rejected[0]["validation"]["used_by"] == 0
+        # Every hypothetical index is dropped again
+        assert sum("hypopg_drop_index" in c for c in session.calls) == 2
+
+    def test_zero_cost_after_is_kept(self):
+        session = _FakeSession()
+        session.explain = lambda sql, params: {"Node Type": "Index Only Scan", "Index Name": "<13543>btree_books_author_id", "Total Cost": 0.0}
+        kept, _rejected = validate_index_advice(
+            session, [_item(["author_id"], "q1")], {"q1": ("SELECT id FROM books WHERE author_id = %s", (1,))}, {"q1": SEQ_PLAN}
+        )
+        assert kept[0]["validation"]["cost_after"] == 0.0
+
+    def test_unchecked_index_is_kept(self):
+        kept, rejected = validate_index_advice(_FakeSession(), [_item(["author_id"], "unknown")], {}, {})
+        assert len(kept) == 1 and "validation" not in kept[0] and not rejected
+
+
+if __name__ == "__main__":
+    unittest.main()
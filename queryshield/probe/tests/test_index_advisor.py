@@ -0,0 +1,64 @@
+import unittest
+
+from queryshield_probe.index_advisor import advise_indexes
+
+
+def _seq_scan(relation, flt, rows=50000, alias=None):
+    node = {"Node Type": "Seq Scan", "Relation Name": relation, "Plan Rows": rows, "Filter": flt}
+    if alias:
+        node["Alias"] = alias
+    return node
+
+
+class IndexAdvisorTest(unittest.TestCase):
+    def test_prefix_candidates_merge_into_one_index(self):
+        filter_plan = _seq_scan("books", "(author_id = 1)")
+        sort_plan = {
+            "Node Type": "Sort",
+            "Sort Key": ["books.created_at DESC"],
+            "Plans": [_seq_scan("books", "(author_id = 1)", rows=10)],
+        }
+        advice = advise_indexes(
+            [
+                ("SELECT id FROM books WHERE author_id = ?", filter_plan, 120.0, 40),
+                ("SELECT id FROM books WHERE author_id = ? ORDER BY created_at DESC", sort_plan, 30.0, 10),
+            ]
+        )
+        assert len(advice) == 1
+        idx = advice[0]
+        assert idx["columns"] == ["author_id", "created_at DESC"]
+        assert idx["weight_ms"] == 150.0 and idx["calls"] == 50
+        assert len(idx["statements"]) == 2
+        assert idx["ddl"].startswith('CREATE INDEX CONCURRENTLY IF NOT EXISTS "idx_books_')
+
+    def test_ranked_by_db_time_with_nested_loop_join(self):
+        join_plan = {
+            "Node Type": "Nested Loop",
+            "Join Filter": "(r.book_id = b.id)",
+            "Plans": [
+                {"Node Type": "Index Scan", "Relation Name": "books", "Alias": "b"},
+                {"Node Type": "Seq Scan", "Relation Name": "reviews", "Alias": "r"},
+            ],
+        }
+        advice = advise_indexes(
+            [
+                ("SELECT id FROM authors WHERE name = ?", _seq_scan("authors", "(name = 'x')"), 5.0, 1),
+                ("SELECT r.id FROM books b JOIN reviews r ON r.book_id = b.id", join_plan, 80.0, 8),
+            ]
+        )
+        assert [(i["table"], i["columns"]) for i in advice] == [("reviews", ["book_id"]), ("authors", ["name"])]
+        assert [i["rank"] for i in advice] == [1, 2]
+
+    def test_unrelated_column_sets_stay_separate(self):
+        advice = advise_indexes(
+            [
+                ("q1", _seq_scan("books", "(author_id = 1)"), 10.0, 1),
+                ("q2", _seq_scan("books", "(isbn = 'x')"), 10.0, 1),
+                ("q3", None, 99.0, 1),
+            ]
+        )
+        assert sorted(tuple(i["columns"]) for i in advice) == [("author_id",), ("isbn",)]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from queryshield_probe.capture import ProbeWrapper, Recorder
+
+
+def _exporter():
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    except ImportError:
+        raise unittest.SkipTest("opentelemetry-sdk not installed")
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider, exporter
+
+
+class RecorderSpansTest(unittest.TestCase):
+    def test_tests_and_queries_become_spans(self):
+        from queryshield_probe.otel import SpanEmitter
+
+        provider, exporter = _exporter()
+        recorder = Recorder(nplus1_threshold=3, spans=SpanEmitter(provider, nplus1_threshold=3))
+        probe = ProbeWrapper(recorder)
+        recorder.start_test("app.tests.BooksTest.test_list")
+        for author_id in range(3):
+            probe(lambda *args: None, f"SELECT * FROM authors WHERE id = {author_id}", None, False, {})
+        recorder.end_test("app.tests.BooksTest.test_list")
+        *queries, test = exporter.get_finished_spans()
+
+        assert test.name == "app.tests.BooksTest.test_list" and test.parent is None
+        assert [q.attributes["queryshield.nplus1"] for q in queries] == [False, False, True]
+        first = queries[0]
+        assert first.parent.span_id == test.context.span_id
+        assert first.attributes["db.statement"] == "SELECT * FROM authors WHERE id = ?"
+        assert first.attributes["queryshield.test"] == "app.tests.BooksTest.test_list"
+        assert first.attributes["code.function"] == "test_tests_and_queries_become_spans"
+        assert test.start_time <= first.start_time <= queries[-1].end_time <= test.end_time
+
+    def test_without_tracker_spans_are_not_tagged(self):
+        from queryshield_probe.otel import SpanEmitter
+
+        provider, exporter = _exporter()
+        recorder = Recorder(spans=SpanEmitter(provider, nplus1_threshold=1))
+        ProbeWrapper(recorder)(lambda *args: None, "SELECT 1", None, False, {})
+        [span] = exporter.get_finished_spans()
+        assert span.attributes["queryshield.repeats"] == 0 and span.attributes["queryshield.nplus1"] is False
+
+
+if __name__ == "__main__":
+    unittest.main()
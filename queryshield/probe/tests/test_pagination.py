@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+from queryshield_probe.capture import QueryEvent
+from queryshield_probe.pagination import classify_pagination
+
+
+def _ev(sql, params=None, ms=10.0, stack=None):
+    e = QueryEvent()
+    e.sql = sql
+    e.params = params
+    e.duration_ms = ms
+    e.stack = stack or []
+    return e
+
+
+BOOKS_PAGE = 'SELECT "app_book"."id", "app_book"."title" FROM "app_book" ORDER BY "app_book"."created_at" DESC'
+COUNT_BOOKS = 'SELECT COUNT(*) AS "__count" FROM "app_book"'
+COUNT_PLAN = {
+    "Node Type": "Aggregate",
+    "Plans": [{"Node Type": "Seq Scan", "Relation Name": "app_book", "Plan Rows": 250000}],
+}
+SMALL_COUNT_PLAN = {
+    "Node Type": "Aggregate",
+    "Plans": [{"Node Type": "Seq Scan", "Relation Name": "app_book", "Plan Rows": 40}],
+}
+
+
+class DeepOffsetTest(unittest.TestCase):
+    def test_literal_offsets(self):
+        events = [_ev(f"{BOOKS_PAGE} LIMIT 20 OFFSET {off}") for off in (0, 20, 4980)]
+        plan = {"Node Type": "Limit", "Plans": [{"Node Type": "Sort", "Plan Rows": 5000}]}
+        problems, tags = classify_pagination(events, {f"{BOOKS_PAGE} LIMIT ? OFFSET ?": plan})
+        assert [p["type"] for p in problems] == ["DEEP_OFFSET"]
+        ev = problems[0]["evidence"]
+        assert (ev["max_offset"], ev["limit"], ev["offset_source"]) == (4980, 20, "literal")
+        assert (ev["executions"], ev["deep_executions"]) == (3, 1)
+        assert ev["db_time_ms"] == 10.0 and ev["attributable_ms"] == 9.96
+        assert ev["input_rows_estimate"] == 5000.0
+        assert problems[0]["suggestion"] == {
+            "kind": "keyset_pagination",
+            "args": {"table": "app_book", "order_by": ["created_at DESC"]},
+        }
+        assert list(tags) == [2]
+
+    def test_bound_parameters(self):
+        pyformat = _ev("SELECT id FROM books WHERE title <> '?' LIMIT %s OFFSET %s", params=(50, 20000))
+        named = _ev("SELECT id FROM books LIMIT %(limit)s OFFSET %(offset)s", params={"limit": 50, "offset": 5000})
+        mysql = _ev("SELECT id FROM books LIMIT 3000, 50")
+        shallow = _ev("SELECT id FROM authors LIMIT $1 OFFSET $2", params=[50, 100])
+        problems, _tags = classify_pagination([pyformat, named, mysql, shallow])
+        found = sorted((p["evidence"]["max_offset"], p["evidence"]["limit"]) for p in problems)
+        assert found == [(3000, 50), (5000, 50), (20000, 50)]
+
+
+class CountStarTest(unittest.TestCase):
+    def test_count_next_to_page_query_on_large_table(self):
+        events = [_ev(COUNT_BOOKS, ms=40.0), _ev(f"{BOOKS_PAGE} LIMIT 20 OFFSET 40")]
+        problems, tags = classify_pagination(events, {COUNT_BOOKS: COUNT_PLAN})
+        assert [(p["type"], p["evidence"]["usage"]) for p in problems] == [("COUNT_STAR", "paging")]
+        assert problems[0]["suggestion"]["kind"] == "estimated_count"
+        assert problems[0]["evidence"]["attributable_ms"] == 40.0
+        assert problems[0]["evidence"]["rows_estimate"] == 250000.0
+        # Small tables and counts without a page query are fine
+        assert classify_pagination(events, {COUNT_BOOKS: SMALL_COUNT_PLAN})[0] == []
+        assert classify_pagination(events[:1], {COUNT_BOOKS: COUNT_PLAN})[0] == []
+
+    def test_count_used_as_existence_check(self):
+        lines = [
+            "def has_books(qs):",
+            "    if qs.count() > 0:",
+            "    if Book.objects.filter(author=a).count():",
+            "    return qs.count() != 0",
+            "    if qs.count() > 5:",
+            "    total = qs.count()",
+            "    if ready and qs.count():",
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+            f.write("\n".join(lines) + "\n")
+        self.addCleanup(os.unlink, f.name)
+        plans = {COUNT_BOOKS: COUNT_PLAN}
+        for line in (2, 3, 4):
+            events = [_ev(COUNT_BOOKS, stack=[(f.name, "has_books", line)])]
+            problems, _tags = classify_pagination(events, plans)
+            assert [(p["type"], p["suggestion"]["kind"]) for p in problems] == [("COUNT_STAR", "exists")], line
+            # Cheap counts on small tables are not worth reporting
+            assert classify_pagination(events, {COUNT_BOOKS: SMALL_COUNT_PLAN})[0] == []
+        for line in (5, 6, 7):
+            assert classify_pagination([_ev(COUNT_BOOKS, stack=[(f.name, "has_books", line)])], plans)[0] == [], line
+        # Grouped counts are reports, not existence checks
+        grouped = _ev('SELECT COUNT(*) FROM "app_book" GROUP BY "author_id"', stack=[(f.name, "has_books", 2)])
+        assert classify_pagination([grouped], plans)[0] == []
+
+    def test_statement_shape_decides_without_a_row_estimate(self):
+        # No plan, or a SQLite plan, which has no row estimates
+        sqlite_plan = {
+            "dialect": "sqlite", "id": 0, "detail": "QUERY PLAN", "op": "QUERY PLAN",
+            "children": [{"detail": "SCAN app_book", "op": "SCAN app_book", "children": []}],
+        }
+        events = [_ev(COUNT_BOOKS), _ev(f"{BOOKS_PAGE} LIMIT 20 OFFSET 40")]
+        for plans in (None, {COUNT_BOOKS: sqlite_plan}):
+            problems, _tags = classify_pagination(events, plans)
+            assert [(p["type"], p["evidence"]["usage"]) for p in problems] == [("COUNT_STAR", "paging")]
+            assert problems[0]["evidence"]["rows_estimate"] is None
+            assert classify_pagination(events[:1], plans)[0] == []
+
+if __name__ == "__main__":
+    unittest.main()
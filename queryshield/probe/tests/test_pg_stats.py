@@ -0,0 +1,58 @@
+import unittest
+
+from queryshield_probe.pg_stats import StatsTracker, usage_between, usage_report
+
+
+def _snap(books_scans=0, author_idx=0, isbn_idx=0, pkey=0):
+    return {
+        1: ("t", "public", "books", None, books_scans, books_scans * 100, None, None),
+        2: ("i", "public", "books", "books_author_id_idx", author_idx, author_idx, False, False),
+        3: ("i", "public", "books", "books_isbn_key", isbn_idx, isbn_idx, True, False),
+        4: ("i", "public", "books", "books_pkey", pkey, pkey, True, True),
+    }
+
+
+class PgStatsTest(unittest.TestCase):
+    def test_unused_excludes_constraint_indexes(self):
+        report = usage_report(_snap(), _snap(books_scans=3, pkey=5))
+        assert report["unused_indexes"] == [{"schema": "public", "table": "books", "index": "books_author_id_idx"}]
+        assert report["indexes"][0]["index"] == "books_pkey" and report["indexes"][0]["scans"] == 5
+        table = report["tables"][0]
+        assert (table["seq_scan"], table["seq_tup_read"], table["idx_scan"]) == (3, 300, 5)
+
+    def test_usage_between_skips_idle_relations(self):
+        usage = usage_between(_snap(author_idx=2), _snap(author_idx=4))
+        assert usage == {"index_scans": {"public.books_author_id_idx": 2}, "seq_scans": {}}
+
+    def test_tracker_attributes_scans_per_test(self):
+        snaps = iter([_snap(), _snap(), _snap(author_idx=2), _snap(author_idx=2), _snap(author_idx=2, books_scans=1),
+                      _snap(author_idx=2, books_scans=1)])
+        closed = []
+        tracker = StatsTracker(lambda: next(snaps), close=lambda: closed.append(True))
+        tracker.start()
+        tracker.start_test("t1")
+        tracker.end_test("t1")
+        tracker.start_test("t2")
+        tracker.end_test("t2")
+        report = tracker.finish()
+        assert closed == [True]
+        assert report["per_test"] == {
+            "t1": {"index_scans": {"public.books_author_id_idx": 2}, "seq_scans": {}},
+            "t2": {"index_scans": {}, "seq_scans": {"public.books": 1}},
+        }
+        assert not any(i["index"] == "books_author_id_idx" for i in report["unused_indexes"])
+
+    def test_tracker_disables_after_failure(self):
+        def boom():
+            raise PermissionError("permission denied for pg_stat_user_indexes")
+
+        tracker = StatsTracker(boom)
+        tracker.start()
+        tracker.start_test("t1")
+        tracker.end_test("t1")
+        assert not tracker.enabled
+        assert tracker.finish() is None
+
+
+if __name__ == "__main__":
+    unittest.main()
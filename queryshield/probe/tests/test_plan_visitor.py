@@ -0,0 +1,73 @@
+import unittest
+
+from queryshield_probe.plan_visitor import ANY_NODE, PlanRule, PlanRules, PlanWalk
+
+
+PG_PLAN = {
+    "Node Type": "Limit",
+    "Plans": [
+        {
+            "Node Type": "Sort",
+            "Plans": [
+                {
+                    "Node Type": "Hash Join",
+                    "Plans": [
+                        {"Node Type": "Seq Scan", "Relation Name": "books"},
+                        {"Node Type": "Hash", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "authors"}]},
+                    ],
+                }
+            ],
+        }
+    ],
+}
+
+
+class PlanWalkTest(unittest.TestCase):
+    def test_preorder_with_parent_and_subtree(self):
+        walk = PlanWalk(PG_PLAN)
+        kinds = [n.kind for n in walk.nodes]
+        assert kinds == ["Limit", "Sort", "Hash Join", "Seq Scan", "Hash", "Seq Scan"]
+        sort = walk.of_kind("Sort")[0]
+        assert [d.kind for d in walk.descendants(sort)] == kinds[2:]
+        scans = walk.of_kind("Seq Scan")
+        assert [s.get("Relation Name") for s in scans] == ["books", "authors"]
+        assert scans[1].parent.kind == "Hash" and scans[1].depth == 4
+
+    def test_mysql_nested_loop_driver(self):
+        plan = {
+            "select_id": 1,
+            "nested_loop": [
+                {"table": {"table_name": "a", "rows_produced_per_join": 40}},
+                {"table": {"table_name": "b", "rows_produced_per_join": 80}},
+                {"table": {"table_name": "c"}},
+            ],
+        }
+        walk = PlanWalk(plan)
+        assert walk.dialect == "mysql"
+        assert [(t.get("table_name"), t.driver) for t in walk.of_kind("table")] == [
+            ("a", 1.0),
+            ("b", 40.0),
+            ("c", 3200.0),
+        ]
+
+
+class PlanRulesTest(unittest.TestCase):
+    def test_dispatch_by_kind_and_first_match(self):
+        seen = []
+
+        def scan(sql, n, walk):
+            seen.append(n.kind)
+            return {"id": n.get("Relation Name")}
+
+        def anything(sql, n, walk):
+            return {"id": "any"} if n.kind == "Hash" else None
+
+        rules = PlanRules([PlanRule("scan", ("Seq Scan",), scan), PlanRule("any", (ANY_NODE,), anything)])
+        problems = rules.evaluate("SELECT 1", PlanWalk(PG_PLAN))
+        # Each rule reports once; the scan handler never sees other node kinds
+        assert problems == [{"id": "books"}, {"id": "any"}]
+        assert seen == ["Seq Scan"]
+
+
+if __name__ == "__main__":
+    unittest.main()
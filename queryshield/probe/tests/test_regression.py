@@ -0,0 +1,104 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from queryshield_probe.capture import QueryEvent
+from queryshield_probe.regression import compare_timings, mann_whitney_u, merge_timings, min_runs, run_timings
+
+
+def _ev(sql, ms):
+    e = QueryEvent()
+    e.sql = sql
+    e.duration_ms = ms
+    return e
+
+
+def _timings(rng, runs, lookup_ms, list_ms=5.0):
+    samples = []
+    for _ in range(runs):
+        events = [_ev(f"SELECT * FROM authors WHERE id = {i}", rng.gauss(lookup_ms, lookup_ms * 0.1)) for i in range(5)]
+        events.append(_ev("SELECT * FROM books", rng.gauss(list_ms, 0.5)))
+        samples.append(run_timings({"t": events}))
+    return merge_timings(samples)
+
+
+class RegressionTest(unittest.TestCase):
+    def test_samples_are_pooled_per_test_and_fingerprint(self):
+        timings = _timings(random.Random(1), 4, 1.0)
+        assert timings["runs"] == 4
+        t = timings["tests"]["t"]
+        assert len(t["db_time_ms"]) == 4
+        assert len(t["fingerprints"]["SELECT * FROM authors WHERE id = ?"]) == 20
+
+    def test_mann_whitney_one_sided(self):
+        _u, p = mann_whitney_u([5, 6, 7, 8, 9, 10], [1, 2, 3, 4, 5, 6])
+        assert p < 0.01
+        _u, p = mann_whitney_u([1, 2, 3, 4, 5, 6], [5, 6, 7, 8, 9, 10])
+        assert p > 0.9
+        # All ties: no evidence either way
+        assert mann_whitney_u([1, 1, 1], [1, 1, 1])[1] == 1.0
+
+    def test_only_significant_regressions_are_reported(self):
+        rng = random.Random(7)
+        baseline = _timings(rng, 10, 2.0)
+        same = _timings(rng, 10, 2.0)
+        slower = _timings(rng, 10, 3.0)
+        assert compare_timings(baseline, same) == []
+        regressions = compare_timings(baseline, slower)
+        assert {r["fingerprint"] for r in regressions} == {None, "SELECT * FROM authors WHERE id = ?"}
+        lookup = [r for r in regressions if r["fingerprint"]][0]
+        assert lookup["effect_size"] > 0.9 and lookup["increase_pct"] > 30
+        assert lookup["n_baseline"] == lookup["n_current"] == 50
+
+    def test_small_shifts_are_not_reported(self):
+        rng = random.Random(3)
+        baseline = _timings(rng, 10, 2.0)
+        # Significant but below the 10% / 0.5 ms thresholds
+        slightly = _timings(rng, 10, 2.1)
+        assert compare_timings(baseline, slightly) == []
+        assert compare_timings(baseline, slightly, min_increase_pct=0, min_increase_ms=0, min_effect=0)
+        # Three runs are too few to compare test DB times; the 15 pooled
+        # lookups still are
+        regressions = compare_timings(_timings(rng, 3, 2.0), _timings(rng, 3, 9.0))
+        assert [r["fingerprint"] for r in regressions] == ["SELECT * FROM authors WHERE id = ?"]
+
+    def test_test_level_family_is_corrected_on_its_own(self):
+        rng = random.Random(5)
+
+        def suite(slow_ms):
+            tests = {}
+            for j in range(20):
+                db = [rng.gauss(100.0, 2.0) + (slow_ms if j == 0 else 0.0) for _ in range(10)]
+                fps = {f"SELECT * FROM t{j}_{i}": [rng.gauss(1.0, 0.1) for _ in range(50)] for i in range(20)}
+                tests[f"t{j}"] = {"db_time_ms": db, "fingerprints": fps}
+            return {"version": "1", "kind": "timings", "runs": 10, "tests": tests}
+
+        # 420 comparisons in one family would push the test's q-value past alpha
+        regressions = compare_timings(suite(0.0), suite(50.0))
+        assert [(r["test"], r["fingerprint"]) for r in regressions] == [("t0", None)]
+        assert min_runs(20) <= 10 < min_runs(500)
+
+    def test_min_runs(self):
+        assert (min_runs(1), min_runs(100), min_runs(110)) == (5, 10, 11)
+        assert min_runs(10 ** 9, limit=20) == 20
+
+    def test_record_baseline_honours_output_with_runs(self):
+        from unittest import mock
+
+        from typer.testing import CliRunner
+        from queryshield_cli import main
+
+        timings = _timings(random.Random(2), 5, 1.0)
+        with tempfile.TemporaryDirectory() as td:
+            out = os.path.join(td, "timings.json")
+            with mock.patch.object(main, "_run_timings", return_value=timings):
+                r = CliRunner().invoke(main.app, ["record-baseline", "--runs", "5", "--output", out])
+            assert r.exit_code == 0
+            with open(out, encoding="utf-8") as f:
+                assert json.load(f) == timings
+
+
+if __name__ == "__main__":
+    unittest.main()
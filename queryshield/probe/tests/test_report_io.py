@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from queryshield_probe.report_io import ReportReader, ReportWriter, copy_report, read_report, write_report
+
+
+def _report(n=3):
+    return {
+        "version": "1",
+        "run": {"mode": "tests", "duration_ms": 12.5},
+        "tests": [
+            {"name": f"t{i}", "queries_total": i, "queries": [{"normalized_sql": "SELECT ?" * 2000, "rows": None}]}
+            for i in range(n)
+        ],
+        "index_advice": [],
+        "cost_analysis": {"total_queries": 3, "estimated_monthly_cost": 25.0},
+    }
+
+
+class ReportIOTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def test_round_trips_and_keeps_key_order(self):
+        report = _report()
+        for name, fmt in (("a.json", None), ("b.json", "json"), ("c.json.gz", None)):
+            write_report(report, self.path(name), fmt)
+            back = read_report(self.path(name))
+            assert back == report and list(back) == list(report), name
+        with open(self.path("a.json"), encoding="utf-8") as f:
+            assert json.load(f) == report
+        with open(self.path("b.json"), encoding="utf-8") as f:
+            assert json.load(f) == report
+        # .json defaults to the indented layout; compact is --format json
+        with open(self.path("a.json"), encoding="utf-8") as f:
+            assert "\n  " in f.read()
+        with open(self.path("b.json"), encoding="utf-8") as f:
+            assert "\n  " not in f.read()
+        with gzip.open(self.path("c.json.gz"), "rt", encoding="utf-8") as f:
+            assert json.load(f) == report
+
+    def test_reads_tests_one_at_a_time(self):
+        write_report(_report(), self.path("r.json"))
+        with ReportReader(self.path("r.json")) as reader:
+            assert reader.header["run"]["duration_ms"] == 12.5 and reader.trailer == {}
+            names = [t["name"] for t in reader.tests()]
+            assert names == ["t0", "t1", "t2"]
+            assert reader.trailer["cost_analysis"]["total_queries"] == 3
+            with self.assertRaises(RuntimeError):
+                list(reader.tests())
+
+    def test_reads_reports_of_earlier_releases(self):
+        report = _report()
+        with open(self.path("old.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        assert read_report(self.path("old.json")) == report
+        with open(self.path("none.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": "1"}, f)
+        assert read_report(self.path("none.json")) == {"version": "1", "tests": []}
+
+    def test_empty_report_and_copy(self):
+        for fmt in ("json", "pretty"):
+            write_report({"version": "1", "tests": []}, self.path("e.json"), fmt)
+            with open(self.path("e.json"), encoding="utf-8") as f:
+                assert json.load(f) == {"version": "1", "tests": []}
+        write_report(_report(), self.path("src.json"), "pretty")
+        copy_report(self.path("src.json"), self.path("dst.json.gz"))
+        assert read_report(self.path("dst.json.gz")) == _report()
+
+    def test_msgpack(self):
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            self.skipTest("msgpack not installed")
+        write_report(_report(), self.path("r.msgpack"))
+        with ReportReader(self.path("r.msgpack")) as reader:
+            assert reader.format == "msgpack"
+            assert reader.read() == _report()
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ReportWriter(self.path("r.json"), "xml")
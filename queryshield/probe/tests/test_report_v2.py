@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+from queryshield_probe.report_io import read_report, write_report
+from queryshield_probe.report_v2 import convert_report, downgrade, load_report, upgrade
+
+
+SQL = 'SELECT "app_book"."id", "app_book"."title" FROM "app_book" WHERE "app_book"."author_id" = %s'
+STACK = [["/srv/app/views.py", "books", 12], ["/srv/app/tests.py", "test_books", 30]]
+
+
+def _query(i):
+    return {
+        "normalized_sql": SQL if i % 2 else "SELECT ?",
+        "duration_ms": 0.25 + i,
+        "rows": None,
+        "stack": STACK if i % 2 else STACK[1:],
+        "error": None,
+        "params": ["int"],
+        "params_hash": f"{i:016x}",
+        "tags": ["N+1"] if i == 3 else [],
+        "db_alias": "default",
+    }
+
+
+def _report(tests=3, queries=6):
+    return {
+        "version": "1",
+        "run": {"mode": "tests"},
+        "tests": [
+            {
+                "name": f"t{n}",
+                "queries_total": queries,
+                "top_fingerprint": {"sql": SQL, "count": queries // 2},
+                "problems": [],
+                "queries": [_query(i) for i in range(queries)],
+            }
+            for n in range(tests)
+        ],
+        "cost_analysis": {"total_queries": tests * queries},
+    }
+
+
+class ReportV2Test(unittest.TestCase):
+    def test_tables_hold_each_sql_and_frame_once(self):
+        v2 = upgrade(_report())
+        assert v2["version"] == "2"
+        assert sorted(e["sql"] for e in v2["fingerprints"]) == sorted([SQL, "SELECT ?"])
+        assert sorted(v2["callsites"]) == sorted(STACK)
+        assert len(v2["stacks"]) == 2
+        queries = v2["tests"][0]["queries"]
+        assert set(queries) == {"fingerprint", "stack", "duration_ms", "params", "params_hash", "tags"}
+        assert v2["fingerprints"][queries["fingerprint"][1]]["sql"] == SQL
+        assert v2["fingerprints"][v2["tests"][0]["top_fingerprint"]["fingerprint"]]["sql"] == SQL
+        assert len(json.dumps(v2)) < len(json.dumps(_report())) / 2
+
+    def test_round_trip(self):
+        report = _report()
+        assert downgrade(upgrade(report)) == report
+        assert upgrade(upgrade(report)) == upgrade(report)
+        assert downgrade(report) is report
+        empty = {"version": "1", "tests": [{"name": "t", "queries_total": 0, "top_fingerprint": None, "queries": []}]}
+        assert downgrade(upgrade(empty)) == empty
+
+    def test_convert_files(self):
+        d = tempfile.mkdtemp()
+        v1, v2, back = (os.path.join(d, n) for n in ("v1.json", "v2.json.gz", "back.json"))
+        write_report(_report(), v1)
+        convert_report(v1, v2)
+        assert read_report(v2) == upgrade(_report())
+        convert_report(v2, back, "1")
+        assert read_report(back) == _report()
+        assert load_report(v2) == load_report(v1) == _report()
+        with self.assertRaises(ValueError):
+            convert_report(v1, back, "3")
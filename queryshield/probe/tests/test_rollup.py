@@ -0,0 +1,80 @@
+import unittest
+
+from queryshield_probe.capture import QueryEvent
+from queryshield_probe.classify import NPlusOneTracker
+from queryshield_probe.report_io import ReportCollector
+from queryshield_probe.report_v2 import V2Writer, downgrade
+from queryshield_probe.rollup import FingerprintRollup
+
+
+def _ev(sql, ms=1.0, line=12, rows=None):
+    e = QueryEvent()
+    e.sql = sql
+    e.duration_ms = ms
+    e.rows = rows
+    e.stack = [("app/views.py", "books_view", line), ("app/tests.py", "test_view", 5)]
+    return e
+
+
+def _add(rollup, name, events):
+    tracker = NPlusOneTracker(5)
+    for e in events:
+        tracker.add(e.sql, e.stack)
+    rollup.add_test(name, events, tracker.normalized)
+    problems, _tags = tracker.finish()
+    return problems
+
+
+class FingerprintRollupTest(unittest.TestCase):
+    def _rollup(self):
+        rollup = FingerprintRollup()
+        lookups = [_ev(f"SELECT * FROM authors WHERE id = {i}", ms=2.0, rows=1) for i in range(6)]
+        problems = _add(rollup, "t_list", [_ev("SELECT * FROM books", ms=1.0, line=10, rows=20)] + lookups)
+        _add(rollup, "t_detail", [_ev("SELECT * FROM books", ms=3.0, line=30, rows=1)])
+        rollup.add_problems(problems)
+        return rollup
+
+    def test_entries_sorted_by_total_time(self):
+        books, authors = "SELECT * FROM books", "SELECT * FROM authors WHERE id = ?"
+        entries = self._rollup().entries()
+        assert [e["sql"] for e in entries] == [authors, books]
+        a, b = entries
+        assert (a["count"], a["total_ms"], a["mean_ms"], a["p95_ms"], a["rows_total"]) == (6, 12.0, 2.0, 2.0, 6)
+        assert (b["count"], b["total_ms"], b["tests"], b["rows_total"]) == (2, 4.0, 2, 21)
+        assert [t["name"] for t in b["top_tests"]] == ["t_detail", "t_list"]
+        assert a["call_sites"] == [{"file": "app/views.py", "function": "books_view", "line": 12, "count": 6}]
+        assert [p["type"] for p in a["problems"]] == ["N+1"] and b["problems"] == []
+
+    def test_plans_are_referenced_and_checked(self):
+        rollup = self._rollup()
+        plan = {"Node Type": "Seq Scan", "Relation Name": "books", "Plan Rows": 20000}
+        plans = rollup.attach_plans({("default", "SELECT * FROM books"): plan})
+        assert plans == [{"db_alias": "default", "plan": plan}]
+        entries = {e["sql"]: e for e in rollup.entries()}
+        books = entries["SELECT * FROM books"]
+        assert books["plan"] == 0 and entries["SELECT * FROM authors WHERE id = ?"]["plan"] is None
+        assert [(p["type"], p["tests"]) for p in books["problems"]] == [("SELECT_STAR_LARGE", 2)]
+
+    def test_django_statements_on_different_tables_stay_apart(self):
+        rollup = FingerprintRollup()
+        books = [_ev(f'SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = {i}') for i in range(3)]
+        authors = [_ev(f'SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = {i}', ms=2.0) for i in range(2)]
+        _add(rollup, "t_list", books + authors)
+        entries = rollup.entries()
+        assert [(e["sql"], e["count"]) for e in entries] == [
+            ('SELECT "app_author"."id" FROM "app_author" WHERE "app_author"."id" = ?', 2),
+            ('SELECT "app_book"."id" FROM "app_book" WHERE "app_book"."author_id" = ?', 3),
+        ]
+
+    def test_v2_fingerprint_table_carries_the_rollup(self):
+        rollup = self._rollup()
+        collector = ReportCollector()
+        writer = V2Writer(collector)
+        writer.reserve_fingerprints(rollup.order())
+        writer.begin({"version": "1"})
+        writer.write_test({"name": "t", "queries_total": 1, "top_fingerprint": {"sql": "SELECT * FROM books", "count": 1}})
+        writer.end({"fingerprints": rollup.entries()})
+        v2 = collector.report
+        assert v2["fingerprints"] == rollup.entries()
+        assert v2["tests"][0]["top_fingerprint"]["fingerprint"] == 1
+        assert downgrade(v2)["fingerprints"] == rollup.entries()